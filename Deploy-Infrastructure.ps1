@@ -49,6 +49,10 @@ $ScriptRoot = $PSScriptRoot
 $ModulesPath = Join-Path $ScriptRoot "modules"
 $LogPath = Join-Path $ScriptRoot "logs"
 $Timestamp = Get-Date -Format "yyyyMMdd-HHmmss"
+
+# Step start/end events for ecst-vmware.py (no-op unless ECST_EVENT_LOG is set)
+. (Join-Path $ModulesPath "00-Events.ps1")
+$currentStep = $null
 #endregion
 
 #region Logging Functions
@@ -128,6 +132,7 @@ try {
     
     #region Step 1: VCSA Deployment (Optional)
     if (!$SkipVCSA -and $Config.vcenter.deployNew) {
+        $currentStep = Start-EcstStep -Step vcsa
         Write-Banner "Step 1: Deploying VCSA"
         $vcsaScript = Join-Path $ScriptRoot "Deploy-VCSA.ps1"
         if (Test-Path $vcsaScript) {
@@ -136,38 +141,47 @@ try {
         } else {
             Write-Log "VCSA deployment script not found, skipping..." -Level WARN
         }
+        Complete-EcstStep $currentStep
     } else {
         Write-Log "Skipping VCSA deployment (using existing vCenter)" -Level INFO
+        Write-EcstEvent -Type step-end -Step vcsa -Status Skipped
     }
     #endregion
     
     #region Step 2: Connect to vCenter
+    $currentStep = Start-EcstStep -Step connect
     Write-Banner "Step 2: Connecting to vCenter"
     $connectScript = Join-Path $ModulesPath "01-Connect.ps1"
     . $connectScript
     Connect-VCenterServer -Server $Config.vcenter.server -Credential $vCenterCred
     Write-Log "Connected to vCenter: $($Config.vcenter.server)" -Level SUCCESS
+    Complete-EcstStep $currentStep
     #endregion
     
     #region Step 3: Create Datacenter and Cluster
+    $currentStep = Start-EcstStep -Step datacenter
     Write-Banner "Step 3: Creating Datacenter and Cluster"
     $dcScript = Join-Path $ModulesPath "02-Datacenter.ps1"
     . $dcScript
     New-VsphereDatacenter -Config $Config
     New-VsphereCluster -Config $Config
     Write-Log "Datacenter and Cluster created" -Level SUCCESS
+    Complete-EcstStep $currentStep
     #endregion
     
     #region Step 4: Add ESXi Hosts
+    $currentStep = Start-EcstStep -Step hosts
     Write-Banner "Step 4: Adding ESXi Hosts"
     $hostsScript = Join-Path $ModulesPath "03-Hosts.ps1"
     . $hostsScript
     Add-ESXiHostsToCluster -Config $Config -Credential $ESXiCred
     Write-Log "ESXi hosts added to cluster" -Level SUCCESS
+    Complete-EcstStep $currentStep
     #endregion
     
     #region Step 5: Configure Networking
     if (!$SkipNetworking) {
+        $currentStep = Start-EcstStep -Step networking
         Write-Banner "Step 5: Configuring Networking"
         $networkScript = Join-Path $ModulesPath "04-Networking.ps1"
         . $networkScript
@@ -176,26 +190,32 @@ try {
         Add-HostsToVDS -Config $Config
         Configure-VMotionStack -Config $Config
         Write-Log "Networking configuration completed" -Level SUCCESS
+        Complete-EcstStep $currentStep
     } else {
         Write-Log "Skipping networking configuration" -Level INFO
+        Write-EcstEvent -Type step-end -Step networking -Status Skipped
     }
     #endregion
     
     #region Step 6: Configure Storage (vSAN)
     if (!$SkipStorage) {
+        $currentStep = Start-EcstStep -Step storage
         Write-Banner "Step 6: Configuring vSAN Storage"
         $storageScript = Join-Path $ModulesPath "05-Storage.ps1"
         . $storageScript
         Enable-VsanCluster -Config $Config
         Configure-VsanDiskGroups -Config $Config -AutoClaim
         Write-Log "vSAN storage configuration completed" -Level SUCCESS
+        Complete-EcstStep $currentStep
     } else {
         Write-Log "Skipping storage configuration" -Level INFO
+        Write-EcstEvent -Type step-end -Step storage -Status Skipped
     }
     #endregion
     
     #region Step 7: Host Configuration (NTP, DNS, Syslog)
     if (!$SkipConfiguration) {
+        $currentStep = Start-EcstStep -Step configuration
         Write-Banner "Step 7: Applying Host Configuration"
         $configScript = Join-Path $ModulesPath "06-Configuration.ps1"
         . $configScript
@@ -204,8 +224,10 @@ try {
         Set-HostSyslogConfiguration -Config $Config
         Set-HostSecurityConfiguration -Config $Config
         Write-Log "Host configuration completed" -Level SUCCESS
+        Complete-EcstStep $currentStep
     } else {
         Write-Log "Skipping host configuration" -Level INFO
+        Write-EcstEvent -Type step-end -Step configuration -Status Skipped
     }
     #endregion
     
@@ -226,6 +248,9 @@ vSAN Enabled:    $($Config.storage.vsan.enabled)
     
 } catch {
     Write-Log "DEPLOYMENT FAILED: $($_.Exception.Message)" -Level ERROR
+    if ($currentStep) {
+        Complete-EcstStep $currentStep -Status Failed -Message $_.Exception.Message
+    }
     Write-Log "Stack Trace: $($_.ScriptStackTrace)" -Level ERROR
     throw
 } finally {
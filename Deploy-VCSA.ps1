@@ -134,6 +134,21 @@ function Deploy-VCSA {
 }
 
 function Wait-VCSADeployment {
+    <#
+    .SYNOPSIS
+        Wait until a new VCSA is usable, not just serving /ui
+    .DESCRIPTION
+        Each round checks TCP 443, the vSphere Client (/ui) and the REST API
+        (POST /api/session answers 401 without credentials once the API
+        gateway is up). The appliance is ready when all of them pass in the
+        same round. Rounds start a couple of seconds apart and back off to
+        -MaxIntervalSeconds with jitter; a check passing for the first time
+        resets the delay. ecst-vmware.py wait runs the same checks in
+        parallel and adds the appliance health API.
+    .OUTPUTS
+        $true when ready; the time each check first passed is printed and
+        kept in $script:VcsaReadinessPhases.
+    #>
     [CmdletBinding()]
     param(
         [Parameter(Mandatory)]
@@ -142,35 +157,90 @@ function Wait-VCSADeployment {
         [Parameter()]
         [int]$TimeoutMinutes = 60,
         
+        # Upper bound of the poll interval
         [Parameter()]
-        [int]$CheckIntervalSeconds = 30
+        [Alias("CheckIntervalSeconds")]
+        [int]$MaxIntervalSeconds = 30,
+        
+        # Probe this URL instead of https://<VCenterServer>, e.g. a local stub
+        [Parameter()]
+        [string]$BaseUrl
     )
     
-    Write-Host "Waiting for VCSA to become available: $VCenterServer" -ForegroundColor Cyan
+    if (!$BaseUrl) { $BaseUrl = "https://$VCenterServer" }
+    $BaseUrl = $BaseUrl.TrimEnd("/")
+    $uri = [Uri]$BaseUrl
+    
+    Write-Host "Waiting for VCSA to become available: $BaseUrl" -ForegroundColor Cyan
+    
+    $statusOf = {
+        param($Uri, $Method)
+        try {
+            $request = @{ Uri = $Uri; Method = $Method; UseBasicParsing = $true; TimeoutSec = 10; ErrorAction = 'Stop' }
+            if ($PSVersionTable.PSVersion.Major -ge 6) { $request.SkipCertificateCheck = $true }
+            [int](Invoke-WebRequest @request).StatusCode
+        }
+        catch {
+            if ($_.Exception.Response) { [int]$_.Exception.Response.StatusCode } else { 0 }
+        }
+    }
+    
+    $checks = [ordered]@{
+        "TCP $($uri.Port)" = {
+            $client = New-Object System.Net.Sockets.TcpClient
+            try {
+                $client.ConnectAsync($uri.Host, $uri.Port).Wait(5000) -and $client.Connected
+            }
+            catch { $false }
+            finally { $client.Close() }
+        }
+        "vSphere Client (/ui)" = { (& $statusOf "$BaseUrl/ui" "Get") -eq 200 }
+        "REST API" = { (& $statusOf "$BaseUrl/api/session" "Post") -in @(200, 201, 401) }
+    }
+    $phases = [ordered]@{}
     
     $stopwatch = [System.Diagnostics.Stopwatch]::StartNew()
     $maxWait = [TimeSpan]::FromMinutes($TimeoutMinutes)
+    $delay = 2.0
     $vcAvailable = $false
     
-    while ($stopwatch.Elapsed -lt $maxWait) {
-        try {
-            $response = Invoke-WebRequest -Uri "https://$VCenterServer/ui" -UseBasicParsing -TimeoutSec 10 -ErrorAction SilentlyContinue
-            
-            if ($response.StatusCode -eq 200) {
-                Write-Host "`nvCenter is now available!" -ForegroundColor Green
-                $vcAvailable = $true
-                break
+    while ($true) {
+        $progressed = $false
+        $passing = 0
+        foreach ($name in $checks.Keys) {
+            if (& $checks[$name]) {
+                $passing++
+                if (!$phases.Contains($name)) {
+                    $phases[$name] = $stopwatch.Elapsed.TotalSeconds
+                    $progressed = $true
+                    Write-Host "  [$($stopwatch.Elapsed.ToString("mm\:ss"))] $name is up" -ForegroundColor Green
+                }
             }
         }
-        catch {
-            $elapsed = $stopwatch.Elapsed.ToString("mm\:ss")
-            Write-Host "  [$elapsed] Waiting for vCenter to start..." -ForegroundColor Gray
+        
+        if ($passing -eq $checks.Count) {
+            Write-Host "`nvCenter is now available!" -ForegroundColor Green
+            $vcAvailable = $true
+            break
+        }
+        if ($stopwatch.Elapsed -ge $maxWait) {
+            break
         }
         
-        Start-Sleep -Seconds $CheckIntervalSeconds
+        $delay = if ($progressed) { 2.0 } else { [Math]::Min($delay * 1.5, $MaxIntervalSeconds) }
+        $sleep = [Math]::Min($delay * (Get-Random -Minimum 0.8 -Maximum 1.2), ($maxWait - $stopwatch.Elapsed).TotalSeconds)
+        Write-Host "  [$($stopwatch.Elapsed.ToString("mm\:ss"))] Waiting for vCenter to start ($passing/$($checks.Count) checks up)..." -ForegroundColor Gray
+        Start-Sleep -Milliseconds ([int]([Math]::Max(0, $sleep) * 1000))
     }
     
     $stopwatch.Stop()
+    $script:VcsaReadinessPhases = $phases
+    
+    $previous = 0.0
+    foreach ($name in $phases.Keys) {
+        Write-Host ("  {0,-22} up after {1,6:N1}s (phase {2:N1}s)" -f $name, $phases[$name], ($phases[$name] - $previous)) -ForegroundColor Gray
+        $previous = $phases[$name]
+    }
     
     if (!$vcAvailable) {
         Write-Host "Timeout waiting for vCenter after $TimeoutMinutes minutes" -ForegroundColor Red
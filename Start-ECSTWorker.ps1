@@ -0,0 +1,238 @@
+<#
+.SYNOPSIS
+    Long-lived PowerShell/PowerCLI worker for ecst-vmware.py
+.DESCRIPTION
+    Keeps PowerCLI, the automation modules and the vCenter connection loaded
+    across requests. The Python tool drives the worker over stdin/stdout:
+
+      Request  (stdin):  one JSON object per line
+                         {"id": 1, "op": "invoke", "modules": ["02-Datacenter.ps1"], "script": "...",
+                          "eventLog": "C:\\Temp\\ecst-events.ndjson"}
+                         {"id": 2, "op": "invoke", "modules": ["03-Hosts.ps1"], "script": "...",
+                          "credentials": {"esxiCredential": {"username": "root", "password": "..."}}}
+                         {"id": 3, "op": "connect", "server": "...", "username": "...", "password": "..."}
+                         {"id": 4, "op": "connect", "server": "...", "session": "..."}
+                         {"id": 5, "op": "logout", "server": "...", "session": "..."}
+                         {"id": 6, "op": "ping"}
+                         {"id": 7, "op": "exit", "logout": true}
+
+      Response (stdout): plain output lines, then a single frame line
+                         ##ECST## {"type": "end", "id": 1, "exitCode": 0, "error": null}
+
+    Frames are always prefixed with "##ECST##" so they can be told apart from
+    regular script output. Scripts can return structured data to Python with
+    Send-EcstData, which writes a "data" frame for the current request.
+
+    An invoke ends with exitCode 1 when the script throws or writes any error
+    record; errors it silences itself do not count.
+
+    When an invoke request carries "eventLog", ECST_EVENT_LOG points at that
+    file while the script runs so Write-EcstEvent (00-Events.ps1) can stream
+    progress events to Python.
+
+    An invoke request's "credentials" become PSCredential variables of the
+    given names for that script only, so passwords are never part of the
+    script text.
+
+    A credential connect returns the vCenter session token as a data frame.
+    Other workers attach to the same session by sending that token instead of
+    credentials, so Python logs in once for the whole pool. "exit" with
+    "logout": false leaves the shared session open for the remaining workers,
+    and "logout" ends an expired shared session once no worker uses it.
+.PARAMETER ModulesPath
+    Directory containing the numbered automation modules
+.NOTES
+    Started automatically by ecst-vmware.py; not intended to be run by hand.
+#>
+
+[CmdletBinding()]
+param(
+    [Parameter()]
+    [string]$ModulesPath = (Join-Path $PSScriptRoot "modules")
+)
+
+$ErrorActionPreference = "Continue"
+$ProgressPreference = "SilentlyContinue"
+[Console]::InputEncoding = [System.Text.Encoding]::UTF8
+[Console]::OutputEncoding = [System.Text.Encoding]::UTF8
+
+$FramePrefix = "##ECST##"
+$LoadedModules = @{}
+$script:CurrentRequestId = $null
+
+function Send-Frame {
+    param([hashtable]$Frame)
+
+    $json = $Frame | ConvertTo-Json -Compress -Depth 10
+    [Console]::Out.WriteLine("$FramePrefix $json")
+    [Console]::Out.Flush()
+}
+
+function Send-EcstData {
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory, ValueFromPipeline)]
+        $InputObject
+    )
+
+    process {
+        Send-Frame @{ type = "data"; id = $script:CurrentRequestId; data = $InputObject }
+    }
+}
+
+function Write-WorkerOutput {
+    param([Parameter(ValueFromPipeline)][string]$Line)
+
+    process {
+        [Console]::Out.WriteLine($Line)
+    }
+}
+
+function Test-WorkerConnection {
+    if ($global:DefaultVIServer -and $global:DefaultVIServer.IsConnected) {
+        return $global:DefaultVIServer.Name
+    }
+    return $null
+}
+
+# Load PowerCLI once for the lifetime of the worker
+if (Get-Module -ListAvailable -Name VMware.PowerCLI) {
+    Import-Module VMware.PowerCLI -ErrorAction SilentlyContinue | Out-Null
+    Set-PowerCLIConfiguration -InvalidCertificateAction Ignore -Scope Session -Confirm:$false | Out-Null
+}
+
+foreach ($moduleName in @("00-Events.ps1", "01-Connect.ps1")) {
+    . (Join-Path $ModulesPath $moduleName)
+    $LoadedModules[$moduleName] = (Get-Item (Join-Path $ModulesPath $moduleName)).LastWriteTimeUtc
+}
+
+Send-Frame @{ type = "ready"; id = $null; pid = $PID }
+
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($null -eq $line) { break }
+    if (!$line.Trim()) { continue }
+
+    try {
+        $request = $line | ConvertFrom-Json
+    }
+    catch {
+        Send-Frame @{ type = "end"; id = $null; exitCode = 1; error = "Malformed request: $($_.Exception.Message)" }
+        continue
+    }
+
+    $script:CurrentRequestId = $request.id
+
+    switch ($request.op) {
+        "ping" {
+            Send-Frame @{ type = "pong"; id = $request.id; server = (Test-WorkerConnection) }
+        }
+
+        "connect" {
+            try {
+                if ($request.session) {
+                    # Attach to a session another worker already opened; the previous
+                    # session is not logged out because other workers may still use it
+                    $connection = Connect-VIServer -Server $request.server -Session $request.session -ErrorAction Stop
+                    [Console]::Out.WriteLine("Attached to vCenter session: $($connection.Name)")
+                } else {
+                    $securePassword = ConvertTo-SecureString $request.password -AsPlainText -Force
+                    $credential = New-Object System.Management.Automation.PSCredential($request.username, $securePassword)
+                    Connect-VCenterServer -Server $request.server -Credential $credential -NewSession *>&1 |
+                        Out-String -Stream -Width 250 | Write-WorkerOutput
+                    Send-EcstData @{ session = $global:DefaultVIServer.SessionSecret }
+                }
+                Send-Frame @{ type = "end"; id = $request.id; exitCode = 0; error = $null }
+            }
+            catch {
+                Send-Frame @{ type = "end"; id = $request.id; exitCode = 1; error = $_.Exception.Message }
+            }
+            finally {
+                $securePassword = $null
+                $credential = $null
+            }
+        }
+
+        "logout" {
+            # Log out a superseded session without disturbing this worker's own connection
+            try {
+                $connection = Connect-VIServer -Server $request.server -Session $request.session -NotDefault -ErrorAction Stop
+                Disconnect-VIServer -Server $connection -Force -Confirm:$false -ErrorAction Stop
+                Send-Frame @{ type = "end"; id = $request.id; exitCode = 0; error = $null }
+            }
+            catch {
+                Send-Frame @{ type = "end"; id = $request.id; exitCode = 1; error = $_.Exception.Message }
+            }
+        }
+
+        "invoke" {
+            try {
+                # Dot-source requested modules at script scope, reloading any that changed on disk
+                foreach ($moduleName in $request.modules) {
+                    $modulePath = Join-Path $ModulesPath $moduleName
+                    $stamp = (Get-Item $modulePath -ErrorAction Stop).LastWriteTimeUtc
+                    if ($LoadedModules[$moduleName] -ne $stamp) {
+                        . $modulePath
+                        $LoadedModules[$moduleName] = $stamp
+                    }
+                }
+
+                if ($request.eventLog) {
+                    $env:ECST_EVENT_LOG = $request.eventLog
+                }
+
+                $credentialNames = @()
+                if ($request.credentials) {
+                    foreach ($entry in $request.credentials.PSObject.Properties) {
+                        $securePassword = ConvertTo-SecureString $entry.Value.password -AsPlainText -Force
+                        Set-Variable -Name $entry.Name -Scope Script -Value (
+                            New-Object System.Management.Automation.PSCredential($entry.Value.username, $securePassword))
+                        $credentialNames += $entry.Name
+                    }
+                    $securePassword = $null
+                }
+
+                # Non-terminating errors fail the request too; errors the script
+                # silences (-ErrorAction SilentlyContinue, try/catch) never reach the stream
+                $blockErrors = @()
+                $block = [ScriptBlock]::Create($request.script)
+                & $block *>&1 | ForEach-Object {
+                    if ($_ -is [System.Management.Automation.ErrorRecord]) { $blockErrors += $_ }
+                    $_
+                } | Out-String -Stream -Width 250 | Write-WorkerOutput
+
+                if ($blockErrors.Count) {
+                    $message = $blockErrors[-1].Exception.Message
+                    if ($blockErrors.Count -gt 1) { $message = "$($blockErrors.Count) errors, last: $message" }
+                    Send-Frame @{ type = "end"; id = $request.id; exitCode = 1; error = $message }
+                } else {
+                    Send-Frame @{ type = "end"; id = $request.id; exitCode = 0; error = $null }
+                }
+            }
+            catch {
+                [Console]::Out.WriteLine("Error: $($_.Exception.Message)")
+                Send-Frame @{ type = "end"; id = $request.id; exitCode = 1; error = $_.Exception.Message }
+            }
+            finally {
+                Remove-Item Env:ECST_EVENT_LOG -ErrorAction SilentlyContinue
+                foreach ($name in $credentialNames) {
+                    Remove-Variable -Name $name -Scope Script -ErrorAction SilentlyContinue
+                }
+            }
+        }
+
+        "exit" {
+            if ($request.logout -ne $false -and (Test-WorkerConnection)) {
+                Disconnect-VIServer -Server * -Force -Confirm:$false -ErrorAction SilentlyContinue
+            }
+            Send-Frame @{ type = "end"; id = $request.id; exitCode = 0; error = $null }
+            exit 0
+        }
+
+        default {
+            Send-Frame @{ type = "end"; id = $request.id; exitCode = 1; error = "Unknown op: $($request.op)" }
+        }
+    }
+
+    $script:CurrentRequestId = $null
+}
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ecst-vmware.py orchestration paths without a lab.
+
+Each run loads the real tool, points its PowerShell workers at the simulated
+worker in fake_worker.py and drives one scenario end to end against a
+generated config with the requested number of hosts:
+
+  deploy     full infrastructure deployment (task graph)
+  configure  NTP/DNS/Syslog on every host (per-host engine)
+  vm         bulk VM deployment from a manifest with one VM per host
+  status     status screen data from the inventory snapshot
+  drift      drift scan of every host against the config
+
+Every run executes in its own Python process so peak memory is measured per
+scenario. Wall-clock time, subprocesses started and peak RSS (orchestrator
+and largest worker) are reported; --json saves the results and --baseline
+compares against an earlier file.
+
+Examples:
+    python benchmarks/bench_orchestrator.py
+    python benchmarks/bench_orchestrator.py --scenario configure --hosts 200 --parallelism 1 4 8
+    python benchmarks/bench_orchestrator.py --hosts 50 200 1000 --json after.json --baseline before.json
+"""
+
+import argparse
+import importlib.util
+import ipaddress
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = Path(__file__).parent.resolve()
+ROOT_DIR = BENCH_DIR.parent
+TOOL_PATH = ROOT_DIR / "ecst-vmware.py"
+FAKE_WORKER = BENCH_DIR / "fake_worker.py"
+
+SCENARIOS = ("deploy", "configure", "vm", "status", "drift")
+DEFAULT_HOSTS = (50, 200)
+
+
+def load_tool():
+    """Import ecst-vmware.py as a module (its file name is not importable)."""
+    spec = importlib.util.spec_from_file_location("ecst_vmware", TOOL_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_config(hosts: int, parallelism: int = None) -> dict:
+    """The repository config.json with ``hosts`` generated ESXi hosts."""
+    with open(ROOT_DIR / "config.json", encoding="utf-8") as f:
+        config = json.load(f)
+
+    config["vcenter"]["server"] = "vcsa.bench.local"
+    config["vcenter"]["deployNew"] = False
+    config["esxiHosts"] = [{
+        "hostname": f"esxi{i + 1:04d}.bench.local",
+        "managementIp": str(ipaddress.ip_address("10.10.0.10") + i),
+        "vmotionIp": str(ipaddress.ip_address("10.20.0.10") + i),
+        "vsanIp": str(ipaddress.ip_address("10.30.0.10") + i),
+    } for i in range(hosts)]
+
+    if parallelism:
+        automation = config.setdefault("automation", {})
+        automation["hostParallelism"] = parallelism
+        automation["maxParallelSteps"] = parallelism
+    return config
+
+
+def write_manifest(path: Path, count: int):
+    rows = ["name,template,os,size,ip,tag"]
+    rows += [f"bench-vm-{i + 1:04d},,RHEL,Small,," for i in range(count)]
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+
+
+@contextmanager
+def count_subprocesses():
+    """Count every process started through subprocess while the block runs."""
+    counter = {"count": 0}
+    original = subprocess.Popen
+
+    class CountingPopen(original):
+        def __init__(self, *args, **kwargs):
+            counter["count"] += 1
+            super().__init__(*args, **kwargs)
+
+    subprocess.Popen = CountingPopen
+    try:
+        yield counter
+    finally:
+        subprocess.Popen = original
+
+
+def peak_rss_mb(who: int) -> float:
+    """Peak resident set size in MiB (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(tool, scenario: str, workdir: Path, hosts: int) -> bool:
+    if scenario == "deploy":
+        return tool.deploy_infrastructure()
+    if scenario == "configure":
+        return tool.configure_services()
+    if scenario == "vm":
+        manifest = workdir / "vms.csv"
+        write_manifest(manifest, hosts)
+        return tool.deploy_vm_manifest(manifest)
+    if scenario == "status":
+        return tool.collect_status() is not None
+    if scenario == "drift":
+        return tool.scan_drift(tool.load_infra_config()) is not None
+    raise ValueError(f"unknown scenario: {scenario}")
+
+
+def run_single(args) -> dict:
+    """Run one scenario in this process and return its measurements."""
+    os.environ.setdefault("ECST_VCENTER_USER", "administrator@vsphere.local")
+    os.environ.setdefault("ECST_VCENTER_PASSWORD", "bench")
+    os.environ.setdefault("ECST_ESXI_PASSWORD", "bench")
+
+    tool = load_tool()
+    tool.NON_INTERACTIVE = True
+    tool.Colors.disable()
+    tool.WORKER_COMMAND = [
+        sys.executable, str(FAKE_WORKER),
+        "--latency", str(args.latency),
+        "--host-latency", str(args.host_latency),
+        "--clone-latency", str(args.clone_latency),
+        "--failure-rate", str(args.failure_rate),
+    ]
+    if args.seed is not None:
+        tool.WORKER_COMMAND += ["--seed", str(args.seed)]
+
+    with tempfile.TemporaryDirectory(prefix="ecst-bench-") as tmp:
+        workdir = Path(tmp)
+        config_path = workdir / "config.json"
+        config_path.write_text(json.dumps(make_config(args.hosts[0], args.parallelism[0])), encoding="utf-8")
+        tool.set_config_file(config_path)
+
+        output = sys.stdout if args.verbose else open(os.devnull, "w")
+        with count_subprocesses() as spawned, redirect_stdout(output):
+            start = time.perf_counter()
+            success = run_scenario(tool, args.scenario[0], workdir, args.hosts[0])
+            wall = time.perf_counter() - start
+            tool.shutdown_worker_pool()
+            tool.shutdown_worker()
+        if output is not sys.stdout:
+            output.close()
+
+    return {
+        "scenario": args.scenario[0],
+        "hosts": args.hosts[0],
+        "parallelism": args.parallelism[0],
+        "success": bool(success),
+        "wall_seconds": round(wall, 3),
+        "subprocesses": spawned["count"],
+        "peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_SELF), 1) if resource else None,
+        "worker_peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1) if resource else None,
+    }
+
+
+def spawn(args, scenario: str, hosts: int, parallelism) -> dict:
+    """Run one scenario in a fresh interpreter so its memory peak is its own."""
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()), "--run",
+        "--scenario", scenario, "--hosts", str(hosts),
+        "--latency", str(args.latency), "--host-latency", str(args.host_latency),
+        "--clone-latency", str(args.clone_latency), "--failure-rate", str(args.failure_rate),
+    ]
+    if parallelism:
+        cmd += ["--parallelism", str(parallelism)]
+    if args.seed is not None:
+        cmd += ["--seed", str(args.seed)]
+
+    completed = subprocess.run(cmd, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        sys.stderr.write(completed.stderr)
+        return {"scenario": scenario, "hosts": hosts, "parallelism": parallelism, "success": False,
+                "wall_seconds": None, "subprocesses": None, "peak_rss_mb": None,
+                "worker_peak_rss_mb": None, "error": f"exit code {completed.returncode}"}
+    return json.loads(lines[-1])
+
+
+def result_key(result: dict) -> tuple:
+    return result["scenario"], result["hosts"], result.get("parallelism")
+
+
+def print_results(results, baseline=None):
+    baseline = {result_key(r): r for r in (baseline or [])}
+    header = f"{'Scenario':<10} {'Hosts':>6} {'Par':>4} {'Wall (s)':>9} {'Procs':>6} {'RSS MB':>7} {'Worker MB':>9}  Result"
+    if baseline:
+        header += "   vs baseline"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        wall = f"{r['wall_seconds']:.2f}" if r["wall_seconds"] is not None else "-"
+        rss = f"{r['peak_rss_mb']:.1f}" if r.get("peak_rss_mb") is not None else "-"
+        worker = f"{r['worker_peak_rss_mb']:.1f}" if r.get("worker_peak_rss_mb") is not None else "-"
+        line = (f"{r['scenario']:<10} {r['hosts']:>6} {str(r.get('parallelism') or '-'):>4} {wall:>9} "
+                f"{str(r['subprocesses'] if r['subprocesses'] is not None else '-'):>6} {rss:>7} {worker:>9}  "
+                f"{'ok' if r['success'] else 'FAILED'}")
+        before = baseline.get(result_key(r))
+        if before and before.get("wall_seconds") and r["wall_seconds"] is not None:
+            change = (r["wall_seconds"] - before["wall_seconds"]) / before["wall_seconds"] * 100
+            line += f"   {change:+.1f}%"
+        print(line)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Benchmark ecst-vmware.py against a simulated PowerShell/vCenter backend.")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--hosts", nargs="+", type=int, default=list(DEFAULT_HOSTS),
+                        help="host counts to generate (default: %(default)s)")
+    parser.add_argument("--parallelism", nargs="+", type=int, default=[None],
+                        help="hostParallelism/maxParallelSteps values to compare (default: config.json)")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per request")
+    parser.add_argument("--host-latency", type=float, default=0.01, help="simulated seconds per host touched")
+    parser.add_argument("--clone-latency", type=float, default=0.05, help="simulated seconds per clone wave")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability a host or VM fails")
+    parser.add_argument("--seed", type=int, help="random seed for simulated failures")
+    parser.add_argument("--json", type=Path, help="write the results to this file")
+    parser.add_argument("--baseline", type=Path, help="compare wall time with a previous --json file")
+    parser.add_argument("--verbose", action="store_true", help="show the tool's output (with --run)")
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    if args.run:
+        print(json.dumps(run_single(args)))
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = []
+    for scenario in args.scenario:
+        for hosts in args.hosts:
+            for parallelism in args.parallelism:
+                label = f"{scenario} x{hosts}" + (f" p{parallelism}" if parallelism else "")
+                print(f"Running {label}...", file=sys.stderr)
+                results.append(spawn(args, scenario, hosts, parallelism))
+
+    print()
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    return 0 if all(r["success"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
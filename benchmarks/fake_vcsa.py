@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Simulated booting vCenter Server Appliance for testing the readiness waiter
+(``ecst-vmware.py wait``) without a lab.
+
+Serves plain HTTP on localhost and brings the appliance's services up on a
+timeline, counted from start:
+
+  --listen-after   the port accepts connections (before that: refused)
+  --ui-after       GET /ui answers 200 (before that: 503)
+  --api-after      POST /api/session answers 201 with a token for any basic
+                   auth, 401 without it (before that: 503)
+  --health-after   GET /api/appliance/health/system answers "green"
+                   (before that: "gray"); needs a session token
+
+Example:
+    python benchmarks/fake_vcsa.py --port 8443 --ui-after 5 --api-after 20 --health-after 30 &
+    python ecst-vmware.py wait --base-url http://127.0.0.1:8443 --timeout 2
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeVcsaHandler(BaseHTTPRequestHandler):
+    server_version = "FakeVCSA/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            sys.stderr.write(f"[{self.server.uptime():6.1f}s] {format % args}\n")
+
+    def reply(self, status, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def up(self, phase):
+        return self.server.uptime() >= getattr(self.server.args, f"{phase}_after")
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/ui":
+            self.reply(200 if self.up("ui") else 503, {"page": "vsphere-client"} if self.up("ui") else None)
+        elif self.path == "/api/appliance/health/system":
+            if not self.up("api"):
+                self.reply(503)
+            elif self.headers.get("vmware-api-session-id") not in self.server.sessions:
+                self.reply(401, {"error_type": "UNAUTHENTICATED"})
+            else:
+                self.reply(200, "green" if self.up("health") else "gray")
+        else:
+            self.reply(404)
+
+    def do_POST(self):
+        if self.path != "/api/session":
+            return self.reply(404)
+        if not self.up("api"):
+            return self.reply(503)
+        if not self.headers.get("Authorization", "").startswith("Basic "):
+            return self.reply(401, {"error_type": "UNAUTHENTICATED"})
+        token = os.urandom(16).hex()
+        self.server.sessions.add(token)
+        self.reply(201, token)
+
+    def do_DELETE(self):
+        if self.path != "/api/session":
+            return self.reply(404)
+        self.server.sessions.discard(self.headers.get("vmware-api-session-id"))
+        self.reply(204)
+
+
+def make_server(args, port=None, started=None):
+    """
+    Bind the stub to 127.0.0.1:``port`` (``args.port`` by default; 0 picks a
+    free port). The timeline counts from ``started`` (default: now).
+    """
+    started = time.monotonic() if started is None else started
+    server = ThreadingHTTPServer(("127.0.0.1", args.port if port is None else port), FakeVcsaHandler)
+    server.args = args
+    server.verbose = args.verbose
+    server.sessions = set()
+    server.uptime = lambda: time.monotonic() - started
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8443, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--listen-after", type=float, default=0, help="seconds until the port opens")
+    parser.add_argument("--ui-after", type=float, default=5, help="seconds until /ui answers 200")
+    parser.add_argument("--api-after", type=float, default=10, help="seconds until the REST API accepts logins")
+    parser.add_argument("--health-after", type=float, default=15, help="seconds until health is green")
+    parser.add_argument("--verbose", action="store_true", help="log every request to stderr")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    time.sleep(args.listen_after)
+    server = make_server(args, started=started)
+    print(f"Fake VCSA listening on http://127.0.0.1:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
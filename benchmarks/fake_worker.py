@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Simulated Start-ECSTWorker.ps1 for benchmarking ecst-vmware.py without
+PowerShell, PowerCLI or a vCenter.
+
+Speaks the same stdin/stdout protocol as the real worker (JSON requests, one
+per line; ``##ECST##`` frames back) and fakes what the module cmdlets would do:
+
+  * every request costs ``--latency`` seconds (cmdlet/vCenter round trip)
+  * scripts that loop over the cluster's hosts (Add-HostsToVDS, ...) cost
+    ``--host-latency`` per host (only the named ones for batched calls);
+    per-host scripts (``$HostName = ...``) cost one
+  * New-VMBatch costs ``--clone-latency`` per wave of clones in flight and
+    reports one data frame per VM
+  * Get-InventorySnapshot / Get-InventoryIndex / Get-ConfigurationState /
+    Get-VsanDiskInventory return data sized to the host count in the config
+    file the script loads
+  * Get-HostConfiguration returns hosts that match the config, except for a
+    ``--failure-rate`` share that always has SSH running; hosts named in
+    ``-KnownHash`` with an unchanged hash come back as the hash only
+  * each host (or VM) fails with probability ``--failure-rate``
+
+Step and result events are appended to the request's event log, like the
+modules do through Write-EcstEvent.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+FRAME_PREFIX = "##ECST##"
+
+# Cmdlets that iterate every host in the cluster in one call, and the step
+# name their result events use
+CLUSTER_WIDE_CMDLETS = {
+    "Add-ESXiHostsToCluster": "hosts",
+    "Add-HostsToVDS": "vds-hosts",
+    "Configure-VMotionStack": "vmotion",
+    "New-VsanVMkernel": "vsan-vmkernel",
+    "Set-HostSecurityConfiguration": "security",
+    "Configure-VsanDiskGroups": "vsan-disks",
+    "Get-ConfigurationState": "plan",
+}
+
+_configs = {}
+
+
+def send_frame(**frame):
+    sys.stdout.write(f"{FRAME_PREFIX} {json.dumps(frame)}\n")
+    sys.stdout.flush()
+
+
+def load_config(script):
+    """Load (once) the config file named by the script's $config preamble."""
+    match = re.search(r"Get-Content '([^']+)'", script)
+    if not match:
+        return {}
+    path = match.group(1).replace("''", "'")
+    host_files = re.search(r"foreach \(\$hostFile in @\(([^)]*)\)\)", script)
+    key = (path, host_files.group(1) if host_files else "")
+    if key not in _configs:
+        try:
+            with open(path, encoding="utf-8") as f:
+                config = json.load(f)
+            if host_files:
+                config["esxiHosts"] = []
+                for host_file in re.findall(r"'((?:[^']|'')*)'", host_files.group(1)):
+                    with open(host_file.replace("''", "'"), encoding="utf-8") as f:
+                        config["esxiHosts"].extend(json.load(f))
+            _configs[key] = config
+        except (OSError, ValueError):
+            _configs[key] = {}
+    return _configs[key]
+
+
+class EventWriter:
+    """Append Write-EcstEvent style NDJSON lines to the request's event log."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, **record):
+        if not self.path:
+            return
+        record = dict(ts=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"), **record)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+class FakeWorker:
+    def __init__(self, args):
+        self.latency = args.latency
+        self.host_latency = args.host_latency
+        self.clone_latency = args.clone_latency
+        self.failure_rate = args.failure_rate
+        self.random = random.Random(args.seed + os.getpid() if args.seed is not None else None)
+        self.server = None
+        self.session = None
+
+    def fails(self):
+        return self.failure_rate > 0 and self.random.random() < self.failure_rate
+
+    def handle(self, request):
+        op = request.get("op")
+        request_id = request.get("id")
+
+        if op == "ping":
+            send_frame(type="pong", id=request_id, server=self.server)
+        elif op == "connect":
+            time.sleep(self.latency)
+            self.server = request.get("server")
+            if request.get("session"):
+                self.session = request["session"]
+                print(f"Attached to vCenter session: {self.server}")
+            else:
+                self.session = os.urandom(16).hex()
+                print(f"Successfully connected to vCenter: {self.server}")
+                send_frame(type="data", id=request_id, data={"session": self.session})
+            send_frame(type="end", id=request_id, exitCode=0, error=None)
+        elif op == "logout":
+            time.sleep(self.latency)
+            send_frame(type="end", id=request_id, exitCode=0, error=None)
+        elif op == "invoke":
+            script = request.get("script") or ""
+            # Like the real worker, credentials arrive beside the script as PSCredential variables
+            credentials = request.get("credentials") or {}
+            missing = [name for name in re.findall(r"-Credential \$(\w+)", script) if name not in credentials]
+            if missing:
+                error = f"Cannot bind argument to parameter 'Credential' because ${missing[0]} is null."
+            else:
+                error = self.invoke(request_id, script, EventWriter(request.get("eventLog")))
+            send_frame(type="end", id=request_id, exitCode=1 if error else 0, error=error)
+        elif op == "exit":
+            send_frame(type="end", id=request_id, exitCode=0, error=None)
+            sys.exit(0)
+        else:
+            send_frame(type="end", id=request_id, exitCode=1, error=f"Unknown op: {op}")
+
+    def invoke(self, request_id, script, events):
+        config = load_config(script)
+        hostnames = [h.get("hostname") for h in config.get("esxiHosts", [])]
+        time.sleep(self.latency)
+
+        if "Get-InventorySnapshot" in script:
+            send_frame(type="data", id=request_id, data=self.snapshot(config, hostnames))
+            return None
+
+        if "Get-InventoryIndex" in script:
+            kinds = re.findall(r"'(\w+)'", re.search(r"-Kind @\(([^)]*)\)", script).group(1))
+            since = re.search(r"-Since '([^']*)'", script)
+            send_frame(type="data", id=request_id,
+                       data=self.index(config, hostnames, kinds, since.group(1) if since else None))
+            return None
+
+        if "Get-VsanDiskInventory" in script:
+            send_frame(type="data", id=request_id, data={"disks": self.vsan_disks(hostnames)})
+            return None
+
+        if "Get-HostConfiguration" in script:
+            known = dict((name.replace("''", "'"), value) for name, value in
+                         re.findall(r"'((?:[^']|'')*)' = '([0-9a-f]+)'", script))
+            for row in self.host_configuration(config, hostnames):
+                time.sleep(self.host_latency / 10)
+                if known.get(row["name"]) == row["hash"]:
+                    row = {"name": row["name"], "hash": row["hash"], "unchanged": True}
+                send_frame(type="data", id=request_id, data=row)
+            return None
+
+        if "New-VMBatch" in script:
+            return self.vm_batch(request_id, script)
+
+        per_host = re.search(r"\$HostName = '((?:[^']|'')*)'", script)
+        cmdlet = next((c for c in CLUSTER_WIDE_CMDLETS if c in script), None)
+        if per_host:
+            targets, step = [per_host.group(1).replace("''", "'")], "host"
+        elif cmdlet:
+            targets, step = hostnames, CLUSTER_WIDE_CMDLETS[cmdlet]
+            # Batched calls name their hosts ($HostNames = @(...) or -HostName @(...))
+            batch = re.search(r"(?:\$HostNames = |-HostName )@\(((?:[^)']|'(?:[^']|'')*')*)\)", script)
+            if batch:
+                targets = [name.replace("''", "'") for name in re.findall(r"'((?:[^']|'')*)'", batch.group(1))]
+        else:
+            return None
+
+        failed = []
+        events.write(type="step-start", step=step)
+        started = time.monotonic()
+        for host in targets:
+            host_started = time.monotonic()
+            time.sleep(self.host_latency)
+            status = "Failed" if self.fails() else "Success"
+            if status == "Failed":
+                failed.append(host)
+            print(f"  [{host}] {status}")
+            events.write(type="result", step=step, target=host, status=status,
+                         seconds=round(time.monotonic() - host_started, 3))
+        events.write(type="step-end", step=step, status="Failed" if failed else "Success",
+                     seconds=round(time.monotonic() - started, 3))
+
+        if cmdlet == "Get-ConfigurationState":
+            send_frame(type="data", id=request_id, data=self.configuration_state(config, hostnames))
+            return None
+        return f"Failed on host(s): {', '.join(failed)}" if failed else None
+
+    def vm_batch(self, request_id, script):
+        match = re.search(r"\$vms = '((?:[^']|'')*)'", script)
+        vms = json.loads(match.group(1).replace("''", "'")) if match else []
+        in_flight = int((re.search(r"-MaxInFlight (\d+)", script) or [None, 8])[1])
+
+        for wave in range(math.ceil(len(vms) / max(1, in_flight))):
+            time.sleep(self.clone_latency)
+            for vm in vms[wave * in_flight:(wave + 1) * in_flight]:
+                failed = self.fails()
+                send_frame(type="data", id=request_id, data={
+                    "name": vm.get("name"),
+                    "status": "Failed" if failed else "Success",
+                    "stage": "clone" if failed else "done",
+                    "error": "Simulated clone failure" if failed else None,
+                    "seconds": self.clone_latency,
+                })
+        return None
+
+    def snapshot(self, config, hostnames):
+        datacenter = config.get("datacenter", {}).get("name", "Datacenter")
+        cluster = config.get("cluster", {}).get("name", "Cluster")
+        hosts = [{
+            "id": f"HostSystem-host-{i}", "name": name, "parent": "ClusterComputeResource-domain-c1",
+            "connectionState": "connected", "powerState": "poweredOn", "inMaintenanceMode": False,
+            "version": "8.0.2", "cpuMhz": 64000, "memoryBytes": 512 * 1024 ** 3, "memoryUsedBytes": 128 * 1024 ** 3,
+        } for i, name in enumerate(hostnames)]
+        return {
+            "vcenter": {"server": config.get("vcenter", {}).get("server"), "version": "8.0.2"},
+            "folders": [{"id": "Folder-group-d1", "name": "Datacenters", "parent": None},
+                        {"id": "Folder-group-h1", "name": "host", "parent": "Datacenter-datacenter-1"}],
+            "datacenters": [{"id": "Datacenter-datacenter-1", "name": datacenter, "parent": "Folder-group-d1"}],
+            "computeResources": [],
+            "clusters": [{"id": "ClusterComputeResource-domain-c1", "name": cluster, "parent": "Folder-group-h1",
+                          "haEnabled": True, "drsEnabled": True}],
+            "hosts": hosts,
+            "vms": [{"parent": "Folder-group-v1", "host": h["id"]} for h in hosts for _ in range(10)],
+            "datastores": [{"name": "vsanDatastore", "type": "vsan",
+                            "capacityBytes": len(hosts) * 8 * 1024 ** 4, "freeBytes": len(hosts) * 5 * 1024 ** 4}],
+            "vds": [{"name": config.get("networking", {}).get("vds", {}).get("name"), "version": "8.0.0",
+                     "mtu": 9000, "hosts": len(hosts), "portGroups": 5}],
+        }
+
+    def index(self, config, hostnames, kinds, since):
+        """Get-InventoryIndex rows derived from the snapshot; VMs never change after creation."""
+        snapshot = self.snapshot(config, hostnames)
+        version = "2024-01-01T00:00:00.000Z"
+        vms = [dict(vm, id=f"VirtualMachine-vm-{i}", name=f"vm-{i:05d}", powerState="poweredOn", version=version)
+               for i, vm in enumerate(snapshot["vms"])]
+        runtime = [{"id": vm["id"], "host": vm.get("host"), "powerState": vm["powerState"]} for vm in vms]
+        portgroups = [{"id": f"DistributedVirtualPortgroup-dvportgroup-{i}", "name": pg.get("name"),
+                       "parent": "VmwareDistributedVirtualSwitch-dvs-1", "vlanId": pg.get("vlanId")}
+                      for i, pg in enumerate(config.get("networking", {}).get("portGroups", []))]
+        sources = {
+            "folder": snapshot["folders"], "datacenter": snapshot["datacenters"],
+            "computeResource": [], "cluster": snapshot["clusters"], "host": snapshot["hosts"],
+            "datastore": [dict(ds, id="Datastore-datastore-1", hosts=[h["id"] for h in snapshot["hosts"]])
+                          for ds in snapshot["datastores"]],
+            "vds": [dict(vds, id="VmwareDistributedVirtualSwitch-dvs-1") for vds in snapshot["vds"]],
+            "portgroup": portgroups, "template": [], "tag": [],
+        }
+        result = {}
+        for kind in kinds:
+            if kind == "vm":
+                rows = [{k: v for k, v in vm.items() if k not in ("host", "powerState")} for vm in vms]
+                result[kind] = {"rows": [] if since else rows, "runtime": runtime, "version": version}
+            elif kind == "template":
+                result[kind] = {"rows": [], "runtime": [], "version": version}
+            else:
+                result[kind] = {"rows": sources.get(kind, [])}
+        return {"vcenter": snapshot["vcenter"], "kinds": result}
+
+    def vsan_disks(self, hostnames):
+        """Every host has two cache-sized SSDs and nine capacity SSDs, all eligible."""
+        sizes = [400, 800] + [1920] * 9
+        return [{"Host": host, "CanonicalName": f"naa.{h:04d}{d:04d}", "CapacityGB": size,
+                 "IsSsd": True, "Type": "SSD", "Status": "Eligible"}
+                for h, host in enumerate(hostnames) for d, size in enumerate(sizes)]
+
+    def host_configuration(self, config, hostnames):
+        """Get-HostConfiguration rows; the drifted hosts depend only on the hostname."""
+        services = config.get("services", {})
+        security = config.get("security", {})
+        syslog = services.get("syslog", {})
+        lockdown = {"normal": "lockdownNormal", "strict": "lockdownStrict"}.get(security.get("lockdownMode"))
+        rows = []
+        for name in hostnames:
+            drifted = self.failure_rate > 0 and random.Random(name).random() < self.failure_rate
+            ssh = bool(security.get("sshEnabled")) or drifted
+            row = {
+                "name": name, "connected": True,
+                "ntpServers": services.get("ntp", {}).get("servers", []),
+                "ntpd": {"running": True, "policy": services.get("ntp", {}).get("policy", "on")},
+                "dnsServers": services.get("dns", {}).get("servers", []),
+                "searchDomains": services.get("dns", {}).get("searchDomains", []),
+                "syslogHost": f"{syslog.get('protocol')}://{syslog.get('server')}:{syslog.get('port')}",
+                "ssh": {"running": ssh, "policy": "on" if ssh else "off"},
+                "shellTimeout": security.get("shellTimeout"),
+                "lockdownMode": lockdown or "lockdownDisabled",
+                "firewall": [{"key": key, "label": key, "enabled": True}
+                             for key in sorted(security.get("firewallRulesetsEnabled", []))],
+            }
+            row["hash"] = hashlib.sha256(json.dumps(row).encode("utf-8")).hexdigest()
+            rows.append(row)
+        return rows
+
+    def configuration_state(self, config, hostnames):
+        return {"datacenter": True, "cluster": None, "hosts": [{"name": h} for h in hostnames],
+                "vds": None, "portGroups": []}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per request (default: %(default)s)")
+    parser.add_argument("--host-latency", type=float, default=0.01, help="seconds per host touched (default: %(default)s)")
+    parser.add_argument("--clone-latency", type=float, default=0.05,
+                        help="seconds per wave of clones in flight (default: %(default)s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability a host or VM fails")
+    parser.add_argument("--seed", type=int, help="random seed (combined with the worker's PID)")
+    args = parser.parse_args()
+
+    worker = FakeWorker(args)
+    send_frame(type="ready", id=None, pid=os.getpid())
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            send_frame(type="end", id=None, exitCode=1, error=f"Malformed request: {e}")
+            continue
+        worker.handle(request)
+
+
+if __name__ == "__main__":
+    main()
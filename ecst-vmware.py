@@ -11,12 +11,40 @@ Version: 1.0.0
 
 import os
 import sys
+import csv
 import json
+import signal
+import asyncio
+import argparse
+import ipaddress
+import time
+import hashlib
+import base64
+import random
+import socket
+import ssl
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+import heapq
+import sqlite3
+import queue
+import atexit
+import threading
 import subprocess
 import getpass
+import fnmatch
+import glob
+import re
+import string
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from contextlib import contextmanager, redirect_stdout, ExitStack
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple, Callable, Sequence, Set, FrozenSet, Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from enum import Enum
 
 
@@ -27,6 +55,44 @@ from enum import Enum
 SCRIPT_DIR = Path(__file__).parent.resolve()
 CONFIG_FILE = SCRIPT_DIR / "config.json"
 MODULES_DIR = SCRIPT_DIR / "modules"
+WORKER_SCRIPT = SCRIPT_DIR / "Start-ECSTWorker.ps1"
+
+# Command that starts a PowerShell worker; None runs WORKER_SCRIPT with
+# powershell.exe. The benchmarks point this at a simulated worker.
+WORKER_COMMAND: Optional[List[str]] = None
+
+# Seconds of idle time after which the worker is pinged before reuse
+WORKER_HEALTH_CHECK_INTERVAL = 60
+
+# Default number of hosts configured concurrently (config: automation.hostParallelism)
+DEFAULT_HOST_PARALLELISM = 4
+
+# Default number of VM clone tasks in flight (config: automation.maxClonesInFlight)
+DEFAULT_CLONE_CONCURRENCY = 8
+
+# Default number of deployment steps run concurrently (config: automation.maxParallelSteps)
+DEFAULT_STEP_PARALLELISM = 3
+
+# Minutes a shared vCenter session token is reused before logging in again
+# (config: automation.sessionTtlMinutes); kept below vCenter's idle timeout
+DEFAULT_SESSION_TTL_MINUTES = 25
+
+# Default VM placement scoring policy (config: automation.placementPolicy)
+DEFAULT_PLACEMENT_POLICY = "balanced"
+
+# Default share of each datastore's capacity VM placement keeps free
+# (config: automation.datastoreHeadroomPercent)
+DEFAULT_DATASTORE_HEADROOM_PERCENT = 10
+
+# Set by the subcommand CLI: skip menus, confirmations and "Press Enter" pauses
+NON_INTERACTIVE = False
+
+# Process exit codes for the subcommand CLI
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_CONFIG_ERROR = 3
+EXIT_INTERRUPTED = 130
 
 # VM Templates available for deployment
 VM_TEMPLATES = {
@@ -38,184 +104,4712 @@ VM_TEMPLATES = {
     "6": {"name": "Ubuntu 22.04", "template": "template-ubuntu-2204", "description": "Ubuntu Server 22.04 LTS"},
 }
 
-# VM Size configurations
-VM_SIZES = {
-    "Small": {"cpu": 2, "memory_gb": 4, "disk_gb": 50},
-    "Medium": {"cpu": 4, "memory_gb": 8, "disk_gb": 100},
-    "Large": {"cpu": 8, "memory_gb": 16, "disk_gb": 200},
-    "XLarge": {"cpu": 16, "memory_gb": 32, "disk_gb": 500},
-}
+# VM Size configurations
+VM_SIZES = {
+    "Small": {"cpu": 2, "memory_gb": 4, "disk_gb": 50},
+    "Medium": {"cpu": 4, "memory_gb": 8, "disk_gb": 100},
+    "Large": {"cpu": 8, "memory_gb": 16, "disk_gb": 200},
+    "XLarge": {"cpu": 16, "memory_gb": 32, "disk_gb": 500},
+}
+
+# OS Types for standard VM deployment
+OS_TYPES = {
+    "1": {"name": "RHEL", "guest_id": "rhel9_64Guest", "description": "Red Hat Enterprise Linux"},
+    "2": {"name": "Ubuntu", "guest_id": "ubuntu64Guest", "description": "Ubuntu Linux"},
+    "3": {"name": "Windows", "guest_id": "windows2019srv_64Guest", "description": "Windows Server"},
+    "4": {"name": "CentOS", "guest_id": "centos9_64Guest", "description": "CentOS Stream"},
+    "5": {"name": "Debian", "guest_id": "debian11_64Guest", "description": "Debian Linux"},
+}
+
+
+# =============================================================================
+# Helper Classes
+# =============================================================================
+
+class Colors:
+    """ANSI color codes for terminal output."""
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+    @classmethod
+    def disable(cls):
+        """Disable colors for non-supporting terminals."""
+        cls.HEADER = ''
+        cls.BLUE = ''
+        cls.CYAN = ''
+        cls.GREEN = ''
+        cls.YELLOW = ''
+        cls.RED = ''
+        cls.ENDC = ''
+        cls.BOLD = ''
+        cls.UNDERLINE = ''
+
+
+@dataclass
+class VMConfig:
+    """Configuration for a virtual machine deployment."""
+    name: str
+    os_type: str
+    size: str
+    tag_name: str
+    ip_address: str
+    template: Optional[str] = None
+    guest_id: Optional[str] = None
+    cpu: Optional[int] = None
+    memory_gb: Optional[int] = None
+    disk_gb: Optional[int] = None
+
+
+# =============================================================================
+# Configuration Model
+# =============================================================================
+
+class ConfigError(ValueError):
+    """Raised when config.json is missing required settings or is malformed."""
+
+
+@dataclass
+class HostConfig:
+    """Configuration for a single ESXi host."""
+    hostname: str
+    management_ip: str
+    vmotion_ip: Optional[str] = None
+    vsan_ip: Optional[str] = None
+
+
+@dataclass
+class PortGroupConfig:
+    """Configuration for a distributed port group."""
+    name: str
+    vlan_id: int
+    type: str
+
+
+@dataclass
+class NetworkConfig:
+    """Configuration for the VDS, port groups and vMotion stack."""
+    vds_name: str
+    vds_version: Optional[str] = None
+    mtu: Optional[int] = None
+    uplinks: List[str] = field(default_factory=list)
+    load_balancing: Optional[str] = None
+    port_groups: List[PortGroupConfig] = field(default_factory=list)
+    vmotion_enabled: bool = False
+    vmotion_gateway: Optional[str] = None
+    vmotion_subnet_mask: Optional[str] = None
+
+
+@dataclass
+class StorageConfig:
+    """Configuration for vSAN."""
+    vsan_enabled: bool
+    claim_mode: Optional[str] = None
+    deduplication_enabled: bool = False
+    compression_enabled: bool = False
+
+
+@dataclass
+class InfraConfig:
+    """Parsed and validated contents of config.json."""
+    environment_name: str
+    vcenter_server: str
+    datacenter_name: str
+    cluster_name: str
+    hosts: Sequence[HostConfig]
+    network: NetworkConfig
+    storage: StorageConfig
+    host_parallelism: int
+    clone_concurrency: int
+    step_parallelism: int
+    session_ttl_minutes: int
+    placement_policy: str
+    datastore_headroom_percent: int
+    raw: Dict[str, Any]
+
+    @property
+    def hostnames(self) -> List[str]:
+        return [h.hostname for h in self.hosts]
+
+    def host(self, hostname: str) -> Optional[HostConfig]:
+        """Look up a host record by hostname (case-insensitive)."""
+        return self.hosts.host(hostname)
+
+    def host_entry(self, hostname: str) -> Optional[Dict[str, Any]]:
+        """The host's ``esxiHosts`` entry, generated if it comes from a range (case-insensitive)."""
+        return self.hosts.entry(hostname)
+
+    def expanded(self) -> Dict[str, Any]:
+        """``raw`` with host ranges and host files expanded into one ``esxiHosts`` list."""
+        expanded = {key: value for key, value in self.raw.items() if key != "esxiHostFiles"}
+        expanded["esxiHosts"] = list(self.hosts.entries())
+        return expanded
+
+
+def _config_value(data: Dict[str, Any], path: str, errors: List[str],
+                  expected: type = None, required: bool = True, default: Any = None) -> Any:
+    """Fetch a dotted path from the raw config, recording problems in ``errors``."""
+    value: Any = data
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            if required:
+                errors.append(f"missing '{path}'")
+            return default
+        value = value[key]
+    if expected is not None and not isinstance(value, expected):
+        errors.append(f"'{path}' should be {getattr(expected, '__name__', expected)}")
+        return default
+    return value
+
+
+def parse_config(data: Dict[str, Any], hosts: Optional["HostList"] = None) -> InfraConfig:
+    """
+    Validate a raw config dictionary and build the typed model.
+
+    ``hosts`` are the host sources when the caller has already read them
+    (ConfigStore adds the ``esxiHostFiles``); by default they are the
+    inline ``esxiHosts`` entries.
+    """
+    if not isinstance(data, dict):
+        raise ConfigError("configuration root must be a JSON object")
+
+    errors: List[str] = []
+    get = lambda path, expected=None, required=True, default=None: _config_value(
+        data, path, errors, expected, required, default)
+
+    inline_hosts = get('esxiHosts', list, default=[])
+    if hosts is None:
+        hosts = HostList([HostSource.inline(inline_hosts)])
+    hosts.validate(errors)
+
+    port_groups: List[PortGroupConfig] = []
+    for index, entry in enumerate(get('networking.portGroups', list, default=[])):
+        prefix = f"networking.portGroups[{index}]"
+        missing = [k for k in ('name', 'vlanId', 'type') if not isinstance(entry, dict) or k not in entry]
+        if missing:
+            errors.extend(f"missing '{prefix}.{k}'" for k in missing)
+            continue
+        port_groups.append(PortGroupConfig(name=entry['name'], vlan_id=entry['vlanId'], type=entry['type']))
+
+    network = NetworkConfig(
+        vds_name=get('networking.vds.name', str),
+        vds_version=get('networking.vds.version', required=False),
+        mtu=get('networking.vds.mtu', int, required=False),
+        uplinks=get('networking.vds.uplinks', list, required=False, default=[]),
+        load_balancing=get('networking.vds.loadBalancing', required=False),
+        port_groups=port_groups,
+        vmotion_enabled=bool(get('networking.vmotionTcpIpStack.enabled', required=False, default=False)),
+        vmotion_gateway=get('networking.vmotionTcpIpStack.gateway', required=False),
+        vmotion_subnet_mask=get('networking.vmotionTcpIpStack.subnetMask', required=False)
+    )
+
+    storage = StorageConfig(
+        vsan_enabled=bool(get('storage.vsan.enabled', bool, default=False)),
+        claim_mode=get('storage.vsan.claimMode', required=False),
+        deduplication_enabled=bool(get('storage.vsan.deduplicationEnabled', required=False, default=False)),
+        compression_enabled=bool(get('storage.vsan.compressionEnabled', required=False, default=False))
+    )
+
+    # Sections read by the modules; only their presence is checked here
+    get('services.ntp.servers', list)
+    get('services.dns.servers', list)
+    get('services.syslog.server', str)
+    get('security', dict)
+
+    parallelism = get('automation.hostParallelism', int, required=False, default=DEFAULT_HOST_PARALLELISM)
+    if parallelism is not None and parallelism < 1:
+        errors.append("'automation.hostParallelism' must be at least 1")
+
+    clones = get('automation.maxClonesInFlight', int, required=False, default=DEFAULT_CLONE_CONCURRENCY)
+    if clones is not None and clones < 1:
+        errors.append("'automation.maxClonesInFlight' must be at least 1")
+
+    steps = get('automation.maxParallelSteps', int, required=False, default=DEFAULT_STEP_PARALLELISM)
+    if steps is not None and steps < 1:
+        errors.append("'automation.maxParallelSteps' must be at least 1")
+
+    # Read by Add-ESXiHostsToCluster
+    host_adds = get('automation.maxHostAddsInFlight', int, required=False)
+    if host_adds is not None and host_adds < 1:
+        errors.append("'automation.maxHostAddsInFlight' must be at least 1")
+
+    session_ttl = get('automation.sessionTtlMinutes', int, required=False, default=DEFAULT_SESSION_TTL_MINUTES)
+    if session_ttl is not None and session_ttl < 1:
+        errors.append("'automation.sessionTtlMinutes' must be at least 1")
+
+    policy = get('automation.placementPolicy', str, required=False, default=DEFAULT_PLACEMENT_POLICY)
+    if policy is not None and policy not in PLACEMENT_POLICIES:
+        errors.append(f"'automation.placementPolicy' must be one of: {', '.join(PLACEMENT_POLICIES)}")
+
+    headroom = get('automation.datastoreHeadroomPercent', int, required=False,
+                   default=DEFAULT_DATASTORE_HEADROOM_PERCENT)
+    if headroom is not None and not 0 <= headroom < 100:
+        errors.append("'automation.datastoreHeadroomPercent' must be between 0 and 99")
+
+    config = InfraConfig(
+        environment_name=get('environment.name', str),
+        vcenter_server=get('vcenter.server', str),
+        datacenter_name=get('datacenter.name', str),
+        cluster_name=get('cluster.name', str),
+        hosts=hosts,
+        network=network,
+        storage=storage,
+        host_parallelism=parallelism or DEFAULT_HOST_PARALLELISM,
+        clone_concurrency=clones or DEFAULT_CLONE_CONCURRENCY,
+        step_parallelism=steps or DEFAULT_STEP_PARALLELISM,
+        session_ttl_minutes=session_ttl or DEFAULT_SESSION_TTL_MINUTES,
+        placement_policy=policy or DEFAULT_PLACEMENT_POLICY,
+        datastore_headroom_percent=DEFAULT_DATASTORE_HEADROOM_PERCENT if headroom is None else headroom,
+        raw=data
+    )
+
+    if errors:
+        raise ConfigError("; ".join(errors))
+    return config
+
+
+# Host record fields that accept an IP range in a host range entry
+HOST_IP_FIELDS = ("managementIp", "vmotionIp", "vsanIp")
+
+# Host files read one entry per line instead of as a JSON list
+LINE_HOST_FILE_SUFFIXES = (".ndjson", ".jsonl")
+
+# Number base of a host number, by the format type of {n} in a range's hostname
+HOST_NUMBER_BASES = {"x": 16, "X": 16, "o": 8, "b": 2}
+
+
+class HostRange:
+    """
+    A compact range entry in ``esxiHosts``::
+
+        {"hostname": "esxi{n:03}.domain.local", "count": 200, "start": 1,
+         "managementIp": "192.168.10.11",
+         "vsanIp": {"start": "10.10.20.11", "stride": 2}}
+
+    ``{n}`` in the hostname is the host number (``start`` + index * ``step``).
+    IP fields are a first address (stride 1) or ``{"start", "stride"}``.
+    Any other keys are copied onto every record.
+
+    Records are generated on demand, so a range takes the same memory
+    whatever its ``count``. ``index_of`` reads the host number back out of
+    a hostname instead of generating the records.
+    """
+
+    def __init__(self, entry: Dict[str, Any], where: str):
+        count, start, step = entry.get("count"), entry.get("start", 1), entry.get("step", 1)
+        pattern = entry.get("hostname")
+        if not all(isinstance(v, int) and not isinstance(v, bool) for v in (count, start, step)) \
+                or count < 1 or step == 0:
+            raise ConfigError(f"'{where}': 'count' must be a positive integer, 'start' and 'step' "
+                              f"non-zero integers")
+        if not isinstance(pattern, str) or "{n" not in pattern:
+            raise ConfigError(f"'{where}.hostname' must be a pattern containing {{n}}")
+
+        self.ranges: Dict[str, Tuple[Any, int]] = {}
+        for key in HOST_IP_FIELDS:
+            spec = entry.get(key)
+            if spec is None:
+                continue
+            first, stride = (spec.get("start"), spec.get("stride", 1)) if isinstance(spec, dict) else (spec, 1)
+            try:
+                first = ipaddress.ip_address(first)
+            except ValueError:
+                raise ConfigError(f"'{where}.{key}' is not an IP address: {first!r}") from None
+            if not isinstance(stride, int) or stride == 0:
+                raise ConfigError(f"'{where}.{key}.stride' must be a non-zero integer")
+            self.ranges[key] = (first, stride)
+
+        self.entry = entry
+        self.where = where
+        self.count, self.start, self.step, self.pattern = count, start, step, pattern
+        self.extra = {k: v for k, v in entry.items()
+                      if k not in ("hostname", "count", "start", "step") + HOST_IP_FIELDS}
+
+        # The hostname pattern as a regex with one group per field, and the base each group is read in
+        parts, self._bases = [], []
+        try:
+            for literal, name, spec, _ in string.Formatter().parse(pattern):
+                parts.append(re.escape(literal))
+                if name is not None:
+                    parts.append("(.+?)")
+                    self._bases.append(HOST_NUMBER_BASES.get((spec or "")[-1:], 10))
+        except ValueError:
+            raise ConfigError(f"'{where}.hostname' is not a valid pattern: {pattern!r}") from None
+        self._regex = re.compile("".join(parts), re.IGNORECASE)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.count):
+            yield self.record(index)
+
+    def record(self, index: int) -> Dict[str, Any]:
+        """The host record at ``index`` (0-based)."""
+        try:
+            record = {"hostname": self.pattern.format(n=self.start + index * self.step)}
+            for key, (first, stride) in self.ranges.items():
+                record[key] = str(first + index * stride)
+        except (KeyError, IndexError, ValueError) as e:
+            raise ConfigError(f"'{self.where}': cannot expand host {index + 1}: {e}") from None
+        record.update(self.extra)
+        return record
+
+    def index_of(self, hostname: str) -> Optional[int]:
+        """
+        Index of ``hostname`` in the range, or None.
+
+        The host number is parsed out of the name; only a pattern whose
+        number cannot be parsed back (``{n:,}``, say) scans the range.
+        """
+        match = self._regex.fullmatch(hostname)
+        if match is None:
+            return None
+        parsed = False
+        for text, base in zip(match.groups(), self._bases):
+            try:
+                n = int(text, base)
+            except ValueError:
+                continue
+            parsed = True
+            index, rest = divmod(n - self.start, self.step)
+            if not rest and 0 <= index < self.count and self.record(index)["hostname"].lower() == hostname.lower():
+                return index
+        if parsed:
+            return None
+        return next((index for index in range(self.count)
+                     if self.record(index)["hostname"].lower() == hostname.lower()), None)
+
+    def missing_fields(self) -> List[str]:
+        """Required host fields that no record of this range has."""
+        return [] if "managementIp" in self.ranges or self.extra.get("managementIp") else ["managementIp"]
+
+
+class HostEntries:
+    """A run of literal host entries from one source, indexed by hostname on first lookup."""
+
+    def __init__(self, entries: List[Any], where: str, offset: int = 0):
+        self.entries = entries
+        self.where = where
+        self.offset = offset
+        self._index: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.entries)
+
+    def record(self, index: int) -> Any:
+        return self.entries[index]
+
+    def index_of(self, hostname: str) -> Optional[int]:
+        """Index of the first entry named ``hostname`` (case-insensitive), or None."""
+        if self._index is None:
+            self._index = {}
+            for index, entry in enumerate(self.entries):
+                if isinstance(entry, dict) and isinstance(entry.get("hostname"), str):
+                    self._index.setdefault(entry["hostname"].lower(), index)
+        return self._index.get(hostname.lower())
+
+    def label(self, index: int) -> str:
+        return f"{self.where}[{self.offset + index}]"
+
+
+def host_segments(entries: Iterable[Any], where: str) -> List[Any]:
+    """
+    Split host entries into runs of literal entries (HostEntries) and
+    ranges (HostRange), in order. ``entries`` is read once, so a line
+    file can be passed as a generator.
+    """
+    segments: List[Any] = []
+    run: List[Any] = []
+    offset = 0
+    for index, entry in enumerate(entries):
+        if isinstance(entry, dict) and "count" in entry:
+            if run:
+                segments.append(HostEntries(run, where, offset))
+                run = []
+            segments.append(HostRange(entry, f"{where}[{index}]"))
+        else:
+            if not run:
+                offset = index
+            run.append(entry)
+    if run:
+        segments.append(HostEntries(run, where, offset))
+    return segments
+
+
+@dataclass
+class HostSource:
+    """The host entries of one source: the inline ``esxiHosts`` list or one host file."""
+    name: str
+    version: str
+    segments: List[Any]
+
+    @classmethod
+    def inline(cls, entries: List[Any]) -> "HostSource":
+        version = hashlib.sha256(json.dumps(entries, sort_keys=True).encode("utf-8")).hexdigest()
+        return cls("esxiHosts", version, host_segments(entries, "esxiHosts"))
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+    def entries(self) -> Iterator[Any]:
+        """Every host entry of the source, with ranges expanded as they are reached."""
+        for segment in self.segments:
+            yield from segment
+
+    def written(self) -> List[Any]:
+        """The entries as written, ranges unexpanded."""
+        return [entry for segment in self.segments
+                for entry in (segment.entries if isinstance(segment, HostEntries) else [segment.entry])]
+
+    @property
+    def has_ranges(self) -> bool:
+        return any(isinstance(segment, HostRange) for segment in self.segments)
+
+
+class HostList(Sequence):
+    """
+    The configured hosts, read through compact host sources.
+
+    Nothing is expanded up front: ``len`` adds up range counts, lookups by
+    name parse the host number out of range patterns, and iteration builds
+    one HostConfig at a time. Memory grows with the config as written, not
+    with the number of hosts it describes. The first source is the inline
+    ``esxiHosts`` list, the rest are host files.
+    """
+
+    def __init__(self, sources: List[HostSource]):
+        self.sources = sources
+        self._segments = [segment for source in sources for segment in source.segments]
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self._segments)
+
+    def __iter__(self) -> Iterator[HostConfig]:
+        for entry in self.entries():
+            yield self._host(entry)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        for segment in self._segments:
+            if 0 <= index < len(segment):
+                return self._host(segment.record(index))
+            index -= len(segment)
+        raise IndexError("host index out of range")
+
+    @property
+    def compact(self) -> bool:
+        """True when the hosts use ranges or host files, so PowerShell needs them expanded."""
+        return len(self.sources) > 1 or any(source.has_ranges for source in self.sources)
+
+    def entries(self) -> Iterator[Any]:
+        """Every host entry, in order, with ranges expanded as they are reached."""
+        for source in self.sources:
+            yield from source.entries()
+
+    def entry(self, hostname: str) -> Optional[Dict[str, Any]]:
+        """The first entry named ``hostname`` (case-insensitive), or None."""
+        for segment in self._segments:
+            index = segment.index_of(hostname)
+            if index is not None:
+                return segment.record(index)
+        return None
+
+    def host(self, hostname: str) -> Optional[HostConfig]:
+        entry = self.entry(hostname)
+        return self._host(entry) if entry is not None else None
+
+    def digest_value(self) -> Any:
+        """
+        What config_digest hashes for ``esxiHosts``: the inline entries as
+        written, plus the content hash of each host file if there are any.
+        """
+        inline = self.sources[0].written() if self.sources else []
+        files = {source.name: source.version for source in self.sources[1:]}
+        return {"esxiHosts": inline, "files": files} if files else inline
+
+    def validate(self, errors: List[str]):
+        """Record missing fields and duplicate hostnames in ``errors``, one record at a time."""
+        for position, segment in enumerate(self._segments):
+            if isinstance(segment, HostRange):
+                errors.extend(f"missing '{segment.where}.{key}'" for key in segment.missing_fields())
+            for index, entry in enumerate(segment):
+                if isinstance(segment, HostEntries):
+                    prefix = segment.label(index)
+                    if not isinstance(entry, dict):
+                        errors.append(f"'{prefix}' should be an object")
+                        continue
+                    if not entry.get('hostname') or not isinstance(entry['hostname'], str):
+                        errors.append(f"missing '{prefix}.hostname'")
+                        continue
+                    if not entry.get('managementIp'):
+                        errors.append(f"missing '{prefix}.managementIp'")
+                hostname = entry['hostname']
+                if segment.index_of(hostname) != index or any(
+                        earlier.index_of(hostname) is not None for earlier in self._segments[:position]):
+                    errors.append(f"duplicate host '{hostname}'")
+
+    @staticmethod
+    def _host(entry: Dict[str, Any]) -> HostConfig:
+        return HostConfig(hostname=entry['hostname'], management_ip=entry.get('managementIp'),
+                          vmotion_ip=entry.get('vmotionIp'), vsan_ip=entry.get('vsanIp'))
+
+
+def host_file_paths(base_dir: Path, patterns: Sequence[str]) -> List[Path]:
+    """Resolve ``esxiHostFiles`` glob patterns (relative to the config file) in a stable order."""
+    paths: List[Path] = []
+    seen: Set[Path] = set()
+    for pattern in patterns:
+        matches = sorted(p.resolve() for p in base_dir.glob(pattern)) if not Path(pattern).is_absolute() \
+            else sorted(Path(p).resolve() for p in glob.glob(pattern))
+        if not matches:
+            raise ConfigError(f"'esxiHostFiles': no file matches '{pattern}'")
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def read_host_file(path: Path) -> HostSource:
+    """
+    Read one host file: a JSON list of host entries, or one entry per line
+    for ``.ndjson``/``.jsonl`` files. Line files are parsed line by line;
+    ranges in either kind stay compact.
+    """
+    digest = hashlib.sha256()
+
+    def lines(f) -> Iterator[Any]:
+        for line in f:
+            digest.update(line.encode("utf-8"))
+            if line.strip():
+                yield json.loads(line)
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            if path.suffix.lower() in LINE_HOST_FILE_SUFFIXES:
+                segments = host_segments(lines(f), path.name)
+            else:
+                text = f.read()
+                digest.update(text.encode("utf-8"))
+                entries = json.loads(text)
+                if not isinstance(entries, list):
+                    raise ConfigError(f"host file {path.name} should contain a JSON list")
+                segments = host_segments(entries, path.name)
+    except ConfigError:
+        raise
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"cannot read host file {path.name}: {e}") from None
+    return HostSource(path.stem, digest.hexdigest(), segments)
+
+
+class ConfigStore:
+    """
+    Cached view of a config file.
+
+    The file is only re-read when its mtime or size changes, and only
+    re-parsed when its content hash changes, so repeated menu redraws cost a
+    single ``stat`` call (plus one per ``esxiHostFiles`` file).
+
+    Host ranges stay compact (see HostList) and host files are cached
+    individually, so a change to one of them re-reads only that file.
+    PowerShell cannot read ranges, so ``host_files`` writes the expanded
+    hosts to ``<config>.hosts/``, one file per source, when a script needs
+    them; a source's file is rewritten only when that source changes.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.parses = 0
+        self.host_dir = self.path.with_name(f"{self.path.stem}.hosts")
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._digest: Optional[str] = None
+        self._config: Optional[InfraConfig] = None
+        self._host_patterns: List[str] = []
+        self._host_files: Dict[Path, Tuple[Tuple[int, int], HostSource]] = {}
+        self._written: Optional[Dict[str, str]] = None     # host file name -> source version
+        self._lock = threading.Lock()
+
+    def _host_file_stamps(self) -> Dict[Path, Tuple[int, int]]:
+        stamps = {}
+        for path in host_file_paths(self.path.parent, self._host_patterns):
+            stat = os.stat(path)
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def _hosts(self, data: Any) -> Optional[HostList]:
+        """
+        The host sources of ``data``: the inline ``esxiHosts`` list, then each
+        host file. None when there is nothing to read beyond what
+        parse_config reads itself.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("esxiHosts", []), list):
+            return None
+        patterns = data.get("esxiHostFiles") or []
+        if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+            raise ConfigError("'esxiHostFiles' should be a list of file patterns")
+        self._host_patterns = patterns
+        if not patterns:
+            self._host_files = {}
+            return None
+
+        sources = [HostSource.inline(data.get("esxiHosts", []))]
+        files: Dict[Path, Tuple[Tuple[int, int], HostSource]] = {}
+        for path, stamp in self._host_file_stamps().items():
+            cached = self._host_files.get(path)
+            files[path] = cached if cached and cached[0] == stamp else (stamp, read_host_file(path))
+            sources.append(files[path][1])
+        self._host_files = files
+        return HostList(sources)
+
+    def load(self) -> InfraConfig:
+        """Return the parsed config, re-reading the file only if it or a host file changed."""
+        with self._lock:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            hosts_changed = bool(self._host_patterns) and self._host_file_stamps() != {
+                path: cached[0] for path, cached in self._host_files.items()}
+            if self._config is not None and stamp == self._stamp and not hosts_changed:
+                return self._config
+
+            content = self.path.read_bytes()
+            digest = hashlib.sha256(content).hexdigest()
+            if self._config is None or digest != self._digest or hosts_changed:
+                data = json.loads(content)
+                self._config = parse_config(data, self._hosts(data))
+                self._digest = digest
+                self.parses += 1
+            self._stamp = stamp
+            return self._config
+
+    def host_files(self) -> List[Path]:
+        """
+        Expanded host files for PowerShell, in order, or [] when the config
+        lists every host literally.
+
+        Each source is streamed to its own file, skipping sources whose
+        version matches the one recorded in ``.index`` by an earlier run.
+        Only files named in that index are ever removed.
+        """
+        hosts = self.load().hosts
+        with self._lock:
+            index_path = self.host_dir / ".index"
+            if self._written is None:
+                try:
+                    self._written = json.loads(index_path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    self._written = {}
+            if not hosts.compact and not self._written:
+                return []
+
+            written = {}
+            for index, source in enumerate(hosts.sources if hosts.compact else []):
+                path = self.host_dir / f"{index:03d}-{source.name}.json"
+                if self._written.get(path.name) != source.version or not path.exists():
+                    _write_atomic(path, json_list_chunks(source.entries()))
+                written[path.name] = source.version
+            for name in self._written:
+                if name not in written:
+                    (self.host_dir / name).unlink(missing_ok=True)
+            if written != self._written:
+                _write_atomic(index_path, json.dumps(written))
+            self._written = written
+            return [self.host_dir / name for name in written]
+
+    def invalidate(self):
+        """Force the next load to re-read the file."""
+        with self._lock:
+            self._stamp = None
+            self._digest = None
+            self._config = None
+            self._host_files = {}
+            self._written = None
+
+
+def json_list_chunks(items: Iterable[Any]) -> Iterator[str]:
+    """Encode ``items`` as a JSON list, one item per chunk, so a long list is never built in memory."""
+    yield "["
+    for index, item in enumerate(items):
+        yield ("," if index else "") + "\n" + json.dumps(item)
+    yield "\n]\n"
+
+
+# =============================================================================
+# Structured Event Stream
+# =============================================================================
+
+# Environment variable naming the NDJSON file Write-EcstEvent appends to
+EVENT_LOG_ENV = "ECST_EVENT_LOG"
+
+
+@dataclass
+class EcstEvent:
+    """One event written by Write-EcstEvent (see modules/00-Events.ps1)."""
+    type: str
+    step: str
+    target: Optional[str] = None
+    status: Optional[str] = None
+    seconds: Optional[float] = None
+    message: Optional[str] = None
+    value: Any = None
+    unit: Optional[str] = None
+    ts: Optional[str] = None
+
+    @classmethod
+    def parse(cls, line: str) -> Optional["EcstEvent"]:
+        """Parse one NDJSON line, returning None for anything malformed."""
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict) or not data.get("type") or not data.get("step"):
+            return None
+        return cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
+
+
+class EventLog:
+    """
+    Events collected from one or more PowerShell runs.
+
+    Only parsed events are kept, never the console output, so a log can be
+    shared between concurrent runs and queried afterwards for reports or to
+    feed later steps.
+    """
+
+    def __init__(self):
+        self.events: List[EcstEvent] = []
+        self._lock = threading.Lock()
+
+    def add(self, event: EcstEvent):
+        with self._lock:
+            self.events.append(event)
+
+    def steps(self) -> Dict[str, EcstEvent]:
+        """Final step-end event for each step, in the order the steps ended."""
+        with self._lock:
+            return {e.step: e for e in self.events if e.type == "step-end"}
+
+    def results(self, step: Optional[str] = None) -> Dict[str, EcstEvent]:
+        """Latest result event per target, optionally limited to one step."""
+        with self._lock:
+            return {e.target: e for e in self.events
+                    if e.type == "result" and e.target and (step is None or e.step == step)}
+
+    def failed(self, step: Optional[str] = None) -> List[EcstEvent]:
+        """Result events with a Failed status."""
+        with self._lock:
+            return [e for e in self.events
+                    if e.type == "result" and e.status == "Failed" and (step is None or e.step == step)]
+
+    def metrics(self, step: Optional[str] = None) -> List[EcstEvent]:
+        """Metric events, optionally limited to one step."""
+        with self._lock:
+            return [e for e in self.events if e.type == "metric" and (step is None or e.step == step)]
+
+
+class EventTail:
+    """
+    Follow an NDJSON event file while another process appends to it.
+
+    The file is polled from a background thread and only complete lines are
+    parsed; a partially written line is kept until the rest arrives. Each event
+    is added to ``log`` and passed to ``on_event`` as soon as it is read.
+    """
+
+    def __init__(self, path: Path, log: Optional[EventLog] = None,
+                 on_event: Optional[Callable[[EcstEvent], None]] = None,
+                 poll_interval: float = 0.2):
+        self.path = Path(path)
+        self.log = log if log is not None else EventLog()
+        self.on_event = on_event
+        self.poll_interval = poll_interval
+        self._offset = 0
+        self._partial = b""
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._follow, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop following and read whatever is left in the file."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.poll()
+
+    def poll(self) -> int:
+        """Read newly appended lines. Returns the number of events parsed."""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read()
+        except OSError:
+            return 0
+        if not chunk:
+            return 0
+        self._offset += len(chunk)
+
+        *lines, self._partial = (self._partial + chunk).split(b"\n")
+        count = 0
+        for raw in lines:
+            event = EcstEvent.parse(raw.decode("utf-8", errors="replace"))
+            if event is None:
+                continue
+            self.log.add(event)
+            count += 1
+            if self.on_event:
+                try:
+                    self.on_event(event)
+                except Exception:
+                    pass
+        return count
+
+    def _follow(self):
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    def __enter__(self) -> "EventTail":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+@contextmanager
+def capture_events(log: Optional[EventLog] = None,
+                   on_event: Optional[Callable[[EcstEvent], None]] = None):
+    """
+    Create a temporary event file and tail it while the block runs.
+
+    Yields the EventTail; pass ``tail.path`` to the PowerShell side as
+    ECST_EVENT_LOG. The file is removed afterwards, the events stay in
+    ``tail.log``. When tracing is enabled the events also become spans under
+    the caller's current span.
+    """
+    fd, path = tempfile.mkstemp(prefix="ecst-events-", suffix=".ndjson")
+    os.close(fd)
+    if _tracer is not None:
+        sink = _tracer.event_sink()
+        handler = on_event
+        on_event = lambda event: (sink(event), handler and handler(event))
+    tail = EventTail(Path(path), log, on_event)
+    try:
+        with tail:
+            yield tail
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def print_event(event: EcstEvent):
+    """Render a progress line for step completions and non-successful results."""
+    colors = {"Success": Colors.GREEN, "Failed": Colors.RED, "Skipped": Colors.YELLOW}
+    color = colors.get(event.status or "", Colors.CYAN)
+    elapsed = f" ({event.seconds:.1f}s)" if event.seconds is not None else ""
+
+    if event.type == "step-end":
+        print(f"{color}» Step {event.step}: {event.status}{elapsed}{Colors.ENDC}")
+    elif event.type == "result" and event.status != "Success":
+        detail = f" - {event.message}" if event.message else ""
+        print(f"{color}» {event.step} {event.target}: {event.status}{detail}{Colors.ENDC}")
+
+
+def print_step_report(log: EventLog):
+    """Print per-step status, duration and result counts collected from events."""
+    steps = log.steps()
+    if not steps:
+        return
+
+    print()
+    print(f"{Colors.BOLD}Step Report:{Colors.ENDC}")
+    width = max([len(name) for name in steps] + [4])
+    print(f"  {'Step':<{width}}  {'Status':<8}  {'Time':>8}  Results")
+    print(f"  {'-' * width}  {'-' * 8}  {'-' * 8}  {'-' * 20}")
+    for name, event in steps.items():
+        color = {"Success": Colors.GREEN, "Failed": Colors.RED}.get(event.status or "", Colors.YELLOW)
+        elapsed = f"{event.seconds:.1f}s" if event.seconds is not None else "-"
+        counts: Dict[str, int] = {}
+        for result in log.results(name).values():
+            counts[result.status or "Unknown"] = counts.get(result.status or "Unknown", 0) + 1
+        summary = ", ".join(f"{n} {status.lower()}" for status, n in counts.items())
+        print(f"  {name:<{width}}  {color}{event.status or '':<8}{Colors.ENDC}  {elapsed:>8}  {summary}")
+
+
+# =============================================================================
+# Performance Tracing
+# =============================================================================
+
+# Default output paths for --trace / --metrics (also used by the interactive menu)
+TRACE_FILE_ENV = "ECST_TRACE_FILE"
+METRICS_FILE_ENV = "ECST_METRICS_FILE"
+
+
+@dataclass
+class Span:
+    """One timed operation: a Python action, a PowerShell step or a per-host operation."""
+    name: str
+    category: str
+    start: float
+    duration: float = 0.0
+    target: Optional[str] = None
+    status: Optional[str] = None
+    parent: Optional["Span"] = field(default=None, repr=False)
+    lane: int = 0
+
+
+def _event_time(ts: Optional[str]) -> Optional[float]:
+    """Convert a Write-EcstEvent timestamp (round-trip "o" format, UTC) to epoch seconds."""
+    if not ts or len(ts) < 19:
+        return None
+    try:
+        base = datetime.strptime(ts[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    fraction = ts[19:].rstrip("Z").split("+")[0]
+    digits = fraction[1:] if fraction.startswith(".") else ""
+    return base.timestamp() + (int(digits) / 10 ** len(digits) if digits.isdigit() else 0.0)
+
+
+def _prometheus_labels(**labels: Optional[str]) -> str:
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{k}="{escape(v)}"' for k, v in labels.items() if v is not None)
+
+
+class Tracer:
+    """
+    Collects hierarchical timing spans for one run of the tool.
+
+    Python spans are opened with ``span()`` and nest per thread. Step-end and
+    timed result events from the PowerShell side are converted into spans
+    under whichever Python span was open when their event file was captured,
+    so a trace covers action -> step -> host. The result can be written as a
+    Chrome trace (chrome://tracing, Perfetto) and as a Prometheus textfile for
+    the node_exporter textfile collector.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.spans: List[Span] = []
+        self.metrics: List[EcstEvent] = []
+        self._clock = clock
+        self._local = threading.local()
+        self._lanes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[Span]:
+        """Innermost open span on the calling thread."""
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, category: str, target: Optional[str] = None,
+             parent: Optional[Span] = None):
+        """
+        Time the block as a span nested under ``parent``, or under the
+        thread's current span. Pass ``parent`` explicitly from pool threads.
+        """
+        span = Span(name=name, category=category, start=self._clock(), target=target,
+                    parent=parent or self.current(), lane=self._lane())
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        self._local.stack.append(span)
+        try:
+            yield span
+        except (Exception, KeyboardInterrupt):
+            span.status = "Failed"
+            raise
+        finally:
+            span.duration = self._clock() - span.start
+            self._local.stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def event_sink(self) -> Callable[[EcstEvent], None]:
+        """
+        Return a callback that records events as spans.
+
+        The parent is fixed now, on the calling thread, because events are
+        delivered later from the tail thread.
+        """
+        parent = self.current()
+        lane = parent.lane if parent else self._lane()
+        return lambda event: self.add_event(event, parent, lane)
+
+    def add_event(self, event: EcstEvent, parent: Optional[Span] = None, lane: int = 0):
+        """Record a step-end or timed result event as a span, and keep metric events."""
+        if event.type == "metric":
+            with self._lock:
+                self.metrics.append(event)
+            return
+        if event.type not in ("step-end", "result") or event.seconds is None:
+            return
+        end = _event_time(event.ts) or self._clock()
+        span = Span(
+            name=event.step,
+            category="step" if event.type == "step-end" else "host",
+            start=end - event.seconds,
+            duration=event.seconds,
+            target=event.target,
+            status=event.status,
+            parent=parent,
+            lane=lane
+        )
+        with self._lock:
+            self.spans.append(span)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Build a Chrome trace-event document with one complete ("X") event per span."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: (s.start, -s.duration))
+            lanes = dict(self._lanes)
+        origin = spans[0].start if spans else 0.0
+        pid = os.getpid()
+
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "ecst-vmware"}}
+        ]
+        for lane in sorted(lanes.values()):
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": lane,
+                           "args": {"name": "main" if lane == 0 else f"thread-{lane}"}})
+        for span in spans:
+            args = {k: v for k, v in (("target", span.target), ("status", span.status),
+                                      ("parent", span.parent.name if span.parent else None)) if v}
+            events.append({
+                "name": f"{span.name} {span.target}" if span.target else span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - origin) * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": pid,
+                "tid": span.lane,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"startTime": origin}}
+
+    def prometheus_text(self) -> str:
+        """Summarize the spans in Prometheus text exposition format."""
+        totals: Dict[Tuple[str, str, Optional[str]], List[float]] = {}
+        failures: Dict[Tuple[str, str, Optional[str]], int] = {}
+        with self._lock:
+            for span in self.spans:
+                key = (span.category, span.name, span.target)
+                totals.setdefault(key, []).append(span.duration)
+                failures[key] = failures.get(key, 0) + (span.status == "Failed")
+            metrics = list(self.metrics)
+
+        lines = [
+            "# HELP ecst_span_duration_seconds Time spent in traced spans during the last run.",
+            "# TYPE ecst_span_duration_seconds summary",
+        ]
+        for (category, name, target), durations in sorted(totals.items(), key=lambda i: tuple(map(str, i[0]))):
+            labels = _prometheus_labels(category=category, name=name, target=target)
+            lines.append(f"ecst_span_duration_seconds_sum{{{labels}}} {sum(durations):.6f}")
+            lines.append(f"ecst_span_duration_seconds_count{{{labels}}} {len(durations)}")
+
+        lines += [
+            "# HELP ecst_span_max_seconds Longest single span per name and target during the last run.",
+            "# TYPE ecst_span_max_seconds gauge",
+        ]
+        for (category, name, target), durations in sorted(totals.items(), key=lambda i: tuple(map(str, i[0]))):
+            labels = _prometheus_labels(category=category, name=name, target=target)
+            lines.append(f"ecst_span_max_seconds{{{labels}}} {max(durations):.6f}")
+
+        lines += [
+            "# HELP ecst_span_failures Traced spans that failed during the last run.",
+            "# TYPE ecst_span_failures gauge",
+        ]
+        for (category, name, target), count in sorted(failures.items(), key=lambda i: tuple(map(str, i[0]))):
+            labels = _prometheus_labels(category=category, name=name, target=target)
+            lines.append(f"ecst_span_failures{{{labels}}} {count}")
+
+        numeric = [m for m in metrics if isinstance(m.value, (int, float)) and not isinstance(m.value, bool)]
+        if numeric:
+            lines += [
+                "# HELP ecst_metric Last value of each metric event emitted by the modules.",
+                "# TYPE ecst_metric gauge",
+            ]
+            latest = {(m.step, m.target, m.unit): m.value for m in numeric}
+            for (step, target, unit), value in latest.items():
+                lines.append(f"ecst_metric{{{_prometheus_labels(step=step, target=target, unit=unit)}}} {value}")
+
+        lines += [
+            "# HELP ecst_last_run_timestamp_seconds When the traced run finished.",
+            "# TYPE ecst_last_run_timestamp_seconds gauge",
+            f"ecst_last_run_timestamp_seconds {self._clock():.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_chrome_trace(self, path: Path):
+        _write_atomic(Path(path), json.dumps(self.chrome_trace()))
+
+    def write_prometheus(self, path: Path):
+        _write_atomic(Path(path), self.prometheus_text())
+
+    def _lane(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            if ident not in self._lanes:
+                self._lanes[ident] = len(self._lanes)
+            return self._lanes[ident]
+
+
+def _read_umask() -> int:
+    """The process umask. It can only be read by setting it, so this runs once, at import."""
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+def _write_atomic(path: Path, text: Any):
+    """
+    Write via a temporary file and rename, so readers never see a partial
+    file. ``text`` is a string or an iterable of string chunks.
+
+    mkstemp creates the file as 0600, so it is widened to 0644 less the
+    umask: node_exporter or a PowerShell session under another account may
+    have to read it.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            if isinstance(text, str):
+                f.write(text)
+            else:
+                f.writelines(text)
+        os.chmod(tmp, 0o644 & ~_UMASK)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+_tracer: Optional[Tracer] = None
+_trace_outputs: Tuple[Optional[Path], Optional[Path]] = (None, None)
+
+
+def enable_tracing(trace_file: Optional[Path] = None, metrics_file: Optional[Path] = None) -> Optional[Tracer]:
+    """
+    Start collecting spans if either output is requested.
+
+    The files are written when the tool exits.
+    """
+    global _tracer, _trace_outputs
+    if not (trace_file or metrics_file):
+        return None
+    if _tracer is None:
+        _tracer = Tracer()
+        atexit.register(write_trace_outputs)
+    _trace_outputs = (trace_file, metrics_file)
+    return _tracer
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def current_span() -> Optional[Span]:
+    """Innermost open span on the calling thread, for handing to pool threads."""
+    return _tracer.current() if _tracer is not None else None
+
+
+@contextmanager
+def trace_span(name: str, category: str, target: Optional[str] = None,
+               parent: Optional[Span] = None):
+    """
+    Time the block when tracing is enabled.
+
+    Always yields a Span so callers can set ``status`` unconditionally.
+    """
+    if _tracer is None:
+        yield Span(name=name, category=category, start=0.0, target=target)
+        return
+    with _tracer.span(name, category, target, parent) as span:
+        yield span
+
+
+def write_trace_outputs():
+    """Write the Chrome trace and Prometheus textfile requested by enable_tracing."""
+    if _tracer is None:
+        return
+    trace_file, metrics_file = _trace_outputs
+    # Keep stdout clean for --json output
+    with redirect_stdout(sys.stderr):
+        try:
+            if trace_file:
+                _tracer.write_chrome_trace(trace_file)
+                print_info(f"Trace written to {trace_file}")
+            if metrics_file:
+                _tracer.write_prometheus(metrics_file)
+                print_info(f"Metrics written to {metrics_file}")
+        except OSError as e:
+            print_error(f"Could not write trace output: {e}")
+
+
+# =============================================================================
+# Concurrent Subprocess Runner
+# =============================================================================
+
+# Rotating colors for job tags so interleaved output stays readable
+JOB_TAG_COLORS = ("CYAN", "GREEN", "YELLOW", "BLUE", "HEADER")
+
+
+@dataclass
+class SubprocessJob:
+    """One command for run_subprocess_jobs; ``name`` tags its output lines."""
+    name: str
+    command: List[str]
+    timeout: Optional[float] = None
+    env: Optional[Dict[str, str]] = None
+    cwd: Optional[Path] = None
+
+
+@dataclass
+class SubprocessJobResult:
+    """Outcome of one SubprocessJob."""
+    name: str
+    returncode: Optional[int] = None
+    duration: float = 0.0
+    output: List[str] = field(default_factory=list)
+    timed_out: bool = False
+    cancelled: bool = False
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.cancelled
+
+
+def process_group_options() -> Dict[str, Any]:
+    """
+    Popen options that start a child in its own process group.
+
+    Ctrl-C then reaches only this tool, which decides what to stop, and
+    kill_process_tree can take down the child together with anything it spawned.
+    """
+    if os.name == 'nt':
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(pid: int):
+    """Kill a child started with process_group_options() and all of its descendants."""
+    try:
+        if os.name == 'nt':
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(pid, signal.SIGKILL)
+    except (OSError, ProcessLookupError):
+        pass
+
+
+async def _run_job(job: SubprocessJob, semaphore: asyncio.Semaphore,
+                   on_line: Callable[[SubprocessJob, str, bool], None]) -> SubprocessJobResult:
+    async with semaphore:
+        result = SubprocessJobResult(name=job.name)
+        start = time.monotonic()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *job.command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=str(job.cwd or SCRIPT_DIR),
+                env=job.env,
+                limit=1024 * 1024,
+                **process_group_options()
+            )
+        except OSError as e:
+            result.output.append(f"Could not start {job.command[0]}: {e}")
+            on_line(job, result.output[-1], True)
+            return result
+
+        async def pump(stream: asyncio.StreamReader, is_error: bool):
+            while True:
+                raw = await stream.readline()
+                if not raw:
+                    return
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                result.output.append(line)
+                on_line(job, line, is_error)
+
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(pump(process.stdout, False), pump(process.stderr, True), process.wait()),
+                job.timeout
+            )
+            result.returncode = process.returncode
+        except asyncio.TimeoutError:
+            result.timed_out = True
+            on_line(job, f"Timed out after {job.timeout:g}s", True)
+        except asyncio.CancelledError:
+            result.cancelled = True
+            raise
+        finally:
+            if process.returncode is None:
+                kill_process_tree(process.pid)
+                await process.wait()
+            # Read the pipes to EOF so their transports close while the loop is alive
+            await asyncio.gather(process.stdout.read(), process.stderr.read(), return_exceptions=True)
+            result.duration = time.monotonic() - start
+        return result
+
+
+async def run_jobs_async(jobs: Sequence[SubprocessJob], max_concurrent: Optional[int] = None,
+                         echo: bool = True, tag_output: Optional[bool] = None) -> List[SubprocessJobResult]:
+    """
+    Run ``jobs`` concurrently, at most ``max_concurrent`` at a time.
+
+    stdout and stderr are read line by line as they arrive. When echoing,
+    each line is prefixed with its job name (by default only when there is
+    more than one job). A job that exceeds its timeout is killed with its
+    process tree, and cancelling this coroutine kills every running job.
+    """
+    if not jobs:
+        return []
+    tag_output = len(jobs) > 1 if tag_output is None else tag_output
+    width = max(len(job.name) for job in jobs)
+    colors = {job.name: getattr(Colors, JOB_TAG_COLORS[i % len(JOB_TAG_COLORS)]) for i, job in enumerate(jobs)}
+
+    def on_line(job: SubprocessJob, line: str, is_error: bool):
+        if not echo:
+            return
+        if is_error:
+            line = f"{Colors.RED}{line}{Colors.ENDC}"
+        if tag_output:
+            line = f"{colors[job.name]}[{job.name:<{width}}]{Colors.ENDC} {line}"
+        print(line, flush=True)
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrent or len(jobs)))
+    tasks = [asyncio.ensure_future(_run_job(job, semaphore, on_line)) for job in jobs]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except asyncio.CancelledError:
+        # Cancelling the gather has cancelled every job once. Cancelling them
+        # again would interrupt their cleanup, so just let each one kill its
+        # process and drain its pipes before giving up
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def run_subprocess_jobs(jobs: Sequence[SubprocessJob], max_concurrent: Optional[int] = None,
+                        echo: bool = True, tag_output: Optional[bool] = None) -> List[SubprocessJobResult]:
+    """
+    Blocking wrapper around run_jobs_async.
+
+    On Ctrl-C every running job is killed, children included, before
+    KeyboardInterrupt propagates, so nothing is left orphaned.
+    """
+    return asyncio.run(run_jobs_async(jobs, max_concurrent, echo, tag_output))
+
+
+# =============================================================================
+# Utility Functions
+# =============================================================================
+
+def clear_screen():
+    """Clear the terminal screen."""
+    if NON_INTERACTIVE:
+        return
+    os.system('cls' if os.name == 'nt' else 'clear')
+
+
+def print_header(title: str):
+    """Print a formatted header."""
+    width = 60
+    print()
+    print(f"{Colors.CYAN}{'=' * width}{Colors.ENDC}")
+    print(f"{Colors.BOLD}{Colors.CYAN}  {title}{Colors.ENDC}")
+    print(f"{Colors.CYAN}{'=' * width}{Colors.ENDC}")
+    print()
+
+
+def print_success(message: str):
+    """Print a success message."""
+    print(f"{Colors.GREEN}[SUCCESS]{Colors.ENDC} {message}")
+
+
+def print_error(message: str):
+    """Print an error message."""
+    print(f"{Colors.RED}[ERROR]{Colors.ENDC} {message}")
+
+
+def print_warning(message: str):
+    """Print a warning message."""
+    print(f"{Colors.YELLOW}[WARNING]{Colors.ENDC} {message}")
+
+
+def print_info(message: str):
+    """Print an info message."""
+    print(f"{Colors.CYAN}[INFO]{Colors.ENDC} {message}")
+
+
+def get_input(prompt: str, default: str = "") -> str:
+    """Get user input with optional default value."""
+    if default:
+        user_input = input(f"{prompt} [{default}]: ").strip()
+        return user_input if user_input else default
+    return input(f"{prompt}: ").strip()
+
+
+def get_password(prompt: str) -> str:
+    """Get password input (hidden)."""
+    return getpass.getpass(f"{prompt}: ")
+
+
+def confirm_action(message: str) -> bool:
+    """Ask for user confirmation."""
+    if NON_INTERACTIVE:
+        return True
+    response = input(f"{Colors.YELLOW}{message} (y/n): {Colors.ENDC}").strip().lower()
+    return response in ('y', 'yes')
+
+
+_config_store = ConfigStore(CONFIG_FILE)
+
+
+def set_config_file(path: Path):
+    """Point the tool (and every generated PowerShell script) at another config file."""
+    global CONFIG_FILE, _config_store
+    CONFIG_FILE = Path(path).resolve()
+    _config_store = ConfigStore(CONFIG_FILE)
+
+
+def load_infra_config() -> InfraConfig:
+    """Load the typed configuration, re-parsing only when config.json changes."""
+    try:
+        return _config_store.load()
+    except FileNotFoundError:
+        print_error(f"Configuration file not found: {CONFIG_FILE}")
+        sys.exit(EXIT_CONFIG_ERROR)
+    except json.JSONDecodeError as e:
+        print_error(f"Invalid JSON in configuration file: {e}")
+        sys.exit(EXIT_CONFIG_ERROR)
+    except ConfigError as e:
+        print_error(f"Invalid configuration: {e}")
+        sys.exit(EXIT_CONFIG_ERROR)
+
+
+def pause():
+    """Wait for Enter before returning to the menu."""
+    if not NON_INTERACTIVE:
+        input("\nPress Enter to continue...")
+
+
+def powershell_config_preamble() -> str:
+    """
+    PowerShell that loads ``$config``: config.json itself, with ``esxiHosts``
+    replaced by the expanded host files when it uses host ranges or host files.
+    Those files are written here, the first time a script needs them.
+    """
+    load_infra_config()
+    preamble = f"$config = Get-Content {quote_ps(_config_store.path)} -Raw | ConvertFrom-Json"
+    host_files = _config_store.host_files()
+    if host_files:
+        files = ", ".join(quote_ps(path) for path in host_files)
+        preamble += (f"\n    $config | Add-Member -NotePropertyName esxiHosts -Force -NotePropertyValue "
+                     f"@(foreach ($hostFile in @({files})) {{ (Get-Content $hostFile -Raw | ConvertFrom-Json) }})")
+    return preamble
+
+
+def load_config() -> Dict[str, Any]:
+    """Load configuration from JSON file."""
+    return load_infra_config().raw
+
+
+def save_config(config: Dict[str, Any]):
+    """Save configuration to JSON file."""
+    with open(CONFIG_FILE, 'w') as f:
+        json.dump(config, f, indent=2)
+    _config_store.invalidate()
+
+
+def powershell_script_command(script: str, params: Dict[str, Any] = None) -> List[str]:
+    """Build the powershell.exe command line that runs ``script`` with ``params``."""
+    cmd = ["powershell.exe", "-ExecutionPolicy", "Bypass", "-File", str(script)]
+    
+    if params:
+        for key, value in params.items():
+            if isinstance(value, bool):
+                # Switch parameters must be bound as -Name:$true with -File
+                cmd.append(f"-{key}:${str(value).lower()}")
+            else:
+                cmd.extend([f"-{key}", str(value)])
+    return cmd
+
+
+def _completed(cmd: List[str], job: SubprocessJobResult) -> subprocess.CompletedProcess:
+    returncode = job.returncode if job.returncode is not None else -1
+    return subprocess.CompletedProcess(cmd, returncode, stdout="\n".join(job.output))
+
+
+def run_powershell(script: str, params: Dict[str, str] = None,
+                   events: Optional[EventLog] = None,
+                   timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """
+    Execute a PowerShell script with parameters.
+
+    Output is streamed to the console line by line. Structured events written
+    with Write-EcstEvent are parsed as they arrive and added to ``events``.
+    The script is killed after ``timeout`` seconds or on Ctrl-C.
+    """
+    cmd = powershell_script_command(script, params)
+    
+    print_info(f"Executing: {script}")
+    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
+    
+    with trace_span(Path(script).name, "subprocess") as span, \
+            capture_events(events, on_event=print_event) as tail:
+        job = SubprocessJob(Path(script).stem, cmd, timeout=timeout,
+                            env=dict(os.environ, **{EVENT_LOG_ENV: str(tail.path)}))
+        result = _completed(cmd, run_subprocess_jobs([job])[0])
+        span.status = "Success" if result.returncode == 0 else "Failed"
+    
+    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
+    return result
+
+
+def run_powershell_command(command: str, timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """Execute a PowerShell command directly."""
+    cmd = ["powershell.exe", "-ExecutionPolicy", "Bypass", "-Command", command]
+    
+    print_info(f"Executing PowerShell command...")
+    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
+    
+    with trace_span("powershell -Command", "subprocess") as span:
+        result = _completed(cmd, run_subprocess_jobs([SubprocessJob("powershell", cmd, timeout=timeout)])[0])
+        span.status = "Success" if result.returncode == 0 else "Failed"
+    
+    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
+    return result
+
+
+def run_powershell_parallel(runs: Dict[str, Tuple[str, Dict[str, Any]]],
+                            max_concurrent: Optional[int] = None,
+                            timeout: Optional[float] = None,
+                            events: Optional[EventLog] = None) -> Dict[str, SubprocessJobResult]:
+    """
+    Run several PowerShell scripts at once, each as its own process.
+
+    ``runs`` maps a job name (shown in front of each output line, e.g. a host)
+    to ``(script, params)``. Each job is killed after ``timeout`` seconds, and
+    all of them on Ctrl-C.
+    """
+    with ExitStack() as stack:
+        jobs = []
+        for name, (script, params) in runs.items():
+            tail = stack.enter_context(capture_events(events, on_event=print_event))
+            jobs.append(SubprocessJob(name, powershell_script_command(script, params), timeout=timeout,
+                                      env=dict(os.environ, **{EVENT_LOG_ENV: str(tail.path)})))
+        with trace_span(f"{len(jobs)} scripts", "subprocess"):
+            results = run_subprocess_jobs(jobs, max_concurrent)
+    return {r.name: r for r in results}
+
+
+# =============================================================================
+# PowerShell Worker Session
+# =============================================================================
+
+WORKER_FRAME_PREFIX = "##ECST##"
+
+# Seconds between checks for Ctrl-C while waiting on a worker
+WORKER_POLL_INTERVAL = 0.5
+
+
+class WorkerError(RuntimeError):
+    """Raised when the PowerShell worker cannot be started or stops responding."""
+
+
+@dataclass
+class WorkerResult:
+    """Outcome of a single request executed by the PowerShell worker."""
+    returncode: int
+    output: List[str] = field(default_factory=list)
+    data: List[Any] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+class PowerShellWorker:
+    """
+    Long-lived PowerShell/PowerCLI process driven over stdin/stdout.
+
+    Requests are written as one JSON object per line. The worker answers with
+    plain output lines followed by a ``##ECST##`` frame that carries the exit
+    code (see Start-ECSTWorker.ps1). PowerCLI, dot-sourced modules and the
+    vCenter connection stay loaded between requests.
+
+    ``command`` can be overridden to run a stand-in shell for testing, e.g.
+    ``PowerShellWorker([sys.executable, "benchmarks/fake_worker.py"])`` (see
+    tests/test_worker.py).
+    """
+
+    def __init__(self, command: Optional[List[str]] = None, echo: bool = True,
+                 start_timeout: float = 120.0,
+                 health_check_interval: float = WORKER_HEALTH_CHECK_INTERVAL):
+        self.command = command or WORKER_COMMAND or [
+            "powershell.exe", "-NoLogo", "-NoProfile", "-NonInteractive",
+            "-ExecutionPolicy", "Bypass", "-File", str(WORKER_SCRIPT),
+        ]
+        self.echo = echo
+        self.start_timeout = start_timeout
+        self.health_check_interval = health_check_interval
+        self.starts = 0
+        # Shared vCenter session token this process is attached to (see SessionBroker)
+        self.session: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._next_id = 0
+        self._pending: Optional[int] = None
+        self._last_used = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process else None
+
+    @property
+    def restarts(self) -> int:
+        """Number of times the worker had to be replaced."""
+        return max(0, self.starts - 1)
+
+    def is_alive(self) -> bool:
+        """Return True if the worker process is running."""
+        return self._process is not None and self._process.poll() is None
+
+    @property
+    def busy(self) -> bool:
+        """True while a request has been sent and its answer not yet read."""
+        return self._pending is not None and self.is_alive()
+
+    def start(self):
+        """Spawn the worker and wait for its ready frame."""
+        with self._lock:
+            if self.is_alive():
+                return
+            try:
+                self._process = subprocess.Popen(
+                    self.command,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    encoding="utf-8",
+                    errors="replace",
+                    bufsize=1,
+                    cwd=str(SCRIPT_DIR),
+                    **process_group_options()
+                )
+            except OSError as e:
+                self._process = None
+                raise WorkerError(f"Could not start PowerShell worker: {e}")
+
+            self.starts += 1
+            self.session = None
+            self._pending = None
+            self._lines = queue.Queue()
+            reader = threading.Thread(
+                target=self._read_output,
+                args=(self._process, self._lines),
+                daemon=True
+            )
+            reader.start()
+
+            try:
+                self._wait_for_frame(None, self.start_timeout, None, ("ready",))
+            except WorkerError:
+                self.kill()
+                raise
+            self._last_used = time.monotonic()
+
+    def stop(self, timeout: float = 10.0, logout: bool = True):
+        """
+        Ask the worker to disconnect and exit, killing it if it does not.
+
+        With ``logout=False`` the vCenter session is left open for other
+        workers attached to the same token.
+        """
+        with self._lock:
+            if not self.is_alive():
+                self._process = None
+                return
+            try:
+                self._request({"op": "exit", "logout": logout}, timeout)
+            except WorkerError:
+                pass
+            try:
+                self._process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                pass
+            self.kill()
+
+    def kill(self):
+        """Terminate the worker process and anything it started, immediately."""
+        with self._lock:
+            if self._process and self._process.poll() is None:
+                kill_process_tree(self._process.pid)
+                self._process.kill()
+                self._process.wait()
+            self._process = None
+            self.session = None
+            self._pending = None
+
+    def abort(self):
+        """
+        Kill the worker without waiting for the thread using it.
+
+        Used on Ctrl-C: the pending request fails with a WorkerError and the
+        worker is restarted on next use.
+        """
+        process = self._process
+        if process is not None and process.poll() is None:
+            kill_process_tree(process.pid)
+            process.kill()
+
+    def restart(self):
+        """Replace the worker with a fresh process."""
+        with self._lock:
+            self.kill()
+            self.start()
+
+    def ping(self, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        """Health check. Returns the pong frame, or None if the worker is unhealthy."""
+        with self._lock:
+            if not self.is_alive():
+                return None
+            try:
+                return self._request({"op": "ping"}, timeout, terminal=("pong",))
+            except WorkerError:
+                return None
+
+    def ensure_running(self):
+        """Start the worker, or restart it if it died or fails a health check."""
+        with self._lock:
+            if not self.is_alive():
+                self._process = None
+                self.start()
+                return
+            idle = time.monotonic() - self._last_used
+            if idle >= self.health_check_interval and self.ping() is None:
+                self.restart()
+
+    def connected_server(self) -> Optional[str]:
+        """Return the vCenter the worker is connected to, if any."""
+        self.ensure_running()
+        frame = self.ping()
+        return frame.get("server") if frame else None
+
+    def connect(self, server: str, username: str, password: str,
+                timeout: Optional[float] = None) -> WorkerResult:
+        """
+        Open (or reuse) the worker's vCenter connection.
+
+        The session token is returned as ``{"session": ...}`` in ``data``.
+        """
+        return self._run({
+            "op": "connect",
+            "server": server,
+            "username": username,
+            "password": password,
+        }, timeout)
+
+    def attach(self, server: str, session: str,
+               timeout: Optional[float] = None) -> WorkerResult:
+        """Attach the worker to an existing vCenter session instead of logging in."""
+        return self._run({
+            "op": "connect",
+            "server": server,
+            "session": session,
+        }, timeout)
+
+    def logout(self, server: str, session: str,
+               timeout: Optional[float] = None) -> WorkerResult:
+        """Log a vCenter session out without touching the worker's own connection."""
+        return self._run({
+            "op": "logout",
+            "server": server,
+            "session": session,
+        }, timeout)
+
+    def invoke(self, script: str, modules: Sequence[str] = (),
+               timeout: Optional[float] = None,
+               event_log: Optional[Path] = None,
+               credentials: Optional[Dict[str, Tuple[str, str]]] = None) -> WorkerResult:
+        """
+        Run a script in the worker after dot-sourcing the given modules.
+
+        ``event_log`` is exposed to the script as ECST_EVENT_LOG so modules can
+        stream events (see capture_events). ``credentials`` maps variable
+        names to (username, password); the worker sets each as a PSCredential
+        for the script, so passwords never appear in the script text.
+        """
+        request = {
+            "op": "invoke",
+            "modules": list(modules),
+            "script": script,
+        }
+        if event_log:
+            request["eventLog"] = str(event_log)
+        if credentials:
+            request["credentials"] = {name: {"username": username, "password": password}
+                                      for name, (username, password) in credentials.items()}
+        return self._run(request, timeout)
+
+    def _run(self, request: Dict[str, Any], timeout: Optional[float]) -> WorkerResult:
+        with self._lock:
+            # Threads that were waiting for a worker or a login when Ctrl-C hit
+            if _interrupted.is_set():
+                return WorkerResult(returncode=-1, error="Cancelled")
+            try:
+                self.ensure_running()
+                result = WorkerResult(returncode=0)
+                frame = self._request(request, timeout, result=result)
+                result.returncode = int(frame.get("exitCode") or 0)
+                result.error = frame.get("error")
+                return result
+            except WorkerError as e:
+                # The worker is in an unknown state; replace it on next use
+                self.kill()
+                return WorkerResult(returncode=-1, error=str(e))
+
+    def _request(self, request: Dict[str, Any], timeout: Optional[float],
+                 result: Optional[WorkerResult] = None,
+                 terminal: Tuple[str, ...] = ("end",)) -> Dict[str, Any]:
+        self._next_id += 1
+        request = dict(request, id=self._next_id)
+        self._pending = self._next_id
+        try:
+            self._process.stdin.write(json.dumps(request) + "\n")
+            self._process.stdin.flush()
+        except (OSError, ValueError, AttributeError) as e:
+            raise WorkerError(f"Lost connection to PowerShell worker: {e}")
+        frame = self._wait_for_frame(self._next_id, timeout, result, terminal)
+        self._pending = None
+        self._last_used = time.monotonic()
+        return frame
+
+    def _wait_for_frame(self, request_id: Optional[int], timeout: Optional[float],
+                        result: Optional[WorkerResult],
+                        terminal: Tuple[str, ...]) -> Dict[str, Any]:
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                raise WorkerError("Timed out waiting for PowerShell worker")
+            try:
+                # Wake up regularly so Ctrl-C is handled promptly (a blocking
+                # get cannot be interrupted on Windows)
+                line = self._lines.get(timeout=min(remaining or WORKER_POLL_INTERVAL, WORKER_POLL_INTERVAL))
+            except queue.Empty:
+                continue
+
+            if line is None:
+                raise WorkerError("PowerShell worker exited unexpectedly")
+
+            if not line.startswith(WORKER_FRAME_PREFIX):
+                if self.echo:
+                    print(line)
+                if result is not None:
+                    result.output.append(line)
+                continue
+
+            try:
+                frame = json.loads(line[len(WORKER_FRAME_PREFIX):])
+            except json.JSONDecodeError:
+                continue
+
+            if frame.get("type") == "data":
+                if result is not None and frame.get("id") == request_id:
+                    result.data.append(frame.get("data"))
+                continue
+
+            if frame.get("type") in terminal and frame.get("id") == request_id:
+                return frame
+
+    @staticmethod
+    def _read_output(process: subprocess.Popen, lines: "queue.Queue[Optional[str]]"):
+        for line in process.stdout:
+            lines.put(line.rstrip("\r\n"))
+        lines.put(None)
+
+
+_worker: Optional[PowerShellWorker] = None
+_vcenter_credentials: Optional[Tuple[str, str]] = None
+_esxi_credentials: Optional[Tuple[str, str]] = None
+_credentials_lock = threading.Lock()
+
+
+def get_worker() -> PowerShellWorker:
+    """Return the shared worker session, creating it on first use."""
+    global _worker
+    if _worker is None:
+        _worker = PowerShellWorker()
+        atexit.register(shutdown_worker)
+    return _worker
+
+
+def shutdown_worker():
+    """Disconnect and stop the shared worker session."""
+    global _worker
+    if _worker is not None:
+        stop_worker(_worker)
+        _worker = None
+
+
+def get_vcenter_credentials() -> Tuple[str, str]:
+    """Prompt for vCenter credentials once per session."""
+    global _vcenter_credentials
+    with _credentials_lock:
+        if _vcenter_credentials is None:
+            username = os.environ.get("ECST_VCENTER_USER")
+            password = os.environ.get("ECST_VCENTER_PASSWORD")
+            if not (username and password):
+                if NON_INTERACTIVE and not sys.stdin.isatty():
+                    raise WorkerError("vCenter credentials required: set ECST_VCENTER_USER and ECST_VCENTER_PASSWORD")
+                username = get_input("vCenter username", "administrator@vsphere.local")
+                password = get_password("vCenter password")
+            _vcenter_credentials = (username, password)
+        return _vcenter_credentials
+
+
+def get_esxi_credentials() -> Tuple[str, str]:
+    """Prompt for the ESXi root credentials once per session."""
+    global _esxi_credentials
+    with _credentials_lock:
+        if _esxi_credentials is None:
+            username = os.environ.get("ECST_ESXI_USER", "root")
+            password = os.environ.get("ECST_ESXI_PASSWORD")
+            if not password:
+                if NON_INTERACTIVE and not sys.stdin.isatty():
+                    raise WorkerError("ESXi credentials required: set ECST_ESXI_PASSWORD (and ECST_ESXI_USER)")
+                username = get_input("ESXi username", username)
+                password = get_password("ESXi password")
+            _esxi_credentials = (username, password)
+        return _esxi_credentials
+
+
+def reset_vcenter_credentials():
+    """Forget the cached vCenter credentials so the next login prompts again."""
+    global _vcenter_credentials
+    with _credentials_lock:
+        _vcenter_credentials = None
+
+
+class SessionBroker:
+    """
+    Shares one vCenter login between every worker.
+
+    The first worker that needs a connection logs in with credentials and the
+    broker keeps the returned session token in memory (it is never written to
+    disk or printed). Other workers attach to that token with
+    ``Connect-VIServer -Session`` instead of logging in again. Once the token
+    is older than ``ttl`` seconds, or vCenter rejects it, it is dropped and the
+    next caller logs in again transparently. Concurrent callers share that
+    one login (single flight) instead of queueing on the broker lock, and the
+    superseded token is logged out once its last holder has re-attached.
+
+    Anything with ``connect``/``attach``/``logout``/``connected_server``/
+    ``is_alive`` and a ``session`` attribute can stand in for a worker (see
+    tests/test_session_broker.py).
+    """
+
+    def __init__(self, ttl: float = DEFAULT_SESSION_TTL_MINUTES * 60,
+                 credentials: Callable[[], Tuple[str, str]] = get_vcenter_credentials,
+                 on_login_failed: Optional[Callable[[], None]] = reset_vcenter_credentials,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.logins = 0
+        self.attaches = 0
+        self._credentials = credentials
+        self._on_login_failed = on_login_failed
+        self._clock = clock
+        self._sessions: Dict[str, Tuple[str, float]] = {}
+        self._holders: Dict[str, List[PowerShellWorker]] = {}
+        self._superseded: Dict[str, str] = {}      # expired token -> server, until its holders move on
+        self._logins: Dict[str, Future] = {}       # server -> login in flight
+        self._lock = threading.Lock()
+
+    def connect(self, worker: PowerShellWorker, server: str) -> Optional[WorkerResult]:
+        """
+        Make sure ``worker`` is connected to ``server`` on the shared session.
+
+        Returns None when connected, otherwise the failed result.
+        """
+        result: Optional[WorkerResult] = None
+        for _ in range(2):
+            try:
+                token, result = self._token(worker, server)
+                if result is not None:
+                    return result
+                if token is None or (worker.session == token and worker.connected_server() == server):
+                    return None
+                result = worker.attach(server, token)
+            except WorkerError as e:
+                return WorkerResult(returncode=-1, error=str(e))
+
+            if result.returncode == 0:
+                self.attaches += 1
+                self._hold(worker, token)
+                return None
+            # Expired or revoked on the vCenter side; log in again and retry once
+            self.invalidate(server, token)
+        return result
+
+    def invalidate(self, server: str, token: Optional[str] = None):
+        """Drop the cached token for ``server`` (only if it is still ``token``)."""
+        with self._lock:
+            cached = self._sessions.get(server)
+            if cached and (token is None or cached[0] == token):
+                del self._sessions[server]
+                self._holders.pop(cached[0], None)
+            if token is not None:
+                # Rejected by vCenter, so there is nothing left to log out
+                self._superseded.pop(token, None)
+
+    def release(self, worker: PowerShellWorker) -> bool:
+        """
+        Detach ``worker`` from its session before it stops.
+
+        Returns True when no other live worker holds the token, meaning the
+        caller should log the session out.
+        """
+        with self._lock:
+            token = worker.session
+            if token is None:
+                return True
+            holders = [w for w in self._holders.get(token, [])
+                       if w is not worker and w.is_alive() and w.session == token]
+            self._holders[token] = holders
+            if holders:
+                return False
+            self._holders.pop(token, None)
+            self._superseded.pop(token, None)
+            for server, (cached, _) in list(self._sessions.items()):
+                if cached == token:
+                    del self._sessions[server]
+            return True
+
+    def _token(self, worker: PowerShellWorker,
+               server: str) -> Tuple[Optional[str], Optional[WorkerResult]]:
+        """
+        Return a live token for ``server``, logging in through ``worker`` if needed.
+
+        Only one caller per server logs in; the others wait on its future
+        outside the lock and get the same outcome.
+        """
+        with self._lock:
+            cached = self._sessions.get(server)
+            if cached and self._clock() - cached[1] < self.ttl:
+                return cached[0], None
+            login = self._logins.get(server)
+            leader = login is None
+            if leader:
+                if cached:
+                    # Expired: keep it until the workers holding it re-attach, then log it out
+                    del self._sessions[server]
+                    self._superseded[cached[0]] = server
+                login = self._logins[server] = Future()
+
+        if not leader:
+            return login.result()
+
+        try:
+            outcome = self._login(worker, server)
+        except BaseException as e:
+            with self._lock:
+                del self._logins[server]
+            login.set_exception(e)
+            raise
+        with self._lock:
+            del self._logins[server]
+        login.set_result(outcome)
+        return outcome
+
+    def _login(self, worker: PowerShellWorker,
+               server: str) -> Tuple[Optional[str], Optional[WorkerResult]]:
+        username, password = self._credentials()
+        result = worker.connect(server, username, password)
+        if result.returncode != 0:
+            # Most likely bad credentials; ask again next time
+            if self._on_login_failed:
+                self._on_login_failed()
+            return None, result
+
+        token = next((item.get("session") for item in result.data
+                      if isinstance(item, dict) and item.get("session")), None)
+        with self._lock:
+            self.logins += 1
+            if token is not None:
+                self._sessions[server] = (token, self._clock())
+        if token is not None:
+            self._hold(worker, token)
+        else:
+            worker.session = None
+        return token, None
+
+    def _hold(self, worker: PowerShellWorker, token: str):
+        with self._lock:
+            previous = worker.session
+            worker.session = token
+            holders = self._holders.setdefault(token, [])
+            if worker not in holders:
+                holders.append(worker)
+
+            retired = None
+            if previous is not None and previous != token:
+                remaining = [w for w in self._holders.get(previous, [])
+                             if w is not worker and w.is_alive() and w.session == previous]
+                if remaining:
+                    self._holders[previous] = remaining
+                else:
+                    self._holders.pop(previous, None)
+                    retired = self._superseded.pop(previous, None)
+
+        if retired is not None:
+            # Last holder of the expired token has moved on; a failed logout
+            # only means vCenter already dropped it
+            try:
+                worker.logout(retired, previous)
+            except WorkerError:
+                pass
+
+
+_session_broker: Optional[SessionBroker] = None
+
+
+def get_session_broker() -> SessionBroker:
+    """Return the shared session broker, with the TTL from config.json."""
+    global _session_broker
+    with _credentials_lock:
+        if _session_broker is None:
+            _session_broker = SessionBroker()
+    _session_broker.ttl = load_infra_config().session_ttl_minutes * 60
+    return _session_broker
+
+
+def stop_worker(worker: PowerShellWorker):
+    """Stop a worker, logging its vCenter session out only if no other worker still uses it."""
+    logout = _session_broker.release(worker) if _session_broker is not None else True
+    worker.stop(logout=logout)
+
+
+def ensure_worker_connected(worker: PowerShellWorker, server: str) -> Optional[WorkerResult]:
+    """
+    Make sure ``worker`` holds a vCenter connection to ``server``.
+
+    The worker attaches to the shared session from the SessionBroker, so only
+    the first connection (and the first after the token expires) logs in.
+    Returns None when connected, otherwise the failed result.
+    """
+    return get_session_broker().connect(worker, server)
+
+
+def vcenter_script_body(script: str) -> str:
+    """Prefix a script body with the shared ``$config`` preamble."""
+    return f"""
+    {powershell_config_preamble()}
+    {script}
+    """
+
+
+def run_vcenter_script(script: str, modules: Sequence[str] = (),
+                       events: Optional[EventLog] = None) -> WorkerResult:
+    """
+    Run a PowerShell script body against vCenter in the warm worker session.
+
+    The worker is connected on first use and the connection is reused by every
+    later call. ``$config`` is loaded from the config file before the body runs.
+    Events emitted by the script are collected into ``events`` when given.
+    """
+    config = load_infra_config()
+    worker = get_worker()
+
+    print_info("Executing PowerShell command in worker session...")
+    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
+
+    failed = ensure_worker_connected(worker, config.vcenter_server)
+    if failed:
+        print_error(failed.error or "Could not connect to vCenter")
+        print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
+        return failed
+
+    with trace_span(", ".join(modules) or "script", "worker") as span:
+        if events is None and not tracing_enabled():
+            result = worker.invoke(vcenter_script_body(script), modules=modules)
+        else:
+            with capture_events(events) as tail:
+                result = worker.invoke(vcenter_script_body(script), modules=modules, event_log=tail.path)
+        span.status = "Success" if result.returncode == 0 else "Failed"
+    if result.error:
+        print_error(result.error)
+
+    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
+    return result
+
+
+# =============================================================================
+# Per-Host Execution Engine
+# =============================================================================
+
+@dataclass
+class HostTaskResult:
+    """Outcome of one unit of per-host work."""
+    host: str
+    success: bool
+    duration: float = 0.0
+    error: Optional[str] = None
+    output: List[str] = field(default_factory=list)
+
+
+class WorkerPool:
+    """
+    Set of PowerShell workers shared by concurrently running jobs.
+
+    Idle workers are handed out most recently used first, so a run that needs
+    fewer workers than the pool holds keeps reusing the warm ones.
+    """
+
+    def __init__(self, size: int, factory: Optional[Callable[[], PowerShellWorker]] = None):
+        self.size = 0
+        self._factory = factory or (lambda: PowerShellWorker(echo=False))
+        self._workers: List[PowerShellWorker] = []
+        self._idle: "queue.LifoQueue[PowerShellWorker]" = queue.LifoQueue()
+        self.grow(size)
+
+    def grow(self, size: int):
+        """Add workers until the pool holds ``size``; existing workers are kept."""
+        while self.size < max(1, size):
+            worker = self._factory()
+            self._workers.append(worker)
+            self._idle.put(worker)
+            self.size += 1
+
+    @contextmanager
+    def acquire(self):
+        """Borrow an idle worker for the duration of the block."""
+        worker = self._idle.get()
+        try:
+            yield worker
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        """Stop every worker in the pool."""
+        for worker in self._workers:
+            stop_worker(worker)
+
+
+_worker_pool: Optional[WorkerPool] = None
+
+
+def get_worker_pool(size: Optional[int] = None) -> WorkerPool:
+    """
+    Return the shared worker pool.
+
+    The pool is sized once from config.json (the larger of hostParallelism
+    and maxParallelSteps) and is never shrunk, so warm workers survive runs
+    on fewer hosts; callers bound their own concurrency. A larger ``size``
+    (e.g. --max-parallel) adds workers.
+    """
+    global _worker_pool
+    config = load_infra_config()
+    size = max(size or 0, config.host_parallelism, config.step_parallelism)
+    if _worker_pool is None:
+        _worker_pool = WorkerPool(size)
+    else:
+        _worker_pool.grow(size)
+    return _worker_pool
+
+
+def shutdown_worker_pool():
+    """Stop the shared worker pool."""
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.close()
+        _worker_pool = None
+
+
+atexit.register(shutdown_worker_pool)
+
+
+# Set on Ctrl-C until the interrupted action has unwound; queued work is skipped
+_interrupted = threading.Event()
+
+
+def interrupt_workers():
+    """
+    Kill every worker that is in the middle of a request (after Ctrl-C).
+
+    Their waiting callers fail fast instead of blocking until vCenter
+    finishes, no PowerShell process is left running the abandoned script,
+    and the workers restart on next use. Work that has not started yet is
+    skipped until clear_interrupt() is called.
+    """
+    _interrupted.set()
+    workers = [_worker] if _worker is not None else []
+    if _worker_pool is not None:
+        workers.extend(_worker_pool._workers)
+    for worker in workers:
+        if worker.busy:
+            worker.abort()
+
+
+def clear_interrupt():
+    """Allow work to run again once an interrupted action has returned."""
+    _interrupted.clear()
+
+
+def run_host_tasks(hosts: Sequence[str], build_script: Callable[[str], str],
+                   modules: Sequence[str] = (), parallelism: Optional[int] = None,
+                   pool: Optional[WorkerPool] = None,
+                   events: Optional[EventLog] = None,
+                   on_result: Optional[Callable[[HostTaskResult], None]] = None) -> List[HostTaskResult]:
+    """
+    Run a PowerShell script once per host with bounded concurrency.
+
+    ``build_script`` returns the script body for a host. Each host runs in its
+    own pooled worker; a failure on one host never stops the others. Results
+    are returned in the order of ``hosts``, and passed to ``on_result`` as
+    each host finishes. Events from every host are collected into ``events``
+    when given.
+    """
+    config = load_infra_config()
+    server = config.vcenter_server
+    if not hosts:
+        return []
+
+    limit = min(parallelism or config.host_parallelism, len(hosts))
+    pool = pool or get_worker_pool(limit)
+    limit = min(limit, pool.size)
+
+    # Prompt on the main thread before fanning out
+    try:
+        get_vcenter_credentials()
+    except WorkerError as e:
+        print_error(str(e))
+        return [HostTaskResult(host=host, success=False, error=str(e)) for host in hosts]
+
+    parent = current_span()
+
+    def run_one(host: str) -> HostTaskResult:
+        if _interrupted.is_set():
+            return HostTaskResult(host=host, success=False, error="Cancelled")
+        start = time.monotonic()
+        with trace_span(", ".join(modules) or "script", "worker", target=host, parent=parent) as span, \
+                pool.acquire() as worker:
+            result = ensure_worker_connected(worker, server)
+            if result is None and events is None and not tracing_enabled():
+                result = worker.invoke(vcenter_script_body(build_script(host)), modules=modules)
+            elif result is None:
+                with capture_events(events) as tail:
+                    result = worker.invoke(vcenter_script_body(build_script(host)), modules=modules,
+                                           event_log=tail.path)
+            span.status = "Success" if result.returncode == 0 else "Failed"
+        error = result.error
+        if result.returncode != 0 and not error:
+            error = next((line for line in reversed(result.output) if line.strip()), None)
+        return HostTaskResult(
+            host=host,
+            success=result.returncode == 0,
+            duration=time.monotonic() - start,
+            error=error,
+            output=result.output
+        )
+
+    print_info(f"Running on {len(hosts)} host(s), {limit} at a time...")
+    results: Dict[str, HostTaskResult] = {}
+    with ThreadPoolExecutor(max_workers=limit) as executor:
+        futures = {executor.submit(run_one, host): host for host in hosts}
+        try:
+            for future in as_completed(futures):
+                host = futures[future]
+                try:
+                    task = future.result()
+                except Exception as e:
+                    task = HostTaskResult(host=host, success=False, error=str(e))
+                results[host] = task
+                if on_result:
+                    on_result(task)
+                status = f"{Colors.GREEN}OK{Colors.ENDC}" if task.success else f"{Colors.RED}FAILED{Colors.ENDC}"
+                print(f"  [{len(results)}/{len(hosts)}] {host}: {status} ({task.duration:.1f}s)")
+        except KeyboardInterrupt:
+            # Drop queued hosts and stop the running ones so the executor can exit
+            for future in futures:
+                future.cancel()
+            interrupt_workers()
+            raise
+
+    return [results[host] for host in hosts]
+
+
+def run_host_batches(hosts: Sequence[str], build_script: Callable[[Sequence[str]], str], step: str,
+                     modules: Sequence[str] = (), parallelism: Optional[int] = None,
+                     pool: Optional[WorkerPool] = None,
+                     events: Optional[EventLog] = None,
+                     on_result: Optional[Callable[[HostTaskResult], None]] = None) -> List[HostTaskResult]:
+    """
+    Run a script that handles many hosts per call, split into one batch of
+    hosts per pooled worker.
+
+    Scripts that read their hosts in bulk make one vCenter round trip per
+    batch instead of one per host, while the batches still run side by side.
+    ``build_script`` returns the script body for a batch of hostnames. Each
+    host's outcome is the ``result`` event the script writes for it under
+    ``step`` (Skipped counts as success); a host without one failed with the
+    batch's error.
+    """
+    config = load_infra_config()
+    server = config.vcenter_server
+    if not hosts:
+        return []
+
+    limit = min(parallelism or config.host_parallelism, len(hosts))
+    pool = pool or get_worker_pool(limit)
+    count = min(limit, pool.size)
+    size = -(-len(hosts) // count)
+    batches = [list(hosts[i:i + size]) for i in range(0, len(hosts), size)]
+
+    try:
+        get_vcenter_credentials()
+    except WorkerError as e:
+        print_error(str(e))
+        return [HostTaskResult(host=host, success=False, error=str(e)) for host in hosts]
+
+    parent = current_span()
+
+    def run_batch(batch: List[str]) -> List[HostTaskResult]:
+        if _interrupted.is_set():
+            return [HostTaskResult(host=host, success=False, error="Cancelled") for host in batch]
+        start = time.monotonic()
+        batch_events = EventLog()
+        with trace_span(", ".join(modules) or "script", "worker", target=f"{batch[0]} +{len(batch) - 1}",
+                        parent=parent) as span, pool.acquire() as worker:
+            result = ensure_worker_connected(worker, server)
+            if result is None:
+                with capture_events(batch_events, on_event=events.add if events is not None else None) as tail:
+                    result = worker.invoke(vcenter_script_body(build_script(batch)), modules=modules,
+                                           event_log=tail.path)
+            span.status = "Success" if result.returncode == 0 else "Failed"
+        duration = time.monotonic() - start
+        error = result.error
+        if result.returncode != 0 and not error:
+            error = next((line for line in reversed(result.output) if line.strip()), None)
+
+        reported = {target.lower(): event for target, event in batch_events.results(step).items()}
+        results = []
+        for host in batch:
+            event = reported.get(host.lower())
+            if event is None:
+                results.append(HostTaskResult(host=host, success=False, duration=duration,
+                                              error=error or "No result reported", output=result.output))
+            else:
+                success = event.status in ("Success", "Skipped")
+                results.append(HostTaskResult(host=host, success=success,
+                                              duration=event.seconds if event.seconds is not None else duration,
+                                              error=None if success else event.message or error))
+        return results
+
+    print_info(f"Running on {len(hosts)} host(s) in {len(batches)} batch(es)...")
+    results: Dict[str, HostTaskResult] = {}
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        futures = {executor.submit(run_batch, batch): batch for batch in batches}
+        try:
+            for future in as_completed(futures):
+                try:
+                    batch_results = future.result()
+                except Exception as e:
+                    batch_results = [HostTaskResult(host=host, success=False, error=str(e)) for host in futures[future]]
+                for task in batch_results:
+                    results[task.host] = task
+                    if on_result:
+                        on_result(task)
+                failed = sum(1 for task in batch_results if not task.success)
+                status = f"{Colors.GREEN}OK{Colors.ENDC}" if not failed else f"{Colors.RED}{failed} FAILED{Colors.ENDC}"
+                print(f"  [{len(results)}/{len(hosts)}] batch of {len(batch_results)}: {status}")
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            interrupt_workers()
+            raise
+
+    return [results[host] for host in hosts]
+
+
+def print_host_summary(title: str, results: List[HostTaskResult], events: Optional[EventLog] = None):
+    """
+    Print a per-host summary table for a run of host tasks.
+
+    When ``events`` is given, failed hosts show the step that reported the
+    failure instead of the last line of output.
+    """
+    first_failure: Dict[str, EcstEvent] = {}
+    for event in (events.failed() if events else []):
+        first_failure.setdefault(event.target.lower(), event)
+    record_site_result(hosts=[{"host": r.host, "success": r.success, "error": r.error} for r in results])
+
+    print()
+    print(f"{Colors.BOLD}{title}{Colors.ENDC}")
+    width = max([len(r.host) for r in results] + [4])
+    print(f"  {'Host':<{width}}  {'Status':<7}  {'Time':>7}  Detail")
+    print(f"  {'-' * width}  {'-' * 7}  {'-' * 7}  {'-' * 20}")
+    for r in results:
+        color = Colors.GREEN if r.success else Colors.RED
+        status = "OK" if r.success else "FAILED"
+        detail = "" if r.success else (r.error or "")
+        failure = first_failure.get(r.host.lower())
+        if failure and not r.success:
+            detail = f"{failure.step}: {failure.message or 'failed'}"
+        print(f"  {r.host:<{width}}  {color}{status:<7}{Colors.ENDC}  {r.duration:>6.1f}s  {detail}")
+
+    failed = sum(1 for r in results if not r.success)
+    print()
+    print(f"  Successful: {Colors.GREEN}{len(results) - failed}{Colors.ENDC}")
+    print(f"  Failed:     {Colors.RED}{failed}{Colors.ENDC}")
+
+
+def quote_ps(value: str) -> str:
+    """Quote a value as a PowerShell single-quoted string literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# =============================================================================
+# Deployment Journal
+# =============================================================================
+
+def config_digest(config: InfraConfig, keys: Sequence[str], host: Optional[str] = None) -> str:
+    """
+    Hash the config.json values at the dotted ``keys`` (plus ``host``'s entry).
+
+    Equal hashes mean the part of the config a piece of work depends on has
+    not changed since it was done. ``esxiHosts`` covers the host files too;
+    a host's entry is looked up by name, so hashing many hosts never scans
+    the host list.
+    """
+    values = {key: config.hosts.digest_value() if key == "esxiHosts"
+              else _config_value(config.raw, key, [], required=False) for key in keys}
+    if host is not None:
+        values["esxiHosts[]"] = config.host_entry(host)
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def deploy_journal_path() -> Path:
+    """Journal file for the current config file (config.json -> config.journal.ndjson)."""
+    return CONFIG_FILE.with_name(f"{CONFIG_FILE.stem}.journal.ndjson")
+
+
+class DeploymentJournal:
+    """
+    Durable record of completed deployment work, used by deploy --resume.
+
+    A unit is a task, or a task on one host ("ntp/esxi01"), stored with the
+    config hash it was done under; a unit only counts as done while that hash
+    still matches, so editing the relevant config section redoes it. Records
+    are appended as NDJSON lines and flushed to disk as each unit finishes. A
+    line torn by a crash is ignored on load, and loading compacts the file
+    with an atomic rename.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.finished: Optional[bool] = None   # outcome of the last run; None while one is in progress
+        self._done: Dict[str, str] = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self) -> "DeploymentJournal":
+        """Read the journal (if any) and rewrite it without superseded records."""
+        with self._lock:
+            self._done.clear()
+            self.finished = True
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    lines = f.read().splitlines()
+            except OSError:
+                return self
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                if record.get("unit") and record.get("hash"):
+                    self._done[record["unit"]] = record["hash"]
+                elif record.get("run") == "start":
+                    self.finished = None
+                elif record.get("run") == "end":
+                    self.finished = record.get("status") == "Success"
+            self._compact()
+        return self
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def is_done(self, unit: str, digest: str) -> bool:
+        return self._done.get(unit) == digest
+
+    def start_run(self):
+        self._append({"run": "start"})
+
+    def end_run(self, success: bool):
+        self._append({"run": "end", "status": "Success" if success else "Failed"})
+        self.close()
+
+    def record(self, unit: str, digest: str):
+        """Mark a unit done. Safe to call from any thread."""
+        if self._done.get(unit) != digest:
+            self._append({"unit": unit, "hash": digest})
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _append(self, record: Dict[str, Any]):
+        record = dict(record, ts=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if record.get("unit"):
+                self._done[record["unit"]] = record["hash"]
+            elif record.get("run") == "start":
+                self.finished = None
+            elif record.get("run") == "end":
+                self.finished = record["status"] == "Success"
+
+    def _compact(self):
+        if self.finished is None:
+            records = [{"run": "start"}]
+        else:
+            records = [{"run": "start"}, {"run": "end", "status": "Success" if self.finished else "Failed"}]
+        records[1:1] = [{"unit": unit, "hash": digest} for unit, digest in self._done.items()]
+        _write_atomic(self.path, "".join(json.dumps(r) + "\n" for r in records))
+
+
+# =============================================================================
+# Deployment Task Graph
+# =============================================================================
+
+# Node groups that replace Deploy-Infrastructure.ps1's -Skip* switches
+STEP_GROUPS = ("vcsa", "networking", "storage", "configuration")
+
+
+@dataclass
+class DeployTask:
+    """One node of the deployment graph."""
+    name: str
+    description: str
+    script: str
+    modules: Tuple[str, ...] = ()
+    depends_on: Tuple[str, ...] = ()
+    group: Optional[str] = None
+    per_host: bool = False          # run once per host with $HostName set
+    host_units: bool = False        # one call for all hosts, reporting a result per host; takes $HostNames
+    batched: bool = False           # host-unit task split into one $HostNames batch per pooled worker
+    hosts: Tuple[str, ...] = ()     # per-host and host-unit tasks: limit to these hosts
+    needs_vcenter: bool = True
+    needs_esxi_credential: bool = False
+    config_keys: Tuple[str, ...] = ()  # config.json paths whose change redoes the task; empty: never journaled
+    action: Optional[Callable[["DeployTask", WorkerPool, EventLog], Optional[str]]] = None  # runs in Python instead of script
+
+
+@dataclass
+class TaskRunResult:
+    """Outcome of one graph node. Times are seconds since the run started."""
+    name: str
+    status: str                     # Success, Failed or Blocked
+    start: float = 0.0
+    end: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def build_deploy_graph(config: InfraConfig) -> List[DeployTask]:
+    """
+    Describe the full deployment as tasks with explicit dependencies.
+
+    Mirrors Deploy-Infrastructure.ps1 steps 1-7, split so independent work
+    (port groups vs. host membership, vSAN vs. host services, the four
+    service settings) can run side by side. ``config_keys`` name the parts
+    of config.json each task depends on, so the deployment journal can tell
+    when finished work has to be redone.
+    """
+    cluster_keys = ("vcenter.server", "datacenter.name", "cluster.name")
+    vds_keys = ("vcenter.server", "datacenter.name", "networking.vds", "esxiHosts")
+    tasks = [
+        DeployTask("connect", "Connect to vCenter",
+                   'Write-Host "Connected to vCenter: $($global:DefaultVIServer.Name)"'),
+        DeployTask("datacenter", "Create datacenter", "New-VsphereDatacenter -Config $config | Out-Null",
+                   ("02-Datacenter.ps1",), ("connect",), config_keys=("vcenter.server", "datacenter")),
+        DeployTask("cluster", "Create cluster (HA/DRS)", "New-VsphereCluster -Config $config | Out-Null",
+                   ("02-Datacenter.ps1",), ("datacenter",), config_keys=cluster_keys + ("cluster",)),
+        DeployTask("hosts", "Add ESXi hosts",
+                   "Add-ESXiHostsToCluster -Config $config -Credential $esxiCredential -HostName $HostNames | Out-Null",
+                   ("03-Hosts.ps1",), ("cluster",), host_units=True, needs_esxi_credential=True,
+                   config_keys=cluster_keys),
+        DeployTask("vds", "Create distributed switch", "New-VsphereVDS -Config $config | Out-Null",
+                   ("04-Networking.ps1",), ("datacenter",), group="networking",
+                   config_keys=("vcenter.server", "datacenter.name", "networking.vds")),
+        DeployTask("portgroups", "Create port groups", "New-VspherePortGroups -Config $config | Out-Null",
+                   ("04-Networking.ps1",), ("vds",), group="networking",
+                   config_keys=("vcenter.server", "networking.vds.name", "networking.portGroups")),
+        DeployTask("vds-hosts", "Add hosts to VDS", "Add-HostsToVDS -Config $config | Out-Null",
+                   ("04-Networking.ps1",), ("vds", "hosts"), group="networking",
+                   config_keys=vds_keys + ("cluster.name",)),
+        DeployTask("vmotion", "Configure vMotion stack",
+                   "Configure-VMotionStack -Config $config -HostName $HostNames -ThrowOnHostFailure | Out-Null",
+                   ("04-Networking.ps1",), ("portgroups", "vds-hosts"), group="networking",
+                   host_units=True, batched=True,
+                   config_keys=vds_keys + ("cluster.name", "networking.portGroups", "networking.vmotionTcpIpStack")),
+        DeployTask("vsan", "Enable vSAN", "Enable-VsanCluster -Config $config | Out-Null",
+                   ("05-Storage.ps1",), ("hosts", "portgroups", "vds-hosts"), group="storage",
+                   config_keys=cluster_keys + ("storage.vsan",)),
+        DeployTask("vsan-disks", "Claim vSAN disks", "Configure-VsanDiskGroups -Config $config -AutoClaim | Out-Null",
+                   ("05-Storage.ps1",), ("vsan",), group="storage",
+                   host_units=True, config_keys=cluster_keys + ("storage.vsan",), action=run_disk_group_task),
+    ]
+
+    for name, description, function, keys in (
+            ("ntp", "Configure NTP", "Set-HostNtpConfiguration", ("services.ntp",)),
+            ("dns", "Configure DNS", "Set-HostDnsConfiguration", ("services.dns",)),
+            ("syslog", "Configure Syslog", "Set-HostSyslogConfiguration", ("services.syslog",))):
+        tasks.append(DeployTask(
+            name, description,
+            f"{function} -Config $config -HostName $HostName -ThrowOnHostFailure | Out-Null",
+            ("06-Configuration.ps1",), ("hosts",), group="configuration", per_host=True,
+            config_keys=("vcenter.server",) + keys
+        ))
+
+    # Security reads every host in one pass and applies only the differences,
+    # so it runs as a few host batches rather than one request per host
+    tasks.append(DeployTask(
+        "security", "Apply security settings",
+        "Set-HostSecurityConfiguration -Config $config -HostName $HostNames -ThrowOnHostFailure | Out-Null",
+        ("06-Configuration.ps1",), ("hosts",), group="configuration",
+        host_units=True, batched=True, config_keys=("vcenter.server", "security")
+    ))
+
+    if config.raw.get('vcenter', {}).get('deployNew'):
+        vcsa_script = SCRIPT_DIR / "Deploy-VCSA.ps1"
+        tasks[0].depends_on = ("vcsa",)
+        tasks.insert(0, DeployTask("vcsa", "Prepare VCSA deployment",
+                                   f". {quote_ps(str(vcsa_script))}\n"
+                                   "Deploy-VCSA -Config $config | Out-Null",
+                                   group="vcsa", needs_vcenter=False, config_keys=("vcenter",)))
+
+    return tasks
+
+
+def select_tasks(tasks: List[DeployTask], skip: Sequence[str] = (),
+                 only: Sequence[str] = (), with_dependencies: bool = True) -> List[DeployTask]:
+    """
+    Pick the nodes to run.
+
+    ``skip`` drops whole groups (the -Skip* switches). ``only`` keeps the named
+    tasks plus, unless ``with_dependencies`` is False, everything they depend
+    on. A dropped node counts as already done, but kept nodes still wait for
+    any kept node the dropped one depended on.
+    """
+    by_name = {t.name: t for t in tasks}
+    unknown = [name for name in only if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown task(s): {', '.join(unknown)} (choose from {', '.join(by_name)})")
+
+    keep = {t.name for t in tasks if t.group not in skip}
+    if only:
+        wanted, stack = set(), list(only)
+        while stack:
+            name = stack.pop()
+            if name in wanted:
+                continue
+            wanted.add(name)
+            if with_dependencies:
+                stack.extend(by_name[name].depends_on)
+        keep &= wanted
+    return _keep_tasks(tasks, keep)
+
+
+def _keep_tasks(tasks: Sequence[DeployTask], keep: Set[str],
+                hosts: Optional[Dict[str, Tuple[str, ...]]] = None) -> List[DeployTask]:
+    """Copy the ``keep`` tasks, rewiring dependencies around the dropped ones."""
+    by_name = {t.name: t for t in tasks}
+    hosts = hosts or {}
+
+    def kept_dependencies(task: DeployTask) -> Tuple[str, ...]:
+        # Look through dropped nodes so ordering between the kept ones survives
+        result, stack, seen = [], list(task.depends_on), set()
+        while stack:
+            name = stack.pop(0)
+            if name in seen or name not in by_name:
+                continue
+            seen.add(name)
+            if name in keep:
+                result.append(name)
+            else:
+                stack.extend(by_name[name].depends_on)
+        return tuple(result)
+
+    return [DeployTask(**{**t.__dict__, "depends_on": kept_dependencies(t), "hosts": hosts.get(t.name, t.hosts)})
+            for t in tasks if t.name in keep]
+
+
+def task_units(task: DeployTask, config: InfraConfig) -> List[Tuple[str, str]]:
+    """
+    Journal units of a task as ``(unit, config hash)`` pairs.
+
+    Per-host and host-unit tasks have one unit per host ("ntp/esxi01"), the
+    others a single unit named after the task. Tasks without config_keys are
+    never journaled and always run.
+    """
+    if not task.config_keys:
+        return []
+    if task.per_host or task.host_units:
+        return [(f"{task.name}/{host}", config_digest(config, task.config_keys, host))
+                for host in (task.hosts or config.hostnames)]
+    return [(task.name, config_digest(config, task.config_keys))]
+
+
+def resume_tasks(tasks: Sequence[DeployTask], journal: DeploymentJournal,
+                 config: InfraConfig) -> Tuple[List[DeployTask], List[str]]:
+    """
+    Drop the work ``journal`` records as done for the current config.
+
+    Returns the tasks still to run, per-host tasks narrowed to the hosts that
+    are not done yet, and the names of the tasks skipped entirely.
+    """
+    keep: Set[str] = set()
+    hosts: Dict[str, Tuple[str, ...]] = {}
+    for task in tasks:
+        units = task_units(task, config)
+        pending = [unit for unit, digest in units if not journal.is_done(unit, digest)]
+        if units and not pending:
+            continue
+        keep.add(task.name)
+        if (task.per_host or task.host_units) and len(pending) < len(units):
+            hosts[task.name] = tuple(unit.split("/", 1)[1] for unit in pending)
+    skipped = [t.name for t in tasks if t.name not in keep]
+    return _keep_tasks(tasks, keep, hosts), skipped
+
+
+def order_tasks(tasks: Sequence[DeployTask]) -> List[DeployTask]:
+    """Return tasks in dependency order, rejecting unknown dependencies and cycles."""
+    by_name = {t.name: t for t in tasks}
+    for t in tasks:
+        missing = [d for d in t.depends_on if d not in by_name]
+        if missing:
+            raise ValueError(f"Task '{t.name}' depends on unknown task(s): {', '.join(missing)}")
+
+    pending = {t.name: set(t.depends_on) for t in tasks}
+    ordered: List[DeployTask] = []
+    while pending:
+        ready = [name for name, deps in pending.items() if not deps]
+        if not ready:
+            raise ValueError(f"Dependency cycle between: {', '.join(sorted(pending))}")
+        for name in ready:
+            ordered.append(by_name[name])
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return ordered
+
+
+def run_task_graph(tasks: Sequence[DeployTask], run_task: Callable[[DeployTask], Optional[str]],
+                   max_parallel: int,
+                   on_finish: Optional[Callable[[TaskRunResult], None]] = None) -> Dict[str, TaskRunResult]:
+    """
+    Run a task graph with at most ``max_parallel`` tasks at a time.
+
+    ``run_task`` returns None on success or an error message (exceptions count
+    as failures). A task starts as soon as all of its dependencies succeeded;
+    among ready tasks the one heading the longest remaining chain goes first.
+    Dependents of a failed task are marked Blocked and never run, while
+    independent branches carry on.
+    """
+    ordered = order_tasks(tasks)
+    by_name = {t.name: t for t in ordered}
+    dependents: Dict[str, List[str]] = {t.name: [] for t in ordered}
+    for t in ordered:
+        for dep in t.depends_on:
+            dependents[dep].append(t.name)
+
+    height: Dict[str, int] = {}
+    for t in reversed(ordered):
+        height[t.name] = 1 + max((height[child] for child in dependents[t.name]), default=0)
+
+    waiting = {t.name: set(t.depends_on) for t in ordered}
+    results: Dict[str, TaskRunResult] = {}
+    origin = time.monotonic()
+
+    def execute(task: DeployTask) -> TaskRunResult:
+        start = time.monotonic() - origin
+        try:
+            error = "Cancelled" if _interrupted.is_set() else run_task(task)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        return TaskRunResult(task.name, "Failed" if error else "Success", start, time.monotonic() - origin, error)
+
+    def block(name: str):
+        stack = list(dependents[name])
+        while stack:
+            child = stack.pop()
+            if child in results:
+                continue
+            results[child] = TaskRunResult(child, "Blocked", error=f"Dependency '{name}' did not complete")
+            if on_finish:
+                on_finish(results[child])
+            stack.extend(dependents[child])
+
+    ready = [name for name, deps in waiting.items() if not deps]
+    running: Dict[Any, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        try:
+            while ready or running:
+                ready.sort(key=lambda name: (-height[name], name))
+                while ready and len(running) < max(1, max_parallel):
+                    name = ready.pop(0)
+                    running[executor.submit(execute, by_name[name])] = name
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result = future.result()
+                    results[name] = result
+                    if on_finish:
+                        on_finish(result)
+                    if result.status != "Success":
+                        block(name)
+                        continue
+                    for child in dependents[name]:
+                        waiting[child].discard(name)
+                        if not waiting[child] and child not in results:
+                            ready.append(child)
+        except KeyboardInterrupt:
+            interrupt_workers()
+            raise
+
+    return {t.name: results[t.name] for t in ordered if t.name in results}
+
+
+def critical_path(tasks: Sequence[DeployTask], results: Dict[str, TaskRunResult]) -> List[str]:
+    """
+    Longest chain of dependent tasks by measured duration.
+
+    This is the part of the run that no amount of parallelism could shorten.
+    Blocked tasks never ran and are ignored.
+    """
+    finish: Dict[str, float] = {}
+    previous: Dict[str, Optional[str]] = {}
+    for t in order_tasks(tasks):
+        result = results.get(t.name)
+        if result is None or result.status == "Blocked":
+            continue
+        before = max((d for d in t.depends_on if d in finish), key=lambda d: finish[d], default=None)
+        finish[t.name] = result.duration + (finish[before] if before else 0.0)
+        previous[t.name] = before
+
+    if not finish:
+        return []
+    name: Optional[str] = max(finish, key=lambda n: finish[n])
+    path = []
+    while name:
+        path.append(name)
+        name = previous[name]
+    return list(reversed(path))
+
+
+def print_task_plan(tasks: Sequence[DeployTask]):
+    """Print the selected tasks in dependency order."""
+    print(f"{Colors.BOLD}Deployment Plan:{Colors.ENDC}")
+    for t in order_tasks(tasks):
+        after = f" (after {', '.join(t.depends_on)})" if t.depends_on else ""
+        print(f"  • {t.name:<12} {t.description}{after}")
+
+
+def print_graph_report(tasks: Sequence[DeployTask], results: Dict[str, TaskRunResult]):
+    """Print per-task timing and the critical path of a graph run."""
+    print()
+    print(f"{Colors.BOLD}Deployment Timeline:{Colors.ENDC}")
+    width = max([len(name) for name in results] + [4])
+    print(f"  {'Task':<{width}}  {'Status':<8}  {'Start':>7}  {'Time':>7}  Detail")
+    print(f"  {'-' * width}  {'-' * 8}  {'-' * 7}  {'-' * 7}  {'-' * 20}")
+    for r in sorted(results.values(), key=lambda r: (r.status == "Blocked", r.start)):
+        color = {"Success": Colors.GREEN, "Failed": Colors.RED}.get(r.status, Colors.YELLOW)
+        start = f"{r.start:.1f}s" if r.status != "Blocked" else "-"
+        elapsed = f"{r.duration:.1f}s" if r.status != "Blocked" else "-"
+        print(f"  {r.name:<{width}}  {color}{r.status:<8}{Colors.ENDC}  {start:>7}  {elapsed:>7}  {r.error or ''}")
+
+    ran = [r for r in results.values() if r.status != "Blocked"]
+    wall = max((r.end for r in ran), default=0.0)
+    serial = sum(r.duration for r in ran)
+    path = critical_path(tasks, results)
+    path_time = sum(results[name].duration for name in path)
+
+    print()
+    print(f"  Wall clock:       {wall:.1f}s")
+    print(f"  Sum of tasks:     {serial:.1f}s (sequential equivalent)")
+    print(f"  Critical path:    {path_time:.1f}s  {' -> '.join(path)}")
+    if wall > 0:
+        print(f"  Parallel speedup: {serial / wall:.1f}x")
+
+
+def run_deploy_graph(tasks: List[DeployTask], max_parallel: Optional[int] = None,
+                     events: Optional[EventLog] = None,
+                     journal: Optional[DeploymentJournal] = None) -> Dict[str, TaskRunResult]:
+    """
+    Run the selected deployment tasks on the shared worker pool.
+
+    With a ``journal``, every task and every host that completes is recorded
+    as soon as it finishes so an interrupted run can be resumed.
+    """
+    config = load_infra_config()
+    limit = max_parallel or config.step_parallelism
+    # maxParallelSteps only bounds the step scheduler; per-host steps fan out
+    # hostParallelism at a time, so the pool must hold that many workers too
+    pool = get_worker_pool(max(limit, config.host_parallelism))
+    events = events if events is not None else EventLog()
+
+    # Prompt on the main thread before any task starts
+    if any(t.needs_vcenter for t in tasks):
+        get_vcenter_credentials()
+    if any(t.needs_esxi_credential for t in tasks):
+        get_esxi_credentials()
+
+    parent = current_span()
+
+    def run_one(task: DeployTask) -> Optional[str]:
+        with trace_span(task.name, "task", parent=parent) as span:
+            error = run_task(task)
+            span.status = "Failed" if error else "Success"
+        return error
+
+    def record_host(task: DeployTask, host: str):
+        entry = config.host(host)
+        if journal is not None and task.config_keys and entry is not None:
+            journal.record(f"{task.name}/{entry.hostname}",
+                           config_digest(config, task.config_keys, entry.hostname))
+
+    def run_task(task: DeployTask) -> Optional[str]:
+        if task.action:
+            return task.action(task, pool, events)
+        if task.per_host:
+            host_results = run_host_tasks(
+                list(task.hosts or config.hostnames), lambda host: f"$HostName = {quote_ps(host)}\n{task.script}",
+                modules=task.modules, parallelism=config.host_parallelism, pool=pool, events=events,
+                on_result=lambda r: r.success and record_host(task, r.host)
+            )
+            failed = [r.host for r in host_results if not r.success]
+            return f"Failed on host(s): {', '.join(failed)}" if failed else None
+        if task.batched:
+            host_results = run_host_batches(
+                list(task.hosts or config.hostnames),
+                lambda batch: f"$HostNames = @({', '.join(quote_ps(host) for host in batch)})\n{task.script}",
+                task.name, modules=task.modules, parallelism=config.host_parallelism, pool=pool,
+                events=events,
+                on_result=lambda r: r.success and record_host(task, r.host)
+            )
+            failed = [r.host for r in host_results if not r.success]
+            return f"Failed on host(s): {', '.join(failed)}" if failed else None
+
+        script = task.script
+        if task.host_units:
+            names = ", ".join(quote_ps(host) for host in task.hosts)
+            script = f"$HostNames = {'@(' + names + ')' if task.hosts else '$null'}\n{script}"
+        # Passed beside the script rather than inlined, so the password is never in script text
+        credentials = {"esxiCredential": get_esxi_credentials()} if task.needs_esxi_credential else None
+
+        with pool.acquire() as worker:
+            if task.needs_vcenter:
+                failed = ensure_worker_connected(worker, config.vcenter_server)
+                if failed:
+                    return failed.error or "Could not connect to vCenter"
+            def on_event(event: EcstEvent):
+                print_event(event)
+                # A host reported done (or already done) by a host-unit task
+                if (task.host_units and event.type == "result" and event.step == task.name
+                        and event.target and event.status in ("Success", "Skipped")):
+                    record_host(task, event.target)
+
+            with capture_events(events, on_event=on_event) as tail:
+                result = worker.invoke(vcenter_script_body(script), modules=task.modules, event_log=tail.path,
+                                       credentials=credentials)
+
+        if result.returncode == 0:
+            return None
+        return result.error or next((line for line in reversed(result.output) if line.strip()), "Failed")
+
+    finished = [0]
+    by_name = {t.name: t for t in tasks}
+
+    def report(result: TaskRunResult):
+        finished[0] += 1
+        if journal is not None and result.status == "Success":
+            for unit, digest in task_units(by_name[result.name], config):
+                journal.record(unit, digest)
+        color = {"Success": Colors.GREEN, "Failed": Colors.RED}.get(result.status, Colors.YELLOW)
+        elapsed = f" ({result.duration:.1f}s)" if result.status != "Blocked" else ""
+        print(f"  [{finished[0]}/{len(tasks)}] {result.name}: {color}{result.status}{Colors.ENDC}{elapsed}")
+
+    print_info(f"Running {len(tasks)} task(s), up to {limit} at a time...")
+    return run_task_graph(tasks, run_one, limit, on_finish=report)
+
+
+# =============================================================================
+# Desired State Planning
+# =============================================================================
+
+@dataclass
+class PlannedChange:
+    """One difference between config.json and the live environment."""
+    task: str                       # DeployTask that converges it
+    target: str                     # object the change applies to
+    setting: str
+    current: Any
+    desired: Any
+    report_only: bool = False       # drift the task deliberately leaves alone
+
+    @property
+    def action(self) -> str:
+        if self.report_only:
+            return "report"
+        return "create" if self.current is None else "update"
+
+
+def _same_items(current: Optional[Sequence[Any]], desired: Sequence[Any]) -> bool:
+    """Compare two lists ignoring order, case and empty entries."""
+    normalize = lambda values: sorted(str(v).lower() for v in (values or []) if v not in (None, ""))
+    return normalize(current) == normalize(desired)
+
+
+def plan_changes(config: InfraConfig, state: Dict[str, Any]) -> List[PlannedChange]:
+    """
+    Compare the desired configuration with a live state snapshot (from
+    Get-ConfigurationState) and list what has to change.
+
+    Pure function: no vCenter access, so a plan can be printed, reviewed and
+    applied later.
+    """
+    raw = config.raw
+    changes: List[PlannedChange] = []
+    add = lambda *args: changes.append(PlannedChange(*args))
+
+    if not state.get('datacenter'):
+        add("datacenter", config.datacenter_name, "exists", None, True)
+
+    cluster = state.get('cluster')
+    ha = bool(raw.get('cluster', {}).get('ha', {}).get('enabled'))
+    drs = raw.get('cluster', {}).get('drs', {})
+    if cluster is None:
+        add("cluster", config.cluster_name, "exists", None, True)
+    else:
+        if ha and not cluster.get('haEnabled'):
+            add("cluster", config.cluster_name, "HA enabled", False, True)
+        if drs.get('enabled') and not cluster.get('drsEnabled'):
+            add("cluster", config.cluster_name, "DRS enabled", False, True)
+        level = drs.get('automationLevel')
+        if drs.get('enabled') and level and str(cluster.get('automationLevel', '')).lower() != level.lower():
+            add("cluster", config.cluster_name, "DRS automation", cluster.get('automationLevel'), level)
+
+    vds = state.get('vds')
+    if vds is None:
+        add("vds", config.network.vds_name, "exists", None, True)
+    elif config.network.mtu and vds.get('mtu') != config.network.mtu:
+        add("vds", config.network.vds_name, "MTU", vds.get('mtu'), config.network.mtu)
+
+    live_port_groups = {pg['name'].lower(): pg for pg in state.get('portGroups') or []}
+    for pg in config.network.port_groups:
+        live = live_port_groups.get(pg.name.lower())
+        if live is None:
+            add("portgroups", pg.name, "exists", None, True)
+        elif live.get('vlanId') != pg.vlan_id:
+            add("portgroups", pg.name, "VLAN", live.get('vlanId'), pg.vlan_id)
+
+    services = raw.get('services', {})
+    ntp = services.get('ntp', {})
+    dns = services.get('dns', {})
+    syslog = services.get('syslog', {})
+    security = raw.get('security', {})
+    syslog_uri = (f"{syslog.get('protocol')}://{syslog.get('server')}:{syslog.get('port')}"
+                  if syslog.get('server') else None)
+    lockdown = {"normal": "lockdownNormal", "strict": "lockdownStrict"}.get(security.get('lockdownMode', 'disabled'))
+    storage = config.storage
+
+    live_hosts = {h['name'].lower(): h for h in state.get('hosts') or []}
+    for host in config.hosts:
+        live = live_hosts.get(host.hostname.lower()) or {}
+        name = host.hostname
+        added = bool(live.get('inCluster'))
+
+        if not added:
+            add("hosts", name, "cluster membership", None, config.cluster_name)
+        if not live.get('vdsMember'):
+            add("vds-hosts", name, "VDS membership", None, config.network.vds_name)
+        if config.network.vmotion_enabled and host.vmotion_ip:
+            # Configure-VMotionStack only creates missing adapters; one with
+            # another IP is reported, not re-addressed
+            vmotion_ip = live.get('vmotionIp')
+            if vmotion_ip and vmotion_ip != host.vmotion_ip:
+                add("vmotion", name, "vMotion VMkernel IP", vmotion_ip, host.vmotion_ip, True)
+            elif not vmotion_ip and host.vmotion_ip not in (live.get('vmkIps') or []):
+                add("vmotion", name, "vMotion VMkernel", None, host.vmotion_ip)
+        if storage.vsan_enabled and (storage.claim_mode or "").lower() == "automatic" and not live.get('diskGroups'):
+            add("vsan-disks", name, "vSAN disk groups", live.get('diskGroups') if added else None, "auto-claim")
+
+        if ntp.get('servers') and not _same_items(live.get('ntpServers'), ntp['servers']):
+            add("ntp", name, "NTP servers", live.get('ntpServers') if added else None, ntp['servers'])
+        ntpd = live.get('ntpd') or {}
+        if added and ntpd and (not ntpd.get('running') or (ntp.get('policy') and ntpd.get('policy') != ntp['policy'])):
+            add("ntp", name, "ntpd service", f"{'running' if ntpd.get('running') else 'stopped'}/{ntpd.get('policy')}",
+                f"running/{ntp.get('policy', ntpd.get('policy'))}")
+
+        if dns.get('servers') and [s for s in live.get('dnsServers') or [] if s] != dns['servers']:
+            add("dns", name, "DNS servers", live.get('dnsServers') if added else None, dns['servers'])
+        if dns.get('searchDomains') and not _same_items(live.get('searchDomains'), dns['searchDomains']):
+            add("dns", name, "search domains", live.get('searchDomains') if added else None, dns['searchDomains'])
+
+        if syslog_uri and live.get('syslogHost') != syslog_uri:
+            add("syslog", name, "log host", live.get('syslogHost') if added else None, syslog_uri)
+
+        ssh = live.get('ssh') or {}
+        want_ssh = bool(security.get('sshEnabled'))
+        if not added or (ssh and (ssh.get('running') != want_ssh or ssh.get('policy') != ("on" if want_ssh else "off"))):
+            add("security", name, "SSH", (f"{'running' if ssh.get('running') else 'stopped'}/{ssh.get('policy')}"
+                                          if added else None), f"{'running' if want_ssh else 'stopped'}/{'on' if want_ssh else 'off'}")
+        timeout = security.get('shellTimeout')
+        if added and timeout is not None and live.get('shellTimeout') != timeout:
+            add("security", name, "shell timeout", live.get('shellTimeout'), timeout)
+        if added and lockdown and live.get('lockdownMode') != lockdown:
+            add("security", name, "lockdown mode", live.get('lockdownMode'), lockdown)
+
+    if storage.vsan_enabled and (cluster is None or not cluster.get('vsanEnabled')):
+        add("vsan", config.cluster_name, "vSAN enabled", None if cluster is None else False, True)
+
+    return changes
+
+
+def read_configuration_state() -> Optional[Dict[str, Any]]:
+    """Read the live state of everything config.json declares in one worker request."""
+    result = run_vcenter_script("Send-EcstData (Get-ConfigurationState -Config $config)", modules=["08-Inventory.ps1"])
+    if result.returncode != 0 or not result.data:
+        print_error(f"Could not read live configuration: {result.error or 'no data returned'}")
+        return None
+    return result.data[-1]
+
+
+def print_plan(changes: List[PlannedChange]):
+    """Print a change set grouped by the task that will apply it."""
+    if not changes:
+        print_success("No changes. The environment matches the configuration.")
+        return
+
+    def show(value: Any) -> str:
+        if value is None:
+            return "(none)"
+        if isinstance(value, list):
+            return ", ".join(str(v) for v in value if v not in (None, "")) or "(none)"
+        return str(value)
+
+    print(f"{Colors.BOLD}Planned Changes:{Colors.ENDC}")
+    by_task: Dict[str, List[PlannedChange]] = {}
+    for change in changes:
+        by_task.setdefault(change.task, []).append(change)
+
+    symbols = {"create": f"{Colors.GREEN}+{Colors.ENDC}", "update": f"{Colors.YELLOW}~{Colors.ENDC}",
+               "report": f"{Colors.RED}!{Colors.ENDC}"}
+    for task, items in by_task.items():
+        targets = len({c.target for c in items})
+        print()
+        print(f"  {Colors.CYAN}{task}{Colors.ENDC} ({targets} object{'s' if targets != 1 else ''})")
+        for c in items:
+            note = " (not changed by apply)" if c.report_only else ""
+            print(f"    {symbols[c.action]} {c.target}  {c.setting}: {show(c.current)} -> {show(c.desired)}{note}")
+
+    creates = sum(1 for c in changes if c.action == "create")
+    reports = sum(1 for c in changes if c.report_only)
+    tasks = len({c.task for c in changes if not c.report_only})
+    print()
+    print(f"Plan: {creates} to create, {len(changes) - creates - reports} to update, "
+          f"{tasks} task(s) to run.")
+    if reports:
+        print_warning(f"{reports} difference(s) need a manual change; apply leaves them as they are.")
+
+
+def tasks_for_plan(config: InfraConfig, changes: List[PlannedChange]) -> List[DeployTask]:
+    """Select only the deployment tasks, and only the hosts, that the plan needs."""
+    targets: Dict[str, List[str]] = {}
+    for change in changes:
+        if change.report_only:
+            continue
+        hosts = targets.setdefault(change.task, [])
+        if change.target not in hosts:
+            hosts.append(change.target)
+    if not targets:
+        return []
+
+    tasks = select_tasks(build_deploy_graph(config), only=list(targets), with_dependencies=False)
+    for task in tasks:
+        if task.per_host or task.host_units:
+            task.hosts = tuple(targets[task.name])
+    return tasks
+
+
+def apply_configuration(plan_only: bool = False, max_parallel: Optional[int] = None) -> bool:
+    """
+    Plan and apply: snapshot live state once, print the change set, then run
+    only the tasks (and hosts) that have drifted.
+    """
+    print_header("Plan Infrastructure Changes" if plan_only else "Apply Infrastructure Configuration")
+    
+    config = load_infra_config()
+    state = read_configuration_state()
+    if state is None:
+        pause()
+        return False
+    
+    changes = plan_changes(config, state)
+    print_plan(changes)
+    
+    if plan_only or not any(not c.report_only for c in changes):
+        pause()
+        return True
+    
+    print()
+    if not confirm_action("Apply these changes?"):
+        print_warning("Apply cancelled.")
+        return False
+    
+    tasks = tasks_for_plan(config, changes)
+    try:
+        results = run_deploy_graph(tasks, max_parallel)
+    except WorkerError as e:
+        print_error(str(e))
+        pause()
+        return False
+    print_graph_report(tasks, results)
+    
+    # Confirm convergence with a fresh snapshot
+    state = read_configuration_state()
+    remaining = [c for c in (plan_changes(config, state) if state is not None else changes) if not c.report_only]
+    success = all(r.status == "Success" for r in results.values()) and not remaining
+    if success:
+        print_success("Infrastructure configuration applied; no drift remains.")
+    else:
+        print_error(f"{len(remaining)} change(s) still pending after apply.")
+        print_plan(remaining)
+    
+    pause()
+    return success
+
+
+# =============================================================================
+# Configuration Drift
+# =============================================================================
+
+@dataclass
+class HostDrift:
+    """Drift scan result for one configured host."""
+    host: str
+    status: str                     # Compliant, Drifted, Disconnected or Missing
+    fingerprint: Optional[str] = None
+    diffs: List[Tuple[str, Any, Any]] = field(default_factory=list)   # (field, current, desired)
+    cached: bool = False            # live state unchanged since the last scan
+
+
+def drift_cache_path() -> Path:
+    """Fingerprint cache for the current config file (config.json -> config.drift.json)."""
+    return CONFIG_FILE.with_name(f"{CONFIG_FILE.stem}.drift.json")
+
+
+def _canonical_items(values: Optional[Sequence[Any]], ordered: bool = False) -> List[str]:
+    """Lowercase a list and drop empty entries; sort it unless order matters."""
+    items = [str(v).lower() for v in (values or []) if v not in (None, "")]
+    return items if ordered else sorted(items)
+
+
+def _as_int(value: Any) -> Any:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def desired_host_fields(config: InfraConfig) -> Dict[str, Any]:
+    """
+    The canonical host settings config.json asks for, by field name.
+
+    Every host should match them, so they hash to a single fingerprint.
+    Settings the config leaves out are not compared.
+    """
+    raw = config.raw
+    services = raw.get('services', {})
+    ntp, dns, syslog = services.get('ntp', {}), services.get('dns', {}), services.get('syslog', {})
+    security = raw.get('security', {})
+    fields: Dict[str, Any] = {}
+
+    if ntp.get('servers'):
+        fields["ntp.servers"] = _canonical_items(ntp['servers'])
+        fields["ntp.running"] = True
+        if ntp.get('policy'):
+            fields["ntp.policy"] = ntp['policy']
+    if dns.get('servers'):
+        fields["dns.servers"] = _canonical_items(dns['servers'], ordered=True)
+    if dns.get('searchDomains'):
+        fields["dns.searchDomains"] = _canonical_items(dns['searchDomains'])
+    if syslog.get('server'):
+        fields["syslog.logHost"] = f"{syslog.get('protocol')}://{syslog.get('server')}:{syslog.get('port')}"
+    if 'sshEnabled' in security:
+        fields["ssh.running"] = bool(security['sshEnabled'])
+        fields["ssh.policy"] = "on" if security['sshEnabled'] else "off"
+    if security.get('shellTimeout') is not None:
+        fields["security.shellTimeout"] = _as_int(security['shellTimeout'])
+    lockdown = {"normal": "lockdownNormal", "strict": "lockdownStrict"}.get(security.get('lockdownMode', 'disabled'))
+    if lockdown:
+        fields["security.lockdownMode"] = lockdown
+    for ruleset in security.get('firewallRulesetsEnabled') or []:
+        fields[f"firewall.{ruleset}"] = True
+    return fields
+
+
+def live_host_fields(row: Dict[str, Any], desired: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a Get-HostConfiguration row onto the fields of ``desired``, normalized the same way."""
+    ntpd = row.get('ntpd') or {}
+    ssh = row.get('ssh') or {}
+    live = {
+        "ntp.servers": _canonical_items(row.get('ntpServers')),
+        "ntp.running": bool(ntpd.get('running')),
+        "ntp.policy": ntpd.get('policy'),
+        "dns.servers": _canonical_items(row.get('dnsServers'), ordered=True),
+        "dns.searchDomains": _canonical_items(row.get('searchDomains')),
+        "syslog.logHost": row.get('syslogHost') or None,
+        "ssh.running": bool(ssh.get('running')),
+        "ssh.policy": ssh.get('policy'),
+        "security.shellTimeout": _as_int(row.get('shellTimeout')),
+        "security.lockdownMode": row.get('lockdownMode') or None,
+    }
+    # config.json names rulesets by key or label, as Set-HostSecurityConfiguration matches them
+    for ruleset in row.get('firewall') or []:
+        for name in (ruleset.get('label'), ruleset.get('key')):
+            if name:
+                live[f"firewall.{str(name).lower()}"] = bool(ruleset.get('enabled'))
+    return {key: live.get(key.lower() if key.startswith("firewall.") else key) for key in desired}
+
+
+def host_fingerprint(fields: Dict[str, Any]) -> str:
+    """Hash of canonical host fields; hosts configured alike share a fingerprint."""
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def load_drift_cache(server: str) -> Dict[str, Any]:
+    """The last scan's rows and fingerprints for ``server``; empty if there are none."""
+    try:
+        with open(drift_cache_path(), encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {"hosts": {}}
+    if not isinstance(cache, dict) or cache.get("server") != server or not isinstance(cache.get("hosts"), dict):
+        return {"hosts": {}}
+    return cache
+
+
+def scan_drift(config: InfraConfig, refresh: bool = False) -> Optional[List[HostDrift]]:
+    """
+    Compare every configured host with config.json by fingerprint.
+
+    Live state comes from one Get-HostConfiguration request. Rows are cached
+    with the hash the worker computed for them; on the next scan hosts with
+    an unchanged hash come back as the hash only and reuse the cached row,
+    and also the cached fingerprint while config.json asks for the same
+    settings. Only hosts whose fingerprint differs from the desired one are
+    diffed field by field. ``refresh`` ignores the cache.
+    """
+    desired = desired_host_fields(config)
+    desired_fingerprint = host_fingerprint(desired)
+    cache = {"hosts": {}} if refresh else load_drift_cache(config.vcenter_server)
+    cached = cache["hosts"]
+    reuse = cache.get("desired") == desired_fingerprint
+
+    hostnames = config.hostnames
+    known = {name: cached[name.lower()]["hash"] for name in hostnames
+             if isinstance(cached.get(name.lower()), dict) and cached[name.lower()].get("hash")}
+    script = (f"Get-HostConfiguration -HostName @({', '.join(quote_ps(h) for h in hostnames)}) "
+              f"-KnownHash @{{{'; '.join(f'{quote_ps(h)} = {quote_ps(v)}' for h, v in known.items())}}}"
+              " | Send-EcstData")
+    result = run_vcenter_script(script, modules=["06-Configuration.ps1"])
+    if result.returncode != 0:
+        print_error(f"Could not read host configuration: {result.error or 'unknown error'}")
+        return None
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    for row in result.data:
+        if not isinstance(row, dict) or not row.get('name'):
+            continue
+        key = row['name'].lower()
+        entry = cached.get(key) if row.get('unchanged') else None
+        if entry is None or entry.get("hash") != row.get('hash'):
+            entry = {"hash": row.get('hash'), "row": row}
+        else:
+            entry = dict(entry, cached=True)
+        entries[key] = entry
+
+    drifts: List[HostDrift] = []
+    for name in hostnames:
+        entry = entries.get(name.lower())
+        if entry is None:
+            drifts.append(HostDrift(name, "Missing"))
+            continue
+        row = entry["row"]
+        if not row.get('connected'):
+            drifts.append(HostDrift(name, "Disconnected", cached=entry.get("cached", False)))
+            continue
+
+        fields = None
+        if not (reuse and entry.get("cached") and entry.get("fingerprint")):
+            fields = live_host_fields(row, desired)
+            entry["fingerprint"] = host_fingerprint(fields)
+        drift = HostDrift(name, "Compliant", entry["fingerprint"], cached=entry.get("cached", False))
+        if drift.fingerprint != desired_fingerprint:
+            fields = fields or live_host_fields(row, desired)
+            drift.status = "Drifted"
+            drift.diffs = [(key, fields[key], value) for key, value in desired.items() if fields[key] != value]
+        drifts.append(drift)
+
+    _write_atomic(drift_cache_path(), json.dumps({
+        "server": config.vcenter_server,
+        "desired": desired_fingerprint,
+        "scanned": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "hosts": {key: {k: v for k, v in entry.items() if k != "cached"} for key, entry in entries.items()},
+    }))
+    return drifts
+
+
+def print_drift_report(drifts: List[HostDrift], desired_fingerprint: str):
+    """Print the hosts that differ from config.json, one line per differing field."""
+    def show(value: Any) -> str:
+        if value is None:
+            return "(none)"
+        if isinstance(value, list):
+            return ", ".join(str(v) for v in value) or "(none)"
+        return str(value)
+
+    counts: Dict[str, int] = {}
+    for drift in drifts:
+        counts[drift.status] = counts.get(drift.status, 0) + 1
+    cached = sum(1 for d in drifts if d.cached)
+
+    print(f"Desired fingerprint: {desired_fingerprint}")
+    print(f"Hosts scanned:       {len(drifts)} ({cached} unchanged since the last scan)")
+    print()
+
+    differing = [d for d in drifts if d.status != "Compliant"]
+    if not differing:
+        print_success("No drift. Every host matches the configuration.")
+        return
+
+    print(f"{Colors.BOLD}Configuration Drift:{Colors.ENDC}")
+    for drift in differing:
+        print()
+        if drift.status == "Drifted":
+            print(f"  {Colors.CYAN}{drift.host}{Colors.ENDC} (fingerprint {drift.fingerprint})")
+            for name, current, desired in drift.diffs:
+                print(f"    {Colors.YELLOW}~{Colors.ENDC} {name}: {show(current)} -> {show(desired)}")
+        else:
+            print(f"  {Colors.CYAN}{drift.host}{Colors.ENDC} {Colors.RED}{drift.status.lower()}{Colors.ENDC}")
+
+    print()
+    print("Drift: " + ", ".join(f"{counts.get(status, 0)} {status.lower()}"
+                                for status in ("Compliant", "Drifted", "Disconnected", "Missing")))
+
+
+def check_drift(refresh: bool = False) -> bool:
+    """Scan every host for drift from config.json; True when all of them match."""
+    print_header("Configuration Drift Scan")
+
+    config = load_infra_config()
+    drifts = scan_drift(config, refresh)
+    if drifts is None:
+        pause()
+        return False
+
+    print_drift_report(drifts, host_fingerprint(desired_host_fields(config)))
+    record_site_result(drift=[{"host": d.host, "status": d.status, "fingerprint": d.fingerprint,
+                               "fields": [name for name, _, _ in d.diffs]}
+                              for d in drifts if d.status != "Compliant"], hostsScanned=len(drifts))
+    pause()
+    return all(d.status == "Compliant" for d in drifts)
+
+
+# =============================================================================
+# Inventory Index
+# =============================================================================
+
+# Minutes before indexed rows of each kind are refreshed from vCenter
+INVENTORY_TTL_MINUTES = {
+    "folder": 60, "datacenter": 60, "computeResource": 60, "cluster": 30, "host": 10,
+    "vm": 5, "template": 30, "datastore": 5, "vds": 30, "portgroup": 30, "tag": 30,
+}
+
+# Kinds that carry Config.ChangeVersion and refresh incrementally
+VERSIONED_KINDS = ("vm", "template")
+
+# Kinds the status dashboard is built from
+STATUS_KINDS = ("folder", "datacenter", "computeResource", "cluster", "host", "vm", "datastore", "vds")
+
+
+def inventory_index_path() -> Path:
+    """Index file for the current config file (config.json -> config.inventory.sqlite)."""
+    return CONFIG_FILE.with_name(f"{CONFIG_FILE.stem}.inventory.sqlite")
+
+
+def fetch_inventory_rows(kinds: Sequence[str], since: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Read index rows for ``kinds`` from vCenter with Get-InventoryIndex (one worker request)."""
+    script = (f"Send-EcstData (Get-InventoryIndex -Kind @({', '.join(quote_ps(k) for k in kinds)})"
+              f"{' -Since ' + quote_ps(since) if since else ''})")
+    result = run_vcenter_script(script, modules=["08-Inventory.ps1"])
+    if result.returncode != 0 or not result.data:
+        print_warning(f"Could not refresh inventory index: {result.error or 'no data returned'}")
+        return None
+    return result.data[-1]
+
+
+class InventoryIndex:
+    """
+    Local SQLite index of the vCenter inventory, keyed by MoRef ID and name.
+
+    Rows are refreshed per kind once they are older than their TTL (see
+    INVENTORY_TTL_MINUTES), in one bulk request for all stale kinds. VMs and
+    templates are incremental: only those whose Config.ChangeVersion moved
+    are re-sent. Host and power state are not covered by ChangeVersion, so
+    they come for every VM in a separate ``runtime`` list and are merged into
+    stored rows; VMs missing from it are deleted. If a refresh fails the last
+    known rows keep being served.
+
+    ``fetch(kinds, since)`` returns the Get-InventoryIndex payload; pass a
+    stub to use the index without vCenter.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS objects (
+            kind    TEXT NOT NULL,
+            moid    TEXT NOT NULL,
+            name    TEXT NOT NULL,
+            parent  TEXT,
+            version TEXT,
+            data    TEXT NOT NULL,
+            PRIMARY KEY (kind, moid)
+        );
+        CREATE INDEX IF NOT EXISTS objects_by_name ON objects (kind, name COLLATE NOCASE);
+        CREATE TABLE IF NOT EXISTS refreshes (
+            kind      TEXT PRIMARY KEY,
+            server    TEXT NOT NULL,
+            refreshed REAL NOT NULL,
+            version   TEXT
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path: Path, server: str, ttl: Optional[Dict[str, float]] = None,
+                 fetch: Optional[Callable[[Sequence[str], Optional[str]], Optional[Dict[str, Any]]]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.server = server
+        self.ttl = {kind: minutes * 60 for kind, minutes in (ttl or INVENTORY_TTL_MINUTES).items()}
+        self.fetch = fetch or fetch_inventory_rows
+        self.clock = clock
+        self.fetches = 0
+        self._lock = threading.RLock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def age(self, kind: str) -> Optional[float]:
+        """Seconds since ``kind`` was refreshed from this vCenter, or None if never."""
+        with self._lock:
+            row = self._db.execute("SELECT server, refreshed FROM refreshes WHERE kind = ?", (kind,)).fetchone()
+        if row is None or row[0] != self.server:
+            return None
+        return max(0.0, self.clock() - row[1])
+
+    def stale(self, kinds: Sequence[str]) -> List[str]:
+        """The ``kinds`` that were never refreshed or are older than their TTL."""
+        result = []
+        for kind in kinds:
+            age = self.age(kind)
+            if age is None or age >= self.ttl.get(kind, 0):
+                result.append(kind)
+        return result
+
+    def invalidate(self, kinds: Optional[Sequence[str]] = None):
+        """Mark ``kinds`` (default: all) stale so the next read refreshes them."""
+        with self._lock, self._db:
+            if kinds is None:
+                self._db.execute("DELETE FROM refreshes")
+            else:
+                self._db.executemany("DELETE FROM refreshes WHERE kind = ?", [(k,) for k in kinds])
+
+    def refresh(self, kinds: Optional[Sequence[str]] = None, force: bool = False) -> List[str]:
+        """
+        Bring ``kinds`` (default: all) up to date and return the kinds refreshed.
+
+        Fresh kinds are skipped unless ``force`` is set; an incremental
+        refresh is a full one when the previous rows came from another vCenter.
+        """
+        kinds = list(kinds or INVENTORY_TTL_MINUTES)
+        with self._lock:
+            wanted = kinds if force else self.stale(kinds)
+            if not wanted:
+                return []
+            versions = []
+            for kind in wanted:
+                if kind in VERSIONED_KINDS:
+                    row = self._db.execute("SELECT server, version FROM refreshes WHERE kind = ?",
+                                           (kind,)).fetchone()
+                    versions.append(row[1] if row and row[0] == self.server else None)
+            since = None if not versions or None in versions else min(versions)
+
+            self.fetches += 1
+            with trace_span(f"inventory {', '.join(wanted)}", "subprocess"):
+                payload = self.fetch(wanted, since)
+            if not payload:
+                return []
+
+            now = self.clock()
+            refreshed = []
+            with self._db:
+                for kind, data in (payload.get('kinds') or {}).items():
+                    if kind in wanted and isinstance(data, dict):
+                        self._store(kind, data, now)
+                        refreshed.append(kind)
+                if payload.get('vcenter'):
+                    self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('vcenter', ?)",
+                                     (json.dumps(payload['vcenter']),))
+            return refreshed
+
+    def _store(self, kind: str, data: Dict[str, Any], now: float):
+        runtime = data.get('runtime')
+        if runtime is not None:
+            runtime = {r['id']: r for r in runtime if isinstance(r, dict) and r.get('id')}
+        rows = [dict(r, **{k: v for k, v in (runtime or {}).get(r['id'], {}).items() if k != 'id'})
+                for r in data.get('rows') or [] if isinstance(r, dict) and r.get('id')]
+        present = set(runtime) if runtime is not None else {r['id'] for r in rows}
+
+        previous = self._db.execute("SELECT server FROM refreshes WHERE kind = ?", (kind,)).fetchone()
+        if previous is None or previous[0] != self.server:
+            self._db.execute("DELETE FROM objects WHERE kind = ?", (kind,))
+        else:
+            stored = self._db.execute("SELECT moid, data FROM objects WHERE kind = ?", (kind,)).fetchall()
+            self._db.executemany("DELETE FROM objects WHERE kind = ? AND moid = ?",
+                                 [(kind, moid) for moid, _ in stored if moid not in present])
+            # Rows not re-sent still pick up the host and power state of this pass
+            sent = {r['id'] for r in rows}
+            updates = []
+            for moid, text in stored:
+                if runtime is None or moid in sent or moid not in runtime:
+                    continue
+                row = json.loads(text)
+                current = {k: v for k, v in runtime[moid].items() if k != 'id'}
+                if any(row.get(k) != v for k, v in current.items()):
+                    row.update(current)
+                    updates.append((json.dumps(row), kind, moid))
+            self._db.executemany("UPDATE objects SET data = ? WHERE kind = ? AND moid = ?", updates)
+
+        self._db.executemany(
+            "INSERT OR REPLACE INTO objects (kind, moid, name, parent, version, data) VALUES (?, ?, ?, ?, ?, ?)",
+            [(kind, r['id'], r.get('name') or "", r.get('parent'), r.get('version'), json.dumps(r)) for r in rows])
+        self._db.execute("INSERT OR REPLACE INTO refreshes (kind, server, refreshed, version) VALUES (?, ?, ?, ?)",
+                         (kind, self.server, now, data.get('version')))
+
+    def get(self, kind: str, moid: str) -> Optional[Dict[str, Any]]:
+        """Indexed row by MoRef ID, without refreshing."""
+        with self._lock:
+            row = self._db.execute("SELECT data FROM objects WHERE kind = ? AND moid = ?", (kind, moid)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, kind: str, name: str) -> Optional[Dict[str, Any]]:
+        """Indexed row by name (case-insensitive), without refreshing."""
+        with self._lock:
+            row = self._db.execute("SELECT data FROM objects WHERE kind = ? AND name = ? COLLATE NOCASE "
+                                   "ORDER BY moid LIMIT 1", (kind, name)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def rows(self, kind: str) -> List[Dict[str, Any]]:
+        """Every indexed row of ``kind``, without refreshing."""
+        with self._lock:
+            return [json.loads(data) for (data,) in
+                    self._db.execute("SELECT data FROM objects WHERE kind = ? ORDER BY moid", (kind,))]
+
+    def lookup(self, kind: str, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Find an object by name, refreshing ``kind`` first if it is stale.
+
+        A miss on fresh data triggers one forced refresh, so objects created
+        since the last refresh are still found.
+        """
+        refreshed = self.refresh([kind])
+        row = self.find(kind, name)
+        if row is None and not refreshed:
+            self.refresh([kind], force=True)
+            row = self.find(kind, name)
+        return row
+
+    def snapshot(self, refresh: bool = True, force: bool = False) -> Dict[str, Any]:
+        """Status data in the shape of Get-InventorySnapshot, for summarize_inventory."""
+        if refresh:
+            self.refresh(STATUS_KINDS, force)
+        with self._lock:
+            meta = self._db.execute("SELECT value FROM meta WHERE key = 'vcenter'").fetchone()
+        plural = {"folder": "folders", "datacenter": "datacenters", "computeResource": "computeResources",
+                  "cluster": "clusters", "host": "hosts", "vm": "vms", "datastore": "datastores", "vds": "vds"}
+        snapshot = {plural[kind]: self.rows(kind) for kind in STATUS_KINDS}
+        snapshot["vcenter"] = json.loads(meta[0]) if meta else {"server": self.server}
+        return snapshot
+
+
+# Kinds a VM deployment resolves through the index
+DEPLOY_KINDS = ("cluster", "host", "datastore", "portgroup", "template", "tag")
+
+# Port group VMs are attached to
+VM_PORT_GROUP = "PG-VMTraffic"
+
+
+_inventory_index: Optional[InventoryIndex] = None
+
+
+def get_inventory_index() -> InventoryIndex:
+    """Return the inventory index for the current config file and vCenter."""
+    global _inventory_index
+    config = load_infra_config()
+    path = inventory_index_path()
+    if _inventory_index is not None and (_inventory_index.path != path
+                                         or _inventory_index.server != config.vcenter_server):
+        _inventory_index.close()
+        _inventory_index = None
+    if _inventory_index is None:
+        _inventory_index = InventoryIndex(path, config.vcenter_server)
+    return _inventory_index
+
+
+def resolve_deploy_objects(templates: Sequence[str] = (), tags: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    MoRef IDs of the objects a VM deployment uses, from the inventory index.
+
+    Returns ``cluster``, ``datastore`` (vSAN first, then most free space,
+    among those mounted by the cluster's hosts) and ``portgroup`` IDs, plus
+    ``templates`` and ``tags`` maps of name to ID. Anything the index cannot
+    resolve is None or missing, and the script looks it up by name instead.
+    """
+    resolved: Dict[str, Any] = {"cluster": None, "datastore": None, "portgroup": None, "templates": {}, "tags": {}}
+    config = load_infra_config()
+    try:
+        index = get_inventory_index()
+        kinds = [k for k in DEPLOY_KINDS if (k != "template" or templates) and (k != "tag" or tags)]
+        refreshed = index.refresh(kinds)
+        # Objects created since the last refresh: re-read those kinds once
+        missing = [kind for kind, names in (("template", templates), ("tag", tags))
+                   if kind not in refreshed and any(index.find(kind, name) is None for name in names)]
+        if missing:
+            index.refresh(missing, force=True)
+
+        cluster = index.find("cluster", config.cluster_name)
+        if cluster:
+            resolved["cluster"] = cluster["id"]
+            hosts = {h["id"] for h in index.rows("host") if h.get("parent") == cluster["id"]}
+            mounted = [ds for ds in index.rows("datastore") if hosts & set(ds.get("hosts") or [])]
+            best = max(mounted, key=lambda ds: (ds.get("type") == "vsan", ds.get("freeBytes") or 0), default=None)
+            resolved["datastore"] = best and best["id"]
+        portgroup = index.find("portgroup", VM_PORT_GROUP)
+        resolved["portgroup"] = portgroup and portgroup["id"]
+        for key, kind, names in (("templates", "template", templates), ("tags", "tag", tags)):
+            for name in names:
+                row = index.find(kind, name)
+                if row:
+                    resolved[key][name] = row["id"]
+    except sqlite3.Error as e:
+        print_warning(f"Inventory index unavailable, looking objects up by name: {e}")
+    return resolved
+
+
+def ps_lookup(cmdlet: str, object_id: Optional[str], fallback: str) -> str:
+    """``cmdlet -Id <id>`` when the index resolved the object, otherwise the ``fallback`` expression."""
+    return f"{cmdlet} -Id {quote_ps(object_id)} -ErrorAction Stop" if object_id else fallback
+
+
+# =============================================================================
+# VM Placement
+# =============================================================================
+
+GIB = 1024 ** 3
+
+# Kinds whose capacity figures VM placement reads; stale after any deployment
+PLACEMENT_KINDS = ("host", "datastore")
+
+# Datastore preference, tried in order before the scoring policy applies
+DATASTORE_TIER_VSAN = 2
+DATASTORE_TIER_SHARED = 1
+DATASTORE_TIER_LOCAL = 0
+
+
+@dataclass
+class PlacementTarget:
+    """A datastore or host and the capacity still unreserved on it."""
+    id: str
+    name: str
+    capacity: int
+    free: int
+    tier: int = 0
+    hosts: FrozenSet[str] = frozenset()
+    keep_free: int = 0
+    reserved: int = 0
+    placed: int = 0
+
+    @property
+    def available(self) -> int:
+        """Bytes that can still be reserved."""
+        return self.free - self.keep_free
+
+    def reserve(self, amount: int):
+        self.free -= amount
+        self.reserved += amount
+        self.placed += 1
+
+
+def score_balanced(target: PlacementTarget) -> float:
+    """Highest share of capacity still free, so utilization stays even across targets."""
+    return target.free / target.capacity if target.capacity else 0.0
+
+
+def score_most_free(target: PlacementTarget) -> float:
+    """Most free bytes, so the largest targets take the most VMs."""
+    return float(target.free)
+
+
+def score_pack(target: PlacementTarget) -> float:
+    """Least free bytes, so targets are filled one after another."""
+    return -float(target.free)
+
 
-# OS Types for standard VM deployment
-OS_TYPES = {
-    "1": {"name": "RHEL", "guest_id": "rhel9_64Guest", "description": "Red Hat Enterprise Linux"},
-    "2": {"name": "Ubuntu", "guest_id": "ubuntu64Guest", "description": "Ubuntu Linux"},
-    "3": {"name": "Windows", "guest_id": "windows2019srv_64Guest", "description": "Windows Server"},
-    "4": {"name": "CentOS", "guest_id": "centos9_64Guest", "description": "CentOS Stream"},
-    "5": {"name": "Debian", "guest_id": "debian11_64Guest", "description": "Debian Linux"},
+# Placement scoring policies (config: automation.placementPolicy). A policy
+# scores a target from its remaining capacity and the highest score wins;
+# any function of a PlacementTarget can be passed to plan_placement.
+PLACEMENT_POLICIES: Dict[str, Callable[[PlacementTarget], float]] = {
+    "balanced": score_balanced,
+    "most-free": score_most_free,
+    "pack": score_pack,
 }
 
 
+@dataclass
+class Placement:
+    """Where one VM of a batch is created."""
+    vm: str
+    datastore_id: str
+    datastore: str
+    host_id: Optional[str] = None
+    host: Optional[str] = None
+
+
+@dataclass
+class PlacementPlan:
+    """Placements by VM name, the VMs that did not fit and the targets with their reservations."""
+    policy: str
+    placements: Dict[str, Placement]
+    unplaced: List[str]
+    datastores: List[PlacementTarget]
+    hosts: List[PlacementTarget]
+    seconds: float = 0.0
+
+
+class _TargetHeap:
+    """
+    Targets ordered by (tier, score), best first.
+
+    A target's score changes only when it is reserved; ``update`` then adds a
+    fresh entry and the old one is skipped as stale when it surfaces.
+    Targets rejected for one VM size are parked until ``unpark`` is called
+    for the next size, as capacity only shrinks while a plan is built.
+    """
+
+    def __init__(self, targets: Sequence[PlacementTarget], score: Callable[[PlacementTarget], float]):
+        self.targets = list(targets)
+        self.score = score
+        self._slot = {t.id: i for i, t in enumerate(self.targets)}
+        self._version = [0] * len(self.targets)
+        self._heap = [self._entry(i) for i in range(len(self.targets))]
+        self._parked: List[Tuple[int, float, int, int]] = []
+        heapq.heapify(self._heap)
+
+    def _entry(self, slot: int) -> Tuple[int, float, int, int]:
+        target = self.targets[slot]
+        return -target.tier, -self.score(target), slot, self._version[slot]
+
+    @property
+    def exhausted(self) -> bool:
+        return not self._heap and not self._parked
+
+    def take(self, fits: Callable[[PlacementTarget], Optional[bool]]) -> Optional[PlacementTarget]:
+        """
+        Remove and return the best target ``fits`` accepts.
+
+        Targets ``fits`` rejects with False are parked, and with None are
+        dropped for good. The caller puts the returned target back with
+        ``update`` once it is reserved.
+        """
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if entry[3] != self._version[entry[2]]:
+                continue
+            target = self.targets[entry[2]]
+            fit = fits(target)
+            if fit:
+                return target
+            if fit is not None:
+                self._parked.append(entry)
+        return None
+
+    def update(self, target: PlacementTarget):
+        slot = self._slot[target.id]
+        self._version[slot] += 1
+        heapq.heappush(self._heap, self._entry(slot))
+
+    def unpark(self, floor: int):
+        """Return parked targets with at least ``floor`` available to the heap."""
+        for entry in self._parked:
+            if entry[3] == self._version[entry[2]] and self.targets[entry[2]].available >= floor:
+                heapq.heappush(self._heap, entry)
+        self._parked = []
+
+
+class _HostHeaps:
+    """One host heap per distinct set of hosts mounting a datastore, built on first use."""
+
+    def __init__(self, hosts: Sequence[PlacementTarget], score: Callable[[PlacementTarget], float]):
+        self.hosts = {h.id: h for h in hosts}
+        self.score = score
+        self._heaps: Dict[FrozenSet[str], _TargetHeap] = {}
+        self._member_of: Dict[str, List[_TargetHeap]] = {h.id: [] for h in hosts}
+
+    def heap(self, mounted: FrozenSet[str]) -> _TargetHeap:
+        heap = self._heaps.get(mounted)
+        if heap is None:
+            heap = self._heaps[mounted] = _TargetHeap(
+                [self.hosts[h] for h in sorted(mounted) if h in self.hosts], self.score)
+            for host in heap.targets:
+                self._member_of[host.id].append(heap)
+        return heap
+
+    def update(self, host: PlacementTarget):
+        for heap in self._member_of[host.id]:
+            heap.update(host)
+
+    def unpark(self, floor: int):
+        for heap in self._heaps.values():
+            heap.unpark(floor)
+
+
+def plan_placement(vms: Sequence[VMConfig], datastores: Sequence[PlacementTarget],
+                   hosts: Sequence[PlacementTarget] = (),
+                   policy: Any = DEFAULT_PLACEMENT_POLICY) -> PlacementPlan:
+    """
+    Place every VM on a datastore (``disk_gb``) and, when ``hosts`` are
+    given, a host that mounts it (``memory_gb``), reserving as it goes.
+
+    ``policy`` is a PLACEMENT_POLICIES name or a scoring function. VMs are
+    placed largest first, so big VMs are not left without room by many
+    small ones; each placement is a few heap operations, so thousands of
+    VMs over hundreds of datastores take milliseconds. The targets are
+    updated in place.
+    """
+    started = time.perf_counter()
+    score = PLACEMENT_POLICIES[policy] if isinstance(policy, str) else policy
+    name = policy if isinstance(policy, str) else getattr(policy, "__name__", "custom")
+    datastore_heap = _TargetHeap(datastores, score)
+    host_heaps = _HostHeaps(hosts, score) if hosts else None
+
+    sizes = [((vm.disk_gb or 0) * GIB, (vm.memory_gb or 0) * GIB) for vm in vms]
+    min_disk = min((disk for disk, _ in sizes), default=0)
+    min_memory = min((memory for _, memory in sizes), default=0)
+
+    placements: Dict[str, Placement] = {}
+    unplaced: List[str] = []
+    previous = None
+    for i in sorted(range(len(vms)), key=lambda i: sizes[i], reverse=True):
+        disk, memory = sizes[i]
+        if sizes[i] != previous:
+            datastore_heap.unpark(min_disk)
+            if host_heaps:
+                host_heaps.unpark(min_memory)
+            previous = sizes[i]
+        chosen: List[PlacementTarget] = []
+
+        def fits(datastore: PlacementTarget) -> Optional[bool]:
+            if datastore.available < disk:
+                return False
+            if host_heaps is None:
+                return True
+            heap = host_heaps.heap(datastore.hosts)
+            host = heap.take(lambda h: h.available >= memory)
+            if host is None:
+                # Drop a datastore whose hosts are all full
+                return None if heap.exhausted else False
+            chosen.append(host)
+            return True
+
+        datastore = datastore_heap.take(fits)
+        if datastore is None:
+            unplaced.append(vms[i].name)
+            continue
+        datastore.reserve(disk)
+        datastore_heap.update(datastore)
+        placement = Placement(vm=vms[i].name, datastore_id=datastore.id, datastore=datastore.name)
+        if chosen:
+            host = chosen[0]
+            host.reserve(memory)
+            host_heaps.update(host)
+            placement.host_id, placement.host = host.id, host.name
+        placements[vms[i].name] = placement
+
+    order = {vm.name: i for i, vm in enumerate(vms)}
+    return PlacementPlan(policy=name, placements=placements, unplaced=sorted(unplaced, key=order.get),
+                         datastores=list(datastores), hosts=list(hosts),
+                         seconds=time.perf_counter() - started)
+
+
+def placement_targets(cluster_id: str, host_rows: Sequence[Dict[str, Any]],
+                      datastore_rows: Sequence[Dict[str, Any]],
+                      headroom_percent: int = DEFAULT_DATASTORE_HEADROOM_PERCENT
+                      ) -> Tuple[List[PlacementTarget], List[PlacementTarget]]:
+    """
+    Datastore and host targets for a cluster from inventory index rows.
+
+    Only connected, powered-on hosts outside maintenance mode take VMs, and
+    only accessible datastores they mount. vSAN is preferred over other
+    shared datastores, and those over datastores local to one host;
+    ``headroom_percent`` of each datastore is never reserved.
+    """
+    hosts = [PlacementTarget(
+        id=row['id'], name=row.get('name') or row['id'],
+        capacity=int(row.get('memoryBytes') or 0),
+        free=int(row.get('memoryBytes') or 0) - int(row.get('memoryUsedBytes') or 0),
+    ) for row in host_rows
+        if row.get('parent') == cluster_id and row.get('connectionState', "connected") == "connected"
+        and row.get('powerState', "poweredOn") == "poweredOn" and not row.get('inMaintenanceMode')]
+    eligible = {h.id for h in hosts}
+
+    datastores = []
+    for row in datastore_rows:
+        mounted = frozenset(row.get('hosts') or []) & eligible
+        if not mounted or row.get('accessible') is False:
+            continue
+        capacity = int(row.get('capacityBytes') or 0)
+        if row.get('type') == "vsan":
+            tier = DATASTORE_TIER_VSAN
+        else:
+            tier = DATASTORE_TIER_SHARED if len(mounted) > 1 else DATASTORE_TIER_LOCAL
+        datastores.append(PlacementTarget(
+            id=row['id'], name=row.get('name') or row['id'], capacity=capacity,
+            free=int(row.get('freeBytes') or 0), keep_free=capacity * headroom_percent // 100,
+            tier=tier, hosts=mounted))
+    return datastores, hosts
+
+
+def plan_vm_placement(vms: Sequence[VMConfig], policy: Optional[str] = None) -> Optional[PlacementPlan]:
+    """
+    Place ``vms`` on the configured cluster using capacity from the inventory
+    index. Returns None when the index has no datastore capacity for the
+    cluster; the deployment then picks one datastore itself.
+    """
+    config = load_infra_config()
+    try:
+        index = get_inventory_index()
+        index.refresh(("cluster",) + PLACEMENT_KINDS)
+        cluster = index.find("cluster", config.cluster_name)
+        if cluster is None:
+            return None
+        datastores, hosts = placement_targets(cluster['id'], index.rows("host"), index.rows("datastore"),
+                                              config.datastore_headroom_percent)
+    except sqlite3.Error as e:
+        print_warning(f"Inventory index unavailable, skipping VM placement: {e}")
+        return None
+    if not datastores:
+        return None
+    with trace_span("placement", "phase"):
+        return plan_placement(vms, datastores, hosts, policy or config.placement_policy)
+
+
+def ps_host_param(placement: Optional[Placement]) -> str:
+    """A ``-VMHost`` line for a New-VM call when placement chose a host (DRS places the VM otherwise)."""
+    if placement is None or placement.host_id is None:
+        return ""
+    return f"\n        -VMHost (Get-VMHost -Id {quote_ps(placement.host_id)} -ErrorAction Stop) `"
+
+
+def _gb(value: int) -> str:
+    return f"{value / GIB:,.0f} GB"
+
+
+def print_placement_plan(plan: PlacementPlan, limit: int = 20):
+    """Print VMs, reserved space and what stays free per datastore and host, busiest first."""
+    placed = len(plan.placements)
+    print(f"{Colors.BOLD}Placement plan ({plan.policy}):{Colors.ENDC} {placed} VM(s) on "
+          f"{sum(1 for d in plan.datastores if d.placed)} datastore(s)"
+          f"{f' and {sum(1 for h in plan.hosts if h.placed)} host(s)' if plan.hosts else ''}"
+          f" in {plan.seconds * 1000:.1f} ms")
+
+    for title, targets, key in (("Datastore", plan.datastores, "Disk"), ("Host", plan.hosts, "Memory")):
+        used = sorted((t for t in targets if t.placed), key=lambda t: (-t.placed, t.name))
+        if not used:
+            continue
+        print_table([{
+            "name": t.name, "vms": t.placed, "reserved": _gb(t.reserved), "free": _gb(t.free),
+            "used": f"{(t.capacity - t.free) / t.capacity * 100:.0f}%" if t.capacity else "-",
+        } for t in used[:limit]], [(title, "name"), ("VMs", "vms"), (f"{key} Reserved", "reserved"),
+                                   ("Free After", "free"), ("Used After", "used")])
+        if len(used) > limit:
+            print(f"  ... and {len(used) - limit} more {title.lower()}s")
+
+    if plan.unplaced:
+        print_error(f"No capacity left for {len(plan.unplaced)} VM(s): {', '.join(plan.unplaced[:10])}"
+                    f"{' ...' if len(plan.unplaced) > 10 else ''}")
+
+
 # =============================================================================
-# Helper Classes
+# vSAN Disk Groups
 # =============================================================================
 
-class Colors:
-    """ANSI color codes for terminal output."""
-    HEADER = '\033[95m'
-    BLUE = '\033[94m'
-    CYAN = '\033[96m'
-    GREEN = '\033[92m'
-    YELLOW = '\033[93m'
-    RED = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
-
-    @classmethod
-    def disable(cls):
-        """Disable colors for non-supporting terminals."""
-        cls.HEADER = ''
-        cls.BLUE = ''
-        cls.CYAN = ''
-        cls.GREEN = ''
-        cls.YELLOW = ''
-        cls.RED = ''
-        cls.ENDC = ''
-        cls.BOLD = ''
-        cls.UNDERLINE = ''
+# vSAN limits per host (OSA): capacity disks per disk group and disk groups
+VSAN_MAX_CAPACITY_DISKS = 7
+VSAN_MAX_DISK_GROUPS = 5
 
 
 @dataclass
-class VMConfig:
-    """Configuration for a virtual machine deployment."""
+class VsanDisk:
+    """A local disk as reported by Get-VsanDiskInventory."""
     name: str
-    os_type: str
-    size: str
-    tag_name: str
-    ip_address: str
-    template: Optional[str] = None
-    guest_id: Optional[str] = None
-    cpu: Optional[int] = None
-    memory_gb: Optional[int] = None
-    disk_gb: Optional[int] = None
+    size_gb: float
+    ssd: bool
+
+
+@dataclass
+class DiskGroupPlan:
+    """One disk group to create: a cache disk and up to seven capacity disks."""
+    cache: VsanDisk
+    capacity: List[VsanDisk] = field(default_factory=list)
+
+    @property
+    def capacity_gb(self) -> float:
+        return sum(d.size_gb for d in self.capacity)
+
+
+@dataclass
+class HostDiskPlan:
+    """Disk groups planned for one host, or why it gets none."""
+    host: str
+    mode: Optional[str] = None           # all-flash or hybrid
+    groups: List[DiskGroupPlan] = field(default_factory=list)
+    unused: List[VsanDisk] = field(default_factory=list)
+    skipped: Optional[str] = None
+
+
+def plan_host_disk_groups(host: str, eligible: Sequence[VsanDisk], existing_groups: int = 0) -> HostDiskPlan:
+    """
+    Choose the cache and capacity tiers for one host's eligible disks.
+
+    A host with any non-SSD disk is hybrid: SSDs are cache candidates and
+    HDDs are capacity. Otherwise it is all-flash and every SSD is a
+    candidate for both. Either way the smallest SSDs become the cache disks,
+    one per group. A host gets as many groups as its capacity disks need at
+    seven per group, up to five, and the capacity disks are spread so the
+    groups end up close in size. Disks that do not fit are left unused.
+    """
+    plan = HostDiskPlan(host=host)
+    if existing_groups:
+        plan.skipped = f"already has {existing_groups} disk group(s)"
+        return plan
+    if not eligible:
+        plan.skipped = "no eligible disks"
+        return plan
+
+    ssds = sorted((d for d in eligible if d.ssd), key=lambda d: (d.size_gb, d.name))
+    hdds = [d for d in eligible if not d.ssd]
+    if hdds:
+        plan.mode = "hybrid"
+        if not ssds:
+            plan.skipped = "hybrid host without an SSD for the cache tier"
+            return plan
+        count = min(len(ssds), VSAN_MAX_DISK_GROUPS, -(-len(hdds) // VSAN_MAX_CAPACITY_DISKS))
+        cache, capacity, plan.unused = ssds[:count], hdds, ssds[count:]
+    else:
+        plan.mode = "all-flash"
+        if len(ssds) < 2:
+            plan.skipped = "all-flash needs at least 2 SSDs"
+            return plan
+        count = min(VSAN_MAX_DISK_GROUPS, -(-len(ssds) // (VSAN_MAX_CAPACITY_DISKS + 1)))
+        cache, capacity = ssds[:count], ssds[count:]
+
+    # Largest first onto the smallest group that still has a free slot
+    capacity = sorted(capacity, key=lambda d: (-d.size_gb, d.name))
+    slots = count * VSAN_MAX_CAPACITY_DISKS
+    plan.unused += capacity[slots:]
+    plan.groups = [DiskGroupPlan(cache=disk) for disk in cache]
+    for disk in capacity[:slots]:
+        group = min((g for g in plan.groups if len(g.capacity) < VSAN_MAX_CAPACITY_DISKS),
+                    key=lambda g: (g.capacity_gb, len(g.capacity)))
+        group.capacity.append(disk)
+    return plan
+
+
+def plan_disk_groups(inventory: Sequence[Dict[str, Any]], hosts: Sequence[str] = ()) -> List[HostDiskPlan]:
+    """
+    Plan disk groups for every host from Get-VsanDiskInventory rows.
+
+    ``hosts`` adds hosts that reported no disks at all, so they show up in
+    the plan; hosts are returned sorted by name.
+    """
+    eligible: Dict[str, List[VsanDisk]] = {host: [] for host in hosts}
+    existing: Dict[str, int] = {}
+    for row in inventory:
+        host = row.get('Host')
+        if not host:
+            continue
+        eligible.setdefault(host, [])
+        status = row.get('Status')
+        if status == "Eligible":
+            eligible[host].append(VsanDisk(name=row['CanonicalName'], size_gb=float(row.get('CapacityGB') or 0),
+                                           ssd=bool(row.get('IsSsd'))))
+        elif status == "Cache (In Use)":
+            existing[host] = existing.get(host, 0) + 1
+    return [plan_host_disk_groups(host, eligible[host], existing.get(host, 0)) for host in sorted(eligible)]
+
+
+def print_disk_group_plan(plans: Sequence[HostDiskPlan]):
+    """Print the disk groups each host gets, and the hosts and disks left out."""
+    groups = sum(len(p.groups) for p in plans)
+    print(f"{Colors.BOLD}vSAN disk group plan:{Colors.ENDC} {groups} disk group(s) on "
+          f"{sum(1 for p in plans if p.groups)} of {len(plans)} host(s)")
+    print_table([{
+        "host": p.host, "mode": p.mode, "group": number, "cache": f"{g.cache.name} ({g.cache.size_gb:,.0f} GB)",
+        "disks": len(g.capacity), "capacity": round(g.capacity_gb),
+    } for p in plans for number, g in enumerate(p.groups, start=1)],
+        [("Host", "host"), ("Mode", "mode"), ("Group", "group"), ("Cache Disk", "cache"),
+         ("Capacity Disks", "disks"), ("Capacity GB", "capacity")])
+    for p in plans:
+        if p.skipped:
+            print(f"  • {p.host}: skipped, {p.skipped}")
+        elif p.unused:
+            print(f"  • {p.host}: {len(p.unused)} disk(s) left unused ({', '.join(d.name for d in p.unused)})")
+
+
+def read_disk_group_plan(hosts: Sequence[str] = ()) -> Optional[List[HostDiskPlan]]:
+    """
+    Read the disks of every cluster host in one request and plan disk groups
+    for ``hosts`` (default: every host in config.json). Cluster hosts that
+    are not in the config are left out.
+    """
+    result = run_vcenter_script("Send-EcstData @{ disks = @(Get-VsanDiskInventory -ClusterName $config.cluster.name) }",
+                                modules=["05-Storage.ps1"])
+    if result.returncode != 0 or not result.data:
+        print_error(f"Could not read the vSAN disk inventory: {result.error or 'no data returned'}")
+        return None
+    config = load_infra_config()
+    hosts = [entry.hostname for entry in map(config.host, hosts or config.hostnames) if entry is not None]
+    # Rows are renamed to the config's spelling so a host is planned once
+    wanted = {host.lower(): host for host in hosts}
+    inventory = [dict(row, Host=wanted[str(row.get('Host') or "").lower()])
+                 for row in result.data[-1].get('disks') or [] if str(row.get('Host') or "").lower() in wanted]
+    return plan_disk_groups(inventory, hosts)
+
+
+def disk_group_script(plan: HostDiskPlan) -> str:
+    """PowerShell that creates one host's planned disk groups."""
+    lines = [f"$HostName = {quote_ps(plan.host)}",
+             "$vmHost = Get-VMHost -Name $HostName -ErrorAction Stop"]
+    for number, group in enumerate(plan.groups, start=1):
+        capacity = ", ".join(quote_ps(d.name) for d in group.capacity)
+        lines += [f"New-VsanDiskGroup -VMHost $vmHost -SsdCanonicalName {quote_ps(group.cache.name)} "
+                  f"-DataDiskCanonicalName @({capacity}) -ErrorAction Stop | Out-Null",
+                  f'Write-Host "  Disk group {number}/{len(plan.groups)} created on $HostName"']
+    return "\n".join(lines)
+
+
+def create_disk_groups(plans: Sequence[HostDiskPlan], pool: Optional[WorkerPool] = None,
+                       events: Optional[EventLog] = None) -> List[HostTaskResult]:
+    """Create the planned disk groups, several hosts at a time."""
+    by_host = {p.host: p for p in plans if p.groups}
+    return run_host_tasks(list(by_host), lambda host: disk_group_script(by_host[host]),
+                          modules=["05-Storage.ps1"], pool=pool, events=events)
+
+
+def run_disk_group_task(task: DeployTask, pool: WorkerPool, events: EventLog) -> Optional[str]:
+    """
+    Deployment graph action for vsan-disks: plan, print and create the disk
+    groups of the task's hosts (all configured hosts when it names none).
+    """
+    if not load_infra_config().storage.vsan_enabled:
+        print_info("vSAN is not enabled, skipping disk group configuration")
+        return None
+    plans = read_disk_group_plan(task.hosts)
+    if plans is None:
+        return "Could not read the vSAN disk inventory"
+    print_disk_group_plan(plans)
+    failed = [r.host for r in create_disk_groups(plans, pool, events) if not r.success]
+    return f"Failed on host(s): {', '.join(failed)}" if failed else None
 
 
 # =============================================================================
-# Utility Functions
+# VCSA Readiness
 # =============================================================================
 
-def clear_screen():
-    """Clear the terminal screen."""
-    os.system('cls' if os.name == 'nt' else 'clear')
+# Poll schedule: start fast and back off while nothing changes
+VCSA_POLL_INITIAL_SECONDS = 2.0
+VCSA_POLL_MAX_SECONDS = 30.0
+VCSA_POLL_BACKOFF = 1.5
+VCSA_POLL_JITTER = 0.2              # +/- share of each delay, so waiters do not poll in lockstep
+VCSA_PROBE_TIMEOUT_SECONDS = 10.0
 
+# Health values of /api/appliance/health/system that count as up
+VCSA_HEALTHY = ("green", "orange")
 
-def print_header(title: str):
-    """Print a formatted header."""
-    width = 60
-    print()
-    print(f"{Colors.CYAN}{'=' * width}{Colors.ENDC}")
-    print(f"{Colors.BOLD}{Colors.CYAN}  {title}{Colors.ENDC}")
-    print(f"{Colors.CYAN}{'=' * width}{Colors.ENDC}")
-    print()
 
+@dataclass
+class ReadinessPhase:
+    """One readiness probe and when it first passed."""
+    probe: str
+    description: str
+    required: bool = True
+    ready_after: Optional[float] = None      # seconds since the wait started
+    attempts: int = 0
+    passing: bool = False
+    detail: str = ""
 
-def print_success(message: str):
-    """Print a success message."""
-    print(f"{Colors.GREEN}[SUCCESS]{Colors.ENDC} {message}")
 
+def _vcsa_request(url: str, method: str = "GET", headers: Optional[Dict[str, str]] = None,
+                  timeout: float = VCSA_PROBE_TIMEOUT_SECONDS) -> Tuple[int, bytes]:
+    """One HTTP(S) request to the appliance; returns the status and body, even for error statuses."""
+    # A freshly deployed appliance still has its self-signed certificate
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    request = urllib.request.Request(url, method=method, headers=headers or {},
+                                     data=b"" if method == "POST" else None)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout, context=context) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
 
-def print_error(message: str):
-    """Print an error message."""
-    print(f"{Colors.RED}[ERROR]{Colors.ENDC} {message}")
 
+def _vcsa_login(base_url: str, credentials: Tuple[str, str]) -> Tuple[int, Optional[str]]:
+    """Create a REST API session; returns the status and the session token on success."""
+    token = base64.b64encode(f"{credentials[0]}:{credentials[1]}".encode("utf-8")).decode("ascii")
+    status, body = _vcsa_request(f"{base_url}/api/session", "POST", {"Authorization": f"Basic {token}"})
+    if status not in (200, 201):
+        return status, None
+    return status, json.loads(body or b'""')
 
-def print_warning(message: str):
-    """Print a warning message."""
-    print(f"{Colors.YELLOW}[WARNING]{Colors.ENDC} {message}")
 
+def _vcsa_logout(base_url: str, session: str):
+    try:
+        _vcsa_request(f"{base_url}/api/session", "DELETE", {"vmware-api-session-id": session})
+    except (OSError, ValueError):
+        pass
 
-def print_info(message: str):
-    """Print an info message."""
-    print(f"{Colors.CYAN}[INFO]{Colors.ENDC} {message}")
 
+def vcsa_probes(base_url: str, credentials: Optional[Tuple[str, str]]) -> Dict[str, Callable[[], Tuple[bool, str]]]:
+    """
+    The readiness probes for the appliance at ``base_url``, by name.
 
-def get_input(prompt: str, default: str = "") -> str:
-    """Get user input with optional default value."""
-    if default:
-        user_input = input(f"{prompt} [{default}]: ").strip()
-        return user_input if user_input else default
-    return input(f"{prompt}: ").strip()
+    Each returns (passed, detail). Without credentials the session probe
+    passes on 401, which shows the API gateway answers, and there is no
+    health probe because the health API needs a session.
+    """
+    parsed = urllib.parse.urlsplit(base_url)
+    address = (parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
 
+    def tcp() -> Tuple[bool, str]:
+        with socket.create_connection(address, timeout=VCSA_PROBE_TIMEOUT_SECONDS):
+            return True, f"port {address[1]} open"
 
-def get_password(prompt: str) -> str:
-    """Get password input (hidden)."""
-    return getpass.getpass(f"{prompt}: ")
+    def ui() -> Tuple[bool, str]:
+        status, _ = _vcsa_request(f"{base_url}/ui")
+        return status == 200, f"HTTP {status}"
 
+    def session() -> Tuple[bool, str]:
+        if credentials is None:
+            status, _ = _vcsa_request(f"{base_url}/api/session", "POST")
+            return status == 401, f"HTTP {status}"
+        status, token = _vcsa_login(base_url, credentials)
+        if token:
+            _vcsa_logout(base_url, token)
+        return token is not None, f"HTTP {status}"
 
-def confirm_action(message: str) -> bool:
-    """Ask for user confirmation."""
-    response = input(f"{Colors.YELLOW}{message} (y/n): {Colors.ENDC}").strip().lower()
-    return response in ('y', 'yes')
+    def health() -> Tuple[bool, str]:
+        status, token = _vcsa_login(base_url, credentials)
+        if not token:
+            return False, f"login HTTP {status}"
+        try:
+            status, body = _vcsa_request(f"{base_url}/api/appliance/health/system",
+                                         headers={"vmware-api-session-id": token})
+        finally:
+            _vcsa_logout(base_url, token)
+        if status != 200:
+            return False, f"HTTP {status}"
+        value = str(json.loads(body or b'""')).lower()
+        return value in VCSA_HEALTHY, f"health {value}"
 
+    probes = {"tcp": tcp, "ui": ui, "session": session}
+    if credentials is not None:
+        probes["health"] = health
+    return probes
 
-def load_config() -> Dict[str, Any]:
-    """Load configuration from JSON file."""
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print_error(f"Configuration file not found: {CONFIG_FILE}")
-        sys.exit(1)
-    except json.JSONDecodeError as e:
-        print_error(f"Invalid JSON in configuration file: {e}")
-        sys.exit(1)
 
+def wait_for_vcsa(server: str, timeout_minutes: float = 60, base_url: Optional[str] = None,
+                  credentials: Optional[Tuple[str, str]] = None,
+                  probes: Optional[Dict[str, Callable[[], Tuple[bool, str]]]] = None) -> Tuple[bool, List[ReadinessPhase]]:
+    """
+    Wait until the appliance at ``server`` is usable, not just serving /ui.
 
-def save_config(config: Dict[str, Any]):
-    """Save configuration to JSON file."""
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+    Every round runs all probes at once (TCP 443, /ui, a REST API session
+    and, with credentials, the appliance health API). The appliance is ready
+    when every required probe passes in the same round. Rounds start
+    VCSA_POLL_INITIAL_SECONDS apart and back off to VCSA_POLL_MAX_SECONDS,
+    with jitter; a probe passing for the first time resets the delay,
+    because the next service usually follows soon. ``base_url`` replaces
+    ``https://<server>`` (e.g. a local stub).
 
+    Returns whether it became ready and each probe's phase, with the time
+    it first passed.
+    """
+    base_url = (base_url or f"https://{server}").rstrip("/")
+    probes = probes or vcsa_probes(base_url, credentials)
+    parsed = urllib.parse.urlsplit(base_url)
+    descriptions = {"tcp": f"TCP {parsed.port or (443 if parsed.scheme == 'https' else 80)}", "ui": "vSphere Client (/ui)", "session": "REST API session",
+                    "health": "Appliance health"}
+    phases = [ReadinessPhase(name, descriptions.get(name, name)) for name in probes]
 
-def run_powershell(script: str, params: Dict[str, str] = None) -> subprocess.CompletedProcess:
-    """Execute a PowerShell script with parameters."""
-    cmd = ["powershell.exe", "-ExecutionPolicy", "Bypass", "-File", str(script)]
-    
-    if params:
-        for key, value in params.items():
-            cmd.extend([f"-{key}", str(value)])
-    
-    print_info(f"Executing: {script}")
-    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
-    
-    result = subprocess.run(
-        cmd,
-        capture_output=False,
-        text=True,
-        cwd=str(SCRIPT_DIR)
-    )
-    
-    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
-    return result
+    start = time.monotonic()
+    deadline = start + timeout_minutes * 60
+    delay = VCSA_POLL_INITIAL_SECONDS
+    last_report = start
+    elapsed = lambda: time.strftime("%M:%S", time.gmtime(time.monotonic() - start))
 
+    print_info(f"Waiting for {base_url} ({', '.join(p.description for p in phases)}), "
+               f"up to {timeout_minutes:g} minutes...")
+    with ThreadPoolExecutor(max_workers=len(phases), thread_name_prefix="vcsa-probe") as pool:
+        while True:
+            def run(probe: Callable[[], Tuple[bool, str]]) -> Tuple[bool, str]:
+                try:
+                    return probe()
+                except (OSError, ValueError, http.client.HTTPException) as e:
+                    return False, str(getattr(e, "reason", None) or e) or type(e).__name__
 
-def run_powershell_command(command: str) -> subprocess.CompletedProcess:
-    """Execute a PowerShell command directly."""
-    cmd = ["powershell.exe", "-ExecutionPolicy", "Bypass", "-Command", command]
-    
-    print_info(f"Executing PowerShell command...")
-    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
-    
-    result = subprocess.run(
-        cmd,
-        capture_output=False,
-        text=True,
-        cwd=str(SCRIPT_DIR)
-    )
-    
-    print(f"{Colors.CYAN}{'─' * 50}{Colors.ENDC}")
-    return result
+            outcomes = list(pool.map(run, [probes[phase.probe] for phase in phases]))
+            now = time.monotonic()
+            progressed = False
+            for phase, (passed, detail) in zip(phases, outcomes):
+                phase.attempts += 1
+                if passed != phase.passing:
+                    color = Colors.GREEN if passed else Colors.YELLOW
+                    print(f"  [{elapsed()}] {phase.description}: {color}{'up' if passed else 'down'}{Colors.ENDC} ({detail})")
+                if passed and phase.ready_after is None:
+                    phase.ready_after = round(now - start, 3)
+                    progressed = True
+                phase.passing, phase.detail = passed, detail
+
+            if all(phase.passing for phase in phases if phase.required):
+                print_success(f"vCenter is ready after {elapsed()}")
+                return True, phases
+            if now >= deadline:
+                waiting = ", ".join(p.description for p in phases if p.required and not p.passing)
+                print_error(f"Timeout waiting for vCenter after {timeout_minutes:g} minutes (still down: {waiting})")
+                return False, phases
+
+            delay = VCSA_POLL_INITIAL_SECONDS if progressed else min(delay * VCSA_POLL_BACKOFF, VCSA_POLL_MAX_SECONDS)
+            pause_for = min(delay * random.uniform(1 - VCSA_POLL_JITTER, 1 + VCSA_POLL_JITTER), deadline - now)
+            if now - last_report >= 60:
+                waiting = ", ".join(p.description for p in phases if not p.passing)
+                print(f"  [{elapsed()}] Still waiting for {waiting}; next check in {pause_for:.0f}s")
+                last_report = now
+            time.sleep(max(0.0, pause_for))
+
+
+def print_readiness_phases(phases: List[ReadinessPhase]):
+    """Print when each probe first passed and how long its phase took."""
+    rows = []
+    previous = 0.0
+    for phase in sorted(phases, key=lambda p: (p.ready_after is None, p.ready_after or 0)):
+        row = {"probe": phase.description, "attempts": phase.attempts, "detail": phase.detail,
+               "ready": "-", "phase": "-"}
+        if phase.ready_after is not None:
+            row["ready"] = f"{phase.ready_after:.1f}s"
+            row["phase"] = f"{phase.ready_after - previous:.1f}s"
+            previous = phase.ready_after
+        rows.append(row)
+    print_table(rows, [("Probe", "probe"), ("Ready After", "ready"), ("Phase", "phase"),
+                       ("Checks", "attempts"), ("Last Result", "detail")])
+
+
+def wait_vcenter(timeout_minutes: float = 60, base_url: Optional[str] = None, as_json: bool = False) -> bool:
+    """Wait for the configured vCenter to become ready and report per-phase timing."""
+    config = load_infra_config()
+    with ExitStack() as stack:
+        # Everything but the JSON, credential prompts included, goes to stderr
+        if as_json:
+            stack.enter_context(redirect_stdout(sys.stderr))
+        try:
+            credentials = get_vcenter_credentials()
+        except WorkerError:
+            credentials = None
+
+        print_header("Wait for vCenter")
+        if credentials is None:
+            print_warning("No vCenter credentials: checking that the API answers, without the health API.")
+        with trace_span("wait vcenter", "probe", target=config.vcenter_server) as span:
+            ready, phases = wait_for_vcsa(config.vcenter_server, timeout_minutes, base_url, credentials)
+            span.status = "Success" if ready else "Failed"
+        print_readiness_phases(phases)
+
+    record_site_result(vcsa=[dict(p.__dict__) for p in phases])
+    if as_json:
+        print(json.dumps({"ready": ready, "phases": [p.__dict__ for p in phases]}, indent=2))
+    return ready
 
 
 # =============================================================================
@@ -227,11 +4821,11 @@ def display_main_menu():
     clear_screen()
     print_header("ECST VMware Automation Tool")
     
-    config = load_config()
-    print(f"  Environment: {Colors.GREEN}{config['environment']['name']}{Colors.ENDC}")
-    print(f"  vCenter:     {Colors.CYAN}{config['vcenter']['server']}{Colors.ENDC}")
-    print(f"  Datacenter:  {Colors.CYAN}{config['datacenter']['name']}{Colors.ENDC}")
-    print(f"  Cluster:     {Colors.CYAN}{config['cluster']['name']}{Colors.ENDC}")
+    config = load_infra_config()
+    print(f"  Environment: {Colors.GREEN}{config.environment_name}{Colors.ENDC}")
+    print(f"  vCenter:     {Colors.CYAN}{config.vcenter_server}{Colors.ENDC}")
+    print(f"  Datacenter:  {Colors.CYAN}{config.datacenter_name}{Colors.ENDC}")
+    print(f"  Cluster:     {Colors.CYAN}{config.cluster_name}{Colors.ENDC}")
     print()
     
     print(f"{Colors.BOLD}Main Menu:{Colors.ENDC}")
@@ -261,7 +4855,9 @@ def display_configure_menu():
     print("  3. Configure vMotion")
     print("  4. Configure NTP/DNS/Syslog")
     print("  5. Configure Security Settings")
-    print("  6. Configure All (Full)")
+    print("  6. Configure All (Plan + Apply)")
+    print("  7. Plan Changes (Review Only)")
+    print("  8. Scan Configuration Drift")
     print()
     print("  B. Back to Main Menu")
     print()
@@ -276,6 +4872,7 @@ def display_vm_menu():
     print()
     print("  1. Deploy VM from Template")
     print("  2. Deploy Standard Virtual Machine")
+    print("  3. Deploy VMs from Manifest (Bulk)")
     print()
     print("  B. Back to Main Menu")
     print()
@@ -318,7 +4915,7 @@ def display_config_management_menu():
 # Deployment Functions
 # =============================================================================
 
-def deploy_vcenter():
+def deploy_vcenter() -> bool:
     """Deploy vCenter Server Appliance."""
     print_header("Deploy vCenter Server Appliance (VCSA)")
     
@@ -335,57 +4932,109 @@ def deploy_vcenter():
     
     if not confirm_action("Do you want to proceed with VCSA deployment?"):
         print_warning("VCSA deployment cancelled.")
-        return
+        return False
     
     script_path = SCRIPT_DIR / "Deploy-VCSA.ps1"
     if not script_path.exists():
         print_error(f"Script not found: {script_path}")
-        return
+        return False
     
     result = run_powershell(script_path, {"ConfigPath": str(CONFIG_FILE)})
     
     if result.returncode == 0:
         print_success("VCSA deployment preparation completed!")
+        # The installer runs by hand, so only offer to wait when someone is there to run it
+        if not NON_INTERACTIVE and confirm_action("Wait for the appliance to come up after running vcsa-deploy?"):
+            wait_vcenter()
     else:
         print_error(f"VCSA deployment failed with exit code: {result.returncode}")
     
-    input("\nPress Enter to continue...")
+    pause()
+    return result.returncode == 0
 
 
-def deploy_infrastructure():
-    """Deploy full infrastructure."""
+def deploy_infrastructure(skip: Sequence[str] = (), only: Sequence[str] = (),
+                          max_parallel: Optional[int] = None, plan_only: bool = False,
+                          resume: bool = False) -> bool:
+    """
+    Deploy full infrastructure.
+
+    Steps run as a dependency graph (see build_deploy_graph) so independent
+    branches proceed concurrently. ``skip`` takes the STEP_GROUPS that
+    Deploy-Infrastructure.ps1 exposes as -Skip* switches. Completed work is
+    recorded in the deployment journal; with ``resume`` (or when confirmed
+    after an unfinished run) work already done for the current config is
+    skipped.
+    """
     print_header("Deploy Full Infrastructure")
     
     config = load_config()
+    infra = load_infra_config()
+    
+    try:
+        tasks = select_tasks(build_deploy_graph(infra), skip, only)
+    except ValueError as e:
+        print_error(str(e))
+        return False
+    
+    journal = DeploymentJournal(deploy_journal_path()).load()
+    if not resume and not NON_INTERACTIVE and journal.finished is not True and len(journal):
+        resume = confirm_action(f"The last deployment did not finish ({len(journal)} unit(s) done). Resume it?")
+    if resume:
+        tasks, done = resume_tasks(tasks, journal, infra)
+        if done:
+            print_info(f"Resuming: {len(done)} task(s) already done ({', '.join(done)})")
+        narrowed = [f"{t.name} ({len(t.hosts)} host(s))" for t in tasks if t.hosts]
+        if narrowed:
+            print_info(f"Remaining hosts only: {', '.join(narrowed)}")
+        if not any(t.config_keys for t in tasks):
+            print_success("Nothing left to deploy for the current configuration.")
+            return True
     
     print("This will deploy the following components:")
     print(f"  • Datacenter: {config['datacenter']['name']}")
     print(f"  • Cluster:    {config['cluster']['name']}")
-    print(f"  • Hosts:      {len(config['esxiHosts'])} ESXi hosts")
+    print(f"  • Hosts:      {len(infra.hosts)} ESXi hosts")
     print(f"  • VDS:        {config['networking']['vds']['name']}")
     print(f"  • vSAN:       {'Enabled' if config['storage']['vsan']['enabled'] else 'Disabled'}")
     print()
+    print_task_plan(tasks)
+    print()
+    
+    if plan_only:
+        return True
     
     if not confirm_action("Do you want to proceed with full infrastructure deployment?"):
         print_warning("Infrastructure deployment cancelled.")
-        return
-    
-    script_path = SCRIPT_DIR / "Deploy-Infrastructure.ps1"
-    if not script_path.exists():
-        print_error(f"Script not found: {script_path}")
-        return
-    
-    result = run_powershell(script_path, {"ConfigPath": str(CONFIG_FILE)})
+        return False
     
-    if result.returncode == 0:
+    events = EventLog()
+    journal.start_run()
+    try:
+        results = run_deploy_graph(tasks, max_parallel, events, journal)
+    except WorkerError as e:
+        journal.end_run(False)
+        print_error(str(e))
+        pause()
+        return False
+    except BaseException:
+        journal.close()
+        raise
+    print_graph_report(tasks, results)
+    
+    success = all(r.status == "Success" for r in results.values())
+    journal.end_run(success)
+    if success:
         print_success("Infrastructure deployment completed!")
     else:
-        print_error(f"Infrastructure deployment failed with exit code: {result.returncode}")
+        failed = [name for name, r in results.items() if r.status != "Success"]
+        print_error(f"Infrastructure deployment failed: {', '.join(failed)}")
     
-    input("\nPress Enter to continue...")
+    pause()
+    return success
 
 
-def deploy_datacenter():
+def deploy_datacenter() -> bool:
     """Deploy datacenter only."""
     print_header("Deploy Datacenter")
     
@@ -397,32 +5046,24 @@ def deploy_datacenter():
     
     if not confirm_action("Create this datacenter?"):
         print_warning("Datacenter creation cancelled.")
-        return
-    
-    ps_command = f"""
-    . '{MODULES_DIR / "01-Connect.ps1"}'
-    . '{MODULES_DIR / "02-Datacenter.ps1"}'
-    
-    $config = Get-Content '{CONFIG_FILE}' -Raw | ConvertFrom-Json
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
+        return False
     
-    Connect-VCenterServer -Server $config.vcenter.server -Credential $cred
+    ps_command = """
     New-VsphereDatacenter -Config $config
-    
-    Disconnect-VIServer -Server * -Force -Confirm:$false
     """
     
-    result = run_powershell_command(ps_command)
+    result = run_vcenter_script(ps_command, modules=["02-Datacenter.ps1"])
     
     if result.returncode == 0:
         print_success("Datacenter created successfully!")
     else:
         print_error(f"Datacenter creation failed with exit code: {result.returncode}")
     
-    input("\nPress Enter to continue...")
+    pause()
+    return result.returncode == 0
 
 
-def deploy_cluster():
+def deploy_cluster() -> bool:
     """Deploy cluster only."""
     print_header("Deploy Cluster")
     
@@ -438,37 +5079,33 @@ def deploy_cluster():
     
     if not confirm_action("Create this cluster?"):
         print_warning("Cluster creation cancelled.")
-        return
+        return False
     
-    ps_command = f"""
-    . '{MODULES_DIR / "01-Connect.ps1"}'
-    . '{MODULES_DIR / "02-Datacenter.ps1"}'
-    
-    $config = Get-Content '{CONFIG_FILE}' -Raw | ConvertFrom-Json
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
-    
-    Connect-VCenterServer -Server $config.vcenter.server -Credential $cred
+    ps_command = """
     New-VsphereCluster -Config $config
-    
-    Disconnect-VIServer -Server * -Force -Confirm:$false
     """
     
-    result = run_powershell_command(ps_command)
+    result = run_vcenter_script(ps_command, modules=["02-Datacenter.ps1"])
     
     if result.returncode == 0:
         print_success("Cluster created successfully!")
     else:
         print_error(f"Cluster creation failed with exit code: {result.returncode}")
     
-    input("\nPress Enter to continue...")
+    pause()
+    return result.returncode == 0
 
 
 # =============================================================================
 # Configuration Functions
 # =============================================================================
 
-def configure_vsan():
-    """Configure vSAN storage."""
+def configure_vsan(plan_only: bool = False) -> bool:
+    """
+    Configure vSAN storage: enable it on the cluster, then plan disk groups
+    for every host from one disk inventory and create them in parallel.
+    With ``plan_only`` the disk group plan is printed and nothing changes.
+    """
     print_header("Configure vSAN")
     
     config = load_config()
@@ -481,35 +5118,56 @@ def configure_vsan():
     print(f"  Compression:  {vsan_config['compressionEnabled']}")
     print()
     
+    if plan_only:
+        plans = read_disk_group_plan()
+        if plans is not None:
+            print_disk_group_plan(plans)
+        return plans is not None
+    
     if not confirm_action("Configure vSAN with these settings?"):
         print_warning("vSAN configuration cancelled.")
-        return
-    
-    ps_command = f"""
-    . '{MODULES_DIR / "01-Connect.ps1"}'
-    . '{MODULES_DIR / "05-Storage.ps1"}'
-    
-    $config = Get-Content '{CONFIG_FILE}' -Raw | ConvertFrom-Json
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
-    
-    Connect-VCenterServer -Server $config.vcenter.server -Credential $cred
-    Enable-VsanCluster -Config $config
-    Configure-VsanDiskGroups -Config $config -AutoClaim
+        return False
     
-    Disconnect-VIServer -Server * -Force -Confirm:$false
-    """
-    
-    result = run_powershell_command(ps_command)
-    
-    if result.returncode == 0:
+    result = run_vcenter_script("Enable-VsanCluster -Config $config", modules=["05-Storage.ps1"])
+    if result.returncode != 0:
+        print_error(f"vSAN configuration failed with exit code: {result.returncode}")
+        pause()
+        return False
+    if not vsan_config['enabled']:
+        pause()
+        return True
+    
+    plans = read_disk_group_plan()
+    if plans is None:
+        pause()
+        return False
+    print_disk_group_plan(plans)
+    
+    groups = sum(len(p.groups) for p in plans)
+    if groups == 0:
+        print_info("No disk groups to create.")
+        pause()
+        return True
+    if not confirm_action(f"Create {groups} disk group(s) on {sum(1 for p in plans if p.groups)} host(s)?"):
+        print_warning("Disk group creation cancelled.")
+        pause()
+        return False
+    
+    events = EventLog()
+    results = create_disk_groups(plans, events=events)
+    print_host_summary("vSAN Disk Group Summary:", results, events)
+    
+    success = all(r.success for r in results)
+    if success:
         print_success("vSAN configured successfully!")
     else:
-        print_error(f"vSAN configuration failed with exit code: {result.returncode}")
+        print_error("vSAN disk groups failed on one or more hosts.")
     
-    input("\nPress Enter to continue...")
+    pause()
+    return success
 
 
-def configure_vds():
+def configure_vds() -> bool:
     """Configure vSphere Distributed Switch."""
     print_header("Configure Distributed Switch (VDS)")
     
@@ -530,34 +5188,26 @@ def configure_vds():
     
     if not confirm_action("Configure VDS with these settings?"):
         print_warning("VDS configuration cancelled.")
-        return
-    
-    ps_command = f"""
-    . '{MODULES_DIR / "01-Connect.ps1"}'
-    . '{MODULES_DIR / "04-Networking.ps1"}'
-    
-    $config = Get-Content '{CONFIG_FILE}' -Raw | ConvertFrom-Json
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
+        return False
     
-    Connect-VCenterServer -Server $config.vcenter.server -Credential $cred
+    ps_command = """
     New-VsphereVDS -Config $config
     New-VspherePortGroups -Config $config
     Add-HostsToVDS -Config $config
-    
-    Disconnect-VIServer -Server * -Force -Confirm:$false
     """
     
-    result = run_powershell_command(ps_command)
+    result = run_vcenter_script(ps_command, modules=["04-Networking.ps1"])
     
     if result.returncode == 0:
         print_success("VDS configured successfully!")
     else:
         print_error(f"VDS configuration failed with exit code: {result.returncode}")
     
-    input("\nPress Enter to continue...")
+    pause()
+    return result.returncode == 0
 
 
-def configure_vmotion():
+def configure_vmotion() -> bool:
     """Configure vMotion networking."""
     print_header("Configure vMotion")
     
@@ -570,38 +5220,31 @@ def configure_vmotion():
     print(f"  Subnet Mask: {vmotion_config['subnetMask']}")
     print()
     print("Host vMotion IPs:")
-    for host in config['esxiHosts']:
-        print(f"  • {host['hostname']}: {host['vmotionIp']}")
+    for host in load_infra_config().hosts:
+        print(f"  • {host.hostname}: {host.vmotion_ip}")
     print()
     
     if not confirm_action("Configure vMotion with these settings?"):
         print_warning("vMotion configuration cancelled.")
-        return
-    
-    ps_command = f"""
-    . '{MODULES_DIR / "01-Connect.ps1"}'
-    . '{MODULES_DIR / "04-Networking.ps1"}'
-    
-    $config = Get-Content '{CONFIG_FILE}' -Raw | ConvertFrom-Json
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
-    
-    Connect-VCenterServer -Server $config.vcenter.server -Credential $cred
-    Configure-VMotionStack -Config $config
+        return False
     
-    Disconnect-VIServer -Server * -Force -Confirm:$false
-    """
-    
-    result = run_powershell_command(ps_command)
+    events = EventLog()
+    results = run_host_batches(load_infra_config().hostnames, lambda batch: f"""
+    Configure-VMotionStack -Config $config -HostName @({', '.join(quote_ps(host) for host in batch)}) -ThrowOnHostFailure
+    """, "vmotion", modules=["04-Networking.ps1"], events=events)
+    print_host_summary("vMotion Summary:", results, events)
     
-    if result.returncode == 0:
+    success = all(r.success for r in results)
+    if success:
         print_success("vMotion configured successfully!")
     else:
-        print_error(f"vMotion configuration failed with exit code: {result.returncode}")
+        print_error("vMotion configuration failed on one or more hosts.")
     
-    input("\nPress Enter to continue...")
+    pause()
+    return success
 
 
-def configure_services():
+def configure_services() -> bool:
     """Configure NTP, DNS, and Syslog services."""
     print_header("Configure Host Services (NTP/DNS/Syslog)")
     
@@ -623,34 +5266,28 @@ def configure_services():
     
     if not confirm_action("Configure services with these settings?"):
         print_warning("Service configuration cancelled.")
-        return
-    
-    ps_command = f"""
-    . '{MODULES_DIR / "01-Connect.ps1"}'
-    . '{MODULES_DIR / "06-Configuration.ps1"}'
-    
-    $config = Get-Content '{CONFIG_FILE}' -Raw | ConvertFrom-Json
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
-    
-    Connect-VCenterServer -Server $config.vcenter.server -Credential $cred
-    Set-HostNtpConfiguration -Config $config
-    Set-HostDnsConfiguration -Config $config
-    Set-HostSyslogConfiguration -Config $config
-    
-    Disconnect-VIServer -Server * -Force -Confirm:$false
-    """
-    
-    result = run_powershell_command(ps_command)
-    
-    if result.returncode == 0:
+        return False
+    
+    hosts = load_infra_config().hostnames
+    events = EventLog()
+    results = run_host_tasks(hosts, lambda host: f"""
+    Set-HostNtpConfiguration -Config $config -HostName {quote_ps(host)} -ThrowOnHostFailure
+    Set-HostDnsConfiguration -Config $config -HostName {quote_ps(host)} -ThrowOnHostFailure
+    Set-HostSyslogConfiguration -Config $config -HostName {quote_ps(host)} -ThrowOnHostFailure
+    """, modules=["06-Configuration.ps1"], events=events)
+    print_host_summary("Host Services Summary:", results, events)
+    
+    success = all(r.success for r in results)
+    if success:
         print_success("Host services configured successfully!")
     else:
-        print_error(f"Service configuration failed with exit code: {result.returncode}")
+        print_error("Service configuration failed on one or more hosts.")
     
-    input("\nPress Enter to continue...")
+    pause()
+    return success
 
 
-def configure_security():
+def configure_security() -> bool:
     """Configure security settings."""
     print_header("Configure Security Settings")
     
@@ -666,78 +5303,214 @@ def configure_security():
     
     if not confirm_action("Apply these security settings?"):
         print_warning("Security configuration cancelled.")
-        return
+        return False
+    
+    hosts = load_infra_config().hostnames
+    events = EventLog()
+    results = run_host_batches(hosts, lambda batch: f"""
+    Set-HostSecurityConfiguration -Config $config -HostName @({', '.join(quote_ps(host) for host in batch)}) -ThrowOnHostFailure
+    """, "security", modules=["06-Configuration.ps1"], events=events)
+    print_host_summary("Security Configuration Summary:", results, events)
+    
+    success = all(r.success for r in results)
+    if success:
+        print_success("Security settings applied successfully!")
+    else:
+        print_error("Security configuration failed on one or more hosts.")
+    
+    pause()
+    return success
+
+
+def configure_all() -> bool:
+    """
+    Configure all infrastructure components.
+
+    Plans against the live environment first, so a re-run on a converged
+    cluster only reads state and touches nothing.
+    """
+    return apply_configuration()
+
+
+def plan_configuration() -> bool:
+    """Show the change set without applying it."""
+    return apply_configuration(plan_only=True)
+
+
+# =============================================================================
+# VM Deployment Functions
+# =============================================================================
+
+def provision_template_vm(vm: VMConfig, power_on: bool = False, policy: Optional[str] = None) -> bool:
+    """Clone a VM from its template and apply size, network and tag settings."""
+    config = load_config()
+    ids = resolve_deploy_objects([vm.template], [vm.tag_name] if vm.tag_name else [])
+    plan = plan_vm_placement([vm], policy)
+    if plan and plan.unplaced:
+        print_error(f"Not enough free capacity in the cluster for '{vm.name}' "
+                    f"({vm.disk_gb} GB disk, {vm.memory_gb} GB memory).")
+        return False
+    placement = plan.placements[vm.name] if plan else None
     
     ps_command = f"""
-    . '{MODULES_DIR / "01-Connect.ps1"}'
-    . '{MODULES_DIR / "06-Configuration.ps1"}'
+    # Get the template
+    $template = {ps_lookup("Get-Template", ids['templates'].get(vm.template),
+                           f"Get-Template -Name '{vm.template}' -ErrorAction Stop")}
+    
+    # Get the cluster
+    $cluster = {ps_lookup("Get-Cluster", ids['cluster'], f"Get-Cluster -Name '{config['cluster']['name']}' -ErrorAction Stop")}
+    
+    # Get datastore (placed by capacity, else vSAN or first available)
+    $datastore = {ps_lookup("Get-Datastore", placement.datastore_id if placement else ids['datastore'],
+                            "Get-Datastore -Location $cluster | Where-Object { $_.Type -eq 'vsan' } | Select-Object -First 1")}
+    if (-not $datastore) {{
+        $datastore = Get-Datastore -Location $cluster | Select-Object -First 1
+    }}
     
-    $config = Get-Content '{CONFIG_FILE}' -Raw | ConvertFrom-Json
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
+    # Get port group for VM network
+    $portGroup = {ps_lookup("Get-VDPortgroup", ids['portgroup'],
+                            f"Get-VDPortgroup -Name '{VM_PORT_GROUP}' -ErrorAction SilentlyContinue")}
+    if (-not $portGroup) {{
+        $portGroup = Get-VirtualPortGroup | Select-Object -First 1
+    }}
+    
+    # Create VM from template
+    Write-Host "Creating VM from template..."
+    $vm = New-VM -Name '{vm.name}' `
+        -Template $template `
+        -ResourcePool $cluster `{ps_host_param(placement)}
+        -Datastore $datastore `
+        -ErrorAction Stop
+    
+    # Configure VM resources
+    Write-Host "Configuring VM resources..."
+    Set-VM -VM $vm `
+        -NumCpu {vm.cpu} `
+        -MemoryGB {vm.memory_gb} `
+        -Confirm:$false
+    
+    # Configure network adapter
+    $adapter = Get-NetworkAdapter -VM $vm
+    Set-NetworkAdapter -NetworkAdapter $adapter -Portgroup $portGroup -Confirm:$false
+    
+    # Tag the VM
+    $tag = {ps_lookup("Get-Tag", ids['tags'].get(vm.tag_name),
+                      f"Get-Tag -Name '{vm.tag_name}' -ErrorAction SilentlyContinue")}
+    if ($tag) {{
+        New-TagAssignment -Tag $tag -Entity $vm
+    }}
     
-    Connect-VCenterServer -Server $config.vcenter.server -Credential $cred
-    Set-HostSecurityConfiguration -Config $config
+    Write-Host "VM '{vm.name}' created successfully!" -ForegroundColor Green
     
-    Disconnect-VIServer -Server * -Force -Confirm:$false
+    # Optionally power on
+    if (${power_on}) {{
+        Start-VM -VM $vm -Confirm:$false
+        Write-Host "VM powered on." -ForegroundColor Green
+    }}
     """
     
-    result = run_powershell_command(ps_command)
+    result = run_vcenter_script(ps_command)
+    get_inventory_index().invalidate(("vm",) + PLACEMENT_KINDS if result.returncode == 0 else DEPLOY_KINDS + ("vm",))
     
     if result.returncode == 0:
-        print_success("Security settings applied successfully!")
+        print_success(f"VM '{vm.name}' deployed from template!")
     else:
-        print_error(f"Security configuration failed with exit code: {result.returncode}")
+        print_error(f"VM deployment failed with exit code: {result.returncode}")
     
-    input("\nPress Enter to continue...")
+    return result.returncode == 0
 
 
-def configure_all():
-    """Configure all infrastructure components."""
-    print_header("Configure All Infrastructure")
+def provision_standard_vm(vm: VMConfig, power_on: bool = False, policy: Optional[str] = None) -> bool:
+    """Create a new empty VM with the requested guest OS, size and tag."""
+    config = load_config()
+    ids = resolve_deploy_objects(tags=[vm.tag_name] if vm.tag_name else [])
+    plan = plan_vm_placement([vm], policy)
+    if plan and plan.unplaced:
+        print_error(f"Not enough free capacity in the cluster for '{vm.name}' "
+                    f"({vm.disk_gb} GB disk, {vm.memory_gb} GB memory).")
+        return False
+    placement = plan.placements[vm.name] if plan else None
     
-    print("This will configure:")
-    print("  • vSAN Storage")
-    print("  • Distributed Switch (VDS)")
-    print("  • vMotion Networking")
-    print("  • NTP, DNS, Syslog Services")
-    print("  • Security Settings")
-    print()
+    ps_command = f"""
+    # Get the cluster
+    $cluster = {ps_lookup("Get-Cluster", ids['cluster'], f"Get-Cluster -Name '{config['cluster']['name']}' -ErrorAction Stop")}
     
-    if not confirm_action("Proceed with full infrastructure configuration?"):
-        print_warning("Full configuration cancelled.")
-        return
+    # Get datastore (placed by capacity, else vSAN or most free)
+    $datastore = {ps_lookup("Get-Datastore", placement.datastore_id if placement else ids['datastore'],
+                            "Get-Datastore -Location $cluster | Where-Object { $_.Type -eq 'vsan' } | Select-Object -First 1")}
+    if (-not $datastore) {{
+        $datastore = Get-Datastore -Location $cluster | Sort-Object FreeSpaceGB -Descending | Select-Object -First 1
+    }}
+    
+    # Get port group for VM network
+    $portGroup = {ps_lookup("Get-VDPortgroup", ids['portgroup'],
+                            f"Get-VDPortgroup -Name '{VM_PORT_GROUP}' -ErrorAction SilentlyContinue")}
+    if (-not $portGroup) {{
+        $portGroup = Get-VirtualPortGroup | Where-Object {{ $_.Name -like '*VM*' }} | Select-Object -First 1
+    }}
+    
+    # Create new VM
+    Write-Host "Creating VM '{vm.name}'..."
+    $vm = New-VM -Name '{vm.name}' `
+        -ResourcePool $cluster `{ps_host_param(placement)}
+        -Datastore $datastore `
+        -NumCpu {vm.cpu} `
+        -MemoryGB {vm.memory_gb} `
+        -DiskGB {vm.disk_gb} `
+        -DiskStorageFormat Thin `
+        -GuestId '{vm.guest_id}' `
+        -NetworkName $portGroup.Name `
+        -ErrorAction Stop
+    
+    Write-Host "VM created successfully!" -ForegroundColor Green
+    
+    # Tag the VM
+    $tag = {ps_lookup("Get-Tag", ids['tags'].get(vm.tag_name),
+                      f"Get-Tag -Name '{vm.tag_name}' -ErrorAction SilentlyContinue")}
+    if ($tag) {{
+        New-TagAssignment -Tag $tag -Entity $vm
+        Write-Host "Tag assigned: {vm.tag_name}" -ForegroundColor Green
+    }} else {{
+        Write-Host "Note: Tag '{vm.tag_name}' not found, skipping tag assignment" -ForegroundColor Yellow
+    }}
+    
+    Write-Host ""
+    Write-Host "VM Summary:" -ForegroundColor Cyan
+    $vm | Select-Object Name, NumCpu, MemoryGB, @{{N='DiskGB';E={{($_ | Get-HardDisk | Measure-Object -Property CapacityGB -Sum).Sum}}}}, PowerState | Format-Table
+    
+    Write-Host "VM '{vm.name}' created successfully!" -ForegroundColor Green
+    
+    # Optionally power on
+    if (${power_on}) {{
+        Start-VM -VM $vm -Confirm:$false
+        Write-Host "VM powered on." -ForegroundColor Green
+    }}
+    """
     
-    script_path = SCRIPT_DIR / "Deploy-Infrastructure.ps1"
-    result = run_powershell(script_path, {
-        "ConfigPath": str(CONFIG_FILE),
-        "SkipVCSA": "$true"
-    })
+    result = run_vcenter_script(ps_command)
+    get_inventory_index().invalidate(("vm",) + PLACEMENT_KINDS if result.returncode == 0 else DEPLOY_KINDS + ("vm",))
     
     if result.returncode == 0:
-        print_success("Full infrastructure configuration completed!")
+        print_success(f"Standard VM '{vm.name}' created successfully!")
     else:
-        print_error(f"Configuration failed with exit code: {result.returncode}")
+        print_error(f"VM creation failed with exit code: {result.returncode}")
     
-    input("\nPress Enter to continue...")
-
+    return result.returncode == 0
 
-# =============================================================================
-# VM Deployment Functions
-# =============================================================================
 
-def deploy_vm_from_template():
+def deploy_vm_from_template() -> bool:
     """Deploy a VM from a template."""
     display_template_menu()
     
     choice = get_input("Select template").upper()
     
     if choice == 'B':
-        return
+        return False
     
     if choice not in VM_TEMPLATES:
         print_error("Invalid template selection.")
-        input("\nPress Enter to continue...")
-        return
+        pause()
+        return False
     
     template = VM_TEMPLATES[choice]
     
@@ -750,7 +5523,7 @@ def deploy_vm_from_template():
     vm_name = get_input("Enter VM Name (e.g., splunk-prod-01)")
     if not vm_name:
         print_error("VM name is required.")
-        return
+        return False
     
     # Select size
     print("\nAvailable Sizes:")
@@ -760,7 +5533,7 @@ def deploy_vm_from_template():
     vm_size = get_input("Enter Size", "Medium")
     if vm_size not in VM_SIZES:
         print_error("Invalid size selection.")
-        return
+        return False
     
     # Get network configuration
     ip_address = get_input("Enter IP Address (e.g., 192.168.1.100)")
@@ -783,81 +5556,28 @@ def deploy_vm_from_template():
     
     if not confirm_action("Deploy this VM?"):
         print_warning("VM deployment cancelled.")
-        return
-    
-    config = load_config()
-    
-    ps_command = f"""
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
-    
-    Connect-VIServer -Server '{config['vcenter']['server']}' -Credential $cred
-    
-    # Get the template
-    $template = Get-Template -Name '{template['template']}' -ErrorAction Stop
-    
-    # Get the cluster
-    $cluster = Get-Cluster -Name '{config['cluster']['name']}' -ErrorAction Stop
-    
-    # Get datastore (vSAN or first available)
-    $datastore = Get-Datastore -Location $cluster | Where-Object {{ $_.Type -eq 'vsan' }} | Select-Object -First 1
-    if (-not $datastore) {{
-        $datastore = Get-Datastore -Location $cluster | Select-Object -First 1
-    }}
-    
-    # Get port group for VM network
-    $portGroup = Get-VDPortgroup -Name 'PG-VMTraffic' -ErrorAction SilentlyContinue
-    if (-not $portGroup) {{
-        $portGroup = Get-VirtualPortGroup | Select-Object -First 1
-    }}
-    
-    # Create VM from template
-    Write-Host "Creating VM from template..."
-    $vm = New-VM -Name '{vm_name}' `
-        -Template $template `
-        -ResourcePool $cluster `
-        -Datastore $datastore `
-        -ErrorAction Stop
-    
-    # Configure VM resources
-    Write-Host "Configuring VM resources..."
-    Set-VM -VM $vm `
-        -NumCpu {size_specs['cpu']} `
-        -MemoryGB {size_specs['memory_gb']} `
-        -Confirm:$false
-    
-    # Configure network adapter
-    $adapter = Get-NetworkAdapter -VM $vm
-    Set-NetworkAdapter -NetworkAdapter $adapter -Portgroup $portGroup -Confirm:$false
-    
-    # Tag the VM
-    $tag = Get-Tag -Name '{tag_name}' -ErrorAction SilentlyContinue
-    if ($tag) {{
-        New-TagAssignment -Tag $tag -Entity $vm
-    }}
-    
-    Write-Host "VM '{vm_name}' created successfully!" -ForegroundColor Green
-    
-    # Optionally power on
-    $powerOn = Read-Host "Power on the VM? (y/n)"
-    if ($powerOn -eq 'y') {{
-        Start-VM -VM $vm -Confirm:$false
-        Write-Host "VM powered on." -ForegroundColor Green
-    }}
-    
-    Disconnect-VIServer -Server * -Force -Confirm:$false
-    """
-    
-    result = run_powershell_command(ps_command)
-    
-    if result.returncode == 0:
-        print_success(f"VM '{vm_name}' deployed from template!")
-    else:
-        print_error(f"VM deployment failed with exit code: {result.returncode}")
+        return False
+    
+    power_on = confirm_action("Power on the VM after deployment?")
+    
+    vm = VMConfig(
+        name=vm_name,
+        os_type=template['name'],
+        size=vm_size,
+        tag_name=tag_name,
+        ip_address=ip_address,
+        template=template['template'],
+        cpu=size_specs['cpu'],
+        memory_gb=size_specs['memory_gb'],
+        disk_gb=size_specs['disk_gb']
+    )
+    success = provision_template_vm(vm, power_on)
     
-    input("\nPress Enter to continue...")
+    pause()
+    return success
 
 
-def deploy_standard_vm():
+def deploy_standard_vm() -> bool:
     """Deploy a standard virtual machine."""
     print_header("Deploy Standard Virtual Machine")
     
@@ -865,7 +5585,7 @@ def deploy_standard_vm():
     vm_name = get_input("Enter VM Name (e.g., rhel-web-01)")
     if not vm_name:
         print_error("VM name is required.")
-        return
+        return False
     
     # Select OS type
     print("\nAvailable OS Types:")
@@ -875,7 +5595,7 @@ def deploy_standard_vm():
     os_choice = get_input("Select OS Type", "1")
     if os_choice not in OS_TYPES:
         print_error("Invalid OS type selection.")
-        return
+        return False
     
     os_type = OS_TYPES[os_choice]
     
@@ -884,156 +5604,505 @@ def deploy_standard_vm():
     for size, specs in VM_SIZES.items():
         print(f"  • {size}: {specs['cpu']} vCPU, {specs['memory_gb']} GB RAM, {specs['disk_gb']} GB Disk")
     
-    vm_size = get_input("Enter Size", "Small")
-    if vm_size not in VM_SIZES:
-        print_error("Invalid size selection.")
-        return
-    
-    # Get network configuration
-    ip_address = get_input("Enter IP Address (e.g., 192.168.1.100)")
-    
-    # Get tag
-    tag_name = get_input("Enter Tag Name (e.g., WebApp-Linux)")
-    
-    # Summary
-    size_specs = VM_SIZES[vm_size]
-    print()
-    print_header("VM Deployment Summary")
-    print(f"  VM Name:    {vm_name}")
-    print(f"  OS Type:    {os_type['name']} ({os_type['description']})")
-    print(f"  Size:       {vm_size}")
-    print(f"  vCPU:       {size_specs['cpu']}")
-    print(f"  Memory:     {size_specs['memory_gb']} GB")
-    print(f"  Disk:       {size_specs['disk_gb']} GB")
-    print(f"  IP Address: {ip_address}")
-    print(f"  Tag:        {tag_name}")
-    print()
-    
-    if not confirm_action("Create this VM?"):
-        print_warning("VM creation cancelled.")
-        return
-    
-    config = load_config()
-    
-    ps_command = f"""
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
-    
-    Connect-VIServer -Server '{config['vcenter']['server']}' -Credential $cred
-    
-    # Get the cluster
-    $cluster = Get-Cluster -Name '{config['cluster']['name']}' -ErrorAction Stop
-    
-    # Get datastore
-    $datastore = Get-Datastore -Location $cluster | Where-Object {{ $_.Type -eq 'vsan' }} | Select-Object -First 1
-    if (-not $datastore) {{
-        $datastore = Get-Datastore -Location $cluster | Sort-Object FreeSpaceGB -Descending | Select-Object -First 1
-    }}
-    
-    # Get port group for VM network
-    $portGroup = Get-VDPortgroup -Name 'PG-VMTraffic' -ErrorAction SilentlyContinue
-    if (-not $portGroup) {{
-        $portGroup = Get-VirtualPortGroup | Where-Object {{ $_.Name -like '*VM*' }} | Select-Object -First 1
-    }}
-    
-    # Create new VM
-    Write-Host "Creating VM '{vm_name}'..."
-    $vm = New-VM -Name '{vm_name}' `
-        -ResourcePool $cluster `
-        -Datastore $datastore `
-        -NumCpu {size_specs['cpu']} `
-        -MemoryGB {size_specs['memory_gb']} `
-        -DiskGB {size_specs['disk_gb']} `
-        -DiskStorageFormat Thin `
-        -GuestId '{os_type['guest_id']}' `
-        -NetworkName $portGroup.Name `
-        -ErrorAction Stop
-    
-    Write-Host "VM created successfully!" -ForegroundColor Green
-    
-    # Tag the VM
-    $tag = Get-Tag -Name '{tag_name}' -ErrorAction SilentlyContinue
-    if ($tag) {{
-        New-TagAssignment -Tag $tag -Entity $vm
-        Write-Host "Tag assigned: {tag_name}" -ForegroundColor Green
-    }} else {{
-        Write-Host "Note: Tag '{tag_name}' not found, skipping tag assignment" -ForegroundColor Yellow
-    }}
-    
-    Write-Host ""
-    Write-Host "VM Summary:" -ForegroundColor Cyan
-    $vm | Select-Object Name, NumCpu, MemoryGB, @{{N='DiskGB';E={{($_ | Get-HardDisk | Measure-Object -Property CapacityGB -Sum).Sum}}}}, PowerState | Format-Table
+    vm_size = get_input("Enter Size", "Small")
+    if vm_size not in VM_SIZES:
+        print_error("Invalid size selection.")
+        return False
     
-    # Optionally power on
-    $powerOn = Read-Host "Power on the VM? (y/n)"
-    if ($powerOn -eq 'y') {{
-        Start-VM -VM $vm -Confirm:$false
-        Write-Host "VM powered on." -ForegroundColor Green
-    }}
+    # Get network configuration
+    ip_address = get_input("Enter IP Address (e.g., 192.168.1.100)")
     
-    Disconnect-VIServer -Server * -Force -Confirm:$false
-    """
+    # Get tag
+    tag_name = get_input("Enter Tag Name (e.g., WebApp-Linux)")
     
-    result = run_powershell_command(ps_command)
+    # Summary
+    size_specs = VM_SIZES[vm_size]
+    print()
+    print_header("VM Deployment Summary")
+    print(f"  VM Name:    {vm_name}")
+    print(f"  OS Type:    {os_type['name']} ({os_type['description']})")
+    print(f"  Size:       {vm_size}")
+    print(f"  vCPU:       {size_specs['cpu']}")
+    print(f"  Memory:     {size_specs['memory_gb']} GB")
+    print(f"  Disk:       {size_specs['disk_gb']} GB")
+    print(f"  IP Address: {ip_address}")
+    print(f"  Tag:        {tag_name}")
+    print()
     
-    if result.returncode == 0:
-        print_success(f"Standard VM '{vm_name}' created successfully!")
-    else:
-        print_error(f"VM creation failed with exit code: {result.returncode}")
+    if not confirm_action("Create this VM?"):
+        print_warning("VM creation cancelled.")
+        return False
+    
+    power_on = confirm_action("Power on the VM after creation?")
+    
+    vm = VMConfig(
+        name=vm_name,
+        os_type=os_type['name'],
+        size=vm_size,
+        tag_name=tag_name,
+        ip_address=ip_address,
+        guest_id=os_type['guest_id'],
+        cpu=size_specs['cpu'],
+        memory_gb=size_specs['memory_gb'],
+        disk_gb=size_specs['disk_gb']
+    )
+    success = provision_standard_vm(vm, power_on)
     
-    input("\nPress Enter to continue...")
+    pause()
+    return success
+
+
+# =============================================================================
+# Bulk VM Provisioning
+# =============================================================================
+
+# Accepted manifest column names, mapped to their canonical field
+MANIFEST_ALIASES = {
+    "name": "name", "vmname": "name",
+    "template": "template",
+    "os": "os", "ostype": "os",
+    "size": "size",
+    "ip": "ip", "ipaddress": "ip",
+    "tag": "tag", "tagname": "tag",
+}
+
+
+def read_vm_manifest(path: Path) -> List[Dict[str, Any]]:
+    """Read VM rows from a CSV, JSON or YAML manifest."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".csv":
+        with open(path, newline='') as f:
+            return [dict(row) for row in csv.DictReader(f)]
+
+    if suffix == ".json":
+        with open(path, 'r') as f:
+            data = json.load(f)
+    elif suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML manifests require PyYAML (pip install pyyaml)")
+        with open(path, 'r') as f:
+            data = yaml.safe_load(f)
+    else:
+        raise ValueError(f"Unsupported manifest format '{suffix}' (use .csv, .json, .yaml)")
+
+    if isinstance(data, dict):
+        data = data.get("vms", [])
+    if not isinstance(data, list):
+        raise ValueError("Manifest must be a list of VMs or an object with a 'vms' list")
+    return data
+
+
+def validate_vm_manifest(rows: List[Dict[str, Any]]) -> Tuple[List[VMConfig], List[str]]:
+    """
+    Validate every manifest row up front.
+
+    Returns the VM configurations and a list of errors; the batch should only
+    run when the error list is empty.
+    """
+    vms: List[VMConfig] = []
+    errors: List[str] = []
+    seen = set()
+
+    for number, raw in enumerate(rows, start=1):
+        if not isinstance(raw, dict):
+            errors.append(f"Row {number}: expected an object")
+            continue
+        row: Dict[str, str] = {}
+        for key, value in raw.items():
+            field = MANIFEST_ALIASES.get(str(key).replace("_", "").lower(), key)
+            value = "" if value is None else str(value).strip()
+            # A blank alias column must not hide a filled one (CSV rows carry every column)
+            if value or field not in row:
+                row[field] = value
+        label = f"Row {number} ({row.get('name') or 'unnamed'})"
+        row_errors = []
+
+        name = row.get("name", "")
+        if not name:
+            row_errors.append("name is required")
+        elif name.lower() in seen:
+            row_errors.append("duplicate VM name")
+        seen.add(name.lower())
+
+        size = row.get("size") or "Medium"
+        if size not in VM_SIZES:
+            row_errors.append(f"unknown size '{size}'")
+
+        template = os_type = None
+        if row.get("template"):
+            template = find_choice(VM_TEMPLATES, row["template"], "name", "template")
+            if template is None:
+                row_errors.append(f"unknown template '{row['template']}'")
+        elif row.get("os"):
+            os_type = find_choice(OS_TYPES, row["os"], "name", "guest_id")
+            if os_type is None:
+                row_errors.append(f"unknown OS type '{row['os']}'")
+        else:
+            row_errors.append("either template or os is required")
+
+        ip = row.get("ip", "")
+        if ip:
+            try:
+                ipaddress.ip_address(ip)
+            except ValueError:
+                row_errors.append(f"invalid IP address '{ip}'")
+
+        if row_errors:
+            errors.append(f"{label}: {'; '.join(row_errors)}")
+            continue
+
+        size_specs = VM_SIZES[size]
+        vms.append(VMConfig(
+            name=name,
+            os_type=(template or os_type)['name'],
+            size=size,
+            tag_name=row.get("tag", ""),
+            ip_address=ip,
+            template=template['template'] if template else None,
+            guest_id=os_type['guest_id'] if os_type else None,
+            cpu=size_specs['cpu'],
+            memory_gb=size_specs['memory_gb'],
+            disk_gb=size_specs['disk_gb']
+        ))
+
+    return vms, errors
+
+
+def print_vm_batch_report(results: List[Dict[str, Any]]):
+    """Print the per-VM result table for a batch deployment."""
+    print()
+    print(f"{Colors.BOLD}VM Deployment Report:{Colors.ENDC}")
+    width = max([len(r['name']) for r in results] + [4])
+    print(f"  {'VM':<{width}}  {'Status':<8}  {'Stage':<9}  {'Time':>7}  Detail")
+    print(f"  {'-' * width}  {'-' * 8}  {'-' * 9}  {'-' * 7}  {'-' * 20}")
+    for r in results:
+        color = Colors.GREEN if r['status'] == "Success" else Colors.RED
+        print(f"  {r['name']:<{width}}  {color}{r['status']:<8}{Colors.ENDC}  {r.get('stage') or '':<9}  "
+              f"{float(r.get('seconds') or 0):>6.1f}s  {r.get('error') or ''}")
+
+    succeeded = sum(1 for r in results if r['status'] == "Success")
+    print()
+    print(f"  Successful: {Colors.GREEN}{succeeded}{Colors.ENDC}")
+    print(f"  Failed:     {Colors.RED}{len(results) - succeeded}{Colors.ENDC}")
+
+
+def deploy_vm_manifest(manifest: Path, power_on: bool = False, report_path: Optional[Path] = None,
+                       max_in_flight: Optional[int] = None, policy: Optional[str] = None,
+                       plan_only: bool = False) -> bool:
+    """
+    Validate a manifest, place its VMs on datastores and hosts by capacity
+    and deploy them in one pipelined batch. With ``plan_only`` the placement
+    plan is printed and nothing is deployed.
+    """
+    print_header("Deploy VMs from Manifest")
+
+    try:
+        rows = read_vm_manifest(manifest)
+    except (OSError, ValueError) as e:
+        print_error(f"Could not read manifest: {e}")
+        return False
+
+    vms, errors = validate_vm_manifest(rows)
+    if errors:
+        print_error(f"Manifest has {len(errors)} invalid row(s):")
+        for error in errors:
+            print(f"  • {error}")
+        return False
+    if not vms:
+        print_warning("Manifest contains no VMs.")
+        return False
+
+    config = load_infra_config()
+    in_flight = max_in_flight or config.clone_concurrency
+
+    print(f"Manifest:        {manifest}")
+    print(f"VMs:             {len(vms)}")
+    for size in VM_SIZES:
+        count = sum(1 for vm in vms if vm.size == size)
+        if count:
+            print(f"  • {size}: {count}")
+    print(f"Clones in flight: {in_flight}")
+    print(f"Power on:        {'Yes' if power_on else 'No'}")
+    print()
+
+    ids = resolve_deploy_objects(sorted({vm.template for vm in vms if vm.template}),
+                                 sorted({vm.tag_name for vm in vms if vm.tag_name}))
+    plan = plan_vm_placement(vms, policy)
+    if plan is None:
+        print_warning("No datastore capacity in the inventory index; every VM goes to one datastore.")
+    else:
+        print_placement_plan(plan)
+        if plan.unplaced:
+            return False
+    if plan_only:
+        return plan is not None
+
+    if not confirm_action(f"Deploy {len(vms)} VMs?"):
+        print_warning("VM deployment cancelled.")
+        return False
+
+    placements = plan.placements if plan else {}
+    batch = [{
+        "name": vm.name,
+        "template": vm.template,
+        "templateId": ids['templates'].get(vm.template),
+        "guestId": vm.guest_id,
+        "cpu": vm.cpu,
+        "memoryGb": vm.memory_gb,
+        "diskGb": vm.disk_gb,
+        "tag": vm.tag_name,
+        "tagId": ids['tags'].get(vm.tag_name),
+        "ip": vm.ip_address,
+        "datastoreId": placements[vm.name].datastore_id if vm.name in placements else None,
+        "hostId": placements[vm.name].host_id if vm.name in placements else None,
+    } for vm in vms]
+    resolved = "".join(f" -{param} {quote_ps(ids[key])}" for param, key in (
+        ("ClusterId", "cluster"), ("DatastoreId", "datastore"), ("PortGroupId", "portgroup")) if ids[key])
+
+    ps_command = f"""
+    $vms = {quote_ps(json.dumps(batch))} | ConvertFrom-Json
+    New-VMBatch -Config $config -VMs $vms -MaxInFlight {int(in_flight)} -PowerOn:${power_on}{resolved} | Out-Null
+    """
+
+    result = run_vcenter_script(ps_command, modules=["07-VirtualMachines.ps1"])
+    get_inventory_index().invalidate(("vm",) + PLACEMENT_KINDS if result.returncode == 0 else DEPLOY_KINDS + ("vm",))
+
+    reported = {r['name']: r for r in result.data if isinstance(r, dict) and 'name' in r}
+    results = [reported.get(vm.name) or {
+        "name": vm.name,
+        "status": "Failed",
+        "stage": "unknown",
+        "error": result.error or "No result reported",
+        "seconds": 0,
+    } for vm in vms]
+    for r in results:
+        if r['name'] in placements:
+            r.setdefault('datastore', placements[r['name']].datastore)
+            r.setdefault('host', placements[r['name']].host)
+
+    print_vm_batch_report(results)
+    record_site_result(vms=[{k: r.get(k) for k in ("name", "status", "stage", "error")} for r in results])
+
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print_info(f"Report written to: {report_path}")
+
+    return all(r['status'] == "Success" for r in results)
+
+
+def deploy_vms_from_manifest() -> bool:
+    """Deploy a batch of VMs from a manifest file (menu entry)."""
+    clear_screen()
+    manifest = get_input("Enter manifest path (.csv, .json, .yaml)")
+    if not manifest:
+        print_error("Manifest path is required.")
+        pause()
+        return False
+
+    power_on = confirm_action("Power on VMs after deployment?")
+    success = deploy_vm_manifest(Path(manifest), power_on)
+
+    pause()
+    return success
 
 
 # =============================================================================
 # Status and Configuration Management
 # =============================================================================
 
-def show_status():
+def summarize_inventory(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aggregate a raw inventory snapshot (from Get-InventorySnapshot) into the
+    status dashboard tables.
+
+    Object relationships arrive as MoRef IDs, so per-datacenter and
+    per-cluster counts are computed here instead of with a vCenter query for
+    every object.
+    """
+    parents: Dict[str, Optional[str]] = {}
+    for kind in ("folders", "datacenters", "computeResources", "clusters", "hosts"):
+        for item in snapshot.get(kind) or []:
+            parents[item['id']] = item.get('parent')
+
+    def ancestor(entity_id: Optional[str], prefix: str) -> Optional[str]:
+        seen = set()
+        while entity_id and entity_id not in seen:
+            if entity_id.startswith(prefix):
+                return entity_id
+            seen.add(entity_id)
+            entity_id = parents.get(entity_id)
+        return None
+
+    def count(values) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for value in values:
+            if value:
+                counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    hosts = snapshot.get('hosts') or []
+    vms = snapshot.get('vms') or []
+    clusters = snapshot.get('clusters') or []
+
+    host_cluster = {h['id']: ancestor(h.get('parent'), "ClusterComputeResource-") for h in hosts}
+    host_datacenter = {h['id']: ancestor(h.get('parent'), "Datacenter-") for h in hosts}
+
+    clusters_per_dc = count(ancestor(c.get('parent'), "Datacenter-") for c in clusters)
+    hosts_per_dc = count(host_datacenter.values())
+    hosts_per_cluster = count(host_cluster.values())
+    vms_per_dc = count(ancestor(vm.get('parent'), "Datacenter-") or host_datacenter.get(vm.get('host'))
+                       for vm in vms)
+    vms_per_cluster = count(host_cluster.get(vm.get('host')) for vm in vms)
+
+    def state(value: Optional[str]) -> str:
+        value = value or ""
+        return value[:1].upper() + value[1:]
+
+    def used_percent(ds: Dict[str, Any]) -> int:
+        capacity = ds.get('capacityBytes') or 0
+        if not capacity:
+            return 0
+        return round((1 - (ds.get('freeBytes') or 0) / capacity) * 100)
+
+    by_name = lambda item: (item.get('name') or "").lower()
+    gb = 1024 ** 3
+
+    return {
+        "vcenter": snapshot.get('vcenter') or {},
+        "datacenters": [{
+            "name": dc['name'],
+            "clusters": clusters_per_dc.get(dc['id'], 0),
+            "hosts": hosts_per_dc.get(dc['id'], 0),
+            "vms": vms_per_dc.get(dc['id'], 0),
+        } for dc in sorted(snapshot.get('datacenters') or [], key=by_name)],
+        "clusters": [{
+            "name": c['name'],
+            "haEnabled": bool(c.get('haEnabled')),
+            "drsEnabled": bool(c.get('drsEnabled')),
+            "hosts": hosts_per_cluster.get(c['id'], 0),
+            "vms": vms_per_cluster.get(c['id'], 0),
+        } for c in sorted(clusters, key=by_name)],
+        "hosts": [{
+            "name": h['name'],
+            "connectionState": "Maintenance" if h.get('inMaintenanceMode') and h.get('connectionState') == "connected"
+                               else state(h.get('connectionState')),
+            "powerState": state(h.get('powerState')),
+            "version": h.get('version'),
+            "cpuGhz": round((h.get('cpuMhz') or 0) / 1000, 1),
+            "memoryGb": round((h.get('memoryBytes') or 0) / gb),
+        } for h in sorted(hosts, key=by_name)],
+        "datastores": [{
+            "name": ds['name'],
+            "type": ds.get('type'),
+            "capacityGb": round((ds.get('capacityBytes') or 0) / gb),
+            "freeGb": round((ds.get('freeBytes') or 0) / gb),
+            "usedPercent": used_percent(ds),
+        } for ds in sorted(snapshot.get('datastores') or [], key=by_name)],
+        "vds": [{
+            "name": vds['name'],
+            "version": vds.get('version'),
+            "mtu": vds.get('mtu'),
+            "hosts": vds.get('hosts', 0),
+            "portGroups": vds.get('portGroups', 0),
+        } for vds in sorted(snapshot.get('vds') or [], key=by_name)],
+    }
+
+
+def print_table(rows: List[Dict[str, Any]], columns: Sequence[Tuple[str, str]]):
+    """Print rows as a table in the same layout as PowerShell's Format-Table."""
+    if not rows:
+        return
+
+    def text(value: Any) -> str:
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return "" if value is None else str(value)
+
+    numeric = [all(isinstance(row.get(key), (int, float)) and not isinstance(row.get(key), bool) for row in rows)
+               for _, key in columns]
+    cells = [[text(row.get(key)) for _, key in columns] for row in rows]
+    widths = [max([len(header)] + [len(r[i]) for r in cells]) for i, (header, _) in enumerate(columns)]
+
+    def line(values: Sequence[str]) -> str:
+        return " ".join(v.rjust(w) if num else v.ljust(w)
+                        for v, w, num in zip(values, widths, numeric)).rstrip()
+
+    print()
+    print(line([header for header, _ in columns]))
+    print(line(["-" * len(header) for header, _ in columns]))
+    for r in cells:
+        print(line(r))
+    print()
+
+
+def show_status(refresh: bool = False) -> bool:
     """Show current infrastructure status."""
     print_header("Infrastructure Status")
     
-    config = load_config()
+    load_config()
+    status = collect_status(refresh)
     
-    ps_command = f"""
-    $config = Get-Content '{CONFIG_FILE}' -Raw | ConvertFrom-Json
-    $cred = Get-Credential -Message "Enter vCenter Administrator Credentials"
+    if status is None:
+        pause()
+        return False
     
-    try {{
-        Connect-VIServer -Server $config.vcenter.server -Credential $cred -ErrorAction Stop
-        
-        Write-Host ""
-        Write-Host "=== vCenter Connection ===" -ForegroundColor Cyan
-        Write-Host "Server:  $($global:DefaultVIServer.Name)"
-        Write-Host "Version: $($global:DefaultVIServer.Version)"
-        
-        Write-Host ""
-        Write-Host "=== Datacenter ===" -ForegroundColor Cyan
-        Get-Datacenter | Format-Table Name, @{{N='Clusters';E={{($_ | Get-Cluster).Count}}}}, @{{N='Hosts';E={{($_ | Get-VMHost).Count}}}}, @{{N='VMs';E={{($_ | Get-VM).Count}}}}
-        
-        Write-Host "=== Clusters ===" -ForegroundColor Cyan
-        Get-Cluster | Format-Table Name, HAEnabled, DrsEnabled, @{{N='Hosts';E={{($_ | Get-VMHost).Count}}}}, @{{N='VMs';E={{($_ | Get-VM).Count}}}}
-        
-        Write-Host "=== ESXi Hosts ===" -ForegroundColor Cyan
-        Get-VMHost | Format-Table Name, ConnectionState, PowerState, Version, @{{N='CPU(GHz)';E={{[math]::Round($_.CpuTotalMhz/1000,1)}}}}, @{{N='Mem(GB)';E={{[math]::Round($_.MemoryTotalGB,0)}}}}
-        
-        Write-Host "=== Datastores ===" -ForegroundColor Cyan
-        Get-Datastore | Format-Table Name, Type, @{{N='Capacity(GB)';E={{[math]::Round($_.CapacityGB,0)}}}}, @{{N='Free(GB)';E={{[math]::Round($_.FreeSpaceGB,0)}}}}, @{{N='Used%';E={{[math]::Round((1-($_.FreeSpaceGB/$_.CapacityGB))*100,0)}}}}
-        
-        Write-Host "=== VDS ===" -ForegroundColor Cyan
-        Get-VDSwitch | Format-Table Name, Version, Mtu, @{{N='Hosts';E={{($_ | Get-VMHost).Count}}}}, @{{N='PortGroups';E={{($_ | Get-VDPortgroup).Count}}}}
-        
-        Disconnect-VIServer -Server * -Force -Confirm:$false
-    }}
-    catch {{
-        Write-Host "Error: $($_.Exception.Message)" -ForegroundColor Red
-    }}
-    """
+    vcenter = status['vcenter']
+    print()
+    print(f"{Colors.CYAN}=== vCenter Connection ==={Colors.ENDC}")
+    print(f"Server:  {vcenter.get('server')}")
+    print(f"Version: {vcenter.get('version')}")
+    oldest = max(get_inventory_index().age(kind) or 0.0 for kind in STATUS_KINDS)
+    print(f"Data:    inventory index, up to {oldest:.0f}s old")
+    
+    print()
+    print(f"{Colors.CYAN}=== Datacenter ==={Colors.ENDC}")
+    print_table(status['datacenters'], [("Name", "name"), ("Clusters", "clusters"), ("Hosts", "hosts"), ("VMs", "vms")])
+    
+    print(f"{Colors.CYAN}=== Clusters ==={Colors.ENDC}")
+    print_table(status['clusters'], [("Name", "name"), ("HAEnabled", "haEnabled"), ("DrsEnabled", "drsEnabled"),
+                                     ("Hosts", "hosts"), ("VMs", "vms")])
+    
+    print(f"{Colors.CYAN}=== ESXi Hosts ==={Colors.ENDC}")
+    print_table(status['hosts'], [("Name", "name"), ("ConnectionState", "connectionState"), ("PowerState", "powerState"),
+                                  ("Version", "version"), ("CPU(GHz)", "cpuGhz"), ("Mem(GB)", "memoryGb")])
+    
+    print(f"{Colors.CYAN}=== Datastores ==={Colors.ENDC}")
+    print_table(status['datastores'], [("Name", "name"), ("Type", "type"), ("Capacity(GB)", "capacityGb"),
+                                       ("Free(GB)", "freeGb"), ("Used%", "usedPercent")])
+    
+    print(f"{Colors.CYAN}=== VDS ==={Colors.ENDC}")
+    print_table(status['vds'], [("Name", "name"), ("Version", "version"), ("Mtu", "mtu"),
+                                ("Hosts", "hosts"), ("PortGroups", "portGroups")])
     
-    result = run_powershell_command(ps_command)
+    pause()
+    return True
+
+
+def collect_status(refresh: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Collect the status dashboard data as a dictionary (also used by
+    ``status --json``).
     
-    input("\nPress Enter to continue...")
+    Served from the inventory index: only kinds older than their TTL (all of
+    them with ``refresh``) are re-read, in a single worker request with a
+    fixed number of bulk Get-View calls.
+    """
+    index = get_inventory_index()
+    snapshot = index.snapshot(force=refresh)
+    if any(index.age(kind) is None for kind in STATUS_KINDS):
+        print_error("Could not collect inventory: vCenter has not been indexed yet")
+        return None
+    status = summarize_inventory(snapshot)
+    record_site_result(status=status)
+    return status
 
 
-def view_configuration():
+def view_configuration() -> bool:
     """View current configuration."""
     print_header("Current Configuration")
     
@@ -1041,17 +6110,20 @@ def view_configuration():
     
     print(json.dumps(config, indent=2))
     
-    input("\nPress Enter to continue...")
+    pause()
+    return True
 
 
-def reload_configuration():
+def reload_configuration() -> bool:
     """Reload configuration from file."""
     print_info("Reloading configuration...")
+    _config_store.invalidate()
     config = load_config()
     print_success("Configuration reloaded successfully!")
     print(f"  Environment: {config['environment']['name']}")
     print(f"  vCenter:     {config['vcenter']['server']}")
-    input("\nPress Enter to continue...")
+    pause()
+    return True
 
 
 # =============================================================================
@@ -1076,6 +6148,10 @@ def handle_configure_menu():
             configure_security()
         elif choice == '6':
             configure_all()
+        elif choice == '7':
+            plan_configuration()
+        elif choice == '8':
+            check_drift()
         elif choice == 'B':
             break
         else:
@@ -1093,6 +6169,8 @@ def handle_vm_menu():
             deploy_vm_from_template()
         elif choice == '2':
             deploy_standard_vm()
+        elif choice == '3':
+            deploy_vms_from_manifest()
         elif choice == 'B':
             break
         else:
@@ -1121,8 +6199,573 @@ def handle_config_management_menu():
             input("\nPress Enter to continue...")
 
 
+# =============================================================================
+# Multi-Site Fan-Out
+# =============================================================================
+
+# File a fleet child writes its site report to (set by run_fleet)
+SITE_REPORT_ENV = "ECST_SITE_REPORT"
+
+# Sites run at the same time unless the registry or --max-sites says otherwise
+DEFAULT_SITE_CONCURRENCY = 4
+
+# Credential variables a site can override with a _<SITE> suffix
+CREDENTIAL_ENV = ("ECST_VCENTER_USER", "ECST_VCENTER_PASSWORD", "ECST_ESXI_USER", "ECST_ESXI_PASSWORD")
+
+_site_report: Dict[str, Any] = {}
+
+
+def record_site_result(**fields: Any):
+    """
+    Add fields to the report this run hands back to ``fleet``.
+
+    List values accumulate across calls, so every host summary of a
+    ``configure all`` ends up in the report. Does nothing outside a fleet run.
+    """
+    if not os.environ.get(SITE_REPORT_ENV):
+        return
+    for key, value in fields.items():
+        if isinstance(value, list):
+            _site_report.setdefault(key, []).extend(value)
+        else:
+            _site_report[key] = value
+
+
+def write_site_report(exit_code: int):
+    """Write the recorded site results for the parent fleet run, if there is one."""
+    path = os.environ.get(SITE_REPORT_ENV)
+    if path:
+        _write_atomic(Path(path), json.dumps(dict(_site_report, exitCode=exit_code), default=str))
+
+
+@dataclass
+class Site:
+    """One environment in a site registry."""
+    name: str
+    config_path: Path
+    vcenter_server: str
+    environment_name: str
+
+
+@dataclass
+class SiteRegistry:
+    """The sites fleet can run against and how many may run at once."""
+    sites: List[Site]
+    max_concurrent: int = DEFAULT_SITE_CONCURRENCY
+
+
+def _merge_config(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """Deep-merge ``override`` onto ``base``; lists and scalars replace, objects merge."""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _materialize_site(path: Path, config: Dict[str, Any]):
+    """Write a registry environment as a standalone config file, leaving it untouched if unchanged."""
+    text = json.dumps(config, indent=2) + "\n"
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return
+    except OSError:
+        pass
+    _write_atomic(path, text)
+
+
+def load_site_registry(path: Path) -> SiteRegistry:
+    """
+    Load a site registry.
+
+    ``path`` is either a directory, where every ``*.json`` config file is a
+    site named after the file, or a single file with an ``environments``
+    object (name -> config) or list (named by ``environment.name``). Each
+    environment is merged over the file's optional ``defaults`` and written
+    to ``<registry>.sites/<name>.json``, so every site keeps its own deploy
+    journal and inventory index next to a stable config path.
+
+    Every site config is validated up front; problems raise ConfigError.
+    """
+    path = Path(path).resolve()
+    configs: List[Tuple[str, Path, Dict[str, Any]]] = []
+    max_concurrent = DEFAULT_SITE_CONCURRENCY
+
+    if path.is_dir():
+        for config_path in sorted(path.glob("*.json")):
+            with open(config_path, encoding="utf-8") as f:
+                data = json.load(f)
+            # Reports and other JSON files can live next to the configs
+            if isinstance(data, dict) and "vcenter" in data:
+                configs.append((config_path.stem, config_path, data))
+    else:
+        with open(path, encoding="utf-8") as f:
+            registry = json.load(f)
+        if not isinstance(registry, dict) or not isinstance(registry.get("environments"), (dict, list)):
+            raise ConfigError(f"{path.name}: expected an 'environments' object or list")
+        defaults = registry.get("defaults")
+        if defaults is None:
+            defaults = {}
+        elif not isinstance(defaults, dict):
+            raise ConfigError(f"{path.name}: 'defaults' should be an object")
+        max_concurrent = registry.get("maxConcurrentSites", DEFAULT_SITE_CONCURRENCY)
+        if not isinstance(max_concurrent, int) or max_concurrent < 1:
+            raise ConfigError(f"{path.name}: 'maxConcurrentSites' must be at least 1")
+
+        environments = registry["environments"]
+        if isinstance(environments, list):
+            entries = [((env.get("environment") or {}).get("name") if isinstance(env, dict) else None, env)
+                       for env in environments]
+        else:
+            entries = list(environments.items())
+        site_dir = path.with_name(f"{path.stem}.sites")
+        for index, (name, override) in enumerate(entries):
+            if not name or not isinstance(override, dict):
+                raise ConfigError(f"{path.name}: environments[{index}] needs a name and a config object")
+            configs.append((str(name), site_dir / f"{name}.json", _merge_config(defaults, override)))
+
+    sites: List[Site] = []
+    errors: List[str] = []
+    seen: Set[str] = set()
+    for name, config_path, data in configs:
+        if name.lower() in seen:
+            errors.append(f"duplicate site '{name}'")
+            continue
+        seen.add(name.lower())
+        try:
+            config = parse_config(data)
+        except ConfigError as e:
+            errors.append(f"{name}: {e}")
+            continue
+        sites.append(Site(name, config_path, config.vcenter_server, config.environment_name))
+    if errors:
+        raise ConfigError("; ".join(errors))
+    if not sites:
+        raise ConfigError(f"no site configs found in {path}")
+
+    if not path.is_dir():
+        for name, config_path, data in configs:
+            _materialize_site(config_path, data)
+    return SiteRegistry(sites, max_concurrent)
+
+
+def select_sites(sites: Sequence[Site], patterns: Sequence[str]) -> List[Site]:
+    """Sites whose name matches any of the glob ``patterns`` (all sites when there are none)."""
+    if not patterns:
+        return list(sites)
+    unmatched = [p for p in patterns if not any(fnmatch.fnmatch(s.name.lower(), p.lower()) for s in sites)]
+    if unmatched:
+        raise ConfigError(f"no site matches: {', '.join(unmatched)}")
+    return [s for s in sites if any(fnmatch.fnmatch(s.name.lower(), p.lower()) for p in patterns)]
+
+
+def site_environment(site: Site, report_path: Path) -> Dict[str, str]:
+    """
+    Environment for a site's child run: the shared credentials, overridden
+    by any ``ECST_VCENTER_PASSWORD_<SITE>`` style variables for this site.
+    """
+    suffix = "".join(c if c.isalnum() else "_" for c in site.name).upper()
+    env = dict(os.environ)
+    for var in CREDENTIAL_ENV:
+        if os.environ.get(f"{var}_{suffix}"):
+            env[var] = os.environ[f"{var}_{suffix}"]
+    env[SITE_REPORT_ENV] = str(report_path)
+    return env
+
+
+def _site_summary(site: Site, job: SubprocessJobResult, report: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a site's process outcome with the results its run recorded."""
+    row: Dict[str, Any] = {
+        "site": site.name,
+        "vcenter": site.vcenter_server,
+        "success": job.success,
+        "exitCode": job.returncode,
+        "seconds": round(job.duration, 1),
+        "timedOut": job.timed_out,
+    }
+    row.update((k, v) for k, v in report.items() if k != "exitCode")
+
+    # A host counts as failed if any summary in the run failed it
+    hosts: Dict[str, Dict[str, Any]] = {}
+    for entry in report.get("hosts") or []:
+        current = hosts.setdefault(entry["host"].lower(), entry)
+        if current is not entry and not entry["success"]:
+            hosts[entry["host"].lower()] = entry
+    failed_hosts = [h for h in hosts.values() if not h["success"]]
+    vms = report.get("vms") or []
+    failed_vms = [vm for vm in vms if vm.get("status") != "Success"]
+
+    row["hostsOk"] = f"{len(hosts) - len(failed_hosts)}/{len(hosts)}" if hosts else ""
+    row["vmsOk"] = f"{len(vms) - len(failed_vms)}/{len(vms)}" if vms else ""
+    if job.timed_out:
+        row["detail"] = "timed out"
+    elif failed_hosts:
+        row["detail"] = f"{failed_hosts[0]['host']}: {failed_hosts[0].get('error') or 'failed'}"
+    elif failed_vms:
+        row["detail"] = f"{failed_vms[0]['name']}: {failed_vms[0].get('error') or 'failed'}"
+    elif "drift" in report:
+        differing = report["drift"]
+        row["detail"] = (f"{len(differing)} of {report.get('hostsScanned', 0)} hosts differ" if differing
+                         else "no drift")
+    elif not job.success:
+        errors = [line for line in job.output if "[ERROR]" in line]
+        row["detail"] = (errors or job.output or [f"exit code {job.returncode}"])[-1].replace("[ERROR] ", "")
+    elif "status" in report:
+        status = report["status"]
+        row["detail"] = (f"{len(status.get('hosts') or [])} hosts, "
+                         f"{sum(dc.get('vms') or 0 for dc in status.get('datacenters') or [])} VMs")
+    else:
+        row["detail"] = ""
+    return row
+
+
+def print_fleet_report(rows: List[Dict[str, Any]]):
+    """Print the merged per-site table for a fleet run."""
+    print()
+    print(f"{Colors.BOLD}Fleet Report:{Colors.ENDC}")
+    table = [dict(row, result="OK" if row["success"] else "FAILED", time=f"{row['seconds']:.1f}s")
+             for row in rows]
+    print_table(table, [("Site", "site"), ("vCenter", "vcenter"), ("Result", "result"), ("Time", "time"),
+                        ("Hosts", "hostsOk"), ("VMs", "vmsOk"), ("Detail", "detail")])
+    failed = sum(1 for row in rows if not row["success"])
+    print(f"  Successful: {Colors.GREEN}{len(rows) - failed}{Colors.ENDC}")
+    print(f"  Failed:     {Colors.RED}{failed}{Colors.ENDC}")
+
+
+def run_fleet(registry_path: Path, operation: Sequence[str], patterns: Sequence[str] = (),
+              max_sites: Optional[int] = None, timeout_minutes: Optional[float] = None,
+              report_path: Optional[Path] = None, list_only: bool = False) -> bool:
+    """
+    Run one CLI operation (``status``, ``configure services``, ...) against
+    every selected site of a registry, a bounded number of sites at a time.
+
+    Each site runs as its own ``ecst-vmware.py --config <site>`` process
+    with its own worker pool, so a site's host parallelism still comes from
+    its config. Output lines are tagged with the site name, and the results
+    every site records are merged into one report.
+    """
+    print_header(f"Fleet: {' '.join(operation) or 'list'}")
+    try:
+        registry = load_site_registry(registry_path)
+        sites = select_sites(registry.sites, patterns)
+    except (OSError, json.JSONDecodeError, ConfigError) as e:
+        print_error(f"Invalid site registry: {e}")
+        return False
+
+    concurrent = max_sites or registry.max_concurrent
+    print(f"Registry: {registry_path}")
+    print(f"Sites:    {len(sites)} of {len(registry.sites)}, {min(concurrent, len(sites))} at a time")
+    print()
+    if list_only:
+        print_table([dict(s.__dict__, config_path=str(s.config_path)) for s in sites],
+                    [("Site", "name"), ("Environment", "environment_name"), ("vCenter", "vcenter_server"),
+                     ("Config", "config_path")])
+        return True
+
+    tool = str(Path(__file__).resolve())
+    with tempfile.TemporaryDirectory(prefix="ecst-fleet-") as tmp:
+        envs = [site_environment(site, Path(tmp) / f"{index}.json") for index, site in enumerate(sites)]
+
+        # Ask for a shared vCenter login once instead of in every child
+        if any(not (env.get("ECST_VCENTER_USER") and env.get("ECST_VCENTER_PASSWORD")) for env in envs):
+            try:
+                username, password = get_vcenter_credentials()
+            except WorkerError as e:
+                print_error(str(e))
+                return False
+            for env in envs:
+                if not (env.get("ECST_VCENTER_USER") and env.get("ECST_VCENTER_PASSWORD")):
+                    env["ECST_VCENTER_USER"], env["ECST_VCENTER_PASSWORD"] = username, password
+
+        jobs = [SubprocessJob(
+            name=site.name,
+            command=[sys.executable, tool, "--config", str(site.config_path), "--no-color", *operation],
+            timeout=timeout_minutes * 60 if timeout_minutes else None,
+            env=env,
+            cwd=Path.cwd()
+        ) for site, env in zip(sites, envs)]
+        results = run_subprocess_jobs(jobs, concurrent, tag_output=True)
+
+        rows = []
+        for index, (site, job) in enumerate(zip(sites, results)):
+            try:
+                with open(Path(tmp) / f"{index}.json", encoding="utf-8") as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                report = {}
+            rows.append(_site_summary(site, job, report))
+
+    print_fleet_report(rows)
+    if report_path:
+        _write_atomic(report_path, json.dumps({"operation": list(operation), "sites": rows}, indent=2))
+        print_info(f"Report written to: {report_path}")
+    return all(row["success"] for row in rows)
+
+
+# =============================================================================
+# Command Line Interface
+# =============================================================================
+
+DEPLOY_ACTIONS: Dict[str, Callable[[], bool]] = {
+    "vcenter": deploy_vcenter,
+    "infra": deploy_infrastructure,
+    "datacenter": deploy_datacenter,
+    "cluster": deploy_cluster,
+}
+
+CONFIGURE_ACTIONS: Dict[str, Callable[[], bool]] = {
+    "vsan": configure_vsan,
+    "vds": configure_vds,
+    "vmotion": configure_vmotion,
+    "services": configure_services,
+    "security": configure_security,
+    "all": configure_all,
+    "plan": plan_configuration,
+}
+
+
+def find_choice(options: Dict[str, Dict[str, str]], value: str, *fields: str) -> Optional[Dict[str, str]]:
+    """Find a menu entry by its key or by any of the given fields (case-insensitive)."""
+    if value in options:
+        return options[value]
+    for option in options.values():
+        if any(option.get(f, "").lower() == value.lower() for f in fields):
+            return option
+    return None
+
+
+def build_vm_config(args: argparse.Namespace) -> VMConfig:
+    """Build a VMConfig from ``vm deploy`` arguments."""
+    size_specs = VM_SIZES[args.size]
+    if args.template:
+        template = find_choice(VM_TEMPLATES, args.template, "name", "template")
+        if template is None:
+            raise ValueError(f"Unknown template: {args.template}")
+        os_name, template_name, guest_id = template['name'], template['template'], None
+    else:
+        os_type = find_choice(OS_TYPES, args.os, "name", "guest_id")
+        if os_type is None:
+            raise ValueError(f"Unknown OS type: {args.os}")
+        os_name, template_name, guest_id = os_type['name'], None, os_type['guest_id']
+
+    return VMConfig(
+        name=args.name,
+        os_type=os_name,
+        size=args.size,
+        tag_name=args.tag,
+        ip_address=args.ip,
+        template=template_name,
+        guest_id=guest_id,
+        cpu=size_specs['cpu'],
+        memory_gb=size_specs['memory_gb'],
+        disk_gb=size_specs['disk_gb']
+    )
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Build the parser for the non-interactive subcommand interface."""
+    parser = argparse.ArgumentParser(
+        prog="ecst-vmware",
+        description="ECST VMware Automation Tool. Run without arguments for the interactive menu."
+    )
+    parser.add_argument("--config", type=Path, default=CONFIG_FILE,
+                        help="path to the configuration file (default: %(default)s)")
+    parser.add_argument("--no-color", action="store_true", help="disable colored output")
+    parser.add_argument("--trace", type=Path, default=os.environ.get(TRACE_FILE_ENV), metavar="FILE",
+                        help=f"write a Chrome trace of the run to FILE (env: {TRACE_FILE_ENV})")
+    parser.add_argument("--metrics", type=Path, default=os.environ.get(METRICS_FILE_ENV), metavar="FILE",
+                        help=f"write a Prometheus textfile summary of the run to FILE (env: {METRICS_FILE_ENV})")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+    deploy = commands.add_parser("deploy", help="deploy vCenter or infrastructure components")
+    deploy.add_argument("target", choices=list(DEPLOY_ACTIONS))
+    deploy.add_argument("--skip", action="append", choices=STEP_GROUPS, default=[],
+                        help="infra: skip a group of steps (repeatable)")
+    deploy.add_argument("--only", action="append", default=[], metavar="TASK",
+                        help="infra: run only this task and its dependencies (repeatable)")
+    deploy.add_argument("--max-parallel", type=int, help="infra: steps run at the same time")
+    deploy.add_argument("--plan", action="store_true", help="infra: print the task graph and exit")
+    deploy.add_argument("--resume", action="store_true",
+                        help="infra: skip work the deployment journal records as done for this config")
+
+    configure = commands.add_parser("configure", help="configure infrastructure components")
+    configure.add_argument("target", choices=list(CONFIGURE_ACTIONS))
+    configure.add_argument("--plan", action="store_true", help="vsan: print the disk group plan and exit")
+
+    vm = commands.add_parser("vm", help="virtual machine operations")
+    vm_commands = vm.add_subparsers(dest="vm_command", metavar="COMMAND", required=True)
+    vm_deploy = vm_commands.add_parser("deploy", help="deploy a virtual machine")
+    source = vm_deploy.add_mutually_exclusive_group(required=True)
+    source.add_argument("--template", help="template key, name or template name (e.g. 1, Splunk)")
+    source.add_argument("--os", help="OS type for a standard VM (e.g. RHEL, Ubuntu)")
+    source.add_argument("--manifest", type=Path, help="deploy every VM in a CSV/JSON/YAML manifest")
+    vm_deploy.add_argument("--name", help="VM name (required with --template/--os)")
+    vm_deploy.add_argument("--size", choices=list(VM_SIZES), default="Medium", help="VM size (default: %(default)s)")
+    vm_deploy.add_argument("--ip", default="", help="IP address")
+    vm_deploy.add_argument("--tag", default="", help="tag to assign")
+    vm_deploy.add_argument("--power-on", action="store_true", help="power on after deployment")
+    vm_deploy.add_argument("--report", type=Path, help="write the per-VM result report as JSON (with --manifest)")
+    vm_deploy.add_argument("--max-in-flight", type=int, help="clone tasks in flight (with --manifest)")
+    vm_deploy.add_argument("--placement", choices=list(PLACEMENT_POLICIES),
+                           help="datastore/host scoring policy (default: automation.placementPolicy)")
+    vm_deploy.add_argument("--plan", action="store_true",
+                           help="print the placement plan and exit (with --manifest)")
+
+    plan = commands.add_parser("plan", help="show what configure would change")
+    plan.add_argument("--json", action="store_true", help="print the change set as JSON on stdout")
+
+    drift = commands.add_parser("drift", help="report hosts whose settings differ from the configuration")
+    drift.add_argument("--json", action="store_true", help="print the differing hosts as JSON on stdout")
+    drift.add_argument("--refresh", action="store_true", help="ignore fingerprints cached by the last scan")
+
+    apply = commands.add_parser("apply", help="apply only the changes reported by plan")
+    apply.add_argument("--max-parallel", type=int, help="tasks run at the same time")
+
+    status = commands.add_parser("status", help="show infrastructure status")
+    status.add_argument("--json", action="store_true", help="print status as JSON on stdout")
+    status.add_argument("--refresh", action="store_true", help="re-read everything from vCenter instead of the index")
+
+    wait = commands.add_parser("wait", help="wait until a newly deployed vCenter is ready")
+    wait.add_argument("--timeout", type=float, default=60, metavar="MINUTES",
+                      help="give up after MINUTES (default: %(default)s)")
+    wait.add_argument("--base-url", help="probe this URL instead of https://<vcenter.server> (e.g. a local stub)")
+    wait.add_argument("--json", action="store_true", help="print the readiness phases as JSON on stdout")
+
+    config = commands.add_parser("config", help="show or validate the configuration")
+    config.add_argument("action", choices=["show", "validate", "expand"])
+
+    fleet = commands.add_parser("fleet", help="run one operation against many vCenters at once")
+    fleet.add_argument("--registry", type=Path, required=True,
+                       help="directory of site config files, or a file with an 'environments' section")
+    fleet.add_argument("--site", action="append", default=[], metavar="PATTERN",
+                       help="run only sites whose name matches PATTERN (glob, repeatable)")
+    fleet.add_argument("--max-sites", type=int,
+                       help=f"sites run at the same time (default: maxConcurrentSites or {DEFAULT_SITE_CONCURRENCY})")
+    fleet.add_argument("--timeout", type=float, metavar="MINUTES", help="stop a site that runs longer than MINUTES")
+    fleet.add_argument("--report", type=Path, help="write the merged per-site report as JSON")
+    fleet.add_argument("--list", action="store_true", help="list the selected sites and exit")
+    fleet.add_argument("operation", nargs=argparse.REMAINDER,
+                       help="command to run on every site, e.g. status or configure services")
+
+    return parser
+
+
+def run_cli(argv: List[str]) -> int:
+    """Run a single subcommand without menus or prompts and return an exit code."""
+    global NON_INTERACTIVE
+    args = build_arg_parser().parse_args(argv)
+
+    NON_INTERACTIVE = True
+    if args.no_color or not sys.stdout.isatty():
+        Colors.disable()
+
+    set_config_file(args.config)
+    if args.command == "fleet":
+        operation = args.operation[1:] if args.operation[:1] == ["--"] else args.operation
+        if not args.list:
+            if not operation or operation[0] in ("fleet", "-h", "--help") or operation[0].startswith("-"):
+                print_error("fleet needs a command to run, e.g. 'fleet --registry sites status'")
+                return EXIT_USAGE
+            # Reject bad site commands here rather than once per site
+            build_arg_parser().parse_args(operation)
+    else:
+        load_infra_config()
+
+    enable_tracing(args.trace, args.metrics)
+    action = " ".join(str(part) for part in (
+        args.command, getattr(args, "target", None), getattr(args, "vm_command", None),
+        getattr(args, "action", None)) if part)
+
+    try:
+        with trace_span(action, "action") as span:
+            if args.command == "deploy" and args.target == "infra":
+                success = deploy_infrastructure(args.skip, args.only, args.max_parallel, args.plan, args.resume)
+            elif args.command == "deploy":
+                success = DEPLOY_ACTIONS[args.target]()
+            elif args.command == "configure":
+                success = configure_vsan(args.plan) if args.target == "vsan" else CONFIGURE_ACTIONS[args.target]()
+            elif args.command == "vm" and args.manifest:
+                success = deploy_vm_manifest(args.manifest, args.power_on, args.report, args.max_in_flight,
+                                             args.placement, args.plan)
+            elif args.command == "vm":
+                if not args.name:
+                    print_error("--name is required with --template/--os")
+                    return EXIT_USAGE
+                try:
+                    vm = build_vm_config(args)
+                except ValueError as e:
+                    print_error(str(e))
+                    return EXIT_USAGE
+                if vm.template:
+                    success = provision_template_vm(vm, args.power_on, args.placement)
+                else:
+                    success = provision_standard_vm(vm, args.power_on, args.placement)
+            elif args.command == "plan" and args.json:
+                with redirect_stdout(sys.stderr):
+                    state = read_configuration_state()
+                if state is not None:
+                    changes = plan_changes(load_infra_config(), state)
+                    print(json.dumps([dict(c.__dict__, action=c.action) for c in changes], indent=2))
+                success = state is not None
+            elif args.command == "plan":
+                success = apply_configuration(plan_only=True)
+            elif args.command == "drift" and args.json:
+                with redirect_stdout(sys.stderr):
+                    drifts = scan_drift(load_infra_config(), args.refresh)
+                if drifts is not None:
+                    print(json.dumps([d.__dict__ for d in drifts if d.status != "Compliant"], indent=2))
+                success = drifts is not None and all(d.status == "Compliant" for d in drifts)
+            elif args.command == "drift":
+                success = check_drift(args.refresh)
+            elif args.command == "apply":
+                success = apply_configuration(max_parallel=args.max_parallel)
+            elif args.command == "status":
+                if args.json:
+                    # Keep stdout clean for the JSON document
+                    with redirect_stdout(sys.stderr):
+                        status = collect_status(args.refresh)
+                    if status is not None:
+                        print(json.dumps(status, indent=2))
+                    success = status is not None
+                else:
+                    success = show_status(args.refresh)
+            elif args.command == "wait":
+                success = wait_vcenter(args.timeout, args.base_url, args.json)
+            elif args.command == "fleet":
+                success = run_fleet(args.registry, operation, args.site, args.max_sites, args.timeout,
+                                    args.report, args.list)
+            elif args.command == "config":
+                if args.action == "show":
+                    print(json.dumps(load_config(), indent=2))
+                elif args.action == "expand":
+                    print(json.dumps(load_infra_config().expanded(), indent=2))
+                else:
+                    config = load_infra_config()
+                    print_success(f"{CONFIG_FILE} is valid ({len(config.hosts)} hosts)")
+                    if config.hosts.compact:
+                        print_info(f"Expanded hosts for PowerShell are written to {_config_store.host_dir}")
+                success = True
+            else:
+                return EXIT_USAGE
+            span.status = "Success" if success else "Failed"
+    except KeyboardInterrupt:
+        interrupt_workers()
+        print_warning("Operation cancelled by user.")
+        write_site_report(EXIT_INTERRUPTED)
+        return EXIT_INTERRUPTED
+
+    write_site_report(EXIT_OK if success else EXIT_FAILURE)
+    return EXIT_OK if success else EXIT_FAILURE
+
+
 def main():
     """Main entry point."""
+    # Any arguments select the non-interactive subcommand interface
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    
     # Check if running on Windows
     if os.name != 'nt':
         Colors.disable()
@@ -1135,39 +6778,46 @@ def main():
         print_info("Please create a config.json file before running this tool.")
         sys.exit(1)
     
+    trace_file, metrics_file = os.environ.get(TRACE_FILE_ENV), os.environ.get(METRICS_FILE_ENV)
+    enable_tracing(Path(trace_file) if trace_file else None, Path(metrics_file) if metrics_file else None)
+    
     # Main menu loop
     while True:
         try:
             display_main_menu()
             choice = get_input("Select option").upper()
             
-            if choice == '1':
-                deploy_vcenter()
-            elif choice == '2':
-                deploy_infrastructure()
-            elif choice == '3':
-                deploy_datacenter()
-            elif choice == '4':
-                deploy_cluster()
-            elif choice == '5':
-                handle_configure_menu()
-            elif choice == '6':
-                handle_vm_menu()
-            elif choice == 'C':
-                handle_config_management_menu()
-            elif choice == 'S':
-                show_status()
-            elif choice == 'Q':
-                print()
-                print_info("Thank you for using ECST VMware Automation Tool!")
-                print()
-                sys.exit(0)
-            else:
-                print_error("Invalid option. Please try again.")
-                input("\nPress Enter to continue...")
+            with trace_span(f"menu {choice}", "action"):
+                if choice == '1':
+                    deploy_vcenter()
+                elif choice == '2':
+                    deploy_infrastructure()
+                elif choice == '3':
+                    deploy_datacenter()
+                elif choice == '4':
+                    deploy_cluster()
+                elif choice == '5':
+                    handle_configure_menu()
+                elif choice == '6':
+                    handle_vm_menu()
+                elif choice == 'C':
+                    handle_config_management_menu()
+                elif choice == 'S':
+                    show_status()
+                elif choice == 'Q':
+                    print()
+                    print_info("Thank you for using ECST VMware Automation Tool!")
+                    print()
+                    sys.exit(0)
+                else:
+                    print_error("Invalid option. Please try again.")
+                    input("\nPress Enter to continue...")
                 
         except KeyboardInterrupt:
             print()
+            # Stop whatever the cancelled action left running before prompting
+            interrupt_workers()
+            clear_interrupt()
             print_warning("Operation cancelled by user.")
             if confirm_action("Do you want to exit?"):
                 sys.exit(0)
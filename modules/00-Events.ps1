@@ -0,0 +1,116 @@
+<#
+.SYNOPSIS
+    Structured Event Module
+.DESCRIPTION
+    Emits newline-delimited JSON events on a side channel next to the regular
+    Write-Host output. Events are appended to the file named by the
+    ECST_EVENT_LOG environment variable, which ecst-vmware.py sets and tails
+    while a step runs. When the variable is not set, every function here is a
+    no-op, so modules can emit events unconditionally.
+
+    Event types:
+      step-start  A deployment step began             (step)
+      step-end    A deployment step finished          (step, status, seconds, message)
+      result      Outcome for one host or object      (step, target, status, seconds, message)
+      metric      A named measurement                 (step, target, value, unit)
+#>
+
+function Write-EcstEvent {
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        [ValidateSet("step-start", "step-end", "result", "metric")]
+        [string]$Type,
+
+        [Parameter(Mandatory)]
+        [string]$Step,
+
+        [Parameter()]
+        [string]$Target,
+
+        [Parameter()]
+        [ValidateSet("Success", "Failed", "Skipped")]
+        [string]$Status,
+
+        [Parameter()]
+        [double]$Seconds = -1,
+
+        [Parameter()]
+        [string]$Message,
+
+        [Parameter()]
+        $Value,
+
+        [Parameter()]
+        [string]$Unit
+    )
+
+    $path = $env:ECST_EVENT_LOG
+    if (!$path) {
+        return
+    }
+
+    $record = [ordered]@{
+        ts   = (Get-Date).ToUniversalTime().ToString("o")
+        type = $Type
+        step = $Step
+    }
+    if ($Target)          { $record.target = $Target }
+    if ($Status)          { $record.status = $Status }
+    if ($Seconds -ge 0)   { $record.seconds = [math]::Round($Seconds, 2) }
+    if ($Message)         { $record.message = $Message }
+    if ($null -ne $Value) { $record.value = $Value }
+    if ($Unit)            { $record.unit = $Unit }
+
+    $line = ($record | ConvertTo-Json -Compress -Depth 5) + "`n"
+
+    try {
+        # Append one complete line per call so the reader never sees a torn event
+        [System.IO.File]::AppendAllText($path, $line, (New-Object System.Text.UTF8Encoding($false)))
+    }
+    catch {
+        Write-Verbose "Could not write event: $($_.Exception.Message)"
+    }
+}
+
+function Start-EcstStep {
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        [string]$Step
+    )
+
+    Write-EcstEvent -Type step-start -Step $Step
+    return @{
+        Step      = $Step
+        Stopwatch = [System.Diagnostics.Stopwatch]::StartNew()
+        Completed = $false
+    }
+}
+
+function Complete-EcstStep {
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        [hashtable]$StepInfo,
+
+        [Parameter()]
+        [ValidateSet("Success", "Failed", "Skipped")]
+        [string]$Status = "Success",
+
+        [Parameter()]
+        [string]$Message
+    )
+
+    if ($StepInfo.Completed) {
+        return
+    }
+    $StepInfo.Completed = $true
+    $StepInfo.Stopwatch.Stop()
+
+    Write-EcstEvent -Type step-end -Step $StepInfo.Step -Status $Status `
+        -Seconds $StepInfo.Stopwatch.Elapsed.TotalSeconds -Message $Message
+}
+
+# Export functions
+Export-ModuleMember -Function Write-EcstEvent, Start-EcstStep, Complete-EcstStep -ErrorAction SilentlyContinue
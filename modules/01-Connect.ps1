@@ -18,7 +18,12 @@ function Connect-VCenterServer {
         [int]$MaxRetries = 3,
         
         [Parameter()]
-        [int]$RetryDelaySeconds = 10
+        [int]$RetryDelaySeconds = 10,
+        
+        # Log in again even if already connected, without logging out the
+        # existing session (other workers may still be attached to it)
+        [Parameter()]
+        [switch]$NewSession
     )
     
     Write-Host "Connecting to vCenter: $Server" -ForegroundColor Cyan
@@ -31,13 +36,13 @@ function Connect-VCenterServer {
             $retryCount++
             
             # Check if already connected
-            if ($global:DefaultVIServer -and $global:DefaultVIServer.Name -eq $Server) {
+            if (!$NewSession -and $global:DefaultVIServer -and $global:DefaultVIServer.Name -eq $Server) {
                 Write-Host "Already connected to $Server" -ForegroundColor Green
                 return $global:DefaultVIServer
             }
             
             # Disconnect any existing connections
-            if ($global:DefaultVIServer) {
+            if (!$NewSession -and $global:DefaultVIServer) {
                 Disconnect-VIServer -Server * -Force -Confirm:$false -ErrorAction SilentlyContinue
             }
             
@@ -3,8 +3,17 @@
     ESXi Host Addition Module
 .DESCRIPTION
     Adds ESXi hosts to the vSphere cluster with validation and error handling.
+    Hosts are added as async vCenter tasks with a bounded number in flight,
+    polled together, and retried with exponential backoff when an add fails.
+    An add that outlives its deadline, or that vCenter stops reporting, fails
+    that host instead of stalling the loop.
 #>
 
+# Structured progress events (no-op unless ECST_EVENT_LOG is set)
+if (!(Get-Command Write-EcstEvent -ErrorAction SilentlyContinue)) {
+    . (Join-Path $PSScriptRoot "00-Events.ps1")
+}
+
 function Add-ESXiHostsToCluster {
     [CmdletBinding()]
     param(
@@ -15,13 +24,46 @@ function Add-ESXiHostsToCluster {
         [PSCredential]$Credential,
         
         [Parameter()]
-        [switch]$Force
+        [string[]]$HostName,
+        
+        [Parameter()]
+        [switch]$Force,
+        
+        # Add-VMHost tasks running in vCenter at once (default: automation.maxHostAddsInFlight, else 8)
+        [Parameter()]
+        [int]$MaxInFlight,
+        
+        [Parameter()]
+        [int]$PollSeconds = 5,
+        
+        # Attempts per host; a failed add is retried after RetryDelaySeconds, doubling each time
+        [Parameter()]
+        [int]$MaxAttempts = 3,
+        
+        [Parameter()]
+        [int]$RetryDelaySeconds = 15,
+        
+        # An add still running after this long fails without a retry
+        [Parameter()]
+        [int]$TaskTimeoutMinutes = 30,
+        
+        # Polls an add may be missing from Get-Task (purged history, dropped session) before it is retried
+        [Parameter()]
+        [int]$MaxMissedPolls = 3
     )
     
     $clusterName = $Config.cluster.name
     $hosts = $Config.esxiHosts
     
-    Write-Host "Adding $($hosts.Count) ESXi hosts to cluster: $clusterName" -ForegroundColor Cyan
+    if ($HostName) {
+        $hosts = @($hosts | Where-Object { $_.hostname -in $HostName })
+    }
+    
+    if (!$PSBoundParameters.ContainsKey('MaxInFlight')) {
+        $MaxInFlight = if ($Config.automation.maxHostAddsInFlight) { $Config.automation.maxHostAddsInFlight } else { 8 }
+    }
+    
+    Write-Host "Adding $($hosts.Count) ESXi hosts to cluster: $clusterName ($MaxInFlight adds in flight)" -ForegroundColor Cyan
     
     $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
     
@@ -31,59 +73,176 @@ function Add-ESXiHostsToCluster {
         Skipped = @()
     }
     
+    # Faults a retry cannot fix
+    $permanentFaults = @("InvalidLogin", "AlreadyConnected", "DuplicateName", "NotSupportedHost")
+    
+    # Look up every host vCenter already knows in one call
+    $existing = @{}
+    $names = @($hosts | ForEach-Object { $_.hostname })
+    if ($names.Count -gt 0) {
+        foreach ($vmHost in (Get-VMHost -Name $names -ErrorAction SilentlyContinue)) {
+            $existing[$vmHost.Name] = $vmHost
+        }
+    }
+    
+    $pending = [System.Collections.Generic.List[object]]::new()
     foreach ($esxiHost in $hosts) {
         $hostname = $esxiHost.hostname
+        $existingHost = $existing[$hostname]
+        
+        if ($existingHost) {
+            $currentCluster = $existingHost.Parent
+            
+            if ($currentCluster.Name -eq $clusterName) {
+                Write-Host "  Host '$hostname' already in cluster '$clusterName', skipping" -ForegroundColor Yellow
+                $results.Skipped += $hostname
+                Write-EcstEvent -Type result -Step hosts -Target $hostname -Status Skipped -Seconds 0 -Message "Already in cluster"
+                continue
+            } elseif (!$Force) {
+                Write-Host "  Host '$hostname' is in different cluster '$($currentCluster.Name)', use -Force to move" -ForegroundColor Yellow
+                $results.Skipped += $hostname
+                Write-EcstEvent -Type result -Step hosts -Target $hostname -Status Skipped -Seconds 0 -Message "In cluster '$($currentCluster.Name)'"
+                continue
+            }
+        }
         
-        Write-Host "Processing host: $hostname" -ForegroundColor Cyan
+        $pending.Add(@{
+            Host      = $hostname
+            Attempt   = 0
+            NotBefore = [datetime]::MinValue
+            Timer     = $null
+            Deadline  = $null
+            Missed    = 0
+        })
+    }
+    
+    $complete = {
+        param($Item, [string]$Status, [string]$ErrorMessage)
         
-        try {
-            # Check if host is already in the cluster
-            $existingHost = Get-VMHost -Name $hostname -ErrorAction SilentlyContinue
+        $seconds = $Item.Timer.Elapsed.TotalSeconds
+        if ($Status -eq "Success") {
+            Write-Host "  Host '$($Item.Host)' added successfully ($([math]::Round($seconds))s)" -ForegroundColor Green
+            $results.Success += $Item.Host
+        } else {
+            # Unreachable hosts are the usual cause; say so if the host does not answer ping
+            if (!(Test-Connection -ComputerName $Item.Host -Count 1 -Quiet -ErrorAction SilentlyContinue)) {
+                $ErrorMessage = "$ErrorMessage (host does not answer ping)"
+            }
+            Write-Host "  Failed to add host '$($Item.Host)': $ErrorMessage" -ForegroundColor Red
+            $results.Failed += @{
+                Host  = $Item.Host
+                Error = $ErrorMessage
+            }
+        }
+        Write-EcstEvent -Type result -Step hosts -Target $Item.Host -Status $Status -Seconds $seconds -Message $ErrorMessage
+    }
+    
+    # A failed attempt goes back in the queue after a backoff, or fails for good
+    $retry = {
+        param($Item, [string]$ErrorMessage, [bool]$Permanent)
+        
+        if ($Permanent -or $Item.Attempt -ge $MaxAttempts) {
+            & $complete $Item "Failed" $ErrorMessage
+            return
+        }
+        $delay = $RetryDelaySeconds * [math]::Pow(2, $Item.Attempt - 1)
+        $Item.NotBefore = (Get-Date).AddSeconds($delay)
+        Write-Host "  Host '$($Item.Host)' attempt $($Item.Attempt) failed, retrying in $($delay)s: $ErrorMessage" -ForegroundColor Yellow
+        $pending.Add($Item)
+    }
+    
+    $inFlight = @{}
+    
+    while ($pending.Count -gt 0 -or $inFlight.Count -gt 0) {
+        # Submit adds whose backoff has passed, up to the in-flight limit
+        $now = Get-Date
+        foreach ($item in @($pending)) {
+            if ($inFlight.Count -ge $MaxInFlight) {
+                break
+            }
+            if ($item.NotBefore -gt $now) {
+                continue
+            }
+            [void]$pending.Remove($item)
+            $item.Attempt++
+            if (!$item.Timer) {
+                $item.Timer = [System.Diagnostics.Stopwatch]::StartNew()
+            }
             
-            if ($existingHost) {
-                $currentCluster = Get-Cluster -VMHost $existingHost -ErrorAction SilentlyContinue
-                
-                if ($currentCluster.Name -eq $clusterName) {
-                    Write-Host "  Host '$hostname' already in cluster '$clusterName', skipping" -ForegroundColor Yellow
-                    $results.Skipped += $hostname
-                    continue
-                } elseif (!$Force) {
-                    Write-Host "  Host '$hostname' is in different cluster '$($currentCluster.Name)', use -Force to move" -ForegroundColor Yellow
-                    $results.Skipped += $hostname
-                    continue
+            try {
+                $task = Add-VMHost -Name $item.Host `
+                    -Location $cluster `
+                    -Credential $Credential `
+                    -Force:$Force `
+                    -RunAsync `
+                    -Confirm:$false `
+                    -ErrorAction Stop
+                $item.Deadline = (Get-Date).AddMinutes($TaskTimeoutMinutes)
+                $item.Missed = 0
+                $inFlight[$task.Id] = $item
+                Write-Host "  Host '$($item.Host)' add submitted (attempt $($item.Attempt))" -ForegroundColor Gray
+            }
+            catch {
+                & $retry $item $_.Exception.Message $false
+            }
+        }
+        
+        if ($inFlight.Count -eq 0) {
+            # Only backoffs left: wait for the earliest one
+            if ($pending.Count -gt 0) {
+                $next = ($pending | Sort-Object { $_.NotBefore } | Select-Object -First 1).NotBefore
+                Start-Sleep -Milliseconds ([math]::Max(100, [int]($next - (Get-Date)).TotalMilliseconds))
+            }
+            continue
+        }
+        
+        Start-Sleep -Seconds $PollSeconds
+        
+        # Poll every in-flight add in a single call
+        $reported = @{}
+        foreach ($task in @(Get-Task -Id @($inFlight.Keys) -ErrorAction SilentlyContinue)) {
+            $reported[$task.Id] = $true
+            $item = $inFlight[$task.Id]
+            if ($task.State -in @("Queued", "Running")) {
+                if ((Get-Date) -gt $item.Deadline) {
+                    $inFlight.Remove($task.Id)
+                    & $retry $item "Add-VMHost task still $($task.State) after $TaskTimeoutMinutes minutes" $true
                 }
+                continue
             }
             
-            # Test connectivity to host
-            Write-Host "  Testing connectivity to $hostname..." -ForegroundColor Gray
-            $pingResult = Test-Connection -ComputerName $hostname -Count 1 -Quiet -ErrorAction SilentlyContinue
+            $inFlight.Remove($task.Id)
             
-            if (!$pingResult) {
-                Write-Host "  Warning: Cannot ping $hostname, attempting to add anyway..." -ForegroundColor Yellow
+            if ($task.State -eq "Success") {
+                & $complete $item "Success" $null
+            } else {
+                $fault = $task.ExtensionData.Info.Error.Fault
+                $message = $task.ExtensionData.Info.Error.LocalizedMessage
+                if (!$message) {
+                    $message = "Add-VMHost task $($task.State)"
+                }
+                $permanent = $fault -and $fault.GetType().Name -in $permanentFaults
+                & $retry $item $message $permanent
             }
-            
-            # Add host to cluster
-            Write-Host "  Adding host to cluster..." -ForegroundColor Gray
-            $vmHost = Add-VMHost -Name $hostname `
-                -Location $cluster `
-                -Credential $Credential `
-                -Force:$Force `
-                -Confirm:$false `
-                -ErrorAction Stop
-            
-            Write-Host "  Host '$hostname' added successfully" -ForegroundColor Green
-            $results.Success += $hostname
-            
-            # Set host to maintenance mode briefly for initial configuration
-            # Write-Host "  Entering maintenance mode for configuration..." -ForegroundColor Gray
-            # Set-VMHost -VMHost $vmHost -State Maintenance -Confirm:$false | Out-Null
-            
         }
-        catch {
-            Write-Host "  Failed to add host '$hostname': $($_.Exception.Message)" -ForegroundColor Red
-            $results.Failed += @{
-                Host  = $hostname
-                Error = $_.Exception.Message
+        
+        # Adds vCenter no longer reports would otherwise stay in flight forever
+        foreach ($taskId in @($inFlight.Keys)) {
+            if ($reported[$taskId]) {
+                continue
+            }
+            $item = $inFlight[$taskId]
+            $item.Missed++
+            if ($item.Missed -ge $MaxMissedPolls -or (Get-Date) -gt $item.Deadline) {
+                $inFlight.Remove($taskId)
+                # The task may have finished before it dropped out of the task list;
+                # a second Add-VMHost would then fail on a host that is already here
+                $addedHost = Get-VMHost -Name $item.Host -ErrorAction SilentlyContinue
+                if ($addedHost -and $addedHost.Parent.Name -eq $clusterName) {
+                    & $complete $item "Success" $null
+                } else {
+                    & $retry $item "Add-VMHost task $taskId is no longer reported by vCenter" $false
+                }
             }
         }
     }
@@ -5,6 +5,11 @@
     Creates VDS, port groups, and configures networking including vMotion TCP/IP stack.
 #>
 
+# Structured progress events (no-op unless ECST_EVENT_LOG is set)
+if (!(Get-Command Write-EcstEvent -ErrorAction SilentlyContinue)) {
+    . (Join-Path $PSScriptRoot "00-Events.ps1")
+}
+
 function New-VsphereVDS {
     [CmdletBinding()]
     param(
@@ -85,7 +90,19 @@ function New-VspherePortGroups {
             $existingPG = Get-VDPortgroup -VDSwitch $vds -Name $pg.name -ErrorAction SilentlyContinue
             
             if ($existingPG) {
-                Write-Host "    Port group '$($pg.name)' already exists, skipping" -ForegroundColor Yellow
+                # Reconcile the VLAN of an existing port group (plan/apply
+                # reports a mismatch as a portgroups change)
+                $currentVlan = $existingPG.ExtensionData.Config.DefaultPortConfig.Vlan.VlanId
+                if ($currentVlan -ne $pg.vlanId) {
+                    Set-VDVlanConfiguration -VDPortgroup $existingPG `
+                        -VlanId $pg.vlanId `
+                        -Confirm:$false `
+                        -ErrorAction Stop | Out-Null
+                    Write-Host "    Port group '$($pg.name)' VLAN changed from $currentVlan to $($pg.vlanId)" -ForegroundColor Green
+                }
+                else {
+                    Write-Host "    Port group '$($pg.name)' already exists, skipping" -ForegroundColor Yellow
+                }
                 continue
             }
             
@@ -127,11 +144,15 @@ function Add-HostsToVDS {
     [CmdletBinding()]
     param(
         [Parameter(Mandatory)]
-        [PSCustomObject]$Config
+        [PSCustomObject]$Config,
+        
+        # Host member specs per switch reconfigure task
+        [Parameter()]
+        [int]$BatchSize = 32
     )
     
     $vdsName = $Config.networking.vds.name
-    $uplinks = $Config.networking.vds.uplinks
+    $uplinks = @($Config.networking.vds.uplinks)
     $clusterName = $Config.cluster.name
     
     Write-Host "Adding hosts to VDS: $vdsName" -ForegroundColor Cyan
@@ -139,44 +160,159 @@ function Add-HostsToVDS {
     try {
         $vds = Get-VDSwitch -Name $vdsName -ErrorAction Stop
         $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
-        $hosts = Get-VMHost -Location $cluster
         
-        foreach ($vmHost in $hosts) {
-            Write-Host "  Processing host: $($vmHost.Name)" -ForegroundColor Gray
+        # Read switch membership and every host's pNICs once for the whole cluster
+        $vdsView = Get-View -Id $vds.Id -Property Uuid, Config.ConfigVersion, Config.Host, Config.UplinkPortgroup
+        $uplinkPortgroupKey = (Get-View -Id $vdsView.Config.UplinkPortgroup[0] -Property Key).Key
+        $hostViews = @(Get-View -ViewType HostSystem -SearchRoot $cluster.ExtensionData.MoRef `
+            -Property Name, Runtime.ConnectionState, Config.Network.Pnic, Config.Network.ProxySwitch)
+        
+        $members = @{}
+        foreach ($member in $vdsView.Config.Host) {
+            $members[$member.Config.Host.Value] = $member.Config
+        }
+        
+        # Work out what each host is missing
+        $report = [ordered]@{}
+        $changes = [System.Collections.Generic.List[object]]::new()
+        foreach ($hostView in ($hostViews | Sort-Object Name)) {
+            $row = [PSCustomObject]@{
+                Host    = $hostView.Name
+                Status  = "Success"
+                Action  = "None"
+                Uplinks = ""
+                Message = ""
+            }
+            $report[$hostView.Name] = $row
             
-            # Check if host is already added to VDS
-            $hostInVDS = $vds | Get-VMHost | Where-Object { $_.Name -eq $vmHost.Name }
+            if ("$($hostView.Runtime.ConnectionState)" -ne "connected") {
+                $row.Status = "Skipped"
+                $row.Message = "Host is $($hostView.Runtime.ConnectionState)"
+                continue
+            }
             
-            if ($hostInVDS) {
-                Write-Host "    Host already in VDS, checking uplinks..." -ForegroundColor Yellow
-            } else {
-                # Add host to VDS
-                Write-Host "    Adding host to VDS..." -ForegroundColor Gray
-                Add-VDSwitchVMHost -VDSwitch $vds -VMHost $vmHost -ErrorAction Stop | Out-Null
+            $member = $members[$hostView.MoRef.Value]
+            $assigned = @(if ($member) { $member.Backing.PnicSpec | ForEach-Object { $_.PnicDevice } })
+            
+            # pNICs another distributed switch already uses cannot be claimed here
+            $claimed = @{}
+            foreach ($proxy in $hostView.Config.Network.ProxySwitch) {
+                if ($proxy.DvsUuid -ne $vdsView.Uuid) {
+                    foreach ($key in $proxy.Pnic) { $claimed[$key] = $proxy.DvsName }
+                }
             }
             
-            # Get physical NICs
-            $pNics = Get-VMHostNetworkAdapter -VMHost $vmHost -Physical | 
-                Where-Object { $_.Name -in $uplinks }
+            $pnics = @{}
+            foreach ($pnic in $hostView.Config.Network.Pnic) { $pnics[$pnic.Device] = $pnic }
             
-            if ($pNics) {
-                Write-Host "    Assigning uplinks: $($pNics.Name -join ', ')" -ForegroundColor Gray
-                
-                # Add pNICs as uplinks
-                foreach ($pNic in $pNics) {
-                    try {
-                        Add-VDSwitchPhysicalNetworkAdapter -DistributedSwitch $vds `
-                            -VMHostPhysicalNic $pNic `
-                            -Confirm:$false `
-                            -ErrorAction SilentlyContinue | Out-Null
-                    }
-                    catch {
-                        Write-Host "    Warning: Could not add $($pNic.Name): $($_.Exception.Message)" -ForegroundColor Yellow
+            $add = @()
+            $notes = @()
+            foreach ($uplink in $uplinks) {
+                if ($uplink -in $assigned) {
+                    continue
+                }
+                if (!$pnics.ContainsKey($uplink)) {
+                    $notes += "$uplink not found"
+                } elseif ($claimed[$pnics[$uplink].Key]) {
+                    $notes += "$uplink in use by $($claimed[$pnics[$uplink].Key])"
+                } else {
+                    $add += $uplink
+                }
+            }
+            $row.Message = $notes -join "; "
+            $row.Uplinks = (@($assigned) + $add | Where-Object { $_ }) -join ", "
+            
+            if (!$member -or $add.Count -gt 0) {
+                $spec = New-Object VMware.Vim.DistributedVirtualSwitchHostMemberConfigSpec
+                $spec.Operation = if ($member) { "edit" } else { "add" }
+                $spec.Host = $hostView.MoRef
+                $spec.Backing = New-Object VMware.Vim.DistributedVirtualSwitchHostMemberPnicBacking
+                # An edit replaces the host's uplink list, so keep the pNICs it already has
+                $pnicSpecs = @(if ($member) { $member.Backing.PnicSpec })
+                foreach ($device in $add) {
+                    $pnicSpec = New-Object VMware.Vim.DistributedVirtualSwitchHostMemberPnicSpec
+                    $pnicSpec.PnicDevice = $device
+                    $pnicSpec.UplinkPortgroupKey = $uplinkPortgroupKey
+                    $pnicSpecs += $pnicSpec
+                }
+                $spec.Backing.PnicSpec = $pnicSpecs
+                $row.Action = if ($member) { "Uplinks" } else { "Added" }
+                $changes.Add($spec)
+            }
+        }
+        
+        Write-Host "  $($hostViews.Count) host(s): $($changes.Count) to change, $($hostViews.Count - $changes.Count) up to date" -ForegroundColor Gray
+        
+        # Apply one chunk of member specs in a single reconfigure; $true when it succeeded
+        $apply = {
+            param($Specs)
+            
+            $dvsSpec = New-Object VMware.Vim.DVSConfigSpec
+            $dvsSpec.ConfigVersion = $vdsView.Config.ConfigVersion
+            $dvsSpec.Host = @($Specs)
+            try {
+                $taskRef = $vdsView.ReconfigureDvs_Task($dvsSpec)
+                Get-Task -Id "Task-$($taskRef.Value)" -ErrorAction Stop | Wait-Task -ErrorAction Stop | Out-Null
+                return $null
+            }
+            catch {
+                return $_.Exception.Message
+            }
+            finally {
+                # Every reconfigure bumps the version the next spec must carry
+                $vdsView.UpdateViewData("Config.ConfigVersion")
+            }
+        }
+        
+        $names = @{}
+        foreach ($hostView in $hostViews) { $names[$hostView.MoRef.Value] = $hostView.Name }
+        
+        for ($offset = 0; $offset -lt $changes.Count; $offset += $BatchSize) {
+            $batch = $changes.GetRange($offset, [math]::Min($BatchSize, $changes.Count - $offset))
+            $batchTimer = [System.Diagnostics.Stopwatch]::StartNew()
+            Write-Host "  Reconfiguring VDS for $($batch.Count) host(s)..." -ForegroundColor Gray
+            
+            $errorMessage = & $apply $batch
+            if ($errorMessage -and $batch.Count -gt 1) {
+                # One bad host fails the whole spec; retry one by one to find it
+                Write-Host "    Batch failed ($errorMessage), retrying hosts individually" -ForegroundColor Yellow
+                foreach ($spec in $batch) {
+                    $hostError = & $apply @($spec)
+                    if ($hostError) {
+                        $row = $report[$names[$spec.Host.Value]]
+                        $row.Status = "Failed"
+                        $row.Message = $hostError
                     }
                 }
+            } elseif ($errorMessage) {
+                $row = $report[$names[$batch[0].Host.Value]]
+                $row.Status = "Failed"
+                $row.Message = $errorMessage
             }
             
-            Write-Host "    Host configured successfully" -ForegroundColor Green
+            foreach ($spec in $batch) {
+                $row = $report[$names[$spec.Host.Value]]
+                Write-EcstEvent -Type result -Step vds-hosts -Target $row.Host -Status $row.Status `
+                    -Seconds $batchTimer.Elapsed.TotalSeconds -Message $row.Message
+            }
+        }
+        
+        foreach ($row in $report.Values) {
+            if ($row.Action -eq "None") {
+                Write-EcstEvent -Type result -Step vds-hosts -Target $row.Host -Status $row.Status -Seconds 0 -Message $row.Message
+            }
+        }
+        
+        # Per-host report
+        foreach ($row in $report.Values) {
+            $color = switch ($row.Status) { "Success" { "Green" } "Skipped" { "Yellow" } default { "Red" } }
+            $detail = @($row.Action, $row.Uplinks, $row.Message | Where-Object { $_ -and $_ -ne "None" }) -join " - "
+            Write-Host ("    {0,-40} {1,-8} {2}" -f $row.Host, $row.Status, $detail) -ForegroundColor $color
+        }
+        
+        $failed = @($report.Values | Where-Object { $_.Status -eq "Failed" })
+        if ($failed.Count -gt 0) {
+            throw "$($failed.Count) host(s) could not be added: $(($failed | ForEach-Object { $_.Host }) -join ', ')"
         }
         
         return $true
@@ -186,86 +322,266 @@ function Add-HostsToVDS {
     }
 }
 
-function Configure-VMotionStack {
+function Get-EsxiHostRecordIndex {
+    <#
+    .SYNOPSIS
+        Index config.json host records by hostname (case-insensitive)
+    #>
     [CmdletBinding()]
     param(
         [Parameter(Mandatory)]
         [PSCustomObject]$Config
     )
     
+    $index = @{}
+    foreach ($record in $Config.esxiHosts) {
+        $index[$record.hostname] = $record
+    }
+    return $index
+}
+
+function Get-VMkernelInventory {
+    <#
+    .SYNOPSIS
+        Every host's VMkernel adapters, their services and netstack gateways in one read
+    .DESCRIPTION
+        Returns one row per host in the cluster (only the -HostName hosts,
+        filtered in the Get-View call, when given) with:
+          Services  service (vmotion, vsan, management, ...) -> @{ Device; Ip }
+          Gateways  netstack key (defaultTcpipStack, vmotion, ...) -> default gateway
+        An adapter on the vMotion TCP/IP stack counts as the host's vMotion adapter.
+    #>
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        $Cluster,
+        
+        [Parameter()]
+        [string[]]$HostName
+    )
+    
+    # Name the hosts in the read itself, so a batch only pulls its own hosts
+    $viewParams = @{
+        ViewType   = "HostSystem"
+        SearchRoot = $Cluster.ExtensionData.MoRef
+        Property   = @("Name", "Runtime.ConnectionState", "Config.Network.Vnic", "Config.Network.NetStackInstance",
+                       "Config.VirtualNicManagerInfo.NetConfig")
+    }
+    if ($HostName) {
+        $viewParams.Filter = @{ Name = "(?i)^(" + (($HostName | ForEach-Object { [regex]::Escape($_) }) -join "|") + ")$" }
+    }
+    $hostViews = @(Get-View @viewParams)
+    
+    foreach ($hostView in $hostViews) {
+        $adapters = @{}
+        foreach ($vnic in $hostView.Config.Network.Vnic) {
+            $adapters[$vnic.Device] = @{ Device = $vnic.Device; Ip = $vnic.Spec.Ip.IpAddress }
+        }
+        
+        $services = @{}
+        foreach ($netConfig in $hostView.Config.VirtualNicManagerInfo.NetConfig) {
+            foreach ($candidate in $netConfig.CandidateVnic) {
+                if ($candidate.Key -in $netConfig.SelectedVnic -and !$services[$netConfig.NicType]) {
+                    $services[$netConfig.NicType] = $adapters[$candidate.Device]
+                }
+            }
+        }
+        foreach ($vnic in $hostView.Config.Network.Vnic) {
+            if ($vnic.Spec.NetStackInstanceKey -eq "vmotion" -and !$services["vmotion"]) {
+                $services["vmotion"] = $adapters[$vnic.Device]
+            }
+        }
+        
+        $gateways = @{}
+        foreach ($netStack in $hostView.Config.Network.NetStackInstance) {
+            $gateways[$netStack.Key] = $netStack.IpRouteConfig.DefaultGateway
+        }
+        
+        [PSCustomObject]@{
+            Host      = $hostView.Name
+            Connected = "$($hostView.Runtime.ConnectionState)" -eq "connected"
+            Services  = $services
+            Gateways  = $gateways
+        }
+    }
+}
+
+function Sync-VMkernelAdapters {
+    <#
+    .SYNOPSIS
+        Create the missing VMkernel adapter (and netstack default route) for one service on each host
+    .DESCRIPTION
+        Hosts are matched to their config.json record by hostname, never by
+        position. Adapters and routes are read for all hosts at once; only
+        hosts without an adapter for the service get one, and only netstacks
+        without the configured gateway get a route. Returns the names of the
+        hosts that failed.
+    #>
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        [PSCustomObject]$Config,
+        
+        [Parameter(Mandatory)]
+        [ValidateSet("vmotion", "vsan")]
+        [string]$Service,
+        
+        # Event step name
+        [Parameter(Mandatory)]
+        [string]$Step,
+        
+        [Parameter(Mandatory)]
+        [string]$PortGroupName,
+        
+        [Parameter(Mandatory)]
+        [string]$SubnetMask,
+        
+        # Default gateway for the service's netstack
+        [Parameter()]
+        [string]$Gateway,
+        
+        [Parameter()]
+        [string[]]$HostName
+    )
+    
+    $ipField = "$($Service)Ip"
+    $clusterName = $Config.cluster.name
+    
+    $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
+    $vds = Get-VDSwitch -Name $Config.networking.vds.name -ErrorAction Stop
+    $vdPortGroup = Get-VDPortgroup -VDSwitch $vds -Name $PortGroupName -ErrorAction Stop
+    $records = Get-EsxiHostRecordIndex -Config $Config
+    $inventory = @(Get-VMkernelInventory -Cluster $cluster -HostName $HostName)
+    
+    $failedHosts = @()
+    $found = @{}
+    foreach ($entry in $inventory) {
+        $found[$entry.Host] = $true
+    }
+    foreach ($name in $HostName) {
+        if (!$found[$name]) {
+            Write-Host "  $($name): not found in cluster '$clusterName'" -ForegroundColor Yellow
+            $failedHosts += $name
+            Write-EcstEvent -Type result -Step $Step -Target $name -Status Failed -Seconds 0 -Message "Not in cluster '$clusterName'"
+        }
+    }
+    
+    # Look up, in one call, only the hosts that need an adapter or a route
+    $work = @($inventory | Where-Object {
+        $_.Connected -and $records[$_.Host].$ipField -and
+            (!$_.Services[$Service] -or ($Gateway -and $_.Gateways[$Service] -ne $Gateway))
+    })
+    $vmHosts = @{}
+    if ($work.Count -gt 0) {
+        foreach ($vmHost in (Get-VMHost -Name @($work | ForEach-Object { $_.Host }) -Location $cluster)) {
+            $vmHosts[$vmHost.Name] = $vmHost
+        }
+    }
+    Write-Host "  $($inventory.Count) host(s), $($work.Count) with missing adapters or routes" -ForegroundColor Gray
+    
+    foreach ($entry in $inventory) {
+        $hostTimer = [System.Diagnostics.Stopwatch]::StartNew()
+        $ip = $records[$entry.Host].$ipField
+        
+        if (!$records[$entry.Host]) {
+            Write-Host "  $($entry.Host): not in config.json, skipping" -ForegroundColor Yellow
+            Write-EcstEvent -Type result -Step $Step -Target $entry.Host -Status Skipped -Seconds 0 -Message "Not in config.json"
+            continue
+        }
+        if (!$ip) {
+            Write-Host "  $($entry.Host): no $ipField in config.json, skipping" -ForegroundColor Yellow
+            Write-EcstEvent -Type result -Step $Step -Target $entry.Host -Status Skipped -Seconds 0 -Message "No $ipField"
+            continue
+        }
+        if (!$entry.Connected) {
+            Write-Host "  $($entry.Host): not connected, skipping" -ForegroundColor Yellow
+            Write-EcstEvent -Type result -Step $Step -Target $entry.Host -Status Skipped -Seconds 0 -Message "Not connected"
+            continue
+        }
+        
+        try {
+            $changes = @()
+            $existing = $entry.Services[$Service]
+            if ($existing) {
+                if ($existing.Ip -ne $ip) {
+                    Write-Host "  $($entry.Host): $($existing.Device) has $($existing.Ip), config.json says $ip (left unchanged)" -ForegroundColor Yellow
+                }
+            } else {
+                $vmkParams = @{
+                    VMHost      = $vmHosts[$entry.Host]
+                    PortGroup   = $vdPortGroup
+                    IP          = $ip
+                    SubnetMask  = $SubnetMask
+                    ErrorAction = "Stop"
+                }
+                if ($Service -eq "vmotion") {
+                    $vmkParams.VMotionEnabled = $true
+                } else {
+                    $vmkParams.VsanTrafficEnabled = $true
+                }
+                $vmk = New-VMHostNetworkAdapter @vmkParams
+                $changes += "created $($vmk.Name) with IP $ip"
+            }
+            
+            if ($Gateway -and $entry.Gateways[$Service] -ne $Gateway) {
+                $esxcli = Get-EsxCli -VMHost $vmHosts[$entry.Host] -V2
+                $esxcli.network.ip.route.ipv4.add.Invoke(@{
+                    gateway  = $Gateway
+                    netstack = $Service
+                    network  = "default"
+                }) | Out-Null
+                $changes += "gateway $Gateway"
+            }
+            
+            if ($changes) {
+                Write-Host "  $($entry.Host): $($changes -join ', ')" -ForegroundColor Green
+            } else {
+                Write-Host "  $($entry.Host): $($existing.Device) already configured" -ForegroundColor Gray
+            }
+            $status = if ($changes) { "Success" } else { "Skipped" }
+            Write-EcstEvent -Type result -Step $Step -Target $entry.Host -Status $status -Seconds $hostTimer.Elapsed.TotalSeconds `
+                -Message ($changes -join ', ')
+        }
+        catch {
+            Write-Host "  $($entry.Host): Warning: $($_.Exception.Message)" -ForegroundColor Yellow
+            $failedHosts += $entry.Host
+            Write-EcstEvent -Type result -Step $Step -Target $entry.Host -Status Failed -Seconds $hostTimer.Elapsed.TotalSeconds -Message $_.Exception.Message
+        }
+    }
+    
+    return $failedHosts
+}
+
+function Configure-VMotionStack {
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        [PSCustomObject]$Config,
+        
+        [Parameter()]
+        [string[]]$HostName,
+        
+        [Parameter()]
+        [switch]$ThrowOnHostFailure
+    )
+    
     if (!$Config.networking.vmotionTcpIpStack.enabled) {
         Write-Host "vMotion TCP/IP Stack configuration is disabled, skipping" -ForegroundColor Yellow
         return $true
     }
     
-    $clusterName = $Config.cluster.name
     $vmotionConfig = $Config.networking.vmotionTcpIpStack
     $vmotionPG = $Config.networking.portGroups | Where-Object { $_.type -eq "vMotion" }
     
     Write-Host "Configuring vMotion TCP/IP Stack" -ForegroundColor Cyan
     
     try {
-        $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
-        $hosts = Get-VMHost -Location $cluster
-        $vds = Get-VDSwitch -Name $Config.networking.vds.name -ErrorAction Stop
+        $failedHosts = @(Sync-VMkernelAdapters -Config $Config -Service vmotion -Step vmotion `
+            -PortGroupName $vmotionPG.name -SubnetMask $vmotionConfig.subnetMask `
+            -Gateway $vmotionConfig.gateway -HostName $HostName)
         
-        $hostIndex = 0
-        foreach ($vmHost in $hosts) {
-            $hostConfig = $Config.esxiHosts[$hostIndex]
-            
-            Write-Host "  Configuring vMotion on: $($vmHost.Name)" -ForegroundColor Gray
-            
-            try {
-                # Get the vMotion port group
-                $pgName = $vmotionPG.name
-                $vdPortGroup = Get-VDPortgroup -VDSwitch $vds -Name $pgName -ErrorAction Stop
-                
-                # Check if vMotion VMkernel already exists
-                $existingVmk = Get-VMHostNetworkAdapter -VMHost $vmHost -VMKernel | 
-                    Where-Object { $_.VMotionEnabled -eq $true }
-                
-                if ($existingVmk) {
-                    Write-Host "    vMotion VMkernel already exists: $($existingVmk.Name)" -ForegroundColor Yellow
-                } else {
-                    # Create VMkernel adapter for vMotion
-                    $vmkParams = @{
-                        VMHost = $vmHost
-                        PortGroup = $vdPortGroup
-                        VMotionEnabled = $true
-                        IP = $hostConfig.vmotionIp
-                        SubnetMask = $vmotionConfig.subnetMask
-                        ErrorAction = "Stop"
-                    }
-                    
-                    $vmk = New-VMHostNetworkAdapter @vmkParams
-                    Write-Host "    Created vMotion VMkernel: $($vmk.Name) with IP $($hostConfig.vmotionIp)" -ForegroundColor Green
-                }
-                
-                # Configure vMotion TCP/IP Stack gateway if specified
-                if ($vmotionConfig.gateway) {
-                    $esxcli = Get-EsxCli -VMHost $vmHost -V2
-                    
-                    try {
-                        # Set default gateway for vMotion TCP/IP stack
-                        $esxcli.network.ip.route.ipv4.add.Invoke(@{
-                            gateway = $vmotionConfig.gateway
-                            netstack = "vmotion"
-                            network = "default"
-                        }) | Out-Null
-                        
-                        Write-Host "    vMotion gateway configured: $($vmotionConfig.gateway)" -ForegroundColor Gray
-                    }
-                    catch {
-                        # Route may already exist
-                        Write-Host "    Note: vMotion route may already exist" -ForegroundColor Yellow
-                    }
-                }
-            }
-            catch {
-                Write-Host "    Warning: Error configuring vMotion on $($vmHost.Name): $($_.Exception.Message)" -ForegroundColor Yellow
-            }
-            
-            $hostIndex++
+        if ($ThrowOnHostFailure -and $failedHosts.Count -gt 0) {
+            throw "Failed on host(s): $($failedHosts -join ', ')"
         }
         
         Write-Host "vMotion TCP/IP Stack configuration completed" -ForegroundColor Green
@@ -280,10 +596,15 @@ function New-VsanVMkernel {
     [CmdletBinding()]
     param(
         [Parameter(Mandatory)]
-        [PSCustomObject]$Config
+        [PSCustomObject]$Config,
+        
+        [Parameter()]
+        [string[]]$HostName,
+        
+        [Parameter()]
+        [switch]$ThrowOnHostFailure
     )
     
-    $clusterName = $Config.cluster.name
     $vsanPG = $Config.networking.portGroups | Where-Object { $_.type -eq "vSAN" }
     
     if (!$vsanPG) {
@@ -294,41 +615,11 @@ function New-VsanVMkernel {
     Write-Host "Creating vSAN VMkernel adapters" -ForegroundColor Cyan
     
     try {
-        $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
-        $hosts = Get-VMHost -Location $cluster
-        $vds = Get-VDSwitch -Name $Config.networking.vds.name -ErrorAction Stop
-        $vdPortGroup = Get-VDPortgroup -VDSwitch $vds -Name $vsanPG.name -ErrorAction Stop
+        $failedHosts = @(Sync-VMkernelAdapters -Config $Config -Service vsan -Step vsan-vmkernel `
+            -PortGroupName $vsanPG.name -SubnetMask "255.255.255.0" -HostName $HostName)
         
-        $hostIndex = 0
-        foreach ($vmHost in $hosts) {
-            $hostConfig = $Config.esxiHosts[$hostIndex]
-            
-            Write-Host "  Configuring vSAN VMkernel on: $($vmHost.Name)" -ForegroundColor Gray
-            
-            try {
-                # Check if vSAN VMkernel already exists
-                $existingVmk = Get-VMHostNetworkAdapter -VMHost $vmHost -VMKernel | 
-                    Where-Object { $_.VsanTrafficEnabled -eq $true }
-                
-                if ($existingVmk) {
-                    Write-Host "    vSAN VMkernel already exists: $($existingVmk.Name)" -ForegroundColor Yellow
-                } else {
-                    # Create VMkernel adapter for vSAN
-                    $vmk = New-VMHostNetworkAdapter -VMHost $vmHost `
-                        -PortGroup $vdPortGroup `
-                        -VsanTrafficEnabled $true `
-                        -IP $hostConfig.vsanIp `
-                        -SubnetMask "255.255.255.0" `
-                        -ErrorAction Stop
-                    
-                    Write-Host "    Created vSAN VMkernel: $($vmk.Name) with IP $($hostConfig.vsanIp)" -ForegroundColor Green
-                }
-            }
-            catch {
-                Write-Host "    Warning: Error creating vSAN VMkernel on $($vmHost.Name): $($_.Exception.Message)" -ForegroundColor Yellow
-            }
-            
-            $hostIndex++
+        if ($ThrowOnHostFailure -and $failedHosts.Count -gt 0) {
+            throw "Failed on host(s): $($failedHosts -join ', ')"
         }
         
         return $true
@@ -339,4 +630,4 @@ function New-VsanVMkernel {
 }
 
 # Export functions
-Export-ModuleMember -Function New-VsphereVDS, New-VspherePortGroups, Add-HostsToVDS, Configure-VMotionStack, New-VsanVMkernel -ErrorAction SilentlyContinue
+Export-ModuleMember -Function New-VsphereVDS, New-VspherePortGroups, Add-HostsToVDS, Get-EsxiHostRecordIndex, Get-VMkernelInventory, Sync-VMkernelAdapters, Configure-VMotionStack, New-VsanVMkernel -ErrorAction SilentlyContinue
@@ -3,6 +3,8 @@
     vSAN Storage Configuration Module
 .DESCRIPTION
     Enables and configures vSAN on the cluster including disk groups and storage policies.
+    Get-VsanDiskInventory reads the disks of every host in one pass; ecst-vmware.py
+    plans disk groups from it and creates them on several hosts at once.
 #>
 
 function Enable-VsanCluster {
@@ -97,39 +99,38 @@ function Configure-VsanDiskGroups {
         $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
         $hosts = Get-VMHost -Location $cluster
         
+        # Disks of every host in one pass instead of per-host and per-disk lookups
+        $disksByHost = @{}
+        foreach ($disk in (Get-VsanDiskInventory -ClusterName $clusterName)) {
+            if (!$disksByHost.ContainsKey($disk.Host)) {
+                $disksByHost[$disk.Host] = [System.Collections.Generic.List[object]]::new()
+            }
+            $disksByHost[$disk.Host].Add($disk)
+        }
+        
         foreach ($vmHost in $hosts) {
             Write-Host "  Processing host: $($vmHost.Name)" -ForegroundColor Gray
+            $hostDisks = @($disksByHost[$vmHost.Name])
             
             # Check existing disk groups
-            $existingDiskGroups = Get-VsanDiskGroup -VMHost $vmHost -ErrorAction SilentlyContinue
+            $existingDiskGroups = @($hostDisks | Where-Object { $_.Status -eq "Cache (In Use)" })
             
-            if ($existingDiskGroups) {
+            if ($existingDiskGroups.Count -gt 0) {
                 Write-Host "    Host already has $($existingDiskGroups.Count) disk group(s), skipping" -ForegroundColor Yellow
                 continue
             }
             
-            # Discover eligible disks
-            Write-Host "    Discovering eligible disks..." -ForegroundColor Gray
-            $discoveredDisks = Get-VsanEligibleDisk -VMHost $vmHost -ErrorAction SilentlyContinue
+            $discoveredDisks = @($hostDisks | Where-Object { $_.Status -eq "Eligible" })
             
-            if (!$discoveredDisks -or $discoveredDisks.Count -eq 0) {
+            if ($discoveredDisks.Count -eq 0) {
                 Write-Host "    No eligible disks found on host" -ForegroundColor Yellow
                 continue
             }
             
-            # Categorize disks
-            $allFlash = $true
-            $cacheDisks = @()
-            $capacityDisks = @()
-            
             foreach ($disk in $discoveredDisks) {
-                $diskInfo = Get-DiskInfo -Disk $disk
-                Write-Host "      Found: $($disk.CanonicalName) | $($diskInfo.SizeGB) GB | $($diskInfo.Type)" -ForegroundColor Gray
-                
-                if (!$disk.IsSsd) {
-                    $allFlash = $false
-                }
+                Write-Host "      Found: $($disk.CanonicalName) | $($disk.CapacityGB) GB | $($disk.Type)" -ForegroundColor Gray
             }
+            $allFlash = @($discoveredDisks | Where-Object { !$_.IsSsd }).Count -eq 0
             
             # Auto-discovery logic for disk group creation
             if ($claimMode -eq "Automatic" -or $AutoClaim) {
@@ -267,50 +268,55 @@ function Get-VsanDiskInventory {
     
     try {
         $cluster = Get-Cluster -Name $ClusterName -ErrorAction Stop
-        $hosts = Get-VMHost -Location $cluster
         
-        $inventory = @()
+        # Every host and its vSAN disk mappings in two calls for the whole cluster
+        $hostViews = @(Get-View -ViewType HostSystem -SearchRoot $cluster.ExtensionData.MoRef `
+            -Property Name, ConfigManager.VsanSystem, Runtime.ConnectionState |
+            Where-Object { "$($_.Runtime.ConnectionState)" -eq "connected" })
         
-        foreach ($vmHost in $hosts) {
-            Write-Host "  Scanning: $($vmHost.Name)" -ForegroundColor Gray
-            
-            # Get eligible disks
-            $eligibleDisks = Get-VsanEligibleDisk -VMHost $vmHost -ErrorAction SilentlyContinue
-            
-            # Get disks already in use
-            $claimedDisks = @()
-            $diskGroups = Get-VsanDiskGroup -VMHost $vmHost -ErrorAction SilentlyContinue
-            if ($diskGroups) {
-                foreach ($dg in $diskGroups) {
-                    $dgDisks = $dg | Get-VsanDisk
-                    $claimedDisks += $dgDisks
-                }
+        $vsanSystems = @{}
+        if ($hostViews.Count -gt 0) {
+            foreach ($vsanSystem in (Get-View -Id @($hostViews | ForEach-Object { $_.ConfigManager.VsanSystem }) `
+                    -Property Config.StorageInfo.DiskMapping)) {
+                $vsanSystems[$vsanSystem.MoRef.Value] = $vsanSystem
             }
+        }
+        
+        $inventory = [System.Collections.Generic.List[object]]::new()
+        
+        foreach ($hostView in $hostViews) {
+            $vsanSystem = $vsanSystems[$hostView.ConfigManager.VsanSystem.Value]
             
-            foreach ($disk in $eligibleDisks) {
-                $inventory += [PSCustomObject]@{
-                    Host          = $vmHost.Name
-                    CanonicalName = $disk.CanonicalName
-                    CapacityGB    = [math]::Round($disk.CapacityGB, 2)
-                    IsSsd         = $disk.IsSsd
-                    Type          = if ($disk.IsSsd) { "SSD" } else { "HDD" }
-                    Status        = "Eligible"
-                }
+            $cacheDisks = @{}
+            foreach ($mapping in $vsanSystem.Config.StorageInfo.DiskMapping) {
+                $cacheDisks[$mapping.Ssd.CanonicalName] = $true
             }
             
-            foreach ($disk in $claimedDisks) {
-                $inventory += [PSCustomObject]@{
-                    Host          = $vmHost.Name
-                    CanonicalName = $disk.CanonicalName
-                    CapacityGB    = [math]::Round($disk.CapacityGB, 2)
-                    IsSsd         = $disk.IsSsd
-                    Type          = if ($disk.IsSsd) { "SSD" } else { "HDD" }
-                    Status        = if ($disk.IsCacheDisk) { "Cache (In Use)" } else { "Capacity (In Use)" }
+            # One API call per host returns every local disk with its vSAN state
+            foreach ($result in $vsanSystem.QueryDisksForVsan($null)) {
+                $disk = $result.Disk
+                $status = switch ($result.State) {
+                    "eligible" { "Eligible" }
+                    "inUse"    { if ($cacheDisks[$disk.CanonicalName]) { "Cache (In Use)" } else { "Capacity (In Use)" } }
+                    default    { $null }
+                }
+                if (!$status) {
+                    continue
                 }
+                
+                $inventory.Add([PSCustomObject]@{
+                    Host          = $hostView.Name
+                    CanonicalName = $disk.CanonicalName
+                    CapacityGB    = [math]::Round([double]$disk.Capacity.Block * $disk.Capacity.BlockSize / 1GB, 2)
+                    IsSsd         = [bool]$disk.Ssd
+                    Type          = if ($disk.Ssd) { "SSD" } else { "HDD" }
+                    Status        = $status
+                })
             }
         }
         
-        return $inventory
+        Write-Host "  $($inventory.Count) disk(s) on $($hostViews.Count) connected host(s)" -ForegroundColor Gray
+        return $inventory.ToArray()
     }
     catch {
         throw "Failed to get disk inventory: $($_.Exception.Message)"
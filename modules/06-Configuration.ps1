@@ -5,11 +5,22 @@
     Configures NTP, DNS, Syslog, and security settings on ESXi hosts.
 #>
 
+# Structured progress events (no-op unless ECST_EVENT_LOG is set)
+if (!(Get-Command Write-EcstEvent -ErrorAction SilentlyContinue)) {
+    . (Join-Path $PSScriptRoot "00-Events.ps1")
+}
+
 function Set-HostNtpConfiguration {
     [CmdletBinding()]
     param(
         [Parameter(Mandatory)]
-        [PSCustomObject]$Config
+        [PSCustomObject]$Config,
+        
+        [Parameter()]
+        [string[]]$HostName,
+        
+        [Parameter()]
+        [switch]$ThrowOnHostFailure
     )
     
     $clusterName = $Config.cluster.name
@@ -19,9 +30,22 @@ function Set-HostNtpConfiguration {
     
     try {
         $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
-        $hosts = Get-VMHost -Location $cluster
+        
+        if ($HostName) {
+            # Ask for the named hosts only; a per-host request must not list the whole cluster
+            $hosts = Get-VMHost -Name $HostName -Location $cluster -ErrorAction SilentlyContinue
+            if (!$hosts) {
+                throw "Host(s) not found in cluster '$clusterName': $($HostName -join ', ')"
+            }
+        }
+        else {
+            $hosts = Get-VMHost -Location $cluster
+        }
+        
+        $failedHosts = @()
         
         foreach ($vmHost in $hosts) {
+            $hostTimer = [System.Diagnostics.Stopwatch]::StartNew()
             Write-Host "  Configuring NTP on: $($vmHost.Name)" -ForegroundColor Gray
             
             try {
@@ -48,12 +72,19 @@ function Set-HostNtpConfiguration {
                 }
                 
                 Write-Host "    NTP configured: $($ntpConfig.servers -join ', ')" -ForegroundColor Green
+                Write-EcstEvent -Type result -Step ntp -Target $vmHost.Name -Status Success -Seconds $hostTimer.Elapsed.TotalSeconds
             }
             catch {
                 Write-Host "    Warning: Failed to configure NTP: $($_.Exception.Message)" -ForegroundColor Yellow
+                $failedHosts += $vmHost.Name
+                Write-EcstEvent -Type result -Step ntp -Target $vmHost.Name -Status Failed -Seconds $hostTimer.Elapsed.TotalSeconds -Message $_.Exception.Message
             }
         }
         
+        if ($ThrowOnHostFailure -and $failedHosts.Count -gt 0) {
+            throw "Failed on host(s): $($failedHosts -join ', ')"
+        }
+        
         return $true
     }
     catch {
@@ -65,7 +96,13 @@ function Set-HostDnsConfiguration {
     [CmdletBinding()]
     param(
         [Parameter(Mandatory)]
-        [PSCustomObject]$Config
+        [PSCustomObject]$Config,
+        
+        [Parameter()]
+        [string[]]$HostName,
+        
+        [Parameter()]
+        [switch]$ThrowOnHostFailure
     )
     
     $clusterName = $Config.cluster.name
@@ -75,9 +112,22 @@ function Set-HostDnsConfiguration {
     
     try {
         $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
-        $hosts = Get-VMHost -Location $cluster
+        
+        if ($HostName) {
+            # Ask for the named hosts only; a per-host request must not list the whole cluster
+            $hosts = Get-VMHost -Name $HostName -Location $cluster -ErrorAction SilentlyContinue
+            if (!$hosts) {
+                throw "Host(s) not found in cluster '$clusterName': $($HostName -join ', ')"
+            }
+        }
+        else {
+            $hosts = Get-VMHost -Location $cluster
+        }
+        
+        $failedHosts = @()
         
         foreach ($vmHost in $hosts) {
+            $hostTimer = [System.Diagnostics.Stopwatch]::StartNew()
             Write-Host "  Configuring DNS on: $($vmHost.Name)" -ForegroundColor Gray
             
             try {
@@ -92,12 +142,19 @@ function Set-HostDnsConfiguration {
                     -ErrorAction Stop | Out-Null
                 
                 Write-Host "    DNS configured: $($dnsConfig.servers -join ', ')" -ForegroundColor Green
+                Write-EcstEvent -Type result -Step dns -Target $vmHost.Name -Status Success -Seconds $hostTimer.Elapsed.TotalSeconds
             }
             catch {
                 Write-Host "    Warning: Failed to configure DNS: $($_.Exception.Message)" -ForegroundColor Yellow
+                $failedHosts += $vmHost.Name
+                Write-EcstEvent -Type result -Step dns -Target $vmHost.Name -Status Failed -Seconds $hostTimer.Elapsed.TotalSeconds -Message $_.Exception.Message
             }
         }
         
+        if ($ThrowOnHostFailure -and $failedHosts.Count -gt 0) {
+            throw "Failed on host(s): $($failedHosts -join ', ')"
+        }
+        
         return $true
     }
     catch {
@@ -109,7 +166,13 @@ function Set-HostSyslogConfiguration {
     [CmdletBinding()]
     param(
         [Parameter(Mandatory)]
-        [PSCustomObject]$Config
+        [PSCustomObject]$Config,
+        
+        [Parameter()]
+        [string[]]$HostName,
+        
+        [Parameter()]
+        [switch]$ThrowOnHostFailure
     )
     
     $clusterName = $Config.cluster.name
@@ -119,9 +182,22 @@ function Set-HostSyslogConfiguration {
     
     try {
         $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
-        $hosts = Get-VMHost -Location $cluster
+        
+        if ($HostName) {
+            # Ask for the named hosts only; a per-host request must not list the whole cluster
+            $hosts = Get-VMHost -Name $HostName -Location $cluster -ErrorAction SilentlyContinue
+            if (!$hosts) {
+                throw "Host(s) not found in cluster '$clusterName': $($HostName -join ', ')"
+            }
+        }
+        else {
+            $hosts = Get-VMHost -Location $cluster
+        }
+        
+        $failedHosts = @()
         
         foreach ($vmHost in $hosts) {
+            $hostTimer = [System.Diagnostics.Stopwatch]::StartNew()
             Write-Host "  Configuring Syslog on: $($vmHost.Name)" -ForegroundColor Gray
             
             try {
@@ -146,12 +222,19 @@ function Set-HostSyslogConfiguration {
                 }
                 
                 Write-Host "    Syslog configured: $syslogUri" -ForegroundColor Green
+                Write-EcstEvent -Type result -Step syslog -Target $vmHost.Name -Status Success -Seconds $hostTimer.Elapsed.TotalSeconds
             }
             catch {
                 Write-Host "    Warning: Failed to configure Syslog: $($_.Exception.Message)" -ForegroundColor Yellow
+                $failedHosts += $vmHost.Name
+                Write-EcstEvent -Type result -Step syslog -Target $vmHost.Name -Status Failed -Seconds $hostTimer.Elapsed.TotalSeconds -Message $_.Exception.Message
             }
         }
         
+        if ($ThrowOnHostFailure -and $failedHosts.Count -gt 0) {
+            throw "Failed on host(s): $($failedHosts -join ', ')"
+        }
+        
         return $true
     }
     catch {
@@ -159,11 +242,77 @@ function Set-HostSyslogConfiguration {
     }
 }
 
+function Get-HostSecurityState {
+    <#
+    .SYNOPSIS
+        Read the security-relevant state of every host in one pass
+    .DESCRIPTION
+        One Get-View call returns the services, firewall rulesets and lockdown
+        mode of all hosts (or only the -HostName hosts, filtered by name in
+        the call) together with their manager objects; the shell
+        timeout is a single-option query per host. The rows are what
+        Set-HostSecurityConfiguration diffs against and applies through.
+    #>
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        $Cluster,
+        
+        [Parameter()]
+        [string[]]$HostName
+    )
+    
+    # Name the hosts in the read itself, so a batch only pulls its own hosts
+    $viewParams = @{
+        ViewType   = "HostSystem"
+        SearchRoot = $Cluster.ExtensionData.MoRef
+        Property   = @("Name", "Runtime.ConnectionState", "Config.Service.Service", "Config.Firewall.Ruleset",
+                       "Config.LockdownMode", "ConfigManager.ServiceSystem", "ConfigManager.FirewallSystem",
+                       "ConfigManager.AdvancedOption", "ConfigManager.HostAccessManager")
+    }
+    if ($HostName) {
+        $viewParams.Filter = @{ Name = "(?i)^(" + (($HostName | ForEach-Object { [regex]::Escape($_) }) -join "|") + ")$" }
+    }
+    $hostViews = @(Get-View @viewParams)
+    
+    foreach ($hostView in $hostViews) {
+        $connected = "$($hostView.Runtime.ConnectionState)" -eq "connected"
+        $shellTimeout = $null
+        $optionManager = $null
+        if ($connected) {
+            try {
+                $optionManager = Get-View -Id $hostView.ConfigManager.AdvancedOption
+                $shellTimeout = ($optionManager.QueryOptions("UserVars.ESXiShellTimeOut") | Select-Object -First 1).Value
+            }
+            catch {
+                Write-Verbose "Could not read shell timeout on $($hostView.Name): $($_.Exception.Message)"
+            }
+        }
+        
+        [PSCustomObject]@{
+            Host          = $hostView.Name
+            Connected     = $connected
+            View          = $hostView
+            Ssh           = $hostView.Config.Service.Service | Where-Object { $_.Key -eq "TSM-SSH" } | Select-Object -First 1
+            Rulesets      = @($hostView.Config.Firewall.Ruleset)
+            LockdownMode  = "$($hostView.Config.LockdownMode)"
+            ShellTimeout  = $shellTimeout
+            OptionManager = $optionManager
+        }
+    }
+}
+
 function Set-HostSecurityConfiguration {
     [CmdletBinding()]
     param(
         [Parameter(Mandatory)]
-        [PSCustomObject]$Config
+        [PSCustomObject]$Config,
+        
+        [Parameter()]
+        [string[]]$HostName,
+        
+        [Parameter()]
+        [switch]$ThrowOnHostFailure
     )
     
     $clusterName = $Config.cluster.name
@@ -171,84 +320,117 @@ function Set-HostSecurityConfiguration {
     
     Write-Host "Applying security configuration on all hosts" -ForegroundColor Cyan
     
+    $lockdownLevel = switch ($securityConfig.lockdownMode) {
+        "normal" { "lockdownNormal" }
+        "strict" { "lockdownStrict" }
+        default { "lockdownDisabled" }
+    }
+    $sshPolicy = if ($securityConfig.sshEnabled) { "on" } else { "off" }
+    
     try {
         $cluster = Get-Cluster -Name $clusterName -ErrorAction Stop
-        $hosts = Get-VMHost -Location $cluster
+        $states = @(Get-HostSecurityState -Cluster $cluster -HostName $HostName)
         
-        foreach ($vmHost in $hosts) {
-            Write-Host "  Applying security on: $($vmHost.Name)" -ForegroundColor Gray
+        if ($HostName -and !$states) {
+            throw "Host(s) not found in cluster '$clusterName': $($HostName -join ', ')"
+        }
+        
+        $failedHosts = @()
+        
+        foreach ($state in $states) {
+            $hostTimer = [System.Diagnostics.Stopwatch]::StartNew()
+            
+            if (!$state.Connected) {
+                Write-Host "  $($state.Host): not connected, skipping" -ForegroundColor Yellow
+                Write-EcstEvent -Type result -Step security -Target $state.Host -Status Skipped -Seconds 0 -Message "Not connected"
+                continue
+            }
             
             try {
-                # Configure SSH
-                $sshService = Get-VMHostService -VMHost $vmHost | Where-Object { $_.Key -eq "TSM-SSH" }
+                # Diff against the state read up front; only differences touch the host
+                $applied = @()
+                $notes = @()
                 
-                if ($securityConfig.sshEnabled) {
-                    if (!$sshService.Running) {
-                        Start-VMHostService -HostService $sshService -Confirm:$false | Out-Null
+                if ($state.Ssh -and ($state.Ssh.Policy -ne $sshPolicy -or [bool]$state.Ssh.Running -ne [bool]$securityConfig.sshEnabled)) {
+                    $serviceSystem = Get-View -Id $state.View.ConfigManager.ServiceSystem
+                    if ($state.Ssh.Policy -ne $sshPolicy) {
+                        $serviceSystem.UpdateServicePolicy("TSM-SSH", $sshPolicy)
+                        $applied += "SSH policy $sshPolicy"
                     }
-                    Set-VMHostService -HostService $sshService -Policy "on" -Confirm:$false | Out-Null
-                    Write-Host "    SSH: Enabled" -ForegroundColor Yellow
-                } else {
-                    if ($sshService.Running) {
-                        Stop-VMHostService -HostService $sshService -Confirm:$false | Out-Null
+                    if ($securityConfig.sshEnabled -and !$state.Ssh.Running) {
+                        $serviceSystem.StartService("TSM-SSH")
+                        $applied += "SSH started"
+                    } elseif (!$securityConfig.sshEnabled -and $state.Ssh.Running) {
+                        $serviceSystem.StopService("TSM-SSH")
+                        $applied += "SSH stopped"
                     }
-                    Set-VMHostService -HostService $sshService -Policy "off" -Confirm:$false | Out-Null
-                    Write-Host "    SSH: Disabled" -ForegroundColor Green
                 }
                 
-                # Configure Shell Timeout
-                $esxcli = Get-EsxCli -VMHost $vmHost -V2
-                
-                try {
-                    $esxcli.system.settings.advanced.set.Invoke(@{
-                        option = "/UserVars/ESXiShellTimeOut"
-                        intvalue = $securityConfig.shellTimeout
-                    }) | Out-Null
-                    Write-Host "    Shell Timeout: $($securityConfig.shellTimeout) seconds" -ForegroundColor Gray
-                }
-                catch {
-                    Write-Host "    Note: Could not set shell timeout" -ForegroundColor Yellow
+                if ($null -ne $securityConfig.shellTimeout -and "$($state.ShellTimeout)" -ne "$($securityConfig.shellTimeout)") {
+                    try {
+                        $option = New-Object VMware.Vim.OptionValue
+                        $option.Key = "UserVars.ESXiShellTimeOut"
+                        $option.Value = [long]$securityConfig.shellTimeout
+                        $state.OptionManager.UpdateOptions(@($option))
+                        $applied += "shell timeout $($securityConfig.shellTimeout)s"
+                    }
+                    catch {
+                        $notes += "could not set shell timeout"
+                    }
                 }
                 
-                # Configure Lockdown Mode
-                if ($securityConfig.lockdownMode -ne "disabled") {
-                    $lockdownLevel = switch ($securityConfig.lockdownMode) {
-                        "normal" { "lockdownNormal" }
-                        "strict" { "lockdownStrict" }
-                        default { "lockdownDisabled" }
-                    }
-                    
+                if ($securityConfig.lockdownMode -ne "disabled" -and $state.LockdownMode -ne $lockdownLevel) {
                     try {
-                        $hostView = Get-View $vmHost -Property ConfigManager.HostAccessManager
-                        $accessManager = Get-View $hostView.ConfigManager.HostAccessManager
-                        $accessManager.ChangeLockdownMode($lockdownLevel)
-                        Write-Host "    Lockdown Mode: $($securityConfig.lockdownMode)" -ForegroundColor Gray
+                        (Get-View -Id $state.View.ConfigManager.HostAccessManager).ChangeLockdownMode($lockdownLevel)
+                        $applied += "lockdown $($securityConfig.lockdownMode)"
                     }
                     catch {
-                        Write-Host "    Note: Could not set lockdown mode" -ForegroundColor Yellow
+                        $notes += "could not set lockdown mode"
                     }
                 }
                 
-                # Enable required firewall rulesets
+                # Rulesets match by key or label; ones the host does not have are noted, not failed
+                $rulesets = @()
                 foreach ($ruleset in $securityConfig.firewallRulesetsEnabled) {
-                    try {
-                        $rule = Get-VMHostFirewallException -VMHost $vmHost -Name $ruleset -ErrorAction SilentlyContinue
-                        if ($rule) {
-                            Set-VMHostFirewallException -Exception $rule -Enabled $true -Confirm:$false | Out-Null
-                        }
+                    $match = $state.Rulesets | Where-Object { $_.Key -eq $ruleset -or $_.Label -eq $ruleset } | Select-Object -First 1
+                    if (!$match) {
+                        $notes += "no ruleset '$ruleset'"
+                    } elseif (!$match.Enabled) {
+                        $rulesets += $match.Key
                     }
-                    catch {
-                        # Silently continue if ruleset doesn't exist
+                }
+                if ($rulesets) {
+                    $firewallSystem = Get-View -Id $state.View.ConfigManager.FirewallSystem
+                    foreach ($key in $rulesets) {
+                        $firewallSystem.EnableRuleset($key)
                     }
+                    $applied += "firewall $($rulesets -join ', ')"
+                }
+                
+                if ($applied) {
+                    Write-Host "  $($state.Host): $($applied -join ', ')" -ForegroundColor Green
+                } else {
+                    Write-Host "  $($state.Host): already compliant" -ForegroundColor Gray
+                }
+                if ($notes) {
+                    Write-Host "    Note: $($notes -join '; ')" -ForegroundColor Yellow
                 }
                 
-                Write-Host "    Security configuration applied" -ForegroundColor Green
+                $status = if ($applied) { "Success" } else { "Skipped" }
+                Write-EcstEvent -Type result -Step security -Target $state.Host -Status $status -Seconds $hostTimer.Elapsed.TotalSeconds `
+                    -Message ((@($applied) + @($notes)) -join ', ')
             }
             catch {
-                Write-Host "    Warning: Failed to apply security config: $($_.Exception.Message)" -ForegroundColor Yellow
+                Write-Host "  $($state.Host): Warning: Failed to apply security config: $($_.Exception.Message)" -ForegroundColor Yellow
+                $failedHosts += $state.Host
+                Write-EcstEvent -Type result -Step security -Target $state.Host -Status Failed -Seconds $hostTimer.Elapsed.TotalSeconds -Message $_.Exception.Message
             }
         }
         
+        if ($ThrowOnHostFailure -and $failedHosts.Count -gt 0) {
+            throw "Failed on host(s): $($failedHosts -join ', ')"
+        }
+        
         return $true
     }
     catch {
@@ -257,38 +439,93 @@ function Set-HostSecurityConfiguration {
 }
 
 function Get-HostConfiguration {
+    <#
+    .SYNOPSIS
+        Read the NTP, DNS, syslog and security state of many hosts in one pass
+    .DESCRIPTION
+        One Get-View call covers NTP, DNS, services, firewall rulesets and
+        lockdown mode for every host (or only the -HostName hosts, filtered
+        by name in the call); syslog and
+        shell timeout come from one Get-AdvancedSetting call for all of them.
+        Each row carries a hash of its contents. Hosts whose hash equals the
+        one in -KnownHash are returned as name and hash only, so a repeat
+        scan ships just the hosts that changed.
+    #>
     [CmdletBinding()]
     param(
-        [Parameter(Mandatory)]
-        [string]$HostName
+        [Parameter()]
+        [string[]]$HostName,
+        
+        # Hostname -> hash from an earlier call
+        [Parameter()]
+        [hashtable]$KnownHash = @{}
     )
     
+    if (!$global:DefaultVIServer -or !$global:DefaultVIServer.IsConnected) {
+        throw "Not connected to vCenter"
+    }
+    
     try {
-        $vmHost = Get-VMHost -Name $HostName -ErrorAction Stop
-        
-        # Get NTP
-        $ntpServers = Get-VMHostNtpServer -VMHost $vmHost
-        $ntpService = Get-VMHostService -VMHost $vmHost | Where-Object { $_.Key -eq "ntpd" }
-        
-        # Get DNS
-        $network = Get-VMHostNetwork -VMHost $vmHost
-        
-        # Get SSH
-        $sshService = Get-VMHostService -VMHost $vmHost | Where-Object { $_.Key -eq "TSM-SSH" }
+        # Name the hosts in the read itself rather than pulling every host in vCenter
+        $viewParams = @{
+            ViewType = "HostSystem"
+            Property = @("Name", "Runtime.ConnectionState", "Config.DateTimeInfo.NtpConfig.Server",
+                         "Config.Network.DnsConfig", "Config.Service.Service", "Config.Firewall.Ruleset",
+                         "Config.LockdownMode")
+        }
+        if ($HostName) {
+            $viewParams.Filter = @{ Name = "(?i)^(" + (($HostName | ForEach-Object { [regex]::Escape($_) }) -join "|") + ")$" }
+        }
+        $hostViews = @(Get-View @viewParams)
         
-        return @{
-            HostName      = $HostName
-            NtpServers    = $ntpServers
-            NtpRunning    = $ntpService.Running
-            NtpPolicy     = $ntpService.Policy
-            DnsServers    = $network.DnsAddress
-            SearchDomains = $network.SearchDomain
-            SshEnabled    = $sshService.Running
+        $advanced = @{}
+        $connected = @($hostViews | Where-Object { "$($_.Runtime.ConnectionState)" -eq "connected" })
+        if ($connected.Count -gt 0) {
+            $vmHosts = Get-VIObjectByVIView -VIView $connected
+            foreach ($setting in (Get-AdvancedSetting -Entity $vmHosts -Name 'Syslog.global.logHost', 'UserVars.ESXiShellTimeOut' -ErrorAction SilentlyContinue)) {
+                $advanced["$($setting.Entity.Name)|$($setting.Name)"] = $setting.Value
+            }
         }
     }
     catch {
         throw "Failed to get host configuration: $($_.Exception.Message)"
     }
+    
+    $sha = [System.Security.Cryptography.SHA256]::Create()
+    
+    foreach ($hostView in $hostViews) {
+        $services = @{}
+        foreach ($service in $hostView.Config.Service.Service) {
+            $services[$service.Key] = [ordered]@{ running = [bool]$service.Running; policy = "$($service.Policy)" }
+        }
+        
+        # Ordered keys and sorted lists keep the hash stable between calls
+        $row = [ordered]@{
+            name          = $hostView.Name
+            connected     = "$($hostView.Runtime.ConnectionState)" -eq "connected"
+            ntpServers    = @($hostView.Config.DateTimeInfo.NtpConfig.Server)
+            ntpd          = $services["ntpd"]
+            dnsServers    = @($hostView.Config.Network.DnsConfig.Address)
+            searchDomains = @($hostView.Config.Network.DnsConfig.SearchDomain)
+            syslogHost    = $advanced["$($hostView.Name)|Syslog.global.logHost"]
+            ssh           = $services["TSM-SSH"]
+            shellTimeout  = $advanced["$($hostView.Name)|UserVars.ESXiShellTimeOut"]
+            lockdownMode  = "$($hostView.Config.LockdownMode)"
+            firewall      = @($hostView.Config.Firewall.Ruleset | Sort-Object Key | ForEach-Object {
+                [ordered]@{ key = $_.Key; label = $_.Label; enabled = [bool]$_.Enabled }
+            })
+        }
+        
+        $json = $row | ConvertTo-Json -Compress -Depth 5
+        $hash = [BitConverter]::ToString($sha.ComputeHash([System.Text.Encoding]::UTF8.GetBytes($json))).Replace("-", "").ToLower()
+        
+        if ($KnownHash[$hostView.Name] -eq $hash) {
+            @{ name = $hostView.Name; hash = $hash; unchanged = $true }
+        } else {
+            $row.hash = $hash
+            $row
+        }
+    }
 }
 
 function Set-HostAdvancedSetting {
@@ -319,4 +556,4 @@ function Set-HostAdvancedSetting {
 }
 
 # Export functions
-Export-ModuleMember -Function Set-HostNtpConfiguration, Set-HostDnsConfiguration, Set-HostSyslogConfiguration, Set-HostSecurityConfiguration, Get-HostConfiguration, Set-HostAdvancedSetting -ErrorAction SilentlyContinue
+Export-ModuleMember -Function Set-HostNtpConfiguration, Set-HostDnsConfiguration, Set-HostSyslogConfiguration, Get-HostSecurityState, Set-HostSecurityConfiguration, Get-HostConfiguration, Set-HostAdvancedSetting -ErrorAction SilentlyContinue
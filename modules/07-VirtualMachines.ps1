@@ -0,0 +1,398 @@
+<#
+.SYNOPSIS
+    Virtual Machine Batch Provisioning Module
+.DESCRIPTION
+    Deploys many VMs from a manifest. Shared objects are resolved once, clones
+    are submitted as async vCenter tasks with a bounded number in flight, and
+    customization, tagging and power-on run as each clone finishes. VMs that
+    carry a datastoreId/hostId from ecst-vmware.py's placement plan are
+    created there; the others share one datastore picked for the batch.
+    A clone or power-on that outlives its deadline, or that vCenter stops
+    reporting, fails that VM instead of stalling the batch.
+#>
+
+function Complete-VMBatchItem {
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        $Result,
+
+        [Parameter(Mandatory)]
+        [ValidateSet("Success", "Failed")]
+        [string]$Status,
+
+        [Parameter()]
+        [string]$ErrorMessage
+    )
+
+    $Result.status = $Status
+    $Result.error = $ErrorMessage
+    if ($Result.started) {
+        $Result.seconds = [math]::Round(((Get-Date) - $Result.started).TotalSeconds, 1)
+    }
+
+    if ($Status -eq "Success") {
+        Write-Host "  [$($Result.name)] Completed in $($Result.seconds)s" -ForegroundColor Green
+    } else {
+        Write-Host "  [$($Result.name)] Failed at $($Result.stage): $ErrorMessage" -ForegroundColor Red
+    }
+
+    # Stream the per-VM result to the Python tool when running in the worker
+    if (Get-Command Send-EcstData -ErrorAction SilentlyContinue) {
+        Send-EcstData @{
+            name    = $Result.name
+            status  = $Result.status
+            stage   = $Result.stage
+            error   = $Result.error
+            seconds = $Result.seconds
+        }
+    }
+}
+
+function Get-AbandonedVMBatchTasks {
+    # Returns task ID -> reason for in-flight tasks to stop waiting on: still running
+    # past their deadline, or missing from Get-Task for MaxMissedPolls polls in a row
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        [hashtable]$Watch,
+
+        [Parameter()]
+        [object[]]$Reported = @(),
+
+        [Parameter(Mandatory)]
+        [string]$Kind,
+
+        [Parameter(Mandatory)]
+        [int]$MaxMissedPolls
+    )
+
+    $abandoned = @{}
+    $seen = @{}
+    $now = Get-Date
+    foreach ($task in $Reported) {
+        $seen[$task.Id] = $true
+        $entry = $Watch[$task.Id]
+        if ($entry -and $task.State -in @("Queued", "Running") -and $now -gt $entry.Deadline) {
+            $abandoned[$task.Id] = "$Kind task still $($task.State) after $($entry.Minutes) minutes"
+        }
+    }
+    foreach ($taskId in @($Watch.Keys)) {
+        if ($seen[$taskId]) {
+            $Watch[$taskId].Missed = 0
+            continue
+        }
+        $Watch[$taskId].Missed++
+        if ($Watch[$taskId].Missed -ge $MaxMissedPolls -or $now -gt $Watch[$taskId].Deadline) {
+            $abandoned[$taskId] = "$Kind task $taskId is no longer reported by vCenter"
+        }
+    }
+    foreach ($taskId in $abandoned.Keys) {
+        $Watch.Remove($taskId)
+    }
+    return $abandoned
+}
+
+function New-VMBatch {
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        [PSCustomObject]$Config,
+
+        [Parameter(Mandatory)]
+        [object[]]$VMs,
+
+        [Parameter()]
+        [int]$MaxInFlight = 8,
+
+        [Parameter()]
+        [int]$PollSeconds = 5,
+
+        [Parameter()]
+        [switch]$PowerOn,
+
+        # A clone or power-on still running after this long fails the VM
+        [Parameter()]
+        [int]$TaskTimeoutMinutes = 60,
+
+        # Polls a task may be missing from Get-Task (purged history, dropped session) before the VM fails
+        [Parameter()]
+        [int]$MaxMissedPolls = 3,
+
+        # MoRef IDs already resolved by the caller (ecst-vmware.py's inventory index)
+        [Parameter()]
+        [string]$ClusterId,
+
+        [Parameter()]
+        [string]$DatastoreId,
+
+        [Parameter()]
+        [string]$PortGroupId
+    )
+
+    Write-Host "Deploying $($VMs.Count) VMs ($MaxInFlight clones in flight)" -ForegroundColor Cyan
+
+    # Resolve shared objects once for the whole batch, by ID when the caller knows it
+    if ($ClusterId) {
+        $cluster = Get-Cluster -Id $ClusterId -ErrorAction Stop
+    } else {
+        $cluster = Get-Cluster -Name $Config.cluster.name -ErrorAction Stop
+    }
+
+    if ($DatastoreId) {
+        $datastore = Get-Datastore -Id $DatastoreId -ErrorAction Stop
+    } else {
+        $datastores = @(Get-Datastore -Location $cluster)
+        $datastore = $datastores | Where-Object { $_.Type -eq 'vsan' } | Select-Object -First 1
+        if (-not $datastore) {
+            $datastore = $datastores | Sort-Object FreeSpaceGB -Descending | Select-Object -First 1
+        }
+    }
+
+    if ($PortGroupId) {
+        $portGroup = Get-VDPortgroup -Id $PortGroupId -ErrorAction Stop
+    } else {
+        $portGroup = Get-VDPortgroup -Name 'PG-VMTraffic' -ErrorAction SilentlyContinue
+    }
+    if (-not $portGroup) {
+        $portGroup = Get-VirtualPortGroup | Select-Object -First 1
+    }
+
+    $templates = @{}
+    $templateIds = @($VMs | Where-Object { $_.template -and $_.templateId } | ForEach-Object { $_.templateId } | Sort-Object -Unique)
+    if ($templateIds.Count -gt 0) {
+        foreach ($template in (Get-Template -Id $templateIds -ErrorAction SilentlyContinue)) {
+            $templates[$template.Name] = $template
+        }
+    }
+    $templateNames = @($VMs | Where-Object { $_.template } | ForEach-Object { $_.template } | Sort-Object -Unique)
+    $unresolved = @($templateNames | Where-Object { !$templates.ContainsKey($_) })
+    if ($unresolved.Count -gt 0) {
+        foreach ($template in (Get-Template -Name $unresolved -ErrorAction SilentlyContinue)) {
+            $templates[$template.Name] = $template
+        }
+    }
+
+    # Per-VM placement (datastoreId/hostId from the caller's placement plan), one lookup per object type
+    $placedDatastores = @{}
+    $datastoreIds = @($VMs | Where-Object { $_.datastoreId } | ForEach-Object { $_.datastoreId } | Sort-Object -Unique)
+    if ($datastoreIds.Count -gt 0) {
+        foreach ($placed in (Get-Datastore -Id $datastoreIds -ErrorAction SilentlyContinue)) {
+            $placedDatastores[$placed.Id] = $placed
+        }
+    }
+    $placedHosts = @{}
+    $hostIds = @($VMs | Where-Object { $_.hostId } | ForEach-Object { $_.hostId } | Sort-Object -Unique)
+    if ($hostIds.Count -gt 0) {
+        foreach ($placed in (Get-VMHost -Id $hostIds -ErrorAction SilentlyContinue)) {
+            $placedHosts[$placed.Id] = $placed
+        }
+    }
+
+    $tags = @{}
+    $tagIds = @($VMs | Where-Object { $_.tag -and $_.tagId } | ForEach-Object { $_.tagId } | Sort-Object -Unique)
+    if ($tagIds.Count -gt 0) {
+        foreach ($tag in (Get-Tag -Id $tagIds -ErrorAction SilentlyContinue)) {
+            $tags[$tag.Name] = $tag
+        }
+    }
+    $tagNames = @($VMs | Where-Object { $_.tag } | ForEach-Object { $_.tag } | Sort-Object -Unique)
+    $unresolved = @($tagNames | Where-Object { !$tags.ContainsKey($_) })
+    if ($unresolved.Count -gt 0) {
+        foreach ($tag in (Get-Tag -Name $unresolved -ErrorAction SilentlyContinue)) {
+            $tags[$tag.Name] = $tag
+        }
+    }
+
+    Write-Host "  Cluster: $($cluster.Name) | Datastore: $($datastore.Name) | Port group: $($portGroup.Name)" -ForegroundColor Gray
+    Write-Host "  Templates resolved: $($templates.Count)/$($templateNames.Count) | Tags resolved: $($tags.Count)/$($tagNames.Count)" -ForegroundColor Gray
+    if ($datastoreIds.Count -gt 0) {
+        Write-Host "  Placement: $($placedDatastores.Count)/$($datastoreIds.Count) datastores, $($placedHosts.Count)/$($hostIds.Count) hosts" -ForegroundColor Gray
+    }
+
+    $results = [ordered]@{}
+    $pending = New-Object System.Collections.Queue
+    foreach ($spec in $VMs) {
+        $results[$spec.name] = @{
+            name    = $spec.name
+            status  = "Pending"
+            stage   = "queued"
+            error   = $null
+            started = $null
+            seconds = 0
+        }
+        $pending.Enqueue($spec)
+    }
+
+    $inFlight = @{}
+    $powerTasks = @{}
+    $cloneWatch = @{}
+    $powerWatch = @{}
+
+    while ($pending.Count -gt 0 -or $inFlight.Count -gt 0) {
+        # Stage 1: submit clones up to the in-flight limit
+        while ($pending.Count -gt 0 -and $inFlight.Count -lt $MaxInFlight) {
+            $spec = $pending.Dequeue()
+            $result = $results[$spec.name]
+            $result.started = Get-Date
+            $result.stage = "clone"
+
+            try {
+                $placement = @{ ResourcePool = $cluster; Datastore = $datastore }
+                if ($spec.datastoreId) {
+                    $placement.Datastore = $placedDatastores[$spec.datastoreId]
+                    if (!$placement.Datastore) {
+                        throw "Placed datastore '$($spec.datastoreId)' not found"
+                    }
+                }
+                if ($spec.hostId -and $placedHosts[$spec.hostId]) {
+                    $placement.VMHost = $placedHosts[$spec.hostId]
+                }
+
+                if ($spec.template) {
+                    $template = $templates[$spec.template]
+                    if (!$template) {
+                        throw "Template '$($spec.template)' not found"
+                    }
+                    $task = New-VM -Name $spec.name `
+                        -Template $template `
+                        @placement `
+                        -RunAsync `
+                        -ErrorAction Stop
+                } else {
+                    $task = New-VM -Name $spec.name `
+                        @placement `
+                        -NumCpu $spec.cpu `
+                        -MemoryGB $spec.memoryGb `
+                        -DiskGB $spec.diskGb `
+                        -DiskStorageFormat Thin `
+                        -GuestId $spec.guestId `
+                        -NetworkName $portGroup.Name `
+                        -RunAsync `
+                        -ErrorAction Stop
+                }
+
+                $inFlight[$task.Id] = $spec
+                $cloneWatch[$task.Id] = @{ Deadline = (Get-Date).AddMinutes($TaskTimeoutMinutes); Minutes = $TaskTimeoutMinutes; Missed = 0 }
+                Write-Host "  [$($spec.name)] Clone submitted" -ForegroundColor Gray
+            }
+            catch {
+                Complete-VMBatchItem -Result $result -Status Failed -ErrorMessage $_.Exception.Message
+            }
+        }
+
+        if ($inFlight.Count -eq 0) {
+            continue
+        }
+
+        Start-Sleep -Seconds $PollSeconds
+
+        # Poll every in-flight clone in a single call
+        $tasks = @(Get-Task -Id @($inFlight.Keys) -ErrorAction SilentlyContinue)
+
+        $abandoned = Get-AbandonedVMBatchTasks -Watch $cloneWatch -Reported $tasks -Kind Clone -MaxMissedPolls $MaxMissedPolls
+        foreach ($taskId in $abandoned.Keys) {
+            $spec = $inFlight[$taskId]
+            $inFlight.Remove($taskId)
+            Complete-VMBatchItem -Result $results[$spec.name] -Status Failed -ErrorMessage $abandoned[$taskId]
+        }
+
+        foreach ($task in $tasks) {
+            if ($task.State -in @("Queued", "Running") -or !$inFlight.ContainsKey($task.Id)) {
+                continue
+            }
+
+            $spec = $inFlight[$task.Id]
+            $inFlight.Remove($task.Id)
+            $cloneWatch.Remove($task.Id)
+            $result = $results[$spec.name]
+
+            if ($task.State -ne "Success") {
+                $message = $task.ExtensionData.Info.Error.LocalizedMessage
+                Complete-VMBatchItem -Result $result -Status Failed -ErrorMessage "Clone task $($task.State): $message"
+                continue
+            }
+
+            # Stages 2-4 run for this VM while other clones are still in flight
+            try {
+                $vm = Get-VIObjectByVIView -MORef $task.ExtensionData.Info.Result -ErrorAction Stop
+
+                if ($spec.template) {
+                    $result.stage = "customize"
+                    Set-VM -VM $vm `
+                        -NumCpu $spec.cpu `
+                        -MemoryGB $spec.memoryGb `
+                        -Confirm:$false `
+                        -ErrorAction Stop | Out-Null
+
+                    Get-NetworkAdapter -VM $vm |
+                        Set-NetworkAdapter -Portgroup $portGroup -Confirm:$false -ErrorAction Stop | Out-Null
+                }
+
+                if ($spec.tag) {
+                    $result.stage = "tag"
+                    if ($tags[$spec.tag]) {
+                        New-TagAssignment -Tag $tags[$spec.tag] -Entity $vm -ErrorAction Stop | Out-Null
+                    } else {
+                        Write-Host "  [$($spec.name)] Note: Tag '$($spec.tag)' not found, skipping tag assignment" -ForegroundColor Yellow
+                    }
+                }
+
+                if ($PowerOn) {
+                    $result.stage = "power-on"
+                    $powerTask = Start-VM -VM $vm -RunAsync -Confirm:$false -ErrorAction Stop
+                    $powerTasks[$powerTask.Id] = $spec.name
+                    $powerWatch[$powerTask.Id] = @{ Deadline = (Get-Date).AddMinutes($TaskTimeoutMinutes); Minutes = $TaskTimeoutMinutes; Missed = 0 }
+                } else {
+                    $result.stage = "done"
+                    Complete-VMBatchItem -Result $result -Status Success
+                }
+            }
+            catch {
+                Complete-VMBatchItem -Result $result -Status Failed -ErrorMessage $_.Exception.Message
+            }
+        }
+    }
+
+    # Wait for outstanding power-on tasks, polling them together
+    while ($powerTasks.Count -gt 0) {
+        Start-Sleep -Seconds $PollSeconds
+
+        $tasks = @(Get-Task -Id @($powerTasks.Keys) -ErrorAction SilentlyContinue)
+
+        $abandoned = Get-AbandonedVMBatchTasks -Watch $powerWatch -Reported $tasks -Kind Power-on -MaxMissedPolls $MaxMissedPolls
+        foreach ($taskId in $abandoned.Keys) {
+            $result = $results[$powerTasks[$taskId]]
+            $powerTasks.Remove($taskId)
+            Complete-VMBatchItem -Result $result -Status Failed -ErrorMessage $abandoned[$taskId]
+        }
+
+        foreach ($task in $tasks) {
+            if ($task.State -in @("Queued", "Running") -or !$powerTasks.ContainsKey($task.Id)) {
+                continue
+            }
+
+            $result = $results[$powerTasks[$task.Id]]
+            $powerTasks.Remove($task.Id)
+            $powerWatch.Remove($task.Id)
+
+            if ($task.State -eq "Success") {
+                $result.stage = "done"
+                Complete-VMBatchItem -Result $result -Status Success
+            } else {
+                Complete-VMBatchItem -Result $result -Status Failed -ErrorMessage "Power-on task $($task.State): $($task.ExtensionData.Info.Error.LocalizedMessage)"
+            }
+        }
+    }
+
+    # Summary
+    $succeeded = @($results.Values | Where-Object { $_.status -eq "Success" }).Count
+    Write-Host "`nVM Batch Summary:" -ForegroundColor Cyan
+    Write-Host "  Successful: $succeeded" -ForegroundColor Green
+    Write-Host "  Failed:     $($results.Count - $succeeded)" -ForegroundColor Red
+
+    return $results.Values
+}
+
+# Export functions
+Export-ModuleMember -Function New-VMBatch -ErrorAction SilentlyContinue
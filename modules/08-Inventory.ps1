@@ -0,0 +1,400 @@
+<#
+.SYNOPSIS
+    Inventory Snapshot Module
+.DESCRIPTION
+    Collects a flat snapshot of the vCenter inventory with one Get-View call
+    per object type, fetching only the properties needed for reporting.
+    Relationships are returned as MoRef IDs so callers can aggregate counts
+    locally instead of issuing a query per datacenter, cluster or switch.
+
+    Get-ConfigurationState reads the live values of everything config.json
+    declares, in a fixed number of calls, so ecst-vmware.py can plan changes.
+
+    Get-InventoryIndex returns rows for ecst-vmware.py's local inventory
+    index, one bulk read per object kind. VMs and templates are incremental:
+    with -Since only those whose Config.ChangeVersion is newer are returned
+    in full. Host and power state are not covered by ChangeVersion, so they
+    are returned for all of them, which also lets deletions be detected.
+#>
+
+function Get-InventorySnapshot {
+    [CmdletBinding()]
+    param(
+        [Parameter()]
+        [string]$Server
+    )
+
+    $viServer = if ($Server) { $global:DefaultVIServers | Where-Object { $_.Name -eq $Server } } else { $global:DefaultVIServer }
+    if (!$viServer -or !$viServer.IsConnected) {
+        throw "Not connected to vCenter"
+    }
+
+    $view = @{ Server = $viServer; ErrorAction = 'Stop' }
+    $id = { param($moref) if ($moref) { "$($moref.Type)-$($moref.Value)" } else { $null } }
+
+    try {
+        $folders = @(Get-View @view -ViewType Folder -Property Name, Parent | ForEach-Object {
+            @{ id = (& $id $_.MoRef); name = $_.Name; parent = (& $id $_.Parent) }
+        })
+
+        $datacenters = @(Get-View @view -ViewType Datacenter -Property Name, Parent | ForEach-Object {
+            @{ id = (& $id $_.MoRef); name = $_.Name; parent = (& $id $_.Parent) }
+        })
+
+        # Standalone hosts sit under a plain ComputeResource; clusters are listed separately below
+        $computeResources = @(Get-View @view -ViewType ComputeResource -Property Name, Parent | ForEach-Object {
+            @{ id = (& $id $_.MoRef); name = $_.Name; parent = (& $id $_.Parent) }
+        })
+
+        $clusters = @(Get-View @view -ViewType ClusterComputeResource -Property Name, Parent, `
+            Configuration.DasConfig.Enabled, Configuration.DrsConfig.Enabled | ForEach-Object {
+            @{
+                id         = (& $id $_.MoRef)
+                name       = $_.Name
+                parent     = (& $id $_.Parent)
+                haEnabled  = [bool]$_.Configuration.DasConfig.Enabled
+                drsEnabled = [bool]$_.Configuration.DrsConfig.Enabled
+            }
+        })
+
+        $hosts = @(Get-View @view -ViewType HostSystem -Property Name, Parent, Runtime.ConnectionState, `
+            Runtime.PowerState, Runtime.InMaintenanceMode, Config.Product.Version, `
+            Summary.Hardware.CpuMhz, Summary.Hardware.NumCpuCores, Summary.Hardware.MemorySize | ForEach-Object {
+            @{
+                id                = (& $id $_.MoRef)
+                name              = $_.Name
+                parent            = (& $id $_.Parent)
+                connectionState   = "$($_.Runtime.ConnectionState)"
+                powerState        = "$($_.Runtime.PowerState)"
+                inMaintenanceMode = [bool]$_.Runtime.InMaintenanceMode
+                version           = $_.Config.Product.Version
+                cpuMhz            = [long]$_.Summary.Hardware.CpuMhz * [long]$_.Summary.Hardware.NumCpuCores
+                memoryBytes       = [long]$_.Summary.Hardware.MemorySize
+            }
+        })
+
+        # Templates are excluded to match Get-VM
+        $vms = @(Get-View @view -ViewType VirtualMachine -Property Parent, Runtime.Host, Config.Template |
+            Where-Object { !$_.Config.Template } | ForEach-Object {
+            @{ parent = (& $id $_.Parent); host = (& $id $_.Runtime.Host) }
+        })
+
+        $datastores = @(Get-View @view -ViewType Datastore -Property Name, Summary.Type, `
+            Summary.Capacity, Summary.FreeSpace | ForEach-Object {
+            @{
+                name          = $_.Name
+                type          = $_.Summary.Type
+                capacityBytes = [long]$_.Summary.Capacity
+                freeBytes     = [long]$_.Summary.FreeSpace
+            }
+        })
+
+        $switches = @(Get-View @view -ViewType DistributedVirtualSwitch -Property Name, `
+            Summary.ProductInfo.Version, Config.MaxMtu, Summary.HostMember, Portgroup | ForEach-Object {
+            @{
+                name       = $_.Name
+                version    = $_.Summary.ProductInfo.Version
+                mtu        = $_.Config.MaxMtu
+                hosts      = @($_.Summary.HostMember).Count
+                portGroups = @($_.Portgroup).Count
+            }
+        })
+    }
+    catch {
+        throw "Failed to collect inventory: $($_.Exception.Message)"
+    }
+
+    return @{
+        vcenter          = @{ server = $viServer.Name; version = $viServer.Version }
+        folders          = $folders
+        datacenters      = $datacenters
+        computeResources = $computeResources
+        clusters         = $clusters
+        hosts            = $hosts
+        vms              = $vms
+        datastores       = $datastores
+        vds              = $switches
+    }
+}
+
+function Get-ConfigurationState {
+    [CmdletBinding()]
+    param(
+        [Parameter(Mandatory)]
+        [PSCustomObject]$Config
+    )
+
+    if (!$global:DefaultVIServer -or !$global:DefaultVIServer.IsConnected) {
+        throw "Not connected to vCenter"
+    }
+
+    $exact = { param($name) "^$([regex]::Escape($name))$" }
+    $id = { param($moref) if ($moref) { "$($moref.Type)-$($moref.Value)" } else { $null } }
+    $hostNames = @($Config.esxiHosts | ForEach-Object { $_.hostname })
+
+    try {
+        $datacenter = Get-View -ViewType Datacenter -Property Name -Filter @{ Name = (& $exact $Config.datacenter.name) }
+
+        $cluster = Get-View -ViewType ClusterComputeResource -Property Name, Configuration.DasConfig.Enabled, `
+            Configuration.DrsConfig.Enabled, Configuration.DrsConfig.DefaultVmBehavior, ConfigurationEx `
+            -Filter @{ Name = (& $exact $Config.cluster.name) } | Select-Object -First 1
+
+        # One read for every configured host, with only the properties the plan compares
+        $hostViews = @(Get-View -ViewType HostSystem -Property Name, Parent, Config.DateTimeInfo.NtpConfig.Server, `
+            Config.Network.DnsConfig, Config.Network.Vnic, Config.VirtualNicManagerInfo.NetConfig, `
+            Config.Service.Service, Config.LockdownMode, Config.VsanHostConfig.StorageInfo.DiskMapping |
+            Where-Object { $_.Name -in $hostNames })
+
+        # Advanced settings for all hosts in a single call
+        $advanced = @{}
+        if ($hostViews.Count -gt 0) {
+            $vmHosts = Get-VIObjectByVIView -VIView $hostViews
+            foreach ($setting in (Get-AdvancedSetting -Entity $vmHosts -Name 'Syslog.global.logHost', 'UserVars.ESXiShellTimeOut' -ErrorAction SilentlyContinue)) {
+                $advanced["$($setting.Entity.Name)|$($setting.Name)"] = $setting.Value
+            }
+        }
+
+        $vds = Get-View -ViewType VmwareDistributedVirtualSwitch -Property Name, Config.MaxMtu, Config.Host `
+            -Filter @{ Name = (& $exact $Config.networking.vds.name) } | Select-Object -First 1
+
+        $portGroups = @()
+        if ($vds) {
+            $portGroups = @(Get-View -ViewType DistributedVirtualPortgroup -Property Name, `
+                Config.DistributedVirtualSwitch, Config.DefaultPortConfig |
+                Where-Object { (& $id $_.Config.DistributedVirtualSwitch) -eq (& $id $vds.MoRef) } | ForEach-Object {
+                @{ name = $_.Name; vlanId = $_.Config.DefaultPortConfig.Vlan.VlanId }
+            })
+        }
+    }
+    catch {
+        throw "Failed to read configuration state: $($_.Exception.Message)"
+    }
+
+    $vdsHosts = @()
+    if ($vds) {
+        $vdsHosts = @($vds.Config.Host | ForEach-Object { & $id $_.Config.Host })
+    }
+
+    $hosts = @($hostViews | ForEach-Object {
+        $services = @{}
+        foreach ($service in $_.Config.Service.Service) {
+            $services[$service.Key] = @{ running = [bool]$service.Running; policy = $service.Policy }
+        }
+
+        # The vMotion adapter as Get-VMkernelInventory picks it: the one
+        # selected for vMotion, else the first on the vMotion TCP/IP stack
+        $vnics = @($_.Config.Network.Vnic)
+        $vmotionNic = $null
+        foreach ($netConfig in @($_.Config.VirtualNicManagerInfo.NetConfig | Where-Object { $_.NicType -eq "vmotion" })) {
+            $vmotionNic = $netConfig.CandidateVnic | Where-Object { $_.Key -in $netConfig.SelectedVnic } | Select-Object -First 1
+        }
+        if (!$vmotionNic) {
+            $vmotionNic = $vnics | Where-Object { $_.Spec.NetStackInstanceKey -eq "vmotion" } | Select-Object -First 1
+        }
+
+        @{
+            name          = $_.Name
+            inCluster     = [bool]($cluster -and (& $id $_.Parent) -eq (& $id $cluster.MoRef))
+            vdsMember     = (& $id $_.MoRef) -in $vdsHosts
+            ntpServers    = @($_.Config.DateTimeInfo.NtpConfig.Server)
+            ntpd          = $services["ntpd"]
+            ssh           = $services["TSM-SSH"]
+            dnsServers    = @($_.Config.Network.DnsConfig.Address)
+            searchDomains = @($_.Config.Network.DnsConfig.SearchDomain)
+            syslogHost    = $advanced["$($_.Name)|Syslog.global.logHost"]
+            shellTimeout  = $advanced["$($_.Name)|UserVars.ESXiShellTimeOut"]
+            lockdownMode  = "$($_.Config.LockdownMode)"
+            vmkIps        = @($vnics | ForEach-Object { $_.Spec.Ip.IpAddress })
+            vmotionIp     = if ($vmotionNic) { $vmotionNic.Spec.Ip.IpAddress } else { $null }
+            diskGroups    = @($_.Config.VsanHostConfig.StorageInfo.DiskMapping).Count
+        }
+    })
+
+    return @{
+        datacenter = [bool]$datacenter
+        cluster    = if ($cluster) {
+            @{
+                haEnabled       = [bool]$cluster.Configuration.DasConfig.Enabled
+                drsEnabled      = [bool]$cluster.Configuration.DrsConfig.Enabled
+                automationLevel = "$($cluster.Configuration.DrsConfig.DefaultVmBehavior)"
+                vsanEnabled     = [bool]$cluster.ConfigurationEx.VsanConfigInfo.Enabled
+            }
+        } else { $null }
+        hosts      = $hosts
+        vds        = if ($vds) { @{ mtu = $vds.Config.MaxMtu } } else { $null }
+        portGroups = $portGroups
+    }
+}
+
+function Get-InventoryIndex {
+    [CmdletBinding()]
+    param(
+        [Parameter()]
+        [string]$Server,
+
+        [Parameter()]
+        [ValidateSet("folder", "datacenter", "computeResource", "cluster", "host", "vm", "template",
+            "datastore", "vds", "portgroup", "tag")]
+        [string[]]$Kind = @("folder", "datacenter", "computeResource", "cluster", "host", "vm", "template",
+            "datastore", "vds", "portgroup", "tag"),
+
+        # Latest Config.ChangeVersion already indexed; older VMs/templates are sent as IDs only
+        [Parameter()]
+        [string]$Since
+    )
+
+    $viServer = if ($Server) { $global:DefaultVIServers | Where-Object { $_.Name -eq $Server } } else { $global:DefaultVIServer }
+    if (!$viServer -or !$viServer.IsConnected) {
+        throw "Not connected to vCenter"
+    }
+
+    $view = @{ Server = $viServer; ErrorAction = 'Stop' }
+    $id = { param($moref) if ($moref) { "$($moref.Type)-$($moref.Value)" } else { $null } }
+    $kinds = @{}
+
+    try {
+        foreach ($plain in @(@{ kind = "folder"; type = "Folder" }, @{ kind = "datacenter"; type = "Datacenter" },
+                @{ kind = "computeResource"; type = "ComputeResource" })) {
+            if ($Kind -contains $plain.kind) {
+                $kinds[$plain.kind] = @{ rows = @(Get-View @view -ViewType $plain.type -Property Name, Parent | ForEach-Object {
+                    @{ id = (& $id $_.MoRef); name = $_.Name; parent = (& $id $_.Parent) }
+                }) }
+            }
+        }
+
+        if ($Kind -contains "cluster") {
+            $kinds.cluster = @{ rows = @(Get-View @view -ViewType ClusterComputeResource -Property Name, Parent, `
+                Configuration.DasConfig.Enabled, Configuration.DrsConfig.Enabled | ForEach-Object {
+                @{
+                    id         = (& $id $_.MoRef)
+                    name       = $_.Name
+                    parent     = (& $id $_.Parent)
+                    haEnabled  = [bool]$_.Configuration.DasConfig.Enabled
+                    drsEnabled = [bool]$_.Configuration.DrsConfig.Enabled
+                }
+            }) }
+        }
+
+        if ($Kind -contains "host") {
+            $kinds.host = @{ rows = @(Get-View @view -ViewType HostSystem -Property Name, Parent, Runtime.ConnectionState, `
+                Runtime.PowerState, Runtime.InMaintenanceMode, Config.Product.Version, `
+                Summary.Hardware.CpuMhz, Summary.Hardware.NumCpuCores, Summary.Hardware.MemorySize, `
+                Summary.QuickStats.OverallMemoryUsage | ForEach-Object {
+                @{
+                    id                = (& $id $_.MoRef)
+                    name              = $_.Name
+                    parent            = (& $id $_.Parent)
+                    connectionState   = "$($_.Runtime.ConnectionState)"
+                    powerState        = "$($_.Runtime.PowerState)"
+                    inMaintenanceMode = [bool]$_.Runtime.InMaintenanceMode
+                    version           = $_.Config.Product.Version
+                    cpuMhz            = [long]$_.Summary.Hardware.CpuMhz * [long]$_.Summary.Hardware.NumCpuCores
+                    memoryBytes       = [long]$_.Summary.Hardware.MemorySize
+                    memoryUsedBytes   = [long]$_.Summary.QuickStats.OverallMemoryUsage * 1MB
+                }
+            }) }
+        }
+
+        if ($Kind -contains "vm" -or $Kind -contains "template") {
+            $rows = @{ vm = [System.Collections.Generic.List[object]]::new(); template = [System.Collections.Generic.List[object]]::new() }
+            $runtime = @{ vm = [System.Collections.Generic.List[object]]::new(); template = [System.Collections.Generic.List[object]]::new() }
+            $latest = $Since
+
+            foreach ($vm in (Get-View @view -ViewType VirtualMachine -Property Name, Parent, Runtime.Host, `
+                    Runtime.PowerState, Config.Template, Config.ChangeVersion)) {
+                $vmKind = if ($vm.Config.Template) { "template" } else { "vm" }
+                $vmId = & $id $vm.MoRef
+                # vMotion and power operations leave ChangeVersion alone, so these go out for every VM
+                $runtime[$vmKind].Add(@{
+                    id         = $vmId
+                    host       = (& $id $vm.Runtime.Host)
+                    powerState = "$($vm.Runtime.PowerState)"
+                })
+
+                $changeVersion = $vm.Config.ChangeVersion
+                if ($changeVersion -and $changeVersion -gt $latest) {
+                    $latest = $changeVersion
+                }
+                # ChangeVersion is an ISO timestamp; ties are re-sent rather than risk missing a change
+                if (!$Since -or !$changeVersion -or $changeVersion -ge $Since) {
+                    $rows[$vmKind].Add(@{
+                        id      = $vmId
+                        name    = $vm.Name
+                        parent  = (& $id $vm.Parent)
+                        version = $changeVersion
+                    })
+                }
+            }
+
+            foreach ($vmKind in @("vm", "template")) {
+                if ($Kind -contains $vmKind) {
+                    $kinds[$vmKind] = @{ rows = @($rows[$vmKind]); runtime = @($runtime[$vmKind]); version = $latest }
+                }
+            }
+        }
+
+        if ($Kind -contains "datastore") {
+            $kinds.datastore = @{ rows = @(Get-View @view -ViewType Datastore -Property Name, Summary.Type, `
+                Summary.Capacity, Summary.FreeSpace, Summary.Accessible, Host | ForEach-Object {
+                @{
+                    id            = (& $id $_.MoRef)
+                    name          = $_.Name
+                    type          = $_.Summary.Type
+                    capacityBytes = [long]$_.Summary.Capacity
+                    freeBytes     = [long]$_.Summary.FreeSpace
+                    accessible    = [bool]$_.Summary.Accessible
+                    hosts         = @($_.Host | ForEach-Object { & $id $_.Key })
+                }
+            }) }
+        }
+
+        if ($Kind -contains "vds") {
+            $kinds.vds = @{ rows = @(Get-View @view -ViewType DistributedVirtualSwitch -Property Name, `
+                Summary.ProductInfo.Version, Config.MaxMtu, Summary.HostMember, Portgroup | ForEach-Object {
+                @{
+                    id         = (& $id $_.MoRef)
+                    name       = $_.Name
+                    version    = $_.Summary.ProductInfo.Version
+                    mtu        = $_.Config.MaxMtu
+                    hosts      = @($_.Summary.HostMember).Count
+                    portGroups = @($_.Portgroup).Count
+                }
+            }) }
+        }
+
+        if ($Kind -contains "portgroup") {
+            $kinds.portgroup = @{ rows = @(Get-View @view -ViewType DistributedVirtualPortgroup -Property Name, `
+                Config.DistributedVirtualSwitch, Config.DefaultPortConfig | ForEach-Object {
+                @{
+                    id     = (& $id $_.MoRef)
+                    name   = $_.Name
+                    parent = (& $id $_.Config.DistributedVirtualSwitch)
+                    vlanId = $_.Config.DefaultPortConfig.Vlan.VlanId
+                }
+            }) }
+        }
+    }
+    catch {
+        throw "Failed to index inventory: $($_.Exception.Message)"
+    }
+
+    # Tags live in the separate tagging service; an outage there should not fail the rest
+    if ($Kind -contains "tag") {
+        try {
+            $kinds.tag = @{ rows = @(Get-Tag -Server $viServer -ErrorAction Stop | ForEach-Object {
+                @{ id = $_.Id; name = $_.Name; parent = $_.Category.Name }
+            }) }
+        }
+        catch {
+            Write-Warning "Tags not indexed: $($_.Exception.Message)"
+        }
+    }
+
+    return @{
+        vcenter = @{ server = $viServer.Name; version = $viServer.Version }
+        kinds   = $kinds
+    }
+}
+
+# Export functions
+Export-ModuleMember -Function Get-InventorySnapshot, Get-ConfigurationState, Get-InventoryIndex -ErrorAction SilentlyContinue
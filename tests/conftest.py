@@ -0,0 +1,20 @@
+"""Shared fixtures for the ecst-vmware.py tests."""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+TOOL_PATH = ROOT_DIR / "ecst-vmware.py"
+
+
+@pytest.fixture(scope="session")
+def ecst():
+    """ecst-vmware.py imported as a module (its file name is not importable)."""
+    spec = importlib.util.spec_from_file_location("ecst_vmware", TOOL_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules.setdefault("ecst_vmware", module)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,117 @@
+"""run_cli exit codes and machine-readable output."""
+
+import json
+
+import pytest
+
+from conftest import ROOT_DIR
+
+CONFIG_FILE = ROOT_DIR / "config.json"
+
+
+@pytest.fixture
+def cli(ecst, monkeypatch):
+    """run_cli with the module globals it rewrites restored afterwards."""
+    for name in ("CONFIG_FILE", "_config_store", "NON_INTERACTIVE"):
+        monkeypatch.setattr(ecst, name, getattr(ecst, name))
+    monkeypatch.delenv(ecst.SITE_REPORT_ENV, raising=False)
+    yield lambda *argv: ecst.run_cli(["--config", str(CONFIG_FILE), *argv])
+    ecst.clear_interrupt()
+
+
+@pytest.fixture
+def bad_config(tmp_path):
+    with open(CONFIG_FILE, encoding="utf-8") as f:
+        raw = json.load(f)
+    raw["cluster"] = {}
+    raw["automation"] = {"hostParallelism": 0}
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(raw))
+    return path
+
+
+def test_config_validate(cli, capsys):
+    assert cli("config", "validate") == 0
+    assert "is valid" in capsys.readouterr().out
+
+
+def test_config_validate_with_a_bad_config(ecst, cli, bad_config, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        ecst.run_cli(["--config", str(bad_config), "config", "validate"])
+
+    assert exit_info.value.code == ecst.EXIT_CONFIG_ERROR
+    out = capsys.readouterr().out
+    assert "missing 'cluster.name'" in out
+    assert "'automation.hostParallelism' must be at least 1" in out
+
+
+def test_missing_config_file(ecst, cli, tmp_path):
+    with pytest.raises(SystemExit) as exit_info:
+        ecst.run_cli(["--config", str(tmp_path / "absent.json"), "plan"])
+
+    assert exit_info.value.code == ecst.EXIT_CONFIG_ERROR
+
+
+def test_vm_deploy_without_name(ecst, cli, monkeypatch, capsys):
+    monkeypatch.setattr(ecst, "provision_template_vm", lambda *args: pytest.fail("deployed without a name"))
+
+    assert cli("vm", "deploy", "--template", "Splunk") == ecst.EXIT_USAGE
+    assert "--name is required" in capsys.readouterr().out
+
+
+def test_vm_deploy_with_unknown_template(ecst, cli, capsys):
+    assert cli("vm", "deploy", "--template", "Oracle", "--name", "db01") == ecst.EXIT_USAGE
+
+
+def test_fleet_without_operation(ecst, cli, tmp_path, capsys):
+    assert cli("fleet", "--registry", str(tmp_path / "sites.json")) == ecst.EXIT_USAGE
+    assert "fleet needs a command" in capsys.readouterr().out
+
+
+def test_unknown_command_is_a_usage_error(ecst, cli, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli("frobnicate")
+
+    assert exit_info.value.code == ecst.EXIT_USAGE
+
+
+def test_failed_action(ecst, cli, monkeypatch):
+    monkeypatch.setattr(ecst, "check_drift", lambda refresh: False)
+
+    assert cli("drift") == ecst.EXIT_FAILURE
+
+
+def test_ctrl_c_is_interrupted(ecst, cli, monkeypatch, capsys):
+    def interrupted(refresh):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(ecst, "check_drift", interrupted)
+
+    assert cli("drift") == ecst.EXIT_INTERRUPTED
+    assert "cancelled" in capsys.readouterr().out
+
+
+def test_json_keeps_stdout_clean(ecst, cli, monkeypatch, capsys):
+    def collect_status(refresh):
+        ecst.print_info("Connecting to vCenter...")
+        print("progress chatter")
+        return {"vcenter": {"name": "vcsa.lab.local"}, "hosts": []}
+
+    monkeypatch.setattr(ecst, "collect_status", collect_status)
+
+    assert cli("status", "--json") == 0
+    captured = capsys.readouterr()
+    assert json.loads(captured.out) == {"vcenter": {"name": "vcsa.lab.local"}, "hosts": []}
+    assert "Connecting to vCenter" in captured.err and "progress chatter" in captured.err
+
+
+def test_plan_json_keeps_stdout_clean(ecst, cli, monkeypatch, capsys):
+    def read_configuration_state():
+        print("Reading vCenter state...")
+        return {}
+
+    monkeypatch.setattr(ecst, "read_configuration_state", read_configuration_state)
+
+    assert cli("plan", "--json") == 0
+    changes = json.loads(capsys.readouterr().out)
+    assert changes and all(change["action"] == "create" for change in changes)
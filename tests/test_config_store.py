@@ -0,0 +1,140 @@
+"""ConfigStore caching and parse_config validation."""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config.json"
+
+
+@pytest.fixture
+def raw():
+    with open(CONFIG_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def config_path(tmp_path, raw):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(raw, indent=2))
+    return path
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_unchanged_file_is_parsed_once(ecst, config_path):
+    store = ecst.ConfigStore(config_path)
+
+    first = store.load()
+    assert store.load() is first
+    assert store.parses == 1
+
+
+def test_touched_file_with_the_same_content_is_not_reparsed(ecst, config_path):
+    store = ecst.ConfigStore(config_path)
+    first = store.load()
+
+    bump_mtime(config_path)
+
+    assert store.load() is first
+    assert store.parses == 1
+
+
+def test_edited_file_is_reparsed(ecst, config_path, raw):
+    store = ecst.ConfigStore(config_path)
+    store.load()
+
+    raw["cluster"]["name"] = "Cluster-02"
+    config_path.write_text(json.dumps(raw, indent=2))
+    bump_mtime(config_path)
+
+    assert store.load().cluster_name == "Cluster-02"
+    assert store.parses == 2
+
+
+def test_invalidate_forces_a_reparse(ecst, config_path):
+    store = ecst.ConfigStore(config_path)
+    first = store.load()
+
+    store.invalidate()
+
+    second = store.load()
+    assert second is not first and second.cluster_name == first.cluster_name
+    assert store.parses == 2
+
+
+def test_bad_edit_keeps_raising_until_fixed(ecst, config_path, raw):
+    store = ecst.ConfigStore(config_path)
+    store.load()
+
+    config_path.write_text(json.dumps(dict(raw, cluster={}), indent=2))
+    bump_mtime(config_path)
+    with pytest.raises(ecst.ConfigError, match="missing 'cluster.name'"):
+        store.load()
+
+    config_path.write_text(json.dumps(raw, indent=2))
+    bump_mtime(config_path)
+    assert store.load().cluster_name == raw["cluster"]["name"]
+
+
+def test_automation_errors_are_reported_together(ecst, raw):
+    raw["automation"] = {
+        "hostParallelism": 0,
+        "maxClonesInFlight": "4",
+        "maxParallelSteps": -1,
+        "maxHostAddsInFlight": 0,
+        "sessionTtlMinutes": 0,
+        "placementPolicy": "random",
+        "datastoreHeadroomPercent": 100,
+    }
+
+    with pytest.raises(ecst.ConfigError) as error:
+        ecst.parse_config(raw)
+
+    assert str(error.value).split("; ") == [
+        "'automation.hostParallelism' must be at least 1",
+        "'automation.maxClonesInFlight' should be int",
+        "'automation.maxParallelSteps' must be at least 1",
+        "'automation.maxHostAddsInFlight' must be at least 1",
+        "'automation.sessionTtlMinutes' must be at least 1",
+        f"'automation.placementPolicy' must be one of: {', '.join(ecst.PLACEMENT_POLICIES)}",
+        "'automation.datastoreHeadroomPercent' must be between 0 and 99",
+    ]
+
+
+def test_automation_defaults(ecst, raw):
+    raw.pop("automation", None)
+
+    config = ecst.parse_config(raw)
+
+    assert config.host_parallelism == ecst.DEFAULT_HOST_PARALLELISM
+    assert config.clone_concurrency == ecst.DEFAULT_CLONE_CONCURRENCY
+    assert config.step_parallelism == ecst.DEFAULT_STEP_PARALLELISM
+    assert config.session_ttl_minutes == ecst.DEFAULT_SESSION_TTL_MINUTES
+    assert config.placement_policy == ecst.DEFAULT_PLACEMENT_POLICY
+    assert config.datastore_headroom_percent == ecst.DEFAULT_DATASTORE_HEADROOM_PERCENT
+
+
+def test_missing_sections_and_bad_types_are_reported_together(ecst, raw):
+    del raw["environment"]
+    raw["networking"]["portGroups"][0].pop("vlanId")
+    raw["storage"]["vsan"]["enabled"] = "yes"
+
+    with pytest.raises(ecst.ConfigError) as error:
+        ecst.parse_config(raw)
+
+    assert set(str(error.value).split("; ")) == {
+        "missing 'networking.portGroups[0].vlanId'",
+        "'storage.vsan.enabled' should be bool",
+        "missing 'environment.name'",
+    }
+
+
+def test_root_must_be_an_object(ecst):
+    with pytest.raises(ecst.ConfigError, match="root must be a JSON object"):
+        ecst.parse_config([])
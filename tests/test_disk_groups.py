@@ -0,0 +1,78 @@
+"""vSAN disk group planning rules (plan_host_disk_groups / plan_disk_groups)."""
+
+
+def disks(ecst, count, size_gb, ssd=True, prefix="naa.ssd"):
+    return [ecst.VsanDisk(name=f"{prefix}{i:02d}", size_gb=size_gb, ssd=ssd) for i in range(count)]
+
+
+def test_all_flash_uses_smallest_ssd_as_cache(ecst):
+    eligible = disks(ecst, 3, 1920) + [ecst.VsanDisk("naa.small", 400, True)]
+    plan = ecst.plan_host_disk_groups("esxi01", eligible)
+
+    assert plan.mode == "all-flash"
+    assert len(plan.groups) == 1
+    assert plan.groups[0].cache.name == "naa.small"
+    assert sorted(d.name for d in plan.groups[0].capacity) == ["naa.ssd00", "naa.ssd01", "naa.ssd02"]
+    assert plan.unused == []
+
+
+def test_hybrid_puts_ssds_in_cache_and_hdds_in_capacity(ecst):
+    eligible = disks(ecst, 2, 800) + disks(ecst, 4, 4000, ssd=False, prefix="naa.hdd")
+    plan = ecst.plan_host_disk_groups("esxi01", eligible)
+
+    assert plan.mode == "hybrid"
+    assert len(plan.groups) == 1
+    assert plan.groups[0].cache.ssd
+    assert all(not d.ssd for d in plan.groups[0].capacity)
+    assert len(plan.groups[0].capacity) == 4
+    # The second SSD is not needed for four HDDs
+    assert [d.name for d in plan.unused] == ["naa.ssd01"]
+
+
+def test_hybrid_without_ssd_is_skipped(ecst):
+    plan = ecst.plan_host_disk_groups("esxi01", disks(ecst, 3, 4000, ssd=False))
+    assert plan.mode == "hybrid"
+    assert plan.groups == []
+    assert "SSD" in plan.skipped
+
+
+def test_all_flash_needs_two_ssds(ecst):
+    plan = ecst.plan_host_disk_groups("esxi01", disks(ecst, 1, 1920))
+    assert plan.groups == []
+    assert plan.skipped == "all-flash needs at least 2 SSDs"
+
+
+def test_more_than_seven_capacity_disks_are_split_evenly(ecst):
+    # 11 SSDs: two groups of one cache and up to seven capacity disks each
+    eligible = disks(ecst, 2, 400, prefix="naa.cache") + disks(ecst, 9, 1920)
+    plan = ecst.plan_host_disk_groups("esxi01", eligible)
+
+    assert len(plan.groups) == 2
+    assert {g.cache.name for g in plan.groups} == {"naa.cache00", "naa.cache01"}
+    assert sorted(len(g.capacity) for g in plan.groups) == [4, 5]
+    assert all(len(g.capacity) <= ecst.VSAN_MAX_CAPACITY_DISKS for g in plan.groups)
+
+
+def test_at_most_five_groups_and_extra_disks_left_unused(ecst):
+    eligible = disks(ecst, 5, 800) + disks(ecst, 40, 4000, ssd=False, prefix="naa.hdd")
+    plan = ecst.plan_host_disk_groups("esxi01", eligible)
+
+    assert len(plan.groups) == ecst.VSAN_MAX_DISK_GROUPS
+    assert sum(len(g.capacity) for g in plan.groups) == ecst.VSAN_MAX_DISK_GROUPS * ecst.VSAN_MAX_CAPACITY_DISKS
+    assert len(plan.unused) == 40 - 35
+
+
+def test_hosts_with_existing_groups_are_skipped(ecst):
+    inventory = [
+        {"Host": "esxi01", "CanonicalName": "naa.a", "CapacityGB": 400, "IsSsd": True, "Status": "Cache (In Use)"},
+        {"Host": "esxi01", "CanonicalName": "naa.b", "CapacityGB": 1920, "IsSsd": True, "Status": "Eligible"},
+        {"Host": "esxi01", "CanonicalName": "naa.c", "CapacityGB": 1920, "IsSsd": True, "Status": "Eligible"},
+        {"Host": "esxi02", "CanonicalName": "naa.d", "CapacityGB": 400, "IsSsd": True, "Status": "Eligible"},
+        {"Host": "esxi02", "CanonicalName": "naa.e", "CapacityGB": 1920, "IsSsd": True, "Status": "Eligible"},
+    ]
+    plans = {p.host: p for p in ecst.plan_disk_groups(inventory, ["esxi03"])}
+
+    assert sorted(plans) == ["esxi01", "esxi02", "esxi03"]
+    assert plans["esxi01"].skipped == "already has 1 disk group(s)"
+    assert [g.cache.name for g in plans["esxi02"].groups] == ["naa.d"]
+    assert plans["esxi03"].skipped == "no eligible disks"
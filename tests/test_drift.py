@@ -0,0 +1,149 @@
+"""Drift fingerprints, field-level diffs and the scan cache."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config.json"
+
+
+@pytest.fixture
+def config(ecst):
+    with open(CONFIG_FILE, encoding="utf-8") as f:
+        raw = json.load(f)
+    raw["esxiHosts"] = raw["esxiHosts"][:2]
+    return ecst.parse_config(raw)
+
+
+def compliant_row(config, name):
+    """A Get-HostConfiguration row matching config.json, with lists in the host's own order."""
+    raw = config.raw
+    ntp, dns, syslog = raw["services"]["ntp"], raw["services"]["dns"], raw["services"]["syslog"]
+    return {
+        "name": name,
+        "connected": True,
+        "hash": f"hash-{name}",
+        "ntpServers": [s.upper() for s in reversed(ntp["servers"])],
+        "ntpd": {"running": True, "policy": ntp["policy"]},
+        "dnsServers": dns["servers"],
+        "searchDomains": dns["searchDomains"],
+        "syslogHost": f"{syslog['protocol']}://{syslog['server']}:{syslog['port']}",
+        "ssh": {"running": False, "policy": "off"},
+        "shellTimeout": str(raw["security"]["shellTimeout"]),
+        "lockdownMode": "lockdownDisabled",
+        "firewall": [{"key": key, "label": key.upper(), "enabled": True}
+                     for key in reversed(raw["security"]["firewallRulesetsEnabled"])],
+    }
+
+
+@pytest.fixture
+def vcenter(ecst, monkeypatch, tmp_path):
+    """Stand-in for Get-HostConfiguration; ``rows`` holds what the next scan returns."""
+    monkeypatch.setattr(ecst, "CONFIG_FILE", tmp_path / "config.json")
+
+    class FakeVCenter:
+        rows = []
+        scripts = []
+
+        def __call__(self, script, modules=(), events=None):
+            self.scripts.append(script)
+            return ecst.WorkerResult(0, data=[dict(row) for row in self.rows])
+
+    fake = FakeVCenter()
+    monkeypatch.setattr(ecst, "run_vcenter_script", fake)
+    return fake
+
+
+def test_reordered_equivalent_state_has_the_desired_fingerprint(ecst, config):
+    desired = ecst.desired_host_fields(config)
+    row = compliant_row(config, config.hostnames[0])
+    shuffled = dict(row, ntpServers=list(reversed(row["ntpServers"])), firewall=list(reversed(row["firewall"])),
+                    shellTimeout=int(row["shellTimeout"]))
+
+    assert ecst.live_host_fields(row, desired) == desired
+    assert (ecst.host_fingerprint(ecst.live_host_fields(row, desired))
+            == ecst.host_fingerprint(ecst.live_host_fields(shuffled, desired))
+            == ecst.host_fingerprint(desired))
+
+
+def test_dns_server_order_matters(ecst, config):
+    desired = ecst.desired_host_fields(config)
+    row = compliant_row(config, config.hostnames[0])
+    row["dnsServers"] = list(reversed(row["dnsServers"]))
+
+    assert ecst.host_fingerprint(ecst.live_host_fields(row, desired)) != ecst.host_fingerprint(desired)
+
+
+def test_changed_host_gets_a_field_level_diff(ecst, config, vcenter):
+    first, second = config.hostnames
+    drifted = compliant_row(config, second)
+    drifted["ssh"] = {"running": True, "policy": "on"}
+    drifted["firewall"][0]["enabled"] = False
+    vcenter.rows = [compliant_row(config, first), drifted]
+
+    drifts = ecst.scan_drift(config)
+
+    assert [(d.host, d.status) for d in drifts] == [(first, "Compliant"), (second, "Drifted")]
+    assert drifts[0].fingerprint == ecst.host_fingerprint(ecst.desired_host_fields(config))
+    assert drifts[1].diffs == [
+        ("ssh.running", True, False),
+        ("ssh.policy", "on", "off"),
+        ("firewall.vSAN", False, True),
+    ]
+
+
+def test_unchanged_hash_reuses_the_cached_fingerprint(ecst, config, vcenter, monkeypatch):
+    first, second = config.hostnames
+    drifted = compliant_row(config, second)
+    drifted["shellTimeout"] = 0
+    vcenter.rows = [compliant_row(config, first), drifted]
+    before = {d.host: d for d in ecst.scan_drift(config)}
+
+    # The worker sends only the hash for hosts whose configuration has not changed
+    vcenter.rows = [{"name": name, "hash": f"hash-{name}", "unchanged": True} for name in config.hostnames]
+    projected = []
+    live_host_fields = ecst.live_host_fields
+    monkeypatch.setattr(ecst, "live_host_fields", lambda row, desired: projected.append(row["name"])
+                        or live_host_fields(row, desired))
+
+    after = {d.host: d for d in ecst.scan_drift(config)}
+
+    assert f"{ecst.quote_ps(first)} = {ecst.quote_ps('hash-' + first)}" in vcenter.scripts[-1]
+    assert all(d.cached for d in after.values())
+    assert projected == [second]            # only the drifted host is diffed again
+    assert after[first].status == "Compliant"
+    assert after[first].fingerprint == before[first].fingerprint
+    assert after[second].diffs == before[second].diffs == [("security.shellTimeout", 0, 900)]
+
+
+def test_changed_hash_is_projected_again(ecst, config, vcenter):
+    first, second = config.hostnames
+    vcenter.rows = [compliant_row(config, first), compliant_row(config, second)]
+    ecst.scan_drift(config)
+
+    changed = dict(compliant_row(config, first), hash="hash-new", ssh={"running": False, "policy": "on"})
+    vcenter.rows = [changed, {"name": second, "hash": f"hash-{second}", "unchanged": True}]
+    drifts = {d.host: d for d in ecst.scan_drift(config)}
+
+    assert not drifts[first].cached
+    assert drifts[first].diffs == [("ssh.policy", "on", "off")]
+    assert drifts[second].cached and drifts[second].status == "Compliant"
+
+
+def test_refresh_ignores_the_cache(ecst, config, vcenter):
+    vcenter.rows = [compliant_row(config, name) for name in config.hostnames]
+    ecst.scan_drift(config)
+
+    ecst.scan_drift(config, refresh=True)
+
+    assert "-KnownHash @{}" in vcenter.scripts[-1]
+
+
+def test_missing_and_disconnected_hosts(ecst, config, vcenter):
+    first, second = config.hostnames
+    vcenter.rows = [{"name": first, "connected": False, "hash": "x"}]
+
+    drifts = ecst.scan_drift(config)
+
+    assert [(d.host, d.status) for d in drifts] == [(first, "Disconnected"), (second, "Missing")]
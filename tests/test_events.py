@@ -0,0 +1,75 @@
+"""Event stream: NDJSON appended by another process, read by EventTail."""
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import ROOT_DIR
+
+FAKE_WORKER = ROOT_DIR / "benchmarks" / "fake_worker.py"
+
+# Writes events the way Write-EcstEvent does: one appended line per event
+EMITTER = r'''
+import json, os, sys
+path = os.environ["ECST_EVENT_LOG"]
+def write(**record):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+write(type="step-start", step="vds-hosts")
+for host in sys.argv[1:]:
+    write(type="result", step="vds-hosts", target=host, status="Failed", message="uplink busy")
+write(type="step-end", step="vds-hosts", status="Failed", seconds=0.5)
+'''
+
+
+def test_child_process_events_reach_the_log(ecst):
+    seen = []
+
+    with ecst.capture_events(on_event=seen.append) as tail:
+        subprocess.run([sys.executable, "-c", EMITTER, "esxi01", "esxi02", "esxi03"],
+                       env=dict(os.environ, **{ecst.EVENT_LOG_ENV: str(tail.path)}), check=True)
+
+    log = tail.log
+    assert [e.type for e in seen] == ["step-start", "result", "result", "result", "step-end"]
+    assert log.steps()["vds-hosts"].status == "Failed"
+    assert sorted(log.results("vds-hosts")) == ["esxi01", "esxi02", "esxi03"]
+    assert [e.message for e in log.failed("vds-hosts")] == ["uplink busy"] * 3
+    assert not tail.path.exists()
+
+
+def test_worker_events_reach_the_log(ecst, tmp_path):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"esxiHosts": [{"hostname": f"esxi{i:02d}"} for i in range(1, 4)]}))
+    worker = ecst.PowerShellWorker(
+        [sys.executable, str(FAKE_WORKER), "--latency", "0", "--host-latency", "0",
+         "--failure-rate", "1"],
+        echo=False, start_timeout=30.0)
+
+    try:
+        with ecst.capture_events() as tail:
+            result = worker.invoke(f"$config = Get-Content '{config}' | ConvertFrom-Json; Add-HostsToVDS",
+                                   timeout=30, event_log=tail.path)
+    finally:
+        worker.kill()
+
+    assert result.returncode == 1
+    assert tail.log.steps()["vds-hosts"].status == "Failed"
+    assert sorted(tail.log.results("vds-hosts")) == ["esxi01", "esxi02", "esxi03"]
+    assert len(tail.log.failed("vds-hosts")) == 3
+
+
+def test_tail_waits_for_complete_lines(ecst, tmp_path):
+    path = tmp_path / "events.ndjson"
+    path.write_text("")
+    tail = ecst.EventTail(path)
+    line = json.dumps({"type": "result", "step": "ntp", "target": "esxi01", "status": "Success"})
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line[:20])
+    assert tail.poll() == 0
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line[20:] + "\nnot json\n" + json.dumps({"type": "metric"}) + "\n")
+    assert tail.poll() == 1
+    assert tail.log.results()["esxi01"].status == "Success"
@@ -0,0 +1,144 @@
+"""Site registry loading, site selection and per-site report rows."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config.json"
+
+
+@pytest.fixture
+def base():
+    with open(CONFIG_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    data["esxiHosts"] = data["esxiHosts"][:2]
+    return data
+
+
+def site(name, server):
+    return {"environment": {"name": name}, "vcenter": {"server": server}}
+
+
+def write_registry(tmp_path, registry):
+    path = tmp_path / "sites.json"
+    path.write_text(json.dumps(registry))
+    return path
+
+
+def test_merge_config_merges_objects_and_replaces_lists(ecst):
+    base = {"vcenter": {"server": "a", "port": 443}, "esxiHosts": [1, 2], "keep": True}
+    override = {"vcenter": {"server": "b"}, "esxiHosts": [3]}
+
+    assert ecst._merge_config(base, override) == {
+        "vcenter": {"server": "b", "port": 443}, "esxiHosts": [3], "keep": True}
+    assert base["vcenter"]["server"] == "a"
+
+
+def test_registry_file_merges_defaults_and_writes_site_configs(ecst, tmp_path, base):
+    path = write_registry(tmp_path, {
+        "defaults": base,
+        "maxConcurrentSites": 2,
+        "environments": {"east": site("East", "vc-east.local"), "west": site("West", "vc-west.local")},
+    })
+
+    registry = ecst.load_site_registry(path)
+
+    assert registry.max_concurrent == 2
+    assert [(s.name, s.vcenter_server, s.environment_name) for s in registry.sites] == [
+        ("east", "vc-east.local", "East"), ("west", "vc-west.local", "West")]
+    written = json.loads((tmp_path / "sites.sites" / "east.json").read_text())
+    assert written["vcenter"]["server"] == "vc-east.local"
+    assert written["datacenter"] == base["datacenter"]
+
+
+def test_registry_list_is_named_by_environment(ecst, tmp_path, base):
+    path = write_registry(tmp_path, {"defaults": base, "environments": [site("lab", "vc-lab.local")]})
+
+    [lab] = ecst.load_site_registry(path).sites
+    assert lab.name == "lab" and lab.config_path == tmp_path / "sites.sites" / "lab.json"
+
+
+def test_registry_directory_uses_config_files_only(ecst, tmp_path, base):
+    (tmp_path / "prod.json").write_text(json.dumps(base))
+    (tmp_path / "fleet-report.json").write_text(json.dumps([{"site": "prod"}]))
+
+    registry = ecst.load_site_registry(tmp_path)
+
+    assert [s.name for s in registry.sites] == ["prod"]
+    assert registry.max_concurrent == ecst.DEFAULT_SITE_CONCURRENCY
+
+
+@pytest.mark.parametrize("registry, message", [
+    ({"environments": "east"}, "expected an 'environments' object or list"),
+    ({"defaults": [], "environments": {}}, "'defaults' should be an object"),
+    ({"maxConcurrentSites": 0, "environments": {}}, "'maxConcurrentSites' must be at least 1"),
+    ({"maxConcurrentSites": "4", "environments": {}}, "'maxConcurrentSites' must be at least 1"),
+    ({"environments": [{"vcenter": {"server": "vc"}}]}, r"environments\[0\] needs a name"),
+    ({"environments": {}}, "no site configs found"),
+])
+def test_bad_registry_is_rejected(ecst, tmp_path, registry, message):
+    with pytest.raises(ecst.ConfigError, match=message):
+        ecst.load_site_registry(write_registry(tmp_path, registry))
+
+
+def test_duplicate_and_invalid_sites_are_reported_together(ecst, tmp_path, base):
+    broken = site("Broken", "vc-broken.local")
+    broken["cluster"] = None
+    path = write_registry(tmp_path, {"defaults": base, "environments": [
+        site("East", "vc-east.local"), site("east", "vc-east2.local"), broken]})
+
+    with pytest.raises(ecst.ConfigError) as error:
+        ecst.load_site_registry(path)
+
+    assert "duplicate site 'east'" in str(error.value)
+    assert "Broken: " in str(error.value)
+    assert not (tmp_path / "sites.sites").exists()
+
+
+def test_select_sites_by_glob(ecst, tmp_path):
+    sites = [ecst.Site(name, tmp_path / f"{name}.json", f"vc-{name}", name)
+             for name in ("prod-east", "prod-west", "lab")]
+
+    assert ecst.select_sites(sites, []) == sites
+    assert [s.name for s in ecst.select_sites(sites, ["PROD-*"])] == ["prod-east", "prod-west"]
+    assert [s.name for s in ecst.select_sites(sites, ["lab", "prod-e*"])] == ["prod-east", "lab"]
+    with pytest.raises(ecst.ConfigError, match="no site matches: staging, dev-\\*"):
+        ecst.select_sites(sites, ["lab", "staging", "dev-*"])
+
+
+def test_site_summary_counts_a_host_failed_in_any_run(ecst, tmp_path):
+    target = ecst.Site("east", tmp_path / "east.json", "vc-east.local", "East")
+    job = ecst.SubprocessJobResult("east", returncode=1, duration=12.34)
+    report = {"exitCode": 1, "hosts": [
+        {"host": "esxi01", "success": True},
+        {"host": "esxi02", "success": True},
+        {"host": "ESXi01", "success": False, "error": "NTP failed"},
+    ]}
+
+    row = ecst._site_summary(target, job, report)
+
+    assert row["success"] is False and row["exitCode"] == 1 and row["seconds"] == 12.3
+    assert row["hostsOk"] == "1/2" and row["vmsOk"] == ""
+    assert row["detail"] == "ESXi01: NTP failed"
+
+
+def test_site_summary_detail(ecst, tmp_path):
+    target = ecst.Site("east", tmp_path / "east.json", "vc-east.local", "East")
+    ok = ecst.SubprocessJobResult("east", returncode=0)
+
+    timed_out = ecst.SubprocessJobResult("east", timed_out=True)
+    assert ecst._site_summary(target, timed_out, {})["detail"] == "timed out"
+
+    vms = {"vms": [{"name": "web01", "status": "Success"}, {"name": "web02", "status": "Failed", "error": "no space"}]}
+    row = ecst._site_summary(target, ok, vms)
+    assert (row["vmsOk"], row["detail"]) == ("1/2", "web02: no space")
+
+    assert ecst._site_summary(target, ok, {"drift": ["esxi02"], "hostsScanned": 8})["detail"] == "1 of 8 hosts differ"
+    assert ecst._site_summary(target, ok, {"drift": []})["detail"] == "no drift"
+
+    failed = ecst.SubprocessJobResult("east", returncode=3, output=["[ERROR] Invalid JSON", "bye"])
+    assert ecst._site_summary(target, failed, {})["detail"] == "Invalid JSON"
+
+    status = {"status": {"hosts": [{}, {}], "datacenters": [{"vms": 3}, {"vms": 4}]}}
+    assert ecst._site_summary(target, ok, status)["detail"] == "2 hosts, 7 VMs"
@@ -0,0 +1,79 @@
+"""Host ranges and host files stay compact until a host is asked for."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config.json"
+
+
+def base_config():
+    with open(CONFIG_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def host_range(**overrides):
+    entry = {"hostname": "esxi{n:03}.lab.local", "count": 500, "managementIp": "10.0.0.1",
+             "vsanIp": {"start": "10.1.0.1", "stride": 2}}
+    entry.update(overrides)
+    return entry
+
+
+def test_range_is_counted_and_looked_up_without_expanding(ecst):
+    data = dict(base_config(), esxiHosts=[{"hostname": "mgmt.lab.local", "managementIp": "10.9.0.1"},
+                                          host_range()])
+    config = ecst.parse_config(data)
+
+    assert len(config.hosts) == 501
+    host = config.host("ESXI250.lab.local")
+    assert (host.hostname, host.management_ip, host.vsan_ip) == ("esxi250.lab.local", "10.0.0.250", "10.1.1.243")
+    assert config.host("esxi501.lab.local") is None
+    assert config.hosts[-1].hostname == "esxi500.lab.local"
+    assert config.raw["esxiHosts"][1]["count"] == 500
+
+
+def test_hex_host_numbers_are_parsed_back(ecst):
+    config = ecst.parse_config(dict(base_config(), esxiHosts=[host_range(hostname="r1-{n:02x}.lab", count=32)]))
+    assert config.host("r1-1f.lab").management_ip == "10.0.0.31"
+    assert config.host("r1-20.lab").management_ip == "10.0.0.32"
+    assert config.host("r1-21.lab") is None
+
+
+def test_duplicates_across_ranges_and_entries_are_reported(ecst):
+    data = dict(base_config(), esxiHosts=[host_range(count=10),
+                                          {"hostname": "esxi005.lab.local", "managementIp": "10.9.0.5"}])
+    with pytest.raises(ecst.ConfigError, match="duplicate host 'esxi005.lab.local'"):
+        ecst.parse_config(data)
+
+
+def test_range_without_management_ip_is_reported_once(ecst):
+    entry = host_range()
+    del entry["managementIp"]
+    with pytest.raises(ecst.ConfigError) as error:
+        ecst.parse_config(dict(base_config(), esxiHosts=[entry]))
+    assert str(error.value).count("managementIp") == 1
+
+
+def test_host_files_are_written_only_for_powershell(ecst, tmp_path):
+    (tmp_path / "hosts").mkdir()
+    (tmp_path / "hosts" / "rack1.ndjson").write_text(
+        json.dumps(host_range(hostname="r1-{n:02}.lab", count=4)) + "\n", encoding="utf-8")
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(dict(base_config(), esxiHosts=[host_range(count=2)],
+                                           esxiHostFiles=["hosts/*.ndjson"])), encoding="utf-8")
+    host_dir = tmp_path / "config.hosts"
+    host_dir.mkdir()
+    (host_dir / "notes.json").write_text("{}", encoding="utf-8")
+
+    store = ecst.ConfigStore(config_path)
+    config = store.load()
+    assert len(config.hosts) == 6
+    assert config.raw["esxiHostFiles"] == ["hosts/*.ndjson"]
+    assert sorted(p.name for p in host_dir.iterdir()) == ["notes.json"]
+
+    files = store.host_files()
+    assert [p.name for p in files] == ["000-esxiHosts.json", "001-rack1.json"]
+    assert [h["hostname"] for h in json.loads(files[1].read_text(encoding="utf-8"))] == \
+        ["r1-01.lab", "r1-02.lab", "r1-03.lab", "r1-04.lab"]
+    assert (host_dir / "notes.json").exists()
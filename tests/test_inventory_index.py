@@ -0,0 +1,58 @@
+"""InventoryIndex refreshes against a stubbed Get-InventoryIndex."""
+
+VERSION = "2024-01-01T00:00:00Z"
+
+
+def vm_payload(runtime, rows):
+    return {"kinds": {"vm": {"rows": rows, "runtime": runtime, "version": VERSION}}}
+
+
+def make_index(ecst, tmp_path, payloads, clock):
+    calls = []
+
+    def fetch(kinds, since):
+        calls.append(since)
+        return payloads.pop(0)
+
+    index = ecst.InventoryIndex(tmp_path / "inventory.sqlite", "vcsa.lab.local", ttl={"vm": 5},
+                                fetch=fetch, clock=lambda: clock[0])
+    return index, calls
+
+
+def test_incremental_refresh_updates_host_and_power_state(ecst, tmp_path):
+    clock = [0.0]
+    payloads = [
+        vm_payload([{"id": "vm-1", "host": "host-1", "powerState": "poweredOn"}],
+                   [{"id": "vm-1", "name": "app01", "parent": "folder-1", "version": VERSION}]),
+        # vMotion and power-off: ChangeVersion did not move, so no full row is re-sent
+        vm_payload([{"id": "vm-1", "host": "host-2", "powerState": "poweredOff"}], []),
+    ]
+    index, calls = make_index(ecst, tmp_path, payloads, clock)
+
+    assert index.refresh(["vm"]) == ["vm"]
+    assert index.get("vm", "vm-1")["host"] == "host-1"
+
+    clock[0] += 600
+    assert index.refresh(["vm"]) == ["vm"]
+    assert calls == [None, VERSION]
+    row = index.get("vm", "vm-1")
+    assert (row["name"], row["host"], row["powerState"]) == ("app01", "host-2", "poweredOff")
+    index.close()
+
+
+def test_incremental_refresh_drops_deleted_vms(ecst, tmp_path):
+    clock = [0.0]
+    payloads = [
+        vm_payload([{"id": "vm-1", "host": "host-1", "powerState": "poweredOn"},
+                    {"id": "vm-2", "host": "host-1", "powerState": "poweredOn"}],
+                   [{"id": "vm-1", "name": "app01", "version": VERSION},
+                    {"id": "vm-2", "name": "app02", "version": VERSION}]),
+        vm_payload([{"id": "vm-2", "host": "host-1", "powerState": "poweredOn"}], []),
+    ]
+    index, _ = make_index(ecst, tmp_path, payloads, clock)
+
+    index.refresh(["vm"])
+    clock[0] += 600
+    index.refresh(["vm"])
+    assert [row["id"] for row in index.rows("vm")] == ["vm-2"]
+    index.close()
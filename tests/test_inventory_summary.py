@@ -0,0 +1,99 @@
+"""summarize_inventory: dashboard tables from a raw Get-InventorySnapshot."""
+
+GB = 1024 ** 3
+
+SNAPSHOT = {
+    "vcenter": {"name": "vcsa.lab.local", "version": "8.0.2"},
+    "folders": [
+        {"id": "group-d1", "parent": None},
+        {"id": "group-h1", "parent": "Datacenter-dc1"},
+        {"id": "group-h9", "parent": "group-h1"},           # nested host folder
+        {"id": "group-v1", "parent": "Datacenter-dc1"},
+        {"id": "group-h2", "parent": "Datacenter-dc2"},
+        {"id": "group-v2", "parent": "Datacenter-dc2"},
+    ],
+    "datacenters": [
+        {"id": "Datacenter-dc2", "name": "DR", "parent": "group-d1"},
+        {"id": "Datacenter-dc1", "name": "Primary", "parent": "group-d1"},
+    ],
+    "clusters": [
+        {"id": "ClusterComputeResource-c1", "name": "Prod", "parent": "group-h1",
+         "haEnabled": True, "drsEnabled": True},
+        {"id": "ClusterComputeResource-c2", "name": "Edge", "parent": "group-h9",
+         "haEnabled": False, "drsEnabled": None},
+        {"id": "ClusterComputeResource-c3", "name": "Recovery", "parent": "group-h2"},
+    ],
+    "computeResources": [
+        {"id": "ComputeResource-s1", "parent": "group-h2"},
+    ],
+    "hosts": [
+        {"id": "HostSystem-1", "name": "esxi01", "parent": "ClusterComputeResource-c1",
+         "connectionState": "connected", "powerState": "poweredOn", "cpuMhz": 48000, "memoryBytes": 256 * GB},
+        {"id": "HostSystem-2", "name": "esxi02", "parent": "ClusterComputeResource-c1",
+         "connectionState": "connected", "inMaintenanceMode": True, "powerState": "poweredOn"},
+        {"id": "HostSystem-3", "name": "esxi03", "parent": "ClusterComputeResource-c2",
+         "connectionState": "disconnected", "powerState": "unknown"},
+        {"id": "HostSystem-4", "name": "dr-standalone", "parent": "ComputeResource-s1",
+         "connectionState": "connected", "powerState": "poweredOn"},
+    ],
+    "vms": [
+        {"id": "vm-1", "parent": "group-v1", "host": "HostSystem-1"},
+        {"id": "vm-2", "parent": "group-v1", "host": "HostSystem-1"},
+        {"id": "vm-3", "parent": "group-v1", "host": "HostSystem-2"},
+        {"id": "vm-4", "parent": "group-v1", "host": "HostSystem-3"},
+        {"id": "vm-5", "parent": "group-v2", "host": "HostSystem-4"},
+        # No folder (e.g. an orphaned VM): counted through its host
+        {"id": "vm-6", "parent": None, "host": "HostSystem-4"},
+    ],
+    "datastores": [
+        {"name": "vsanDatastore", "type": "vsan", "capacityBytes": 1000 * GB, "freeBytes": 250 * GB},
+        {"name": "iso", "type": "NFS", "capacityBytes": 300 * GB, "freeBytes": 200 * GB},
+        {"name": "local-esxi03", "type": "VMFS", "capacityBytes": 0, "freeBytes": 0},
+    ],
+}
+
+
+def test_per_datacenter_counts(ecst):
+    summary = ecst.summarize_inventory(SNAPSHOT)
+
+    assert summary["vcenter"] == SNAPSHOT["vcenter"]
+    assert summary["datacenters"] == [
+        {"name": "DR", "clusters": 1, "hosts": 1, "vms": 2},
+        {"name": "Primary", "clusters": 2, "hosts": 3, "vms": 4},
+    ]
+
+
+def test_per_cluster_counts(ecst):
+    summary = ecst.summarize_inventory(SNAPSHOT)
+
+    assert summary["clusters"] == [
+        {"name": "Edge", "haEnabled": False, "drsEnabled": False, "hosts": 1, "vms": 1},
+        {"name": "Prod", "haEnabled": True, "drsEnabled": True, "hosts": 2, "vms": 3},
+        {"name": "Recovery", "haEnabled": False, "drsEnabled": False, "hosts": 0, "vms": 0},
+    ]
+
+
+def test_host_rows(ecst):
+    hosts = {h["name"]: h for h in ecst.summarize_inventory(SNAPSHOT)["hosts"]}
+
+    assert list(hosts) == ["dr-standalone", "esxi01", "esxi02", "esxi03"]
+    assert hosts["esxi01"]["connectionState"] == "Connected"
+    assert hosts["esxi02"]["connectionState"] == "Maintenance"
+    assert hosts["esxi03"]["connectionState"] == "Disconnected"
+    assert (hosts["esxi01"]["cpuGhz"], hosts["esxi01"]["memoryGb"]) == (48.0, 256)
+
+
+def test_datastore_used_percent(ecst):
+    datastores = ecst.summarize_inventory(SNAPSHOT)["datastores"]
+
+    assert [(ds["name"], ds["capacityGb"], ds["freeGb"], ds["usedPercent"]) for ds in datastores] == [
+        ("iso", 300, 200, 33),
+        ("local-esxi03", 0, 0, 0),
+        ("vsanDatastore", 1000, 250, 75),
+    ]
+
+
+def test_empty_snapshot(ecst):
+    summary = ecst.summarize_inventory({})
+
+    assert summary == {"vcenter": {}, "datacenters": [], "clusters": [], "hosts": [], "datastores": [], "vds": []}
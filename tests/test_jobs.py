@@ -0,0 +1,145 @@
+"""Concurrent subprocess runner, with plain Python children instead of PowerShell."""
+
+import asyncio
+import os
+import re
+import signal
+import sys
+import threading
+import time
+
+import pytest
+
+posix_only = pytest.mark.skipif(os.name == "nt", reason="process groups are checked through /proc")
+
+# Starts a grandchild that outlives nothing, records its PID and waits
+SPAWNER = r'''
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+with open(sys.argv[1], "w") as f:
+    f.write(str(child.pid))
+print("started", flush=True)
+time.sleep(60)
+'''
+
+
+def python(code, *args):
+    return [sys.executable, "-c", code, *args]
+
+
+def alive(pid):
+    """True while ``pid`` runs; a zombie waiting for its reaper counts as gone."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+def wait_for_file(path, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not (path.exists() and path.read_text()):
+        assert time.monotonic() < deadline, f"{path} was never written"
+        time.sleep(0.02)
+    return int(path.read_text())
+
+
+def test_output_is_tagged_per_job(ecst, capsys):
+    jobs = [
+        ecst.SubprocessJob("esxi01", python("print('ntp set'); import sys; sys.exit(0)")),
+        ecst.SubprocessJob("esxi02-long", python("import sys; print('dns failed', file=sys.stderr); sys.exit(3)")),
+    ]
+
+    results = ecst.run_subprocess_jobs(jobs)
+
+    out = re.sub(r"\x1b\[[0-9;]*m", "", capsys.readouterr().out)
+    assert "[esxi01     ] ntp set" in out.splitlines()
+    assert "[esxi02-long] dns failed" in out.splitlines()
+    assert [(r.name, r.returncode, r.success, r.output) for r in results] == [
+        ("esxi01", 0, True, ["ntp set"]),
+        ("esxi02-long", 3, False, ["dns failed"]),
+    ]
+
+
+def test_single_job_output_is_not_tagged(ecst, capsys):
+    ecst.run_subprocess_jobs([ecst.SubprocessJob("only", python("print('hello')"))])
+
+    assert re.sub(r"\x1b\[[0-9;]*m", "", capsys.readouterr().out) == "hello\n"
+
+
+def test_missing_executable_is_reported(ecst):
+    [result] = ecst.run_subprocess_jobs([ecst.SubprocessJob("x", ["/nonexistent/pwsh"])], echo=False)
+
+    assert result.returncode is None and not result.success
+    assert result.output[0].startswith("Could not start /nonexistent/pwsh")
+
+
+def test_concurrency_limit(ecst, tmp_path):
+    log = tmp_path / "log"
+    code = ("import sys, time\n"
+            "log = open(sys.argv[1], 'a', buffering=1)\n"
+            "log.write('+\\n'); time.sleep(0.3); log.write('-\\n')")
+    jobs = [ecst.SubprocessJob(f"job{i}", python(code, str(log))) for i in range(5)]
+
+    results = ecst.run_subprocess_jobs(jobs, max_concurrent=2, echo=False)
+
+    assert all(r.success for r in results)
+    running = peak = 0
+    for mark in log.read_text().split():
+        running += 1 if mark == "+" else -1
+        peak = max(peak, running)
+    assert peak == 2
+
+
+@posix_only
+def test_timeout_kills_the_job_and_its_children(ecst, tmp_path):
+    pid_file = tmp_path / "pid"
+    job = ecst.SubprocessJob("slow", python(SPAWNER, str(pid_file)), timeout=1.0)
+
+    [result] = ecst.run_subprocess_jobs([job], echo=False)
+
+    assert result.timed_out and not result.success
+    assert result.output == ["started"]
+    assert result.duration < 10
+    grandchild = wait_for_file(pid_file)
+    deadline = time.monotonic() + 5
+    while alive(grandchild) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not alive(grandchild)
+
+
+@posix_only
+def test_cancel_kills_every_running_job(ecst, tmp_path):
+    pid_files = [tmp_path / f"pid{i}" for i in range(3)]
+    jobs = [ecst.SubprocessJob(f"job{i}", python(SPAWNER, str(path))) for i, path in enumerate(pid_files)]
+
+    async def run_then_cancel():
+        task = asyncio.ensure_future(ecst.run_jobs_async(jobs, echo=False))
+        while not all(path.exists() and path.read_text() for path in pid_files):
+            await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run_then_cancel())
+
+    grandchildren = [wait_for_file(path) for path in pid_files]
+    time.sleep(0.2)
+    assert not any(alive(pid) for pid in grandchildren)
+
+
+@posix_only
+def test_ctrl_c_kills_jobs_before_propagating(ecst, tmp_path):
+    pid_file = tmp_path / "pid"
+    job = ecst.SubprocessJob("job", python(SPAWNER, str(pid_file)))
+
+    def interrupt():
+        wait_for_file(pid_file)
+        os.kill(os.getpid(), signal.SIGINT)
+
+    threading.Thread(target=interrupt, daemon=True).start()
+    with pytest.raises(KeyboardInterrupt):
+        ecst.run_subprocess_jobs([job], echo=False)
+
+    time.sleep(0.2)
+    assert not alive(wait_for_file(pid_file))
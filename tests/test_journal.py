@@ -0,0 +1,86 @@
+"""Deployment journal and deploy --resume (resume_tasks)."""
+
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config.json"
+
+
+@pytest.fixture
+def raw():
+    with open(CONFIG_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    data["vcenter"]["deployNew"] = False
+    data["esxiHosts"] = data["esxiHosts"][:3]
+    return data
+
+
+def record_done(ecst, journal, config, tasks, names, hosts=None):
+    for task in tasks:
+        if task.name in names:
+            for unit, digest in ecst.task_units(task, config):
+                if hosts is None or "/" not in unit or unit.split("/", 1)[1] in hosts:
+                    journal.record(unit, digest)
+
+
+def test_finished_tasks_are_skipped_and_dependencies_rewired(ecst, raw, tmp_path):
+    config = ecst.parse_config(raw)
+    tasks = ecst.build_deploy_graph(config)
+    journal = ecst.DeploymentJournal(tmp_path / "config.journal.ndjson").load()
+    record_done(ecst, journal, config, tasks, {"datacenter", "cluster"})
+
+    kept, skipped = ecst.resume_tasks(tasks, journal, config)
+    assert {"datacenter", "cluster"} <= set(skipped)
+    by_name = {t.name: t for t in kept}
+    assert "cluster" not in by_name
+    # "hosts" depended on "cluster"; it now waits on what "cluster" waited on
+    assert set(by_name["hosts"].depends_on) <= set(by_name)
+    ecst.order_tasks(kept)
+
+
+def test_per_host_tasks_are_narrowed_to_unfinished_hosts(ecst, raw, tmp_path):
+    config = ecst.parse_config(raw)
+    tasks = ecst.build_deploy_graph(config)
+    journal = ecst.DeploymentJournal(tmp_path / "config.journal.ndjson").load()
+    record_done(ecst, journal, config, tasks, {"ntp"}, hosts={config.hostnames[0]})
+
+    kept, _ = ecst.resume_tasks(tasks, journal, config)
+    ntp = next(t for t in kept if t.name == "ntp")
+    assert ntp.hosts == tuple(config.hostnames[1:])
+
+
+def test_config_change_redoes_the_affected_work(ecst, raw, tmp_path):
+    config = ecst.parse_config(raw)
+    tasks = ecst.build_deploy_graph(config)
+    journal = ecst.DeploymentJournal(tmp_path / "config.journal.ndjson").load()
+    record_done(ecst, journal, config, tasks, {"ntp", "dns"})
+
+    changed = copy.deepcopy(raw)
+    changed["services"]["ntp"]["servers"] = ["ntp3.domain.local"]
+    config = ecst.parse_config(changed)
+    kept, skipped = ecst.resume_tasks(ecst.build_deploy_graph(config), journal, config)
+
+    assert "dns" in skipped
+    ntp = next(t for t in kept if t.name == "ntp")
+    assert ntp.hosts == ()
+
+
+def test_journal_survives_a_torn_line_and_compacts(ecst, raw, tmp_path):
+    path = tmp_path / "config.journal.ndjson"
+    journal = ecst.DeploymentJournal(path).load()
+    journal.start_run()
+    journal.record("datacenter", "aaaa")
+    journal.record("datacenter", "bbbb")
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"unit": "cluster", "ha')
+
+    reloaded = ecst.DeploymentJournal(path).load()
+    assert reloaded.is_done("datacenter", "bbbb")
+    assert not reloaded.is_done("datacenter", "aaaa")
+    assert not reloaded.is_done("cluster", "")
+    assert reloaded.finished is None
+    assert len(reloaded) == 1
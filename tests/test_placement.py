@@ -0,0 +1,80 @@
+"""Capacity-aware VM placement (plan_placement / placement_targets)."""
+
+GIB = 1024 ** 3
+
+
+def vm(ecst, name, disk_gb=50, memory_gb=4):
+    return ecst.VMConfig(name=name, os_type="RHEL", size="Small", tag_name="", ip_address="",
+                         disk_gb=disk_gb, memory_gb=memory_gb)
+
+
+def target(ecst, ident, free_gb, capacity_gb=1000, **kwargs):
+    return ecst.PlacementTarget(id=ident, name=ident, capacity=capacity_gb * GIB, free=free_gb * GIB, **kwargs)
+
+
+def test_balanced_spreads_vms_by_free_share(ecst):
+    datastores = [target(ecst, "ds1", 500), target(ecst, "ds2", 500)]
+    plan = ecst.plan_placement([vm(ecst, f"vm{i}") for i in range(4)], datastores, policy="balanced")
+
+    assert plan.unplaced == []
+    assert sorted(d.placed for d in datastores) == [2, 2]
+
+
+def test_pack_fills_one_datastore_first(ecst):
+    datastores = [target(ecst, "ds1", 500), target(ecst, "ds2", 400)]
+    plan = ecst.plan_placement([vm(ecst, f"vm{i}") for i in range(3)], datastores, policy="pack")
+
+    assert {p.datastore for p in plan.placements.values()} == {"ds2"}
+
+
+def test_vsan_tier_is_preferred_over_more_free_space(ecst):
+    datastores = [target(ecst, "local", 900, tier=ecst.DATASTORE_TIER_LOCAL),
+                  target(ecst, "vsan", 100, tier=ecst.DATASTORE_TIER_VSAN)]
+    plan = ecst.plan_placement([vm(ecst, "vm0")], datastores, policy="most-free")
+    assert plan.placements["vm0"].datastore == "vsan"
+
+
+def test_headroom_is_never_reserved_and_misfits_are_reported(ecst):
+    datastores = [target(ecst, "ds1", 120, capacity_gb=1000, keep_free=100 * GIB)]
+    plan = ecst.plan_placement([vm(ecst, "big", disk_gb=50), vm(ecst, "small", disk_gb=10)], datastores)
+
+    assert list(plan.placements) == ["small"]
+    assert plan.unplaced == ["big"]
+    assert datastores[0].available == 10 * GIB
+
+
+def test_hosts_are_chosen_among_those_mounting_the_datastore(ecst):
+    hosts = [target(ecst, "host-1", 8), target(ecst, "host-2", 64)]
+    datastores = [target(ecst, "ds1", 500, hosts=frozenset({"host-1"}))]
+    plan = ecst.plan_placement([vm(ecst, "vm0", memory_gb=4), vm(ecst, "vm1", memory_gb=4),
+                                vm(ecst, "vm2", memory_gb=4)], datastores, hosts)
+
+    assert {p.host for p in plan.placements.values()} == {"host-1"}
+    assert len(plan.placements) == 2
+    assert len(plan.unplaced) == 1
+
+
+def test_placement_targets_skip_unusable_hosts_and_tier_datastores(ecst):
+    host_rows = [
+        {"id": "h1", "parent": "c1", "memoryBytes": 64 * GIB, "memoryUsedBytes": 16 * GIB},
+        {"id": "h2", "parent": "c1", "memoryBytes": 64 * GIB, "inMaintenanceMode": True},
+        {"id": "h3", "parent": "c1", "memoryBytes": 64 * GIB, "connectionState": "disconnected"},
+        {"id": "h4", "parent": "c2", "memoryBytes": 64 * GIB},
+        {"id": "h5", "parent": "c1", "memoryBytes": 64 * GIB},
+    ]
+    datastore_rows = [
+        {"id": "vsan", "type": "vsan", "capacityBytes": 1000 * GIB, "freeBytes": 500 * GIB, "hosts": ["h1", "h5"]},
+        {"id": "nfs", "type": "NFS", "capacityBytes": 1000 * GIB, "freeBytes": 500 * GIB, "hosts": ["h1", "h5"]},
+        {"id": "local", "type": "VMFS", "capacityBytes": 100 * GIB, "freeBytes": 50 * GIB, "hosts": ["h1"]},
+        {"id": "other", "type": "VMFS", "capacityBytes": 100 * GIB, "freeBytes": 50 * GIB, "hosts": ["h4"]},
+        {"id": "gone", "type": "NFS", "capacityBytes": 100 * GIB, "freeBytes": 50 * GIB, "hosts": ["h1"],
+         "accessible": False},
+    ]
+    datastores, hosts = ecst.placement_targets("c1", host_rows, datastore_rows, headroom_percent=10)
+
+    assert [h.id for h in hosts] == ["h1", "h5"]
+    assert hosts[0].free == 48 * GIB
+    tiers = {d.id: d.tier for d in datastores}
+    assert tiers == {"vsan": ecst.DATASTORE_TIER_VSAN, "nfs": ecst.DATASTORE_TIER_SHARED,
+                     "local": ecst.DATASTORE_TIER_LOCAL}
+    assert datastores[0].keep_free == 100 * GIB
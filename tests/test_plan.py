@@ -0,0 +1,131 @@
+"""plan_changes: diff the desired configuration against a live state snapshot."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config.json"
+
+
+@pytest.fixture
+def raw():
+    with open(CONFIG_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    data["esxiHosts"] = data["esxiHosts"][:2]
+    return data
+
+
+def converged_state(config):
+    """A live state in which everything the config asks for is already in place."""
+    raw = config.raw
+    ntp, dns, syslog = raw["services"]["ntp"], raw["services"]["dns"], raw["services"]["syslog"]
+    return {
+        "datacenter": True,
+        "cluster": {"haEnabled": True, "drsEnabled": True, "automationLevel": "fullyAutomated",
+                    "vsanEnabled": True},
+        "vds": {"mtu": config.network.mtu},
+        "portGroups": [{"name": pg.name, "vlanId": pg.vlan_id} for pg in config.network.port_groups],
+        "hosts": [{
+            "name": host.hostname.upper(),
+            "inCluster": True,
+            "vdsMember": True,
+            "vmkIps": [host.vmotion_ip, host.vsan_ip],
+            "diskGroups": 1,
+            "ntpServers": list(reversed(ntp["servers"])),
+            "ntpd": {"running": True, "policy": ntp["policy"]},
+            "dnsServers": dns["servers"],
+            "searchDomains": dns["searchDomains"],
+            "syslogHost": f"{syslog['protocol']}://{syslog['server']}:{syslog['port']}",
+            "ssh": {"running": False, "policy": "off"},
+            "shellTimeout": raw["security"]["shellTimeout"],
+            "lockdownMode": "lockdownDisabled",
+        } for host in config.hosts],
+    }
+
+
+def test_converged_environment_has_no_changes(ecst, raw):
+    config = ecst.parse_config(raw)
+    assert ecst.plan_changes(config, converged_state(config)) == []
+
+
+def test_empty_environment_creates_everything(ecst, raw):
+    config = ecst.parse_config(raw)
+    changes = ecst.plan_changes(config, {})
+
+    assert all(c.action == "create" for c in changes)
+    tasks = {c.task for c in changes}
+    assert {"datacenter", "cluster", "vds", "portgroups", "hosts", "vds-hosts", "vsan"} <= tasks
+    assert {c.target for c in changes if c.task == "hosts"} == set(config.hostnames)
+
+
+def test_drifted_settings_are_updates_on_the_affected_host_only(ecst, raw):
+    config = ecst.parse_config(raw)
+    state = converged_state(config)
+    state["hosts"][1]["dnsServers"] = ["10.0.0.1"]
+    state["hosts"][1]["ssh"] = {"running": True, "policy": "on"}
+    state["vds"]["mtu"] = 1500
+
+    changes = ecst.plan_changes(config, state)
+    assert {(c.task, c.target, c.setting) for c in changes} == {
+        ("dns", config.hostnames[1], "DNS servers"),
+        ("security", config.hostnames[1], "SSH"),
+        ("vds", config.network.vds_name, "MTU"),
+    }
+    assert all(c.action == "update" for c in changes)
+
+
+def test_host_missing_from_cluster_is_planned_as_new(ecst, raw):
+    config = ecst.parse_config(raw)
+    state = converged_state(config)
+    del state["hosts"][0]
+
+    changes = [c for c in ecst.plan_changes(config, state) if c.target == config.hostnames[0]]
+    assert {"hosts", "vds-hosts", "ntp", "dns", "syslog", "security"} <= {c.task for c in changes}
+    assert all(c.current is None for c in changes)
+
+
+def apply_tasks(ecst, config, state, changes):
+    """Apply the plan's tasks to ``state`` the way the modules change vCenter."""
+    tasks = {task.name: task for task in ecst.tasks_for_plan(config, changes)}
+    live_port_groups = {pg["name"]: pg for pg in state["portGroups"]}
+    live_hosts = {h["name"].lower(): h for h in state["hosts"]}
+    for change in changes:
+        if change.task not in tasks:
+            continue
+        if change.task == "portgroups":
+            # New-VspherePortGroups sets the VLAN of existing port groups
+            live_port_groups[change.target]["vlanId"] = change.desired
+        elif change.task == "vmotion":
+            # Configure-VMotionStack only creates missing adapters
+            host = live_hosts[change.target.lower()]
+            if not host.get("vmotionIp"):
+                host["vmotionIp"] = change.desired
+                host["vmkIps"].append(change.desired)
+    return set(tasks)
+
+
+def test_apply_converges_and_leaves_a_readdressed_vmotion_adapter_reported(ecst, raw):
+    config = ecst.parse_config(raw)
+    state = converged_state(config)
+    first, second = state["hosts"]
+    state["portGroups"][0]["vlanId"] = 999
+    first["vmkIps"] = [config.hosts[0].vsan_ip]
+    second["vmotionIp"] = "10.10.10.99"
+    second["vmkIps"] = ["10.10.10.99", config.hosts[1].vsan_ip]
+
+    changes = ecst.plan_changes(config, state)
+    assert {(c.task, c.target, c.action) for c in changes} == {
+        ("portgroups", config.network.port_groups[0].name, "update"),
+        ("vmotion", config.hostnames[0], "create"),
+        ("vmotion", config.hostnames[1], "report"),
+    }
+    vmotion = next(t for t in ecst.tasks_for_plan(config, changes) if t.name == "vmotion")
+    assert vmotion.hosts == (config.hostnames[0],)
+
+    assert apply_tasks(ecst, config, state, changes) == {"portgroups", "vmotion"}
+
+    remaining = ecst.plan_changes(config, state)
+    assert [(c.target, c.current, c.report_only) for c in remaining] == [
+        (config.hostnames[1], "10.10.10.99", True)]
+    assert ecst.tasks_for_plan(config, remaining) == []
@@ -0,0 +1,207 @@
+"""SessionBroker against an in-process stand-in for vCenter's session manager."""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+import pytest
+
+CREDENTIALS = ("administrator@vsphere.local", "VMware1!")
+
+
+@dataclass
+class Result:
+    """The WorkerResult fields the broker reads."""
+    returncode: int
+    data: List[Any] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+class LocalSessionServer:
+    """
+    Stand-in for vCenter's session manager. ``worker()`` returns objects with
+    the worker surface the broker uses; ``expire()`` revokes every token, as
+    vCenter does for idle sessions.
+    """
+
+    def __init__(self, name: str = "vcenter.local", login_delay: float = 0.0):
+        self.name = name
+        self.login_delay = login_delay
+        self.logins = 0
+        self.logouts = 0
+        self._tokens: set = set()
+        self._lock = threading.Lock()
+
+    def expire(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def is_valid(self, token: Optional[str]) -> bool:
+        with self._lock:
+            return token in self._tokens
+
+    def worker(self) -> "LocalSessionWorker":
+        return LocalSessionWorker(self)
+
+    def login(self, username: str, password: str) -> Optional[str]:
+        time.sleep(self.login_delay)
+        with self._lock:
+            if (username, password) != CREDENTIALS:
+                return None
+            self.logins += 1
+            token = os.urandom(16).hex()
+            self._tokens.add(token)
+            return token
+
+    def logout(self, token: Optional[str]):
+        with self._lock:
+            if token in self._tokens:
+                self._tokens.discard(token)
+                self.logouts += 1
+
+
+class LocalSessionWorker:
+    """Worker stand-in bound to a LocalSessionServer."""
+
+    def __init__(self, server: LocalSessionServer):
+        self.server = server
+        self.session: Optional[str] = None
+        self._token: Optional[str] = None
+        self._alive = True
+
+    def is_alive(self) -> bool:
+        return self._alive
+
+    def connected_server(self) -> Optional[str]:
+        return self.server.name if self.server.is_valid(self._token) else None
+
+    def connect(self, server: str, username: str, password: str, timeout: Optional[float] = None) -> Result:
+        token = self.server.login(username, password) if server == self.server.name else None
+        if token is None:
+            return Result(returncode=1, error="Cannot complete login due to an incorrect user name or password.")
+        self._token = token
+        return Result(returncode=0, data=[{"session": token}])
+
+    def attach(self, server: str, session: str, timeout: Optional[float] = None) -> Result:
+        if server != self.server.name or not self.server.is_valid(session):
+            return Result(returncode=1, error="The session is not authenticated.")
+        self._token = session
+        return Result(returncode=0)
+
+    def logout(self, server: str, session: str, timeout: Optional[float] = None) -> Result:
+        if server != self.server.name or not self.server.is_valid(session):
+            return Result(returncode=1, error="The session is not authenticated.")
+        self.server.logout(session)
+        return Result(returncode=0)
+
+    def stop(self, logout: bool = True):
+        if logout:
+            self.server.logout(self._token)
+        self._token = None
+        self.session = None
+        self._alive = False
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def broker(ecst, clock):
+    return ecst.SessionBroker(ttl=60, credentials=lambda: CREDENTIALS, on_login_failed=None, clock=clock)
+
+
+def test_workers_share_one_login(broker):
+    server = LocalSessionServer()
+    workers = [server.worker() for _ in range(4)]
+    for worker in workers:
+        assert broker.connect(worker, server.name) is None
+
+    assert server.logins == 1
+    assert broker.attaches == 3
+    assert len({w.session for w in workers}) == 1
+
+
+def test_concurrent_connects_log_in_once(broker):
+    server = LocalSessionServer(login_delay=0.2)
+    workers = [server.worker() for _ in range(8)]
+    results = [None] * len(workers)
+    start = threading.Barrier(len(workers))
+
+    def connect(i):
+        start.wait()
+        results[i] = broker.connect(workers[i], server.name)
+
+    threads = [threading.Thread(target=connect, args=(i,)) for i in range(len(workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [None] * len(workers)
+    assert server.logins == 1
+    assert all(w.connected_server() == server.name for w in workers)
+
+
+def test_expired_token_logs_in_again_and_logs_out_after_last_holder_moves(broker, clock):
+    server = LocalSessionServer()
+    first, second = server.worker(), server.worker()
+    broker.connect(first, server.name)
+    broker.connect(second, server.name)
+    old = first.session
+
+    clock.now = 61
+    assert broker.connect(first, server.name) is None
+    assert server.logins == 2
+    assert first.session != old
+    # ``second`` still holds the old token, so it stays logged in
+    assert server.is_valid(old)
+    assert server.logouts == 0
+
+    assert broker.connect(second, server.name) is None
+    assert second.session == first.session
+    assert not server.is_valid(old)
+    assert server.logouts == 1
+
+
+def test_token_rejected_by_vcenter_is_replaced_without_logout(broker):
+    server = LocalSessionServer()
+    first, second = server.worker(), server.worker()
+    broker.connect(first, server.name)
+    server.expire()
+
+    assert broker.connect(second, server.name) is None
+    assert server.logins == 2
+    assert server.logouts == 0
+    assert server.is_valid(second.session)
+
+
+def test_release_reports_the_last_holder(broker):
+    server = LocalSessionServer()
+    first, second = server.worker(), server.worker()
+    broker.connect(first, server.name)
+    broker.connect(second, server.name)
+
+    assert broker.release(first) is False
+    first.stop(logout=False)
+    assert broker.release(second) is True
+
+
+def test_failed_login_is_reported(ecst, clock):
+    server = LocalSessionServer()
+    broker = ecst.SessionBroker(ttl=60, credentials=lambda: ("administrator@vsphere.local", "wrong"),
+                                on_login_failed=None, clock=clock)
+    result = broker.connect(server.worker(), server.name)
+    assert result.returncode == 1
+    assert "incorrect user name or password" in result.error
@@ -0,0 +1,153 @@
+"""Deployment task graph: selection, ordering and the parallel scheduler."""
+
+import contextlib
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config.json"
+
+
+@pytest.fixture
+def graph(ecst):
+    with open(CONFIG_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    return ecst.build_deploy_graph(ecst.parse_config(data))
+
+
+def task(ecst, name, *depends_on):
+    return ecst.DeployTask(name, name, "", depends_on=depends_on)
+
+
+def test_order_puts_dependencies_first(ecst, graph):
+    position = {t.name: i for i, t in enumerate(ecst.order_tasks(graph))}
+
+    assert position["connect"] == 0
+    for t in graph:
+        assert all(position[dep] < position[t.name] for dep in t.depends_on)
+
+
+def test_only_pulls_in_dependencies(ecst, graph):
+    selected = ecst.select_tasks(graph, only=["vmotion"])
+
+    assert {t.name for t in selected} == {
+        "connect", "datacenter", "cluster", "hosts", "vds", "portgroups", "vds-hosts", "vmotion"}
+
+    alone = ecst.select_tasks(graph, only=["vmotion"], with_dependencies=False)
+    assert [(t.name, t.depends_on) for t in alone] == [("vmotion", ())]
+
+
+def test_only_rejects_unknown_tasks(ecst, graph):
+    with pytest.raises(ValueError, match="Unknown task"):
+        ecst.select_tasks(graph, only=["vmotoin"])
+
+
+def test_skip_drops_groups_and_rewires_dependencies(ecst, graph):
+    selected = {t.name: t for t in ecst.select_tasks(graph, skip=["networking", "configuration"])}
+
+    assert set(selected) == {"connect", "datacenter", "cluster", "hosts", "vsan", "vsan-disks"}
+    # vsan waited on portgroups and vds-hosts; it now waits on what they waited on
+    assert set(selected["vsan"].depends_on) == {"hosts", "datacenter"}
+    # The input graph is left alone
+    assert next(t for t in graph if t.name == "vsan").depends_on == ("hosts", "portgroups", "vds-hosts")
+
+
+def test_dependents_wait_for_their_dependencies(ecst, graph):
+    results = ecst.run_task_graph(graph, lambda t: time.sleep(0.01), max_parallel=4)
+
+    assert all(r.status == "Success" for r in results.values())
+    for t in graph:
+        assert all(results[dep].end <= results[t.name].start for dep in t.depends_on)
+
+
+def test_failure_blocks_dependents_but_not_siblings(ecst):
+    tasks = [task(ecst, "root"), task(ecst, "bad", "root"), task(ecst, "sibling", "root"),
+             task(ecst, "child", "bad"), task(ecst, "grandchild", "child"),
+             task(ecst, "join", "bad", "sibling")]
+    ran = []
+
+    def run(t):
+        ran.append(t.name)
+        if t.name == "bad":
+            raise RuntimeError("host unreachable")
+
+    results = ecst.run_task_graph(tasks, run, max_parallel=2)
+
+    assert {name: r.status for name, r in results.items()} == {
+        "root": "Success", "bad": "Failed", "sibling": "Success",
+        "child": "Blocked", "grandchild": "Blocked", "join": "Blocked"}
+    assert results["bad"].error == "host unreachable"
+    assert results["grandchild"].error == "Dependency 'bad' did not complete"
+    assert sorted(ran) == ["bad", "root", "sibling"]
+
+
+def test_max_parallel_is_respected(ecst):
+    tasks = [task(ecst, "root")] + [task(ecst, f"leaf{i}", "root") for i in range(6)]
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def run(t):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    results = ecst.run_task_graph(tasks, run, max_parallel=2)
+
+    assert len(results) == 7 and all(r.status == "Success" for r in results.values())
+    assert peak[0] == 2
+
+
+def test_cycles_and_unknown_dependencies_are_rejected(ecst):
+    cycle = [task(ecst, "a", "c"), task(ecst, "b", "a"), task(ecst, "c", "b"), task(ecst, "d")]
+    with pytest.raises(ValueError, match="Dependency cycle between: a, b, c"):
+        ecst.order_tasks(cycle)
+    with pytest.raises(ValueError, match="Dependency cycle"):
+        ecst.run_task_graph(cycle, lambda t: None, max_parallel=2)
+
+    with pytest.raises(ValueError, match="depends on unknown task"):
+        ecst.order_tasks([task(ecst, "a", "missing")])
+
+
+def test_critical_path_follows_the_longest_chain(ecst):
+    tasks = [task(ecst, "connect"), task(ecst, "hosts", "connect"), task(ecst, "vds", "connect"),
+             task(ecst, "vds-hosts", "hosts", "vds"), task(ecst, "ntp", "hosts")]
+    timing = {"connect": (0, 1), "hosts": (1, 9), "vds": (1, 3), "vds-hosts": (9, 10), "ntp": (9, 12)}
+    results = {name: ecst.TaskRunResult(name, "Success", start, end) for name, (start, end) in timing.items()}
+
+    assert ecst.critical_path(tasks, results) == ["connect", "hosts", "ntp"]
+
+
+def test_esxi_password_is_not_inlined_in_the_script(ecst, monkeypatch):
+    invoked = []
+
+    class RecordingWorker:
+        def invoke(self, script, modules=(), timeout=None, event_log=None, credentials=None):
+            invoked.append((script, credentials))
+            return ecst.WorkerResult(0)
+
+    class RecordingPool:
+        @contextlib.contextmanager
+        def acquire(self):
+            yield RecordingWorker()
+
+    monkeypatch.setattr(ecst, "get_worker_pool", lambda size=None: RecordingPool())
+    monkeypatch.setattr(ecst, "ensure_worker_connected", lambda worker, server: None)
+    monkeypatch.setattr(ecst, "_vcenter_credentials", ("administrator@vsphere.local", "vc-pass"))
+    monkeypatch.setattr(ecst, "_esxi_credentials", None)
+    monkeypatch.setenv("ECST_ESXI_USER", "root")
+    monkeypatch.setenv("ECST_ESXI_PASSWORD", "p@ss'word")
+    graph = ecst.build_deploy_graph(ecst.load_infra_config())
+
+    results = ecst.run_deploy_graph(ecst.select_tasks(graph, only=["hosts"], with_dependencies=False))
+
+    assert results["hosts"].status == "Success"
+    [(script, credentials)] = invoked
+    assert "p@ss" not in script and "AsPlainText" not in script
+    assert "-Credential $esxiCredential" in script
+    assert credentials == {"esxiCredential": ("root", "p@ss'word")}
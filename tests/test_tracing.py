@@ -0,0 +1,22 @@
+"""Trace and metrics files written by the Tracer."""
+
+import os
+import stat
+import sys
+
+import pytest
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX file modes")
+def test_prometheus_textfile_is_readable_by_other_users(ecst, tmp_path):
+    tracer = ecst.Tracer()
+    with tracer.span("configure", "action"):
+        pass
+    path = tmp_path / "ecst.prom"
+    tracer.write_prometheus(path)
+
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    assert mode == 0o644 & ~ecst._UMASK
+    assert mode & stat.S_IRUSR
+    if not ecst._UMASK & 0o004:
+        assert mode & stat.S_IROTH
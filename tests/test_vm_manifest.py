@@ -0,0 +1,116 @@
+"""Reading and up-front validation of bulk VM manifests."""
+
+import json
+
+import pytest
+
+ROWS = [
+    {"name": "web01", "template": "RHEL 9", "size": "Large", "ip": "10.0.0.10"},
+    {"name": "WEB01", "os": "Ubuntu", "size": "Small"},
+    {"name": "db01", "template": "template-oracle", "size": "Medium"},
+    {"name": "app01", "os": "BeOS", "size": "Huge"},
+]
+
+BAD_ERRORS = [
+    "Row 2 (WEB01): duplicate VM name",
+    "Row 3 (db01): unknown template 'template-oracle'",
+    "Row 4 (app01): unknown size 'Huge'; unknown OS type 'BeOS'",
+]
+
+
+def write_manifest(path, rows):
+    suffix = path.suffix
+    if suffix == ".csv":
+        columns = []
+        for row in rows:
+            columns += [c for c in row if c not in columns]
+        lines = [",".join(columns)]
+        lines += [",".join(str(row.get(c, "")) for c in columns) for row in rows]
+        path.write_text("\n".join(lines) + "\n")
+    elif suffix == ".json":
+        path.write_text(json.dumps({"vms": rows}))
+    else:
+        yaml = pytest.importorskip("yaml")
+        path.write_text(yaml.safe_dump(rows))
+    return path
+
+
+@pytest.fixture(params=[".csv", ".json", ".yaml"])
+def manifest(request, tmp_path):
+    return lambda rows: write_manifest(tmp_path / f"vms{request.param}", rows)
+
+
+def test_valid_manifest_builds_vm_configs(ecst, manifest):
+    path = manifest([ROWS[0], {"VMName": "cribl01", "Template": "Cribl", "IPAddress": ""}])
+
+    vms, errors = ecst.validate_vm_manifest(ecst.read_vm_manifest(path))
+
+    assert errors == []
+    assert [vm.name for vm in vms] == ["web01", "cribl01"]
+    web, cribl = vms
+    assert (web.template, web.cpu, web.memory_gb, web.ip_address) == ("template-rhel9", 8, 16, "10.0.0.10")
+    assert (cribl.template, cribl.size, cribl.cpu) == ("template-cribl-stream", "Medium", 4)
+
+
+def test_every_bad_row_is_reported(ecst, manifest):
+    vms, errors = ecst.validate_vm_manifest(ecst.read_vm_manifest(manifest(ROWS)))
+
+    assert [vm.name for vm in vms] == ["web01"]
+    assert errors == BAD_ERRORS
+
+
+def test_os_row_uses_guest_id(ecst, manifest):
+    vms, errors = ecst.validate_vm_manifest(ecst.read_vm_manifest(manifest([ROWS[1]])))
+
+    assert errors == []
+    assert (vms[0].template, vms[0].guest_id, vms[0].os_type) == (None, "ubuntu64Guest", "Ubuntu")
+
+
+def test_missing_name_column(ecst, manifest):
+    path = manifest([{"template": "Splunk", "size": "Small"}])
+
+    vms, errors = ecst.validate_vm_manifest(ecst.read_vm_manifest(path))
+
+    assert vms == []
+    assert errors == ["Row 1 (unnamed): name is required"]
+
+
+def test_missing_template_and_os_columns(ecst, manifest):
+    path = manifest([{"name": "web01", "size": "Small"}, {"name": "web02", "size": "Small"}])
+
+    vms, errors = ecst.validate_vm_manifest(ecst.read_vm_manifest(path))
+
+    assert vms == []
+    assert errors == [
+        "Row 1 (web01): either template or os is required",
+        "Row 2 (web02): either template or os is required",
+    ]
+
+
+def test_invalid_ip_address(ecst):
+    vms, errors = ecst.validate_vm_manifest([{"name": "web01", "os": "RHEL", "ip": "10.0.0.300"}])
+
+    assert vms == []
+    assert errors == ["Row 1 (web01): invalid IP address '10.0.0.300'"]
+
+
+def test_non_object_row(ecst):
+    vms, errors = ecst.validate_vm_manifest(["web01"])
+
+    assert errors == ["Row 1: expected an object"]
+
+
+def test_unsupported_format(ecst, tmp_path):
+    path = tmp_path / "vms.txt"
+    path.write_text("web01\n")
+
+    with pytest.raises(ValueError, match="Unsupported manifest format"):
+        ecst.read_vm_manifest(path)
+
+
+def test_json_must_be_a_list(ecst, tmp_path):
+    path = tmp_path / "vms.json"
+    path.write_text(json.dumps({"vms": {"name": "web01"}}))
+
+    with pytest.raises(ValueError, match="list of VMs"):
+        ecst.read_vm_manifest(path)
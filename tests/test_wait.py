@@ -0,0 +1,99 @@
+"""VCSA readiness waiter against the stub appliance in benchmarks/fake_vcsa.py."""
+
+import argparse
+import importlib.util
+import json
+import threading
+
+import pytest
+
+from conftest import ROOT_DIR
+
+CREDENTIALS = ("administrator@vsphere.local", "VMware1!")
+
+
+@pytest.fixture(scope="module")
+def fake_vcsa():
+    spec = importlib.util.spec_from_file_location("fake_vcsa", ROOT_DIR / "benchmarks" / "fake_vcsa.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def appliance(fake_vcsa):
+    """Start a stub on a free port; returns a function taking the service timeline."""
+    servers = []
+
+    def start(ui_after=0.0, api_after=0.0, health_after=0.0):
+        args = argparse.Namespace(port=0, listen_after=0, ui_after=ui_after, api_after=api_after,
+                                  health_after=health_after, verbose=False)
+        server = fake_vcsa.make_server(args, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(ecst, monkeypatch):
+    monkeypatch.setattr(ecst, "VCSA_POLL_INITIAL_SECONDS", 0.05)
+    monkeypatch.setattr(ecst, "VCSA_POLL_MAX_SECONDS", 0.1)
+
+
+def test_ready_once_every_service_is_up(ecst, appliance):
+    base_url = appliance(ui_after=0.1, api_after=0.3, health_after=0.5)
+
+    ready, phases = ecst.wait_for_vcsa("vcsa.local", 0.5, base_url, CREDENTIALS)
+
+    assert ready
+    by_probe = {phase.probe: phase for phase in phases}
+    assert list(by_probe) == ["tcp", "ui", "session", "health"]
+    assert all(phase.passing for phase in phases)
+    assert (by_probe["tcp"].ready_after <= by_probe["ui"].ready_after
+            <= by_probe["session"].ready_after <= by_probe["health"].ready_after)
+    assert by_probe["health"].ready_after >= 0.5
+    assert by_probe["health"].detail == "health green"
+
+
+def test_without_credentials_an_unauthenticated_api_counts_as_up(ecst, appliance):
+    base_url = appliance()
+
+    ready, phases = ecst.wait_for_vcsa("vcsa.local", 0.5, base_url)
+
+    assert ready
+    assert [(phase.probe, phase.detail) for phase in phases][1:] == [("ui", "HTTP 200"), ("session", "HTTP 401")]
+
+
+def test_times_out_while_health_stays_gray(ecst, appliance):
+    base_url = appliance(health_after=3600)
+
+    ready, phases = ecst.wait_for_vcsa("vcsa.local", 0.5 / 60, base_url, CREDENTIALS)
+
+    assert not ready
+    by_probe = {phase.probe: phase for phase in phases}
+    assert by_probe["session"].passing
+    assert not by_probe["health"].passing and by_probe["health"].ready_after is None
+    assert by_probe["health"].detail == "health gray"
+    assert by_probe["health"].attempts > 1
+
+
+def test_wait_command_exits_non_zero_on_timeout(ecst, appliance, monkeypatch, capsys):
+    base_url = appliance(health_after=3600)
+    for name in ("CONFIG_FILE", "_config_store", "NON_INTERACTIVE", "_vcenter_credentials"):
+        monkeypatch.setattr(ecst, name, getattr(ecst, name))
+    monkeypatch.setattr(ecst, "_vcenter_credentials", None)
+    monkeypatch.setenv("ECST_VCENTER_USER", CREDENTIALS[0])
+    monkeypatch.setenv("ECST_VCENTER_PASSWORD", CREDENTIALS[1])
+
+    code = ecst.run_cli(["--config", str(ROOT_DIR / "config.json"), "wait", "--base-url", base_url,
+                         "--timeout", str(0.5 / 60), "--json"])
+
+    assert code == ecst.EXIT_FAILURE
+    report = json.loads(capsys.readouterr().out)
+    assert report["ready"] is False
+    assert [phase["passing"] for phase in report["phases"]] == [True, True, True, False]
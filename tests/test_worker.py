@@ -0,0 +1,87 @@
+"""PowerShellWorker against the simulated worker in benchmarks/fake_worker.py."""
+
+import sys
+
+import pytest
+
+from conftest import ROOT_DIR
+
+FAKE_WORKER = ROOT_DIR / "benchmarks" / "fake_worker.py"
+
+
+def fake_worker(ecst, *args):
+    command = [sys.executable, str(FAKE_WORKER),
+               "--latency", "0", "--host-latency", "0", "--clone-latency", "0", *args]
+    return ecst.PowerShellWorker(command, echo=False, start_timeout=30.0)
+
+
+@pytest.fixture
+def worker(ecst):
+    worker = fake_worker(ecst)
+    yield worker
+    worker.kill()
+
+
+def test_requests_share_one_process(worker):
+    worker.start()
+    pid = worker.pid
+
+    for host in ("esxi01", "esxi02", "esxi03"):
+        result = worker.invoke(f"$HostName = '{host}'; Set-HostNtp", timeout=30)
+        assert result.returncode == 0
+        assert result.output == [f"  [{host}] Success"]
+
+    assert worker.pid == pid
+    assert worker.starts == 1 and worker.restarts == 0
+
+
+def test_connect_returns_session_and_ping_reports_server(worker):
+    result = worker.connect("vcenter.local", "administrator@vsphere.local", "secret", timeout=30)
+
+    assert result.returncode == 0
+    assert len(result.data) == 1 and result.data[0]["session"]
+    assert worker.connected_server() == "vcenter.local"
+
+
+def test_failed_script_reports_error(ecst):
+    worker = fake_worker(ecst, "--failure-rate", "1")
+    try:
+        result = worker.invoke("$HostName = 'esxi01'; Set-HostNtp", timeout=30)
+    finally:
+        worker.kill()
+
+    assert result.returncode == 1
+    assert result.error == "Failed on host(s): esxi01"
+
+
+def test_dead_worker_is_replaced_on_next_use(worker):
+    worker.start()
+    process = worker._process
+    process.kill()
+    process.wait(timeout=10)
+
+    result = worker.invoke("$HostName = 'esxi01'; Set-HostNtp", timeout=30)
+
+    assert result.returncode == 0
+    assert worker.restarts == 1
+
+
+def test_stop_ends_the_process(worker):
+    worker.start()
+    process = worker._process
+
+    worker.stop(timeout=10)
+
+    assert not worker.is_alive()
+    assert process.poll() is not None
+
+
+def test_credentials_are_sent_beside_the_script(worker):
+    script = "Add-ESXiHostsToCluster -Config $config -Credential $esxiCredential -HostName @('esxi01')"
+
+    result = worker.invoke(script, credentials={"esxiCredential": ("root", "s3cret")}, timeout=30)
+    assert result.returncode == 0
+
+    result = worker.invoke(script, timeout=30)
+    assert result.returncode == 1
+    assert "$esxiCredential is null" in result.error